@@ -0,0 +1,76 @@
+"""add composite indexes for hot queries
+
+Revision ID: 2a2e0b160768
+Revises: d84952239b31
+Create Date: 2026-10-18 14:21:09.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '2a2e0b160768'
+down_revision = 'd84952239b31'
+branch_labels = None
+depends_on = None
+
+#: (table, index name, columns) for each index added by this migration
+INDEXES = [
+    ('transactions', 'ix_transactions_date', ['date']),
+    ('transactions', 'ix_transactions_account_id_date', ['account_id', 'date']),
+    ('ofx_trans', 'ix_ofx_trans_date_posted', ['date_posted']),
+    (
+        'ofx_trans', 'ix_ofx_trans_account_id_date_posted',
+        ['account_id', 'date_posted']
+    ),
+    (
+        'account_balances', 'ix_account_balances_account_id_overall_date',
+        ['account_id', 'overall_date']
+    ),
+    (
+        'ofx_statements', 'ix_ofx_statements_account_id_as_of',
+        ['account_id', 'as_of']
+    ),
+    (
+        'budget_transactions', 'ix_budget_transactions_budget_id_trans_id',
+        ['budget_id', 'trans_id']
+    ),
+    (
+        'fuellog', 'ix_fuellog_vehicle_id_odometer_miles',
+        ['vehicle_id', 'odometer_miles']
+    ),
+]
+
+#: Single-column foreign key indexes made redundant by the new composite
+#: indexes. The ones that were declared explicitly need to be dropped; the
+#: ones that MySQL created implicitly for a foreign key are dropped by MySQL
+#: itself when the composite index is added, but need to be recreated before
+#: the composite index can be dropped on downgrade.
+FK_INDEXES = [
+    ('transactions', 'fk_transactions_account_id_accounts', ['account_id']),
+    (
+        'account_balances', 'fk_account_balances_account_id_accounts',
+        ['account_id']
+    ),
+]
+IMPLICIT_FK_INDEXES = [
+    (
+        'budget_transactions', 'fk_budget_transactions_budget_id_budgets',
+        ['budget_id']
+    ),
+    ('fuellog', 'fk_fuellog_vehicle_id_vehicles', ['vehicle_id']),
+]
+
+
+def upgrade():
+    for table, name, cols in INDEXES:
+        op.create_index(name, table, cols, unique=False)
+    for table, name, _ in FK_INDEXES:
+        op.drop_index(name, table_name=table)
+
+
+def downgrade():
+    for table, name, cols in FK_INDEXES + IMPLICIT_FK_INDEXES:
+        op.create_index(name, table, cols, unique=False)
+    for table, name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,34 @@
+"""add credit payoff results table
+
+Revision ID: 3c8e5f2b9d71
+Revises: 5e9b3d7a1c42
+Create Date: 2026-10-18 20:14:33.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy_utc.sqltypes import UtcDateTime
+
+
+# revision identifiers, used by Alembic.
+revision = '3c8e5f2b9d71'
+down_revision = '5e9b3d7a1c42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'credit_payoff_results',
+        sa.Column('inputs_hash', sa.String(length=64), nullable=False),
+        sa.Column('result', sa.Text(), nullable=False),
+        sa.Column('created', UtcDateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint(
+            'inputs_hash', name=op.f('pk_credit_payoff_results')
+        ),
+        mysql_engine='InnoDB'
+    )
+
+
+def downgrade():
+    op.drop_table('credit_payoff_results')
@@ -0,0 +1,49 @@
+"""add jobs table
+
+Revision ID: 5e9b3d7a1c42
+Revises: 7c3f1e9a4b25
+Create Date: 2026-10-18 18:02:47.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy_utc.sqltypes import UtcDateTime
+
+
+# revision identifiers, used by Alembic.
+revision = '5e9b3d7a1c42'
+down_revision = '7c3f1e9a4b25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('job_type', sa.String(length=50), nullable=False),
+        sa.Column('job_key', sa.String(length=100), nullable=True),
+        sa.Column('params', sa.Text(), nullable=True),
+        sa.Column('state', sa.String(length=10), nullable=False),
+        sa.Column('done', sa.Integer(), nullable=True),
+        sa.Column('total', sa.Integer(), nullable=True),
+        sa.Column('message', sa.String(length=254), nullable=True),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('worker', sa.String(length=100), nullable=True),
+        sa.Column('created', UtcDateTime(timezone=True), nullable=True),
+        sa.Column('started', UtcDateTime(timezone=True), nullable=True),
+        sa.Column('finished', UtcDateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_jobs')),
+        mysql_engine='InnoDB'
+    )
+    op.create_index('ix_jobs_state_id', 'jobs', ['state', 'id'], unique=False)
+    op.create_index(
+        'ix_jobs_job_key_id', 'jobs', ['job_key', 'id'], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_jobs_job_key_id', table_name='jobs')
+    op.drop_index('ix_jobs_state_id', table_name='jobs')
+    op.drop_table('jobs')
@@ -0,0 +1,27 @@
+"""PlaidItem add sync_cursor
+
+Revision ID: 7c3f1e9a4b25
+Revises: 2a2e0b160768
+Create Date: 2026-10-18 16:02:41.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3f1e9a4b25'
+down_revision = '2a2e0b160768'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'plaid_items',
+        sa.Column('sync_cursor', sa.Text(), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column('plaid_items', 'sync_cursor')
@@ -0,0 +1,45 @@
+"""add pay_period_budget_sums table
+
+Revision ID: b7b7536ace7b
+Revises: a1b2c3d4e5f6
+Create Date: 2026-10-18 09:12:31.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7b7536ace7b'
+down_revision = 'a1b2c3d4e5f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'pay_period_budget_sums',
+        sa.Column('start_date', sa.Date(), nullable=False),
+        sa.Column('budget_id', sa.Integer(), nullable=False),
+        sa.Column(
+            'allocated', sa.Numeric(precision=10, scale=4), nullable=False
+        ),
+        sa.Column('spent', sa.Numeric(precision=10, scale=4), nullable=False),
+        sa.Column(
+            'trans_total', sa.Numeric(precision=10, scale=4), nullable=False
+        ),
+        sa.Column('trans_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['budget_id'],
+            ['budgets.id'],
+            name=op.f('fk_pay_period_budget_sums_budget_id_budgets')
+        ),
+        sa.PrimaryKeyConstraint(
+            'start_date', 'budget_id', name=op.f('pk_pay_period_budget_sums')
+        ),
+        mysql_engine='InnoDB'
+    )
+
+
+def downgrade():
+    op.drop_table('pay_period_budget_sums')
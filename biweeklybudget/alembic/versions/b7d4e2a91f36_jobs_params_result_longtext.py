@@ -0,0 +1,33 @@
+"""jobs params and result LONGTEXT
+
+Revision ID: b7d4e2a91f36
+Revises: 3c8e5f2b9d71
+Create Date: 2026-10-18 22:41:05.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d4e2a91f36'
+down_revision = '3c8e5f2b9d71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for col in ['params', 'result']:
+        op.alter_column(
+            'jobs', col, existing_type=sa.Text(), type_=mysql.LONGTEXT(),
+            existing_nullable=True
+        )
+
+
+def downgrade():
+    for col in ['params', 'result']:
+        op.alter_column(
+            'jobs', col, existing_type=mysql.LONGTEXT(), type_=sa.Text(),
+            existing_nullable=True
+        )
@@ -0,0 +1,29 @@
+"""add scheduled_transactions is_active, date index
+
+Revision ID: c9a1f4d2e853
+Revises: b7d4e2a91f36
+Create Date: 2026-10-18 23:12:48.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9a1f4d2e853'
+down_revision = 'b7d4e2a91f36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_scheduled_transactions_is_active_date', 'scheduled_transactions',
+        ['is_active', 'date'], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index(
+        'ix_scheduled_transactions_is_active_date',
+        table_name='scheduled_transactions'
+    )
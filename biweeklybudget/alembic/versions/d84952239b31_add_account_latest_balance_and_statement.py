@@ -0,0 +1,63 @@
+"""add account latest_balance_id and latest_statement_id
+
+Revision ID: d84952239b31
+Revises: b7b7536ace7b
+Create Date: 2026-10-18 11:02:47.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd84952239b31'
+down_revision = 'b7b7536ace7b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'accounts',
+        sa.Column('latest_balance_id', sa.Integer(), nullable=True)
+    )
+    op.add_column(
+        'accounts',
+        sa.Column('latest_statement_id', sa.Integer(), nullable=True)
+    )
+    op.create_foreign_key(
+        'fk_accounts_latest_balance_id_account_balances',
+        'accounts', 'account_balances',
+        ['latest_balance_id'], ['id']
+    )
+    op.create_foreign_key(
+        'fk_accounts_latest_statement_id_ofx_statements',
+        'accounts', 'ofx_statements',
+        ['latest_statement_id'], ['id']
+    )
+    op.execute(
+        'UPDATE accounts SET latest_balance_id=('
+        'SELECT MAX(b.id) FROM account_balances b '
+        'WHERE b.account_id=accounts.id);'
+    )
+    op.execute(
+        'UPDATE accounts SET latest_statement_id=('
+        'SELECT s.id FROM ofx_statements s '
+        'WHERE s.account_id=accounts.id '
+        'ORDER BY s.as_of DESC, s.id DESC LIMIT 1);'
+    )
+
+
+def downgrade():
+    op.drop_constraint(
+        'fk_accounts_latest_statement_id_ofx_statements',
+        'accounts',
+        type_='foreignkey'
+    )
+    op.drop_constraint(
+        'fk_accounts_latest_balance_id_account_balances',
+        'accounts',
+        type_='foreignkey'
+    )
+    op.drop_column('accounts', 'latest_statement_id')
+    op.drop_column('accounts', 'latest_balance_id')
@@ -39,6 +39,8 @@ from datetime import datetime
 import os
 import argparse
 import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
 from pytz import UTC
 
@@ -52,12 +54,36 @@ from biweeklybudget.ofxapi.exceptions import DuplicateFileException
 logger = logging.getLogger(__name__)
 
 
+def parse_ofx_file(path):
+    """
+    Read and parse one OFX/QFX file. This is a module-level function so that
+    it can be run in a :py:class:`concurrent.futures.ProcessPoolExecutor`
+    worker; both arguments and return value must be picklable.
+
+    :param path: absolute path to OFX/QFX file
+    :type path: str
+    :return: 2-tuple of the parsed ``ofxparse.ofxparse.Ofx`` instance and the
+      file modification time as a timezone-aware UTC datetime
+    :rtype: tuple
+    """
+    with open(path, 'rb') as fh:
+        ofx_str = fh.read()
+    ofx = OfxParser.parse(BytesIO(ofx_str))
+    mtime = datetime.fromtimestamp(os.path.getmtime(path), tz=UTC)
+    return ofx, mtime
+
+
 class OfxBackfiller(object):
     """
     Class to backfill OFX in database from files on disk.
+
+    When ``jobs`` is greater than one, files are parsed concurrently in a pool
+    of worker processes, while the parsed statements are still written to the
+    database one at a time, in file modification time order, by the calling
+    process.
     """
 
-    def __init__(self, client, savedir):
+    def __init__(self, client, savedir, jobs=1, batch_size=25):
         """
         Initialize the OFX Backfiller.
 
@@ -66,10 +92,21 @@ class OfxBackfiller(object):
           :py:class:`~.OfxApiRemote`
         :param savedir: directory/path to save statements in
         :type savedir: str
+        :param jobs: number of worker processes to parse files in; 1 parses
+          serially in the current process
+        :type jobs: int
+        :param batch_size: maximum number of statements to send to the
+          client's ``update_statements_ofx`` method at once
+        :type batch_size: int
         """
-        logger.info('Initializing OfxBackfiller with savedir=%s', savedir)
+        logger.info('Initializing OfxBackfiller with savedir=%s jobs=%d '
+                    'batch_size=%d', savedir, jobs, batch_size)
         self.savedir = savedir
         self._client = client
+        self._jobs = max(1, jobs)
+        self._batch_size = max(1, batch_size)
+        self._executor = None
+        self._existing = set()
 
     def run(self):
         """
@@ -77,15 +114,28 @@ class OfxBackfiller(object):
         """
         logger.debug('Checking for Accounts with statement directories')
         accounts = self._client.get_accounts()
-        for acctname in sorted(accounts.keys()):
-            p = os.path.join(self.savedir, acctname)
-            data = accounts[acctname]
-            if not os.path.isdir(p):
-                logger.info('No statement directory for Account %d (%s)',
-                            data['id'], p)
-                continue
-            logger.debug('Found directory %s for Account %d', p, data['id'])
-            self._do_account_dir(data['id'], p)
+        self._existing = set(
+            (acct_id, fname)
+            for acct_id, fname in self._client.get_statement_filenames()
+        )
+        logger.debug('Found %d existing statements', len(self._existing))
+        if self._jobs > 1:
+            self._executor = ProcessPoolExecutor(max_workers=self._jobs)
+        try:
+            for acctname in sorted(accounts.keys()):
+                p = os.path.join(self.savedir, acctname)
+                data = accounts[acctname]
+                if not os.path.isdir(p):
+                    logger.info('No statement directory for Account %d (%s)',
+                                data['id'], p)
+                    continue
+                logger.debug('Found directory %s for Account %d',
+                             p, data['id'])
+                self._do_account_dir(data['id'], p)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
 
     def _do_account_dir(self, acct_id, path):
         """
@@ -98,6 +148,7 @@ class OfxBackfiller(object):
         """
         logger.debug('Doing account %d directory (%s)', acct_id, path)
         files = {}
+        already = 0
         for f in os.listdir(path):
             p = os.path.join(path, f)
             if not os.path.isfile(p):
@@ -105,46 +156,108 @@ class OfxBackfiller(object):
             extension = p.split('.')[-1].lower()
             if extension not in ['ofx', 'qfx']:
                 continue
+            if (acct_id, f) in self._existing:
+                already += 1
+                continue
             files[p] = os.path.getmtime(p)
-        logger.debug('Found %d files for account %d', len(files), acct_id)
+        logger.debug('Found %d new files for account %d (%d already in DB)',
+                     len(files), acct_id, already)
         # run through the files, oldest to newest
-        success = 0
-        already = 0
-        for p in sorted(files, key=files.get):
+        counts = {'success': 0, 'already': already}
+        batch = []
+        for p, parsed in self._parsed_files(sorted(files, key=files.get)):
             try:
-                self._do_one_file(acct_id, p)
-                success += 1
-            except DuplicateFileException:
-                already += 1
-                logger.warning('OFX is already parsed for account; skipping')
+                ofx, mtime = self._parse_one_file(p, parsed=parsed)
             except (InvalidRequestError, IntegrityError, TypeError):
                 raise
             except Exception:
-                logger.error('Exception parsing and inserting file %s',
-                             p, exc_info=True)
+                logger.error('Exception parsing file %s', p, exc_info=True)
+                continue
+            batch.append((p, ofx, mtime))
+            if len(batch) >= self._batch_size:
+                self._write_batch(acct_id, batch, counts)
+                batch = []
+        if batch:
+            self._write_batch(acct_id, batch, counts)
         logger.info('Successfully parsed and inserted %d of %d files for '
-                    'account %d; %d files already in DB', success, len(files),
-                    acct_id, already)
+                    'account %d; %d files already in DB', counts['success'],
+                    len(files), acct_id, counts['already'])
 
-    def _do_one_file(self, acct_id, path):
+    def _parsed_files(self, paths):
         """
-        Parse one OFX file and use OFXUpdater to upsert it into the DB.
+        Generator yielding ``(path, parsed)`` for each of ``paths``, in order.
+        When running serially, ``parsed`` is always None and the file is parsed
+        by :py:meth:`~._parse_one_file`. Otherwise, ``parsed`` is a
+        :py:class:`concurrent.futures.Future` for the return value of
+        :py:func:`~.parse_ofx_file`. At most twice as many files as there are
+        workers are parsed ahead of the writer, to bound memory use.
+
+        :param paths: absolute paths to OFX/QFX files, in the order to write
+          them in
+        :type paths: list
+        """
+        if self._executor is None:
+            for p in paths:
+                yield p, None
+            return
+        pending = deque()
+        paths = deque(paths)
+        while paths or pending:
+            while paths and len(pending) < self._jobs * 2:
+                p = paths.popleft()
+                pending.append((p, self._executor.submit(parse_ofx_file, p)))
+            yield pending.popleft()
+
+    def _parse_one_file(self, path, parsed=None):
+        """
+        Parse one OFX file, or wait for it to be parsed by a worker process.
 
-        :param acct_id: Account ID number
-        :type acct_id: int
         :param path: absolute path to OFX/QFX file
         :type path: str
+        :param parsed: if the file has already been submitted for parsing, the
+          :py:class:`concurrent.futures.Future` for the result of
+          :py:func:`~.parse_ofx_file`
+        :type parsed: concurrent.futures.Future
+        :return: return value of :py:func:`~.parse_ofx_file`
+        :rtype: tuple
         """
-        logger.debug('Handle file %s for Account %d', path, acct_id)
-        with open(path, 'rb') as fh:
-            ofx_str = fh.read()
-        ofx = OfxParser.parse(BytesIO(ofx_str))
-        logger.debug('Parsed OFX')
-        fname = os.path.basename(path)
-        mtime = datetime.fromtimestamp(os.path.getmtime(path), tz=UTC)
-        self._client.update_statement_ofx(
-            acct_id, ofx, mtime=mtime, filename=fname
-        )
+        logger.debug('Parse file %s', path)
+        if parsed is None:
+            return parse_ofx_file(path)
+        return parsed.result()
+
+    def _write_batch(self, acct_id, batch, counts):
+        """
+        Upsert a batch of parsed OFX files into the DB, in order, with one call
+        to the client's ``update_statements_ofx`` method.
+
+        :param acct_id: Account ID number
+        :type acct_id: int
+        :param batch: list of (path, ofx, mtime) 3-tuples
+        :type batch: list
+        :param counts: dict of ``success`` and ``already`` counts to update
+        :type counts: dict
+        """
+        logger.debug('Writing batch of %d statements for Account %d',
+                     len(batch), acct_id)
+        results = self._client.update_statements_ofx([
+            (acct_id, ofx, mtime, os.path.basename(p))
+            for p, ofx, mtime in batch
+        ])
+        for (p, _, _), res in zip(batch, results):
+            if isinstance(res, DuplicateFileException):
+                counts['already'] += 1
+                logger.warning('OFX %s is already parsed for account; '
+                               'skipping', p)
+            elif isinstance(
+                res, (InvalidRequestError, IntegrityError, TypeError)
+            ):
+                raise res
+            elif isinstance(res, Exception):
+                logger.error('Exception inserting file %s: %s', p, res)
+            else:
+                counts['success'] += 1
+                self._existing.add((acct_id, os.path.basename(p)))
         logger.debug('Done updating')
 
 
@@ -175,6 +288,14 @@ def parse_args():
                    type=str, default=None,
                    help='path to unencrypted client key to use for SSL client '
                         'cert auth, if key is not contained in the cert file')
+    p.add_argument('-j', '--jobs', dest='jobs', action='store', type=int,
+                   default=1,
+                   help='number of worker processes to parse OFX files in '
+                        '(default: 1, parse serially)')
+    p.add_argument('-b', '--batch-size', dest='batch_size', action='store',
+                   type=int, default=25,
+                   help='maximum number of statements to upload to the API '
+                        'in one request (default: 25)')
     args = p.parse_args()
     return args
 
@@ -211,7 +332,9 @@ def main():
             raise SystemExit(1)
         save_path = os.path.abspath(args.save_path)
 
-    cls = OfxBackfiller(client, save_path)
+    cls = OfxBackfiller(
+        client, save_path, jobs=args.jobs, batch_size=args.batch_size
+    )
     cls.run()
 
 
@@ -0,0 +1,324 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import logging
+from datetime import date, datetime, time, timedelta
+from math import ceil
+
+import pytz
+from sqlalchemy import and_, func
+
+from biweeklybudget.models.account import Account
+from biweeklybudget.models.account_balance import AccountBalance
+
+logger = logging.getLogger(__name__)
+
+#: Valid values for the ``resolution`` of an :py:class:`~.BalanceHistory`
+RESOLUTIONS = ('day', 'week', 'month')
+
+#: Default maximum number of points returned by
+#: :py:meth:`~.BalanceHistory.chart_data`
+DEFAULT_MAX_POINTS = 500
+
+#: Upper limit on the ``max_points`` of an :py:class:`~.BalanceHistory`
+MAX_POINTS_LIMIT = 5000
+
+#: Day that day and week bucket numbers are counted from; a Monday, so that
+#: weekly buckets start on Mondays.
+BUCKET_EPOCH = date(1970, 1, 5)
+
+
+class BalanceHistory(object):
+    """
+    Class to calculate the history of :py:class:`~.AccountBalance` ledger
+    balances for all accounts, for charting. The last balance for each
+    account in each day, week or month is selected in the database, so the
+    number of rows loaded is bounded by the number of accounts and buckets
+    in the requested date range rather than the number of balances ever
+    recorded. The result is then downsampled to at most ``max_points``.
+    """
+
+    def __init__(self, db_session, start_date=None, end_date=None,
+                 resolution='day', max_points=DEFAULT_MAX_POINTS):
+        """
+        Initialize the history.
+
+        :param db_session: active database session to use
+        :type db_session: sqlalchemy.orm.session.Session
+        :param start_date: first date to include, or None for no limit
+        :type start_date: datetime.date
+        :param end_date: last date to include, or None for no limit
+        :type end_date: datetime.date
+        :param resolution: bucket size; one of :py:const:`~.RESOLUTIONS`
+        :type resolution: str
+        :param max_points: maximum number of points to return, between 1 and
+          :py:const:`~.MAX_POINTS_LIMIT`
+        :type max_points: int
+        :raises: ValueError if any of the parameters are invalid
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(
+                'Invalid resolution "%s"; must be one of: %s' % (
+                    resolution, ', '.join(RESOLUTIONS)
+                )
+            )
+        if not 1 <= max_points <= MAX_POINTS_LIMIT:
+            raise ValueError(
+                'max_points must be between 1 and %d' % MAX_POINTS_LIMIT
+            )
+        if (
+            start_date is not None and end_date is not None and
+            start_date > end_date
+        ):
+            raise ValueError('start_date must not be after end_date')
+        self._db = db_session
+        self.start_date = start_date
+        self.end_date = end_date
+        self.resolution = resolution
+        self.max_points = max_points
+
+    def _bucket_expr(self):
+        """
+        Return a SQL expression for the integer bucket number of
+        :py:attr:`.AccountBalance.overall_date`, for the current resolution.
+        See :py:meth:`~._bucket_date` for the reverse.
+
+        :return: SQL expression for the bucket number
+        :rtype: sqlalchemy.sql.expression.ColumnElement
+        """
+        col = AccountBalance.overall_date
+        if self.resolution == 'month':
+            return func.year(col) * 12 + func.month(col) - 1
+        days = func.datediff(col, BUCKET_EPOCH)
+        if self.resolution == 'week':
+            return func.floor(days / 7)
+        return days
+
+    def _bucket_date(self, bucket):
+        """
+        Return the first date in the specified bucket number.
+
+        :param bucket: bucket number, as returned by :py:meth:`~._bucket_expr`
+        :type bucket: int
+        :return: first date in the bucket
+        :rtype: datetime.date
+        """
+        bucket = int(bucket)
+        if self.resolution == 'month':
+            return date(bucket // 12, (bucket % 12) + 1, 1)
+        if self.resolution == 'week':
+            return BUCKET_EPOCH + timedelta(days=bucket * 7)
+        return BUCKET_EPOCH + timedelta(days=bucket)
+
+    def _date_filters(self):
+        """
+        Return a list of SQL filter expressions restricting
+        :py:attr:`.AccountBalance.overall_date` to the requested date range.
+
+        :return: list of SQL filter expressions
+        :rtype: list
+        """
+        filters = []
+        if self.start_date is not None:
+            filters.append(
+                AccountBalance.overall_date >= self._as_utc(self.start_date)
+            )
+        if self.end_date is not None:
+            filters.append(
+                AccountBalance.overall_date < self._as_utc(
+                    self.end_date + timedelta(days=1)
+                )
+            )
+        return filters
+
+    @staticmethod
+    def _as_utc(d):
+        """
+        Return midnight UTC on the given date.
+
+        :param d: date
+        :type d: datetime.date
+        :return: midnight UTC on ``d``
+        :rtype: datetime.datetime
+        """
+        return datetime.combine(d, time(0, 0, 0), tzinfo=pytz.utc)
+
+    def _bucket_balances(self):
+        """
+        Query the ledger balance of the last :py:class:`~.AccountBalance` for
+        each account in each bucket in the date range.
+
+        :return: list of (bucket number, account ID, ledger balance) tuples,
+          ordered by bucket
+        :rtype: list
+        """
+        bucket = self._bucket_expr()
+        last = self._db.query(
+            AccountBalance.account_id.label('account_id'),
+            bucket.label('bucket'),
+            func.max(AccountBalance.overall_date).label('max_date')
+        ).filter(*self._date_filters()).group_by(
+            AccountBalance.account_id, bucket
+        ).subquery()
+        rows = self._db.query(
+            last.c.bucket, AccountBalance.account_id, AccountBalance.ledger
+        ).join(
+            last, and_(
+                AccountBalance.account_id == last.c.account_id,
+                AccountBalance.overall_date == last.c.max_date
+            )
+        ).order_by(last.c.bucket, AccountBalance.id)
+        return [(int(b), acct_id, ledger) for b, acct_id, ledger in rows]
+
+    def _initial_balances(self):
+        """
+        If a start date was specified, query the ledger balance of the last
+        :py:class:`~.AccountBalance` before it for each account, so that the
+        first point in the range is complete.
+
+        :return: dict of account ID to ledger balance
+        :rtype: dict
+        """
+        if self.start_date is None:
+            return {}
+        last = self._db.query(
+            AccountBalance.account_id.label('account_id'),
+            func.max(AccountBalance.overall_date).label('max_date')
+        ).filter(
+            AccountBalance.overall_date < self._as_utc(self.start_date)
+        ).group_by(AccountBalance.account_id).subquery()
+        rows = self._db.query(
+            AccountBalance.account_id, AccountBalance.ledger
+        ).join(
+            last, and_(
+                AccountBalance.account_id == last.c.account_id,
+                AccountBalance.overall_date == last.c.max_date
+            )
+        ).order_by(AccountBalance.id)
+        return {acct_id: ledger for acct_id, ledger in rows}
+
+    @staticmethod
+    def downsample(points, max_points):
+        """
+        Downsample a list of points by splitting it into at most
+        ``max_points`` consecutive, equally-sized buckets and keeping the last
+        point in each. Since every point is a running balance, the last value
+        in each bucket is the correct balance as of the end of that bucket.
+
+        :param points: points to downsample
+        :type points: list
+        :param max_points: maximum number of points to return
+        :type max_points: int
+        :return: downsampled points, including the last point
+        :rtype: list
+        """
+        if len(points) <= max_points:
+            return points
+        size = int(ceil(len(points) / float(max_points)))
+        # align the buckets to the end of the list, so the latest point is
+        # always kept
+        offset = (len(points) - 1) % size
+        return points[offset::size]
+
+    def chart_data(self):
+        """
+        Return the balance history in the format used by the Morris.js line
+        chart on the index page; a dict with ``keys``, a sorted list of account
+        names, and ``data``, a list of one dict per bucket with a ``date``
+        key (the first date in the bucket, as a ``%Y-%m-%d`` string) and a
+        key for each account name. Account balances are carried forward to
+        buckets where the account had no balance, and are None before the
+        account's first balance.
+
+        :return: chart data
+        :rtype: dict
+        """
+        accounts = {
+            acct_id: name for acct_id, name in self._db.query(
+                Account.id, Account.name
+            )
+        }
+        current = {name: None for name in accounts.values()}
+        for acct_id, ledger in self._initial_balances().items():
+            current[accounts[acct_id]] = self._as_float(ledger)
+        points = []
+        last_bucket = None
+        for bucket, acct_id, ledger in self._bucket_balances():
+            if bucket != last_bucket:
+                if last_bucket is not None:
+                    points.append(self._point(last_bucket, current))
+                last_bucket = bucket
+            current[accounts[acct_id]] = self._as_float(ledger)
+        if last_bucket is not None:
+            points.append(self._point(last_bucket, current))
+        logger.debug(
+            'Balance history has %d %s points; max_points=%d',
+            len(points), self.resolution, self.max_points
+        )
+        return {
+            'data': self.downsample(points, self.max_points),
+            'keys': sorted(accounts.values())
+        }
+
+    def _point(self, bucket, balances):
+        """
+        Return a chart data point for the given bucket and balances.
+
+        :param bucket: bucket number
+        :type bucket: int
+        :param balances: dict of account name to balance
+        :type balances: dict
+        :return: chart data point
+        :rtype: dict
+        """
+        d = dict(balances)
+        d['date'] = self._bucket_date(bucket).strftime('%Y-%m-%d')
+        return d
+
+    @staticmethod
+    def _as_float(ledger):
+        """
+        Return a ledger balance as a float, or 0.0 if it is None.
+
+        :param ledger: ledger balance
+        :type ledger: decimal.Decimal
+        :return: ledger balance
+        :rtype: float
+        """
+        if ledger is None:
+            return 0.0
+        return float(ledger)
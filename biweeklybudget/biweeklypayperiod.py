@@ -35,17 +35,181 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 ################################################################################
 """
 
+import logging
+from calendar import monthrange
 from datetime import timedelta, datetime, date
 from functools import total_ordering
-from sqlalchemy import or_, asc
-from dateutil import relativedelta
+from operator import attrgetter
+from threading import RLock
+from bisect import bisect_right
+import weakref
+from sqlalchemy import or_, asc, event, func, insert
+from sqlalchemy.orm import Session, scoped_session, selectinload
 from collections import defaultdict
 from decimal import Decimal
 
 from biweeklybudget import settings
-from biweeklybudget.models import Transaction, ScheduledTransaction, Budget
+from biweeklybudget.models import (
+    Transaction, ScheduledTransaction, Budget, Account, PayPeriodBudgetSum
+)
+from biweeklybudget.payperiod_entry import PayPeriodEntry
 from biweeklybudget.utils import dtnow
 
+logger = logging.getLogger(__name__)
+
+#: Number of days between the start dates of consecutive pay periods.
+PERIOD_INTERVAL_DAYS = 14
+
+#: Process-wide registry of interned :py:class:`~.BiweeklyPayPeriod` instances.
+#: Keys are sessions (weakly referenced); values are dicts of the periods
+#: interned for that session, keyed by start date. Periods are strongly
+#: referenced, so their cached data lives until the session flushes, ends its
+#: transaction or is garbage collected, even if no caller holds them in the
+#: meantime. See :py:meth:`~.BiweeklyPayPeriod.for_start_date`.
+_period_registry = weakref.WeakKeyDictionary()
+
+#: Lock protecting :py:data:`~._period_registry`.
+_period_registry_lock = RLock()
+
+
+class _NoSession(object):
+    """
+    :py:data:`~._period_registry` key for periods created without a session
+    (i.e. in benchmarks); ``None`` cannot be weakly referenced.
+    """
+    pass
+
+
+_NO_SESSION = _NoSession()
+
+
+def period_start_for_date(dt):
+    """
+    Return the start date of the pay period containing ``dt``. The start date
+    is calculated directly from the number of whole pay periods between
+    :py:attr:`~biweeklybudget.settings.PAY_PERIOD_START_DATE` and ``dt``, so
+    this runs in constant time regardless of how far ``dt`` is from the start
+    date.
+
+    :param dt: datetime or date to find the pay period start date for
+    :type dt: :py:class:`~datetime.datetime` or :py:class:`~datetime.date`
+    :return: start date of the pay period containing ``dt``
+    :rtype: datetime.date
+    """
+    if isinstance(dt, datetime):
+        dt = dt.date()
+    # floor division rounds towards negative infinity, so this is also
+    # correct for dates before the anchor date
+    num_periods = (dt - _anchor_date()).days // PERIOD_INTERVAL_DAYS
+    return period_start_for_index(num_periods)
+
+
+def period_start_for_index(idx):
+    """
+    Return the start date of the pay period ``idx`` periods after (or before,
+    if negative) the one starting on
+    :py:attr:`~biweeklybudget.settings.PAY_PERIOD_START_DATE`.
+
+    :param idx: pay period index
+    :type idx: int
+    :return: start date of the pay period
+    :rtype: datetime.date
+    """
+    return _anchor_date() + timedelta(days=int(idx) * PERIOD_INTERVAL_DAYS)
+
+
+def period_index_sql(date_expr):
+    """
+    Return a SQL expression for the index of the pay period containing
+    ``date_expr``, relative to the one starting on
+    :py:attr:`~biweeklybudget.settings.PAY_PERIOD_START_DATE` (see
+    :py:func:`~.period_start_for_index`). This allows grouping rows by pay
+    period in the database.
+
+    :param date_expr: SQL expression or column for a date
+    :type date_expr: sqlalchemy.sql.expression.ColumnElement
+    :return: SQL expression for the pay period index
+    :rtype: sqlalchemy.sql.expression.ColumnElement
+    """
+    return func.floor(
+        func.datediff(date_expr, _anchor_date()) / PERIOD_INTERVAL_DAYS
+    )
+
+
+def _anchor_date():
+    """
+    Return :py:attr:`~biweeklybudget.settings.PAY_PERIOD_START_DATE` as a
+    :py:class:`datetime.date`.
+
+    :return: pay period anchor date
+    :rtype: datetime.date
+    """
+    anchor = settings.PAY_PERIOD_START_DATE
+    if isinstance(anchor, datetime):
+        anchor = anchor.date()
+    return anchor
+
+
+def _registry_session(db_session):
+    """
+    Return the object to use as a :py:data:`~._period_registry` key. For a
+    :py:class:`sqlalchemy.orm.scoping.scoped_session`, this is the underlying
+    :py:class:`sqlalchemy.orm.session.Session` for the current scope (thread),
+    so that interned periods (and their cached data) are never shared between
+    threads or outlive the request-scoped session.
+
+    :param db_session: database session passed to BiweeklyPayPeriod
+    :return: session object to use in registry keys
+    """
+    if isinstance(db_session, scoped_session):
+        return db_session()
+    if db_session is None:
+        return _NO_SESSION
+    return db_session
+
+
+def clear_period_registry(db_session=None):
+    """
+    Remove interned :py:class:`~.BiweeklyPayPeriod` instances from the
+    process-wide registry. If ``db_session`` is specified, only remove periods
+    interned for that session; otherwise clear the entire registry.
+
+    This is called automatically (via SQLAlchemy session events) whenever a
+    session flushes, commits, rolls back or otherwise ends a transaction
+    (i.e. when it is closed), so that a subsequent
+    :py:meth:`~.BiweeklyPayPeriod.period_for_date` call never returns a period
+    with cached data from before the change. Instances already held by callers
+    keep their cached data; use :py:meth:`~.BiweeklyPayPeriod.clear_cache` for
+    those.
+
+    :param db_session: session to clear interned periods for, or None for all
+    :type db_session: sqlalchemy.orm.session.Session
+    """
+    with _period_registry_lock:
+        if db_session is None:
+            _period_registry.clear()
+            return
+        _period_registry.pop(_registry_session(db_session), None)
+
+
+def _handle_session_change(session, *args):
+    """
+    SQLAlchemy ``after_flush``, ``after_commit``, ``after_soft_rollback`` and
+    ``after_transaction_end`` event handler; calls
+    :py:func:`~.clear_period_registry` for ``session``.
+
+    :param session: the session that changed
+    :type session: sqlalchemy.orm.session.Session
+    """
+    clear_period_registry(session)
+
+
+for _evt in [
+    'after_flush', 'after_commit', 'after_soft_rollback',
+    'after_transaction_end'
+]:
+    event.listen(Session, _evt, _handle_session_change)
+
 
 @total_ordering
 class BiweeklyPayPeriod(object):
@@ -73,8 +237,47 @@ class BiweeklyPayPeriod(object):
         self._start_date = start_date
         self._end_date = start_date + self.period_length
         self._data_cache = {}
+        self._sums_cache = None
         self._income_budget_id_list = None
 
+    @staticmethod
+    def for_start_date(start_date, db_session):
+        """
+        Return the interned BiweeklyPayPeriod starting on ``start_date`` for
+        ``db_session``, creating and registering it if it does not already
+        exist. Repeated calls (including via :py:attr:`~.next`,
+        :py:attr:`~.previous` and :py:meth:`~.period_for_date`) return the same
+        object, so data cached by :py:attr:`~._data` (or loaded by
+        :py:meth:`~.load_budget_sums`) is shared rather than recomputed. The
+        registry holds interned periods until ``db_session`` flushes or ends
+        its transaction, so callers do not need to keep a reference to a
+        period for its cached data to be reused.
+
+        ``start_date`` must be the actual start date of a pay period; it is
+        not validated against :py:attr:`~biweeklybudget.settings.PAY_PERIOD_START_DATE`.
+
+        :param start_date: starting date of the pay period
+        :type start_date: :py:class:`datetime.date` or
+          :py:class:`datetime.datetime`
+        :param db_session: active database session to use for queries
+        :type db_session: sqlalchemy.orm.session.Session
+        :return: BiweeklyPayPeriod starting on ``start_date``
+        :rtype: BiweeklyPayPeriod
+        """
+        if isinstance(start_date, datetime):
+            start_date = start_date.date()
+        sess = _registry_session(db_session)
+        with _period_registry_lock:
+            periods = _period_registry.get(sess)
+            if periods is None:
+                periods = {}
+                _period_registry[sess] = periods
+            p = periods.get(start_date)
+            if p is None:
+                p = BiweeklyPayPeriod(start_date, db_session)
+                periods[start_date] = p
+        return p
+
     @property
     def period_interval(self):
         """
@@ -83,7 +286,7 @@ class BiweeklyPayPeriod(object):
         :return: interval between BiweeklyPayPeriods
         :rtype: datetime.timedelta
         """
-        return timedelta(days=14)
+        return timedelta(days=PERIOD_INTERVAL_DAYS)
 
     @property
     def period_length(self):
@@ -126,12 +329,15 @@ class BiweeklyPayPeriod(object):
     @property
     def next(self):
         """
-        Return the BiweeklyPayPeriod following this one.
+        Return the BiweeklyPayPeriod following this one. This is looked up via
+        :py:meth:`~.for_start_date` on every access rather than held by this
+        instance, so that after the registry is cleared (i.e. by a flush) a
+        new period with fresh data is returned.
 
         :return: next BiweeklyPayPeriod after this one
         :rtype: BiweeklyPayPeriod
         """
-        return BiweeklyPayPeriod(
+        return BiweeklyPayPeriod.for_start_date(
             (self.start_date + self.period_interval),
             self._db
         )
@@ -139,12 +345,14 @@ class BiweeklyPayPeriod(object):
     @property
     def previous(self):
         """
-        Return the BiweeklyPayPeriod preceding this one.
+        Return the BiweeklyPayPeriod preceding this one. Like
+        :py:attr:`~.next`, this is looked up via :py:meth:`~.for_start_date`
+        on every access.
 
         :return: previous BiweeklyPayPeriod before this one
         :rtype: BiweeklyPayPeriod
         """
-        return BiweeklyPayPeriod(
+        return BiweeklyPayPeriod.for_start_date(
             (self.start_date - self.period_interval),
             self._db
         )
@@ -168,7 +376,9 @@ class BiweeklyPayPeriod(object):
         Given a datetime, return the BiweeklyPayPeriod instance describing the
         pay period containing this date.
 
-        .. todo:: This is a very naive, poorly-performing implementation.
+        The period start date is calculated in constant time by
+        :py:func:`~.period_start_for_date`, and the result is interned via
+        :py:meth:`~.for_start_date`.
 
         :param dt: datetime or date to find the pay period for
         :type dt: :py:class:`~datetime.datetime` or :py:class:`~datetime.date`
@@ -177,20 +387,241 @@ class BiweeklyPayPeriod(object):
         :return: BiweeklyPayPeriod containing the specified date
         :rtype: :py:class:`~.BiweeklyPayPeriod`
         """
-        p = BiweeklyPayPeriod(settings.PAY_PERIOD_START_DATE, db_session)
-        if isinstance(dt, datetime):
-            dt = dt.date()
-        if dt < p.start_date:
-            while True:
-                if p.end_date >= dt >= p.start_date:
-                    return p
-                p = p.previous
-        if dt > p.end_date:
-            while True:
-                if p.end_date >= dt >= p.start_date:
-                    return p
-                p = p.next
-        return p
+        return BiweeklyPayPeriod.for_start_date(
+            period_start_for_date(dt), db_session
+        )
+
+    @staticmethod
+    def prefetch_data(periods, db_session):
+        """
+        Populate the data cache (:py:attr:`~._data`) of every BiweeklyPayPeriod
+        in ``periods`` using a fixed number of queries, regardless of how many
+        periods are given. This loads all :py:class:`~.Budget` and
+        :py:class:`~.Account` records (so that relationships to them resolve
+        from the session identity map), all :py:class:`~.Transaction` records
+        (and their :py:class:`~.BudgetTransaction` and
+        :py:class:`~.TxnReconcile` children) from the earliest start date to
+        the latest end date of ``periods``, and all active
+        :py:class:`~.ScheduledTransaction` records; the results are then
+        split into the individual periods in memory.
+
+        The resulting :py:attr:`~.transactions_list`, :py:attr:`~.budget_sums`
+        and :py:attr:`~.overall_sums` of each period are identical to what it
+        would have calculated on its own. Periods that already have cached
+        data are left unchanged. ``periods`` must not overlap.
+
+        :param periods: pay periods to load data for
+        :type periods: list of :py:class:`~.BiweeklyPayPeriod`
+        :param db_session: active database session to use for queries
+        :type db_session: sqlalchemy.orm.session.Session
+        """
+        periods = sorted(p for p in periods if len(p._data_cache) == 0)
+        if len(periods) == 0:
+            return
+        starts = [p.start_date for p in periods]
+        budgets = db_session.query(Budget).all()
+        db_session.query(Account).all()
+        txns = db_session.query(Transaction).options(
+            selectinload(Transaction.budget_transactions),
+            selectinload(Transaction.reconcile)
+        ).filter(
+            Transaction.date >= periods[0].start_date,
+            Transaction.date <= periods[-1].end_date
+        ).order_by(asc(Transaction.id)).all()
+        sched = db_session.query(ScheduledTransaction).filter(
+            ScheduledTransaction.is_active.__eq__(True)
+        ).order_by(asc(ScheduledTransaction.id)).all()
+        # imported here to avoid a circular import
+        from biweeklybudget.recurrence import RecurrenceEngine
+        by_type = defaultdict(list)
+        for t in sched:
+            by_type[t.schedule_type].append(t)
+        by_period = {p.start_date: defaultdict(list) for p in periods}
+        for t in txns:
+            idx = bisect_right(starts, t.date) - 1
+            if idx >= 0 and t.date <= periods[idx].end_date:
+                by_period[starts[idx]]['transactions'].append(t)
+        # "date", "monthly" and "annual" schedules occur at most once per
+        # period; expand them for all periods at once.
+        occurrences = RecurrenceEngine(
+            by_type['date'] + by_type['monthly'] + by_type['annual']
+        ).expand(periods[0].start_date, periods[-1].end_date)
+        for p in periods:
+            for occ in occurrences[p.start_date]:
+                by_period[p.start_date]['st_' + occ.sched_type].append(
+                    occ.sched_trans
+                )
+        per_period = sorted(
+            by_type['per period'], key=lambda x: (x.num_per_period, x.amount)
+        )
+        weekly = sorted(
+            by_type['weekly'], key=lambda x: (x.day_of_week, x.amount)
+        )
+        for p in periods:
+            data = by_period[p.start_date]
+            p._data_cache = {
+                'transactions': data['transactions'],
+                'st_date': data['st_date'],
+                'st_per_period': per_period,
+                'st_monthly': data['st_monthly'],
+                'st_weekly': weekly,
+                'st_annual': data['st_annual']
+            }
+            p._data_cache['all_trans_list'] = p._make_combined_transactions()
+            p._data_cache['budget_sums'] = p._make_budget_sums(budgets=budgets)
+            p._data_cache['overall_sums'] = p._make_overall_sums()
+
+    @staticmethod
+    def load_budget_sums(periods, db_session):
+        """
+        Populate :py:attr:`~.budget_sums` and :py:attr:`~.overall_sums` of
+        every BiweeklyPayPeriod in ``periods`` from the materialized
+        :py:class:`~.PayPeriodBudgetSum` table, without loading any
+        transactions. Periods that have not been materialized yet are
+        calculated in one batch via :py:meth:`~.prefetch_data`. Periods that
+        already have cached data are left unchanged.
+
+        This only reads from ``db_session``; stored sums are maintained when
+        data is written (see :py:func:`~.handle_pay_period_sums_update`). So
+        only periods affected by a write, or stored by the ``payperiodsums
+        rebuild`` command, have stored sums. Other periods (i.e. upcoming
+        periods that nothing has been written to yet) are calculated on every
+        call. Storing them here would make GET requests write, and could
+        store sums calculated from data that a concurrent transaction is
+        changing.
+
+        :param periods: pay periods to load sums for
+        :type periods: list of :py:class:`~.BiweeklyPayPeriod`
+        :param db_session: active database session to use for queries
+        :type db_session: sqlalchemy.orm.session.Session
+        """
+        periods = sorted(
+            p for p in periods
+            if len(p._data_cache) == 0 and p._sums_cache is None
+        )
+        if len(periods) == 0:
+            return
+        budgets = db_session.query(Budget).all()
+        rows = defaultdict(list)
+        for r in db_session.query(PayPeriodBudgetSum).filter(
+            PayPeriodBudgetSum.start_date.in_([p.start_date for p in periods])
+        ).all():
+            rows[r.start_date].append(r)
+        missing = []
+        for p in periods:
+            if len(rows[p.start_date]) == 0:
+                missing.append(p)
+                continue
+            bsums = p._budget_sums_from_rows(rows[p.start_date], budgets)
+            p._sums_cache = {
+                'budget_sums': bsums,
+                'overall_sums': p._make_overall_sums(budget_sums=bsums)
+            }
+        if len(missing) == 0:
+            return
+        logger.debug('Calculating budget sums for: %s', missing)
+        BiweeklyPayPeriod.prefetch_data(missing, db_session)
+
+    @staticmethod
+    def store_budget_sums(start_dates, db_session):
+        """
+        Calculate the budget sums of the pay periods starting on each of
+        ``start_dates`` from the data in ``db_session``'s current transaction,
+        and replace their stored :py:class:`~.PayPeriodBudgetSum` rows. The
+        statements execute immediately and no instances are added to the
+        session, so this can be called while the session is flushing.
+
+        :param start_dates: pay period start dates to store sums for
+        :type start_dates: set
+        :param db_session: active database session to use
+        :type db_session: sqlalchemy.orm.session.Session
+        """
+        if len(start_dates) == 0:
+            return
+        # new (not interned) instances, so cached periods are not affected
+        periods = [BiweeklyPayPeriod(d, db_session) for d in sorted(start_dates)]
+        BiweeklyPayPeriod.prefetch_data(periods, db_session)
+        PayPeriodBudgetSum.invalidate(db_session, start_dates)
+        rows = [r for p in periods for r in p._budget_sum_rows()]
+        logger.debug('Storing budget sums for: %s', periods)
+        if len(rows) > 0:
+            db_session.execute(insert(PayPeriodBudgetSum), rows)
+
+    def _budget_sum_rows(self):
+        """
+        Return a list of :py:class:`~.PayPeriodBudgetSum` column values
+        representing :py:attr:`~.budget_sums` for this period.
+
+        :return: list of PayPeriodBudgetSum column value dicts for this period
+        :rtype: list
+        """
+        counts = defaultdict(int)
+        for t in self.transactions_list:
+            for budg_id in t['budgets'].keys():
+                counts[budg_id] += 1
+            if t['budgeted_amount'] is not None and t.get(
+                'planned_budget_id', None
+            ) is not None and t['planned_budget_id'] not in t['budgets']:
+                counts[t['planned_budget_id']] += 1
+        return [
+            {
+                'start_date': self.start_date,
+                'budget_id': budg_id,
+                'allocated': data['allocated'],
+                'spent': data['spent'],
+                'trans_total': data['trans_total'],
+                'trans_count': counts[budg_id]
+            } for budg_id, data in self.budget_sums.items()
+        ]
+
+    def _budget_sums_from_rows(self, rows, budgets):
+        """
+        Given a list of :py:class:`~.PayPeriodBudgetSum` rows for this period
+        and a list of all :py:class:`~.Budget` objects, return a dict in the
+        same format as :py:meth:`~._make_budget_sums`.
+
+        :param rows: PayPeriodBudgetSum rows for this period
+        :type rows: list
+        :param budgets: all Budgets
+        :type budgets: list
+        :return: dict of dicts, transaction sums and amounts per budget
+        :rtype: dict
+        """
+        budgets_by_id = {b.id: b for b in budgets}
+        res = {}
+        for b in budgets:
+            if b.is_active and b.is_periodic:
+                res[b.id] = self._empty_budget_sum(b)
+        for r in rows:
+            b = budgets_by_id[r.budget_id]
+            if not b.is_periodic:
+                continue
+            if not b.is_active and r.trans_count < 1:
+                continue
+            if b.id not in res:
+                res[b.id] = self._empty_budget_sum(b)
+            res[b.id]['allocated'] = r.allocated
+            res[b.id]['spent'] = r.spent
+            res[b.id]['trans_total'] = r.trans_total
+        return self._set_budget_sums_remaining(res)
+
+    @staticmethod
+    def _empty_budget_sum(budget):
+        """
+        Return the initial :py:meth:`~._make_budget_sums` dict for ``budget``.
+
+        :param budget: the budget to return a dict for
+        :type budget: Budget
+        :return: initial budget sums dict for the budget
+        :rtype: dict
+        """
+        return {
+            'budget_amount': budget.starting_balance,
+            'allocated': Decimal('0.0'),
+            'spent': Decimal('0.0'),
+            'trans_total': Decimal('0.0'),
+            'is_income': budget.is_income
+        }
 
     def filter_query(self, query, date_prop):
         """
@@ -334,56 +765,81 @@ class BiweeklyPayPeriod(object):
         :return: list of annual ScheduledTransactions in this pay period
         :rtype: list
         """
-        result = []
-        for t in annual_transactions:
+        return [
+            t for t in annual_transactions
+            if self._annual_date(t.annual_month, t.annual_day) is not None
+        ]
+
+    def _filter_monthly_for_period(self, monthly_transactions):
+        """
+        Filter monthly transactions to only those whose day of month actually
+        occurs within this pay period. The SQL in
+        :py:meth:`~._scheduled_transactions_monthly` only compares day numbers,
+        so it can return a day that the month in question does not have.
+
+        :param monthly_transactions: list of monthly ScheduledTransactions
+        :return: list of monthly ScheduledTransactions in this pay period
+        :rtype: list
+        """
+        return [
+            t for t in monthly_transactions
+            if self._monthly_date(t.day_of_month) is not None
+        ]
+
+    def _monthly_date(self, day_of_month):
+        """
+        Return the date in this pay period that falls on ``day_of_month``, or
+        None if there is none. Months that do not have ``day_of_month`` (i.e.
+        the 31st in a 30-day month) are skipped, the same as in
+        :py:class:`~biweeklybudget.recurrence.RecurrenceEngine`.
+
+        :param day_of_month: day of the month
+        :type day_of_month: int
+        :return: date of ``day_of_month`` in this pay period, or None
+        :rtype: datetime.date
+        """
+        # a pay period spans at most two months
+        for d in (self.start_date, self.end_date):
+            if day_of_month > monthrange(d.year, d.month)[1]:
+                continue
+            candidate = date(d.year, d.month, day_of_month)
+            if self.start_date <= candidate <= self.end_date:
+                return candidate
+        return None
+
+    def _annual_date(self, month, day):
+        """
+        Return the date in this pay period that falls on ``month`` / ``day``,
+        or None if there is none. Years that do not have the date (i.e.
+        February 29th in a non-leap year) are skipped, the same as in
+        :py:class:`~biweeklybudget.recurrence.RecurrenceEngine`.
+
+        :param month: month of the year
+        :type month: int
+        :param day: day of the month
+        :type day: int
+        :return: date of ``month`` / ``day`` in this pay period, or None
+        :rtype: datetime.date
+        """
+        for year in sorted({self.start_date.year, self.end_date.year}):
             try:
-                # Try to construct the date for this year
-                annual_date = date(
-                    year=self.start_date.year,
-                    month=t.annual_month,
-                    day=t.annual_day
-                )
+                candidate = date(year, month, day)
             except ValueError:
-                # Invalid date (e.g., Feb 29 in non-leap year)
-                # Try next year in case period spans year boundary
-                try:
-                    annual_date = date(
-                        year=self.start_date.year + 1,
-                        month=t.annual_month,
-                        day=t.annual_day
-                    )
-                except ValueError:
-                    # Still invalid, skip this transaction
-                    continue
-
-            # Check if this date falls in our pay period
-            if self.start_date <= annual_date <= self.end_date:
-                result.append(t)
                 continue
-
-            # If the pay period spans a year boundary, check the next year too
-            if self.end_date.year > self.start_date.year:
-                try:
-                    annual_date_next = date(
-                        year=self.end_date.year,
-                        month=t.annual_month,
-                        day=t.annual_day
-                    )
-                    if self.start_date <= annual_date_next <= self.end_date:
-                        result.append(t)
-                except ValueError:
-                    # Invalid date, skip
-                    pass
-        return result
+            if self.start_date <= candidate <= self.end_date:
+                return candidate
+        return None
 
     @property
     def transactions_list(self):
         """
-        Return an ordered list of dicts, each representing a transaction for
-        this pay period. Dicts have keys and values as described in
-        :py:meth:`~._trans_dict`.
+        Return an ordered list of :py:class:`~.PayPeriodEntry`, each
+        representing a transaction for this pay period. Entries are read-only
+        mappings with keys and values as described in :py:meth:`~._trans_dict`,
+        so they can be used in place of the dicts previously returned here;
+        use :py:attr:`~.PayPeriodEntry.as_dict` for an actual dict.
 
-        :return: ordered list of transaction dicts
+        :return: ordered list of transaction entries
         :rtype: list
         """
         return self._data['all_trans_list']
@@ -418,7 +874,9 @@ class BiweeklyPayPeriod(object):
             'transactions': self._transactions().all(),
             'st_date': self._scheduled_transactions_date().all(),
             'st_per_period': self._scheduled_transactions_per_period().all(),
-            'st_monthly': self._scheduled_transactions_monthly().all(),
+            'st_monthly': self._filter_monthly_for_period(
+                self._scheduled_transactions_monthly().all()
+            ),
             'st_weekly': self._scheduled_transactions_weekly().all(),
             'st_annual': self._filter_annual_for_period(
                 self._scheduled_transactions_annual().all()
@@ -432,14 +890,17 @@ class BiweeklyPayPeriod(object):
     def clear_cache(self):
         """
         Clear the cached transaction, budget and sum data stored in
-        `self._data_cache` and returned by :py:attr:`~._data`.
+        `self._data_cache` and returned by :py:attr:`~._data`, as well as sums
+        loaded by :py:meth:`~.load_budget_sums`.
         """
         self._data_cache = {}
+        self._sums_cache = None
 
     def _make_combined_transactions(self):
         """
         Combine all Transactions and ScheduledTransactions from
-        ``self._data_cache`` into one ordered list of similar dicts, adding
+        ``self._data_cache`` into one ordered list of
+        :py:class:`~.PayPeriodEntry`, adding
         dates to the monthly ScheduledTransactions as appropriate and excluding
         ScheduledTransactions that have been converted to real Transactions.
         Store the finished list back into ``self._data_cache``.
@@ -471,16 +932,11 @@ class BiweeklyPayPeriod(object):
             for occ_idx in range(remaining):
                 d = self._trans_dict(t, weekly_occurrence=occ_idx)
                 ordered.append(d)
-        for t in sorted(unordered, key=lambda k: k['date']):
-            ordered.append(t)
-
-        def sortkey(k):
-            d = k.get('date', None)
-            if d is None:
-                d = date.min
-            return d, k['amount']
-
-        return sorted(ordered, key=sortkey)
+        # sort_key is calculated once per entry, when it is created. The sort
+        # is stable, so entries with the same date and amount keep the order
+        # they were added in above.
+        ordered.extend(unordered)
+        return sorted(ordered, key=attrgetter('sort_key'))
 
     @property
     def budget_sums(self):
@@ -491,9 +947,11 @@ class BiweeklyPayPeriod(object):
         :return: dict of dicts, transaction sums and amounts per budget
         :rtype: dict
         """
+        if len(self._data_cache) == 0 and self._sums_cache is not None:
+            return self._sums_cache['budget_sums']
         return self._data['budget_sums']
 
-    def _make_budget_sums(self):
+    def _make_budget_sums(self, budgets=None):
         """
         Find the sums of all transactions per periodic budget ID ; return a dict
         where keys are budget IDs and values are per-budget dicts containing:
@@ -514,21 +972,22 @@ class BiweeklyPayPeriod(object):
           budget. This is ``budget_amount`` minus the greater of ``allocated``
           or ``trans_total``. For income budgets, this is always positive.
 
+        :param budgets: if specified, a list of already-loaded Budgets to use
+          instead of querying for active periodic budgets.
+        :type budgets: list
         :return: dict of dicts, transaction sums and amounts per budget
         :rtype: dict
         """
         res = {}
-        for b in self._db.query(Budget).filter(
-            Budget.is_active.__eq__(True),
-            Budget.is_periodic.__eq__(True)
-        ).all():
-            res[b.id] = {
-                'budget_amount': b.starting_balance,
-                'allocated': Decimal('0.0'),
-                'spent': Decimal('0.0'),
-                'trans_total': Decimal('0.0'),
-                'is_income': b.is_income
-            }
+        if budgets is None:
+            budgets = self._db.query(Budget).filter(
+                Budget.is_active.__eq__(True),
+                Budget.is_periodic.__eq__(True)
+            ).all()
+        else:
+            budgets = [b for b in budgets if b.is_active and b.is_periodic]
+        for b in budgets:
+            res[b.id] = self._empty_budget_sum(b)
         for t in self.transactions_list:
             # if a ScheduledTransaction, update some values and then continue
             if t['type'] == 'ScheduledTransaction':
@@ -539,13 +998,7 @@ class BiweeklyPayPeriod(object):
                         b = self._db.query(Budget).get(budg_id)
                         if not b.is_periodic:
                             continue
-                        res[b.id] = {
-                            'budget_amount': b.starting_balance,
-                            'allocated': Decimal('0.0'),
-                            'spent': Decimal('0.0'),
-                            'trans_total': Decimal('0.0'),
-                            'is_income': b.is_income
-                        }
+                        res[b.id] = self._empty_budget_sum(b)
                     res[budg_id]['allocated'] += budg_data['amount']
                     res[budg_id]['trans_total'] += budg_data['amount']
                 continue
@@ -557,13 +1010,7 @@ class BiweeklyPayPeriod(object):
                     b = self._db.query(Budget).get(budg_id)
                     if not b.is_periodic:
                         continue
-                    res[b.id] = {
-                        'budget_amount': b.starting_balance,
-                        'allocated': Decimal('0.0'),
-                        'spent': Decimal('0.0'),
-                        'trans_total': Decimal('0.0'),
-                        'is_income': b.is_income
-                    }
+                    res[b.id] = self._empty_budget_sum(b)
                 # update the budget's transactions total and spent amount
                 res[budg_id]['trans_total'] += budg_data['amount']
                 res[budg_id]['spent'] += budg_data['amount']
@@ -583,14 +1030,21 @@ class BiweeklyPayPeriod(object):
                     b = self._db.query(Budget).get(bid)
                     if not b.is_periodic:
                         continue
-                    res[bid] = {
-                        'budget_amount': b.starting_balance,
-                        'allocated': Decimal('0.0'),
-                        'spent': Decimal('0.0'),
-                        'trans_total': Decimal('0.0'),
-                        'is_income': b.is_income
-                    }
+                    res[bid] = self._empty_budget_sum(b)
                 res[bid]['allocated'] += t['budgeted_amount']
+        return self._set_budget_sums_remaining(res)
+
+    @staticmethod
+    def _set_budget_sums_remaining(res):
+        """
+        Given a :py:meth:`~._make_budget_sums` result dict, set the
+        ``remaining`` key of each budget's dict and return the result.
+
+        :param res: dict of dicts, transaction sums and amounts per budget
+        :type res: dict
+        :return: ``res``, with ``remaining`` set for each budget
+        :rtype: dict
+        """
         for b in res.keys():
             if res[b]['trans_total'] > res[b]['allocated']:
                 res[b]['remaining'] = res[
@@ -611,9 +1065,11 @@ class BiweeklyPayPeriod(object):
         :return: dict describing sums for the pay period
         :rtype: dict
         """
+        if len(self._data_cache) == 0 and self._sums_cache is not None:
+            return self._sums_cache['overall_sums']
         return self._data['overall_sums']
 
-    def _make_overall_sums(self):
+    def _make_overall_sums(self, budget_sums=None):
         """
         Return a dict describing the overall sums for this pay period, namely:
 
@@ -632,9 +1088,14 @@ class BiweeklyPayPeriod(object):
           ``allocated`` or ``spent`` for current or future pay periods, or minus
           ``spent`` for pay periods ending in the past (:py:attr:`~.is_in_past`)
 
+        :param budget_sums: if specified, the :py:meth:`~._make_budget_sums`
+          result to use instead of ``self._data_cache['budget_sums']``
+        :type budget_sums: dict
         :return: dict describing sums for the pay period
         :rtype: dict
         """
+        if budget_sums is None:
+            budget_sums = self._data_cache['budget_sums']
         budgets_total = Decimal('0.0')
         res = {
             'allocated': Decimal('0.0'),
@@ -642,7 +1103,7 @@ class BiweeklyPayPeriod(object):
             'income': Decimal('0.0'),
             'remaining': Decimal('0.0')
         }
-        for _, b in self._data_cache['budget_sums'].items():
+        for _, b in budget_sums.items():
             if b['is_income']:
                 if abs(b['trans_total']) > abs(b['budget_amount']):
                     res['income'] += abs(b['trans_total'])
@@ -660,10 +1121,12 @@ class BiweeklyPayPeriod(object):
 
     def _trans_dict(self, t, weekly_occurrence=0):
         """
-        Given a Transaction or ScheduledTransaction, return a dict of a
-        common format describing the object.
+        Given a Transaction or ScheduledTransaction, return a
+        :py:class:`~.PayPeriodEntry` of a common format describing the object.
+        PayPeriodEntry is a compact, read-only mapping; :py:attr:`~.as_dict`
+        returns it as a plain dict.
 
-        The resulting dict will have the following layout:
+        The resulting entry will have the following keys (and attributes):
 
         * ``type`` (**str**) "Transaction" or "ScheduledTransaction"
         * ``id`` (**int**) the id of the object
@@ -693,10 +1156,10 @@ class BiweeklyPayPeriod(object):
         :param t: the object to return a dict for
         :type t: :py:class:`~.Transaction` or :py:class:`~.ScheduledTransaction`
         :param weekly_occurrence: For weekly transactions, which occurrence
-          (0 or 1) within the pay period this dict is for.
+          (0 or 1) within the pay period this entry is for.
         :type weekly_occurrence: int
-        :return: dict describing ``t``
-        :rtype: dict
+        :return: entry describing ``t``
+        :rtype: PayPeriodEntry
         """
         if isinstance(t, Transaction):
             return self._dict_for_trans(t)
@@ -704,10 +1167,10 @@ class BiweeklyPayPeriod(object):
 
     def _dict_for_trans(self, t):
         """
-        Return a dict describing the Transaction t. Called from
-        :py:meth:`~._trans_dict`.
+        Return a :py:class:`~.PayPeriodEntry` describing the Transaction t.
+        Called from :py:meth:`~._trans_dict`.
 
-        The resulting dict will have the following layout:
+        The resulting entry will have the following keys:
 
         * ``type`` (**str**) "Transaction" or "ScheduledTransaction"
         * ``id`` (**int**) the id of the object
@@ -736,46 +1199,39 @@ class BiweeklyPayPeriod(object):
 
         :param t: transaction to describe
         :type t: Transaction
-        :return: common-format dict describing ``t``
-        :rtype: dict
+        :return: common-format entry describing ``t``
+        :rtype: PayPeriodEntry
         """
-        res = {
-            'type': 'Transaction',
-            'id': t.id,
-            'date': t.date,
-            'sched_type': None,
-            'sched_trans_id': t.scheduled_trans_id,
-            'description': t.description,
-            'amount': t.actual_amount,
-            'account_id': t.account_id,
-            'account_name': t.account.name,
-            'planned_budget_id': t.planned_budget_id,
-            'planned_budget_name': None,
-            'budgets': {
+        return PayPeriodEntry(
+            type='Transaction',
+            id=t.id,
+            date=t.date,
+            sched_type=None,
+            sched_trans_id=t.scheduled_trans_id,
+            description=t.description,
+            amount=t.actual_amount,
+            budgeted_amount=t.budgeted_amount,
+            account_id=t.account_id,
+            account_name=t.account.name,
+            reconcile_id=None if t.reconcile is None else t.reconcile.id,
+            budgets={
                 bt.budget_id: {
                     'amount': bt.amount,
                     'name': bt.budget.name
                 } for bt in t.budget_transactions
-            }
-        }
-        if t.reconcile is None:
-            res['reconcile_id'] = None
-        else:
-            res['reconcile_id'] = t.reconcile.id
-        if t.budgeted_amount is None:
-            res['budgeted_amount'] = None
-        else:
-            res['budgeted_amount'] = t.budgeted_amount
-        if t.planned_budget is not None:
-            res['planned_budget_name'] = t.planned_budget.name
-        return res
+            },
+            planned_budget_id=t.planned_budget_id,
+            planned_budget_name=(
+                None if t.planned_budget is None else t.planned_budget.name
+            )
+        )
 
     def _dict_for_sched_trans(self, t, weekly_occurrence=0):
         """
-        Return a dict describing the ScheduledTransaction t. Called from
-        :py:meth:`~._trans_dict`.
+        Return a :py:class:`~.PayPeriodEntry` describing the
+        ScheduledTransaction t. Called from :py:meth:`~._trans_dict`.
 
-        The resulting dict will have the following layout:
+        The resulting entry will have the following keys:
 
         * ``type`` (**str**) "Transaction" or "ScheduledTransaction"
         * ``id`` (**int**) the id of the object
@@ -799,99 +1255,62 @@ class BiweeklyPayPeriod(object):
         :param t: ScheduledTransaction to describe
         :type t: ScheduledTransaction
         :param weekly_occurrence: For weekly transactions, which occurrence
-          (0 or 1) within the pay period this dict is for.
+          (0 or 1) within the pay period this entry is for.
         :type weekly_occurrence: int
-        :return: common-format dict describing ``t``
-        :rtype: dict
+        :return: common-format entry describing ``t``
+        :rtype: PayPeriodEntry
         """
-        res = {
-            'type': 'ScheduledTransaction',
-            'id': t.id,
-            'sched_type': t.schedule_type,
-            'sched_trans_id': None,
-            'description': t.description,
-            'amount': t.amount,
-            'budgeted_amount': None,
-            'account_id': t.account_id,
-            'account_name': t.account.name,
-            'reconcile_id': None,
-            'budgets': {
+        return PayPeriodEntry(
+            type='ScheduledTransaction',
+            id=t.id,
+            date=self._sched_trans_date(
+                t, weekly_occurrence=weekly_occurrence
+            ),
+            sched_type=t.schedule_type,
+            sched_trans_id=None,
+            description=t.description,
+            amount=t.amount,
+            budgeted_amount=None,
+            account_id=t.account_id,
+            account_name=t.account.name,
+            reconcile_id=None,
+            budgets={
                 t.budget_id: {
                     'name': t.budget.name,
                     'amount': t.amount
                 }
             }
-        }
+        )
+
+    def _sched_trans_date(self, t, weekly_occurrence=0):
+        """
+        Return the date of the ScheduledTransaction ``t`` in this pay period,
+        or None for "per period" ScheduledTransactions (or if ``t`` does not
+        occur in this period). Called from :py:meth:`~._dict_for_sched_trans`.
+
+        :param t: ScheduledTransaction to find the date of
+        :type t: ScheduledTransaction
+        :param weekly_occurrence: For weekly transactions, which occurrence
+          (0 or 1) within the pay period to return the date of.
+        :type weekly_occurrence: int
+        :return: date of ``t`` in this pay period
+        :rtype: datetime.date
+        """
         if t.schedule_type == 'date':
-            res['date'] = t.date
-            return res
+            return t.date
         if t.schedule_type == 'per period':
-            res['date'] = None
-            return res
+            return None
         if t.schedule_type == 'weekly':
             # Find the dates in this pay period that fall on the specified
             # weekday. There are exactly 2 occurrences in a 14-day period.
             dates_for_weekday = self._dates_for_weekday_in_period(t.day_of_week)
             if weekly_occurrence < len(dates_for_weekday):
-                res['date'] = dates_for_weekday[weekly_occurrence]
-            else:
-                res['date'] = None
-            return res
+                return dates_for_weekday[weekly_occurrence]
+            return None
         if t.schedule_type == 'annual':
-            # Calculate the annual date for this period
-            try:
-                annual_date = date(
-                    year=self.start_date.year,
-                    month=t.annual_month,
-                    day=t.annual_day
-                )
-                if self.start_date <= annual_date <= self.end_date:
-                    res['date'] = annual_date
-                    return res
-            except ValueError:
-                pass
-            # Try next year if period spans year boundary
-            if self.end_date.year > self.start_date.year:
-                try:
-                    annual_date = date(
-                        year=self.end_date.year,
-                        month=t.annual_month,
-                        day=t.annual_day
-                    )
-                    if self.start_date <= annual_date <= self.end_date:
-                        res['date'] = annual_date
-                        return res
-                except ValueError:
-                    pass
-            res['date'] = None
-            return res
-        # else it's a monthly transaction, and we need to figure out the date
-        # for it that falls in this PayPeriod.
-        if self.start_date.day <= t.day_of_month <= self.end_date.day:
-            res['date'] = date(
-                year=self.start_date.year,
-                month=self.start_date.month,
-                day=t.day_of_month
-            )
-            return res
-        # If we got here, we're in a pay period that spans two months; i.e.
-        # start_date.day > end_date.day.
-        if t.day_of_month >= self.start_date.day:
-            # in the same month as start_date.day
-            res['date'] = date(
-                year=self.start_date.year,
-                month=self.start_date.month,
-                day=t.day_of_month
-            )
-            return res
-        # else t.day_of_month < self.start_date.day, which means it's actually
-        # ``t.day_of_month`` in the next month...
-        res['date'] = date(
-            year=self.start_date.year,
-            month=self.start_date.month,
-            day=t.day_of_month
-        ) + relativedelta.relativedelta(months=1)
-        return res
+            return self._annual_date(t.annual_month, t.annual_day)
+        # else it's a monthly transaction
+        return self._monthly_date(t.day_of_month)
 
     def _dates_for_weekday_in_period(self, day_of_week):
         """
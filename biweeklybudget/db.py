@@ -44,7 +44,7 @@ from copy import deepcopy
 import warnings
 from importlib.resources import files
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, tuple_
 from sqlalchemy.orm import scoped_session, sessionmaker
 from pymysql.err import Warning
 from alembic.config import Config
@@ -246,3 +246,77 @@ def upsert_record(model_class, key_fields, **kwargs):
     for k, v in args.items():
         setattr(res, k, v)
     return res
+
+
+#: Number of records to look up per query in :py:func:`~.bulk_upsert_records`
+BULK_UPSERT_BATCH_SIZE = 500
+
+
+def bulk_upsert_records(model_class, key_fields, records):
+    """
+    Upsert many records in the database, with the same semantics as
+    :py:func:`~.upsert_record` but with one query per
+    :py:const:`~.BULK_UPSERT_BATCH_SIZE` records to find existing ones,
+    instead of one query per record. New records are added to the session, so
+    they are INSERTed in batches when the session is flushed, and ORM event
+    handlers run for both new and updated records as usual. If ``records``
+    contains more than one record with the same key, the later ones update
+    the first.
+
+    Unlike :py:func:`~.upsert_record`, values in ``records`` are not copied.
+
+    Neither :py:meth:`sqlalchemy.orm.session.Session.commit` nor
+    :py:meth:`sqlalchemy.orm.session.Session.flush` are called.
+
+    :param model_class: the class of model to insert/update
+    :type model_class: biweeklybudget.models.base.ModelAsDict
+    :param key_fields: The field name(s) (keys in each record) that make up
+      the primary key. This can be a single string, or a list or tuple of
+      strings for compound keys.
+    :param records: list of dicts of arguments to provide to the model class
+      constructor, or to update if there is an existing record matching the
+      key.
+    :type records: list
+    :return: 2-tuple of int count of records inserted, int count of records
+      updated
+    :rtype: tuple
+    """
+    if isinstance(key_fields, type('')):
+        key_fields = [key_fields]
+    key_cols = [getattr(model_class, k) for k in key_fields]
+    # records by key, either found in the DB or added by this function
+    found = {}
+    new_keys = set()
+    updated_keys = set()
+    for i in range(0, len(records), BULK_UPSERT_BATCH_SIZE):
+        batch = records[i:i + BULK_UPSERT_BATCH_SIZE]
+        keys = [
+            k for k in set(tuple(r[f] for f in key_fields) for r in batch)
+            if k not in found
+        ]
+        logger.debug(
+            'Upserting %d %s records; looking up %d keys', len(batch),
+            model_class.__name__, len(keys)
+        )
+        if len(keys) > 0:
+            if len(key_fields) == 1:
+                cond = key_cols[0].in_([k[0] for k in keys])
+            else:
+                cond = tuple_(*key_cols).in_(keys)
+            for o in db_session.query(model_class).filter(cond).all():
+                found[tuple(getattr(o, f) for f in key_fields)] = o
+        for r in batch:
+            pkey = tuple(r[f] for f in key_fields)
+            o = found.get(pkey)
+            if o is None:
+                o = model_class(**r)
+                db_session.add(o)
+                found[pkey] = o
+                new_keys.add(pkey)
+                continue
+            for k, v in r.items():
+                if k not in key_fields:
+                    setattr(o, k, v)
+            if pkey not in new_keys:
+                updated_keys.add(pkey)
+    return len(new_keys), len(updated_keys)
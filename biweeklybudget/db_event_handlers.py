@@ -40,16 +40,75 @@ This is mostly based on http://flask.pocoo.org/docs/0.12/patterns/sqlalchemy/
 import logging
 import time
 import os
+from itertools import chain
+from threading import Lock
 from sqlalchemy import event, inspect
 
+from biweeklybudget.biweeklypayperiod import (
+    BiweeklyPayPeriod, period_start_for_date
+)
 from biweeklybudget.models.account import Account
+from biweeklybudget.models.account_balance import AccountBalance
 from biweeklybudget.models.budget_model import Budget
 from biweeklybudget.models.budget_transaction import BudgetTransaction
-from biweeklybudget.models.ofx_transaction import OFXTransaction
+from biweeklybudget.models.ofx_statement import OFXStatement
+from biweeklybudget.models.ofx_transaction import (
+    OFXTransaction, clear_matcher_cache
+)
+from biweeklybudget.models.pay_period_budget_sum import PayPeriodBudgetSum
+from biweeklybudget.models.scheduled_transaction import ScheduledTransaction
+from biweeklybudget.models.transaction import Transaction
+from biweeklybudget.reclassify import start_reclassify
 from biweeklybudget.utils import fmt_currency
 
 logger = logging.getLogger(__name__)
 
+#: key in :py:attr:`sqlalchemy.orm.session.Session.info` marking that the
+#: current transaction has changed data; see :py:func:`~.data_version`
+DATA_CHANGED_KEY = 'biweeklybudget_data_changed'
+
+#: key in :py:attr:`sqlalchemy.orm.session.Session.info` holding the set of
+#: Account IDs to reclassify OFXTransactions for when the current transaction
+#: commits; see :py:func:`~.handle_account_re_change`
+RECLASSIFY_KEY = 'biweeklybudget_reclassify_accounts'
+
+#: key in :py:attr:`sqlalchemy.orm.session.Session.info` holding the set of
+#: start dates of the pay periods whose :py:class:`~.PayPeriodBudgetSum` rows
+#: must be recalculated after the current flush; see
+#: :py:func:`~.handle_pay_period_sums_update`
+PAY_PERIOD_SUMS_KEY = 'biweeklybudget_pay_period_sums'
+
+_data_version = 0
+_data_version_lock = Lock()
+
+
+def data_version():
+    """
+    Return the current data version. This is a counter that is incremented
+    every time a database transaction that changed data (other than
+    :py:class:`~.PayPeriodBudgetSum` rows) is committed through a session
+    with :py:func:`~.init_event_listeners` registered, so it can be used to
+    invalidate in-process caches of values calculated from the database.
+    Changes made by other processes are not reflected.
+
+    :return: current data version
+    :rtype: int
+    """
+    return _data_version
+
+
+def bump_data_version():
+    """
+    Increment the counter returned by :py:func:`~.data_version`.
+
+    :return: new data version
+    :rtype: int
+    """
+    global _data_version
+    with _data_version_lock:
+        _data_version += 1
+        return _data_version
+
 
 def handle_budget_trans_amount_change(**kwargs):
     """
@@ -177,20 +236,17 @@ def handle_ofx_transaction_new_or_change(session):
     :param session: current database session
     :type session: sqlalchemy.orm.session.Session
     """
-    for obj in session.new:
-        if isinstance(obj, OFXTransaction):
-            try:
-                obj.update_is_fields()
-            except Exception:
-                logger.error('Error setting OFXTransaction is_ fields',
-                             exc_info=True)
-    for obj in session.dirty:
-        if isinstance(obj, OFXTransaction):
-            try:
-                obj.update_is_fields()
-            except Exception:
-                logger.error('Error setting OFXTransaction is_ fields',
-                             exc_info=True)
+    txns = [
+        obj for obj in chain(session.new, session.dirty)
+        if isinstance(obj, OFXTransaction)
+    ]
+    if len(txns) == 0:
+        return
+    try:
+        OFXTransaction.update_is_fields_many(txns, session)
+    except Exception:
+        logger.error('Error setting OFXTransaction is_ fields',
+                     exc_info=True)
 
 
 def handle_account_re_change(session):
@@ -203,9 +259,11 @@ def handle_account_re_change(session):
     * :py:attr:`~.Account.re_other_fee`
     * :py:attr:`~.Account.re_payment`
 
-    When one of these regexes is changed on an Account, we trigger a re-run
-    of :py:meth:`~.OFXTransaction.update_is_fields` on all OFXTransactions for
-    the account.
+    When one of these regexes is changed on an Account, the Account's ID is
+    recorded in the session's ``info`` (:py:const:`~.RECLASSIFY_KEY`), and
+    when the transaction commits :py:func:`~.handle_after_commit` starts a
+    background reclassification of all of the Account's OFXTransactions with
+    :py:func:`biweeklybudget.reclassify.start_reclassify`.
 
     :param session: current database session
     :type session: sqlalchemy.orm.session.Session
@@ -235,13 +293,232 @@ def handle_account_re_change(session):
         if len(changed) < 1:
             continue
         logger.debug(
-            '%s has regex changes; triggering update_is_fields() on all child '
-            'OFXTransactions.', obj
+            '%s has regex changes; will reclassify all OFXTransactions after '
+            'commit', obj
+        )
+        clear_matcher_cache(obj.id)
+        session.info.setdefault(RECLASSIFY_KEY, set()).add(obj.id)
+
+
+def _attr_values(obj, attr_name):
+    """
+    Return a list of all current and previous (not None) values of the
+    attribute named ``attr_name`` on ``obj``, according to the attribute's
+    history.
+
+    :param obj: the model instance
+    :param attr_name: the attribute name
+    :type attr_name: str
+    :return: list of current and previous attribute values
+    :rtype: list
+    """
+    hist = inspect(obj).attrs[attr_name].history
+    return [
+        x for x in chain(hist.added, hist.unchanged, hist.deleted)
+        if x is not None
+    ]
+
+
+def handle_account_latest_pointers(session):
+    """
+    ``before_flush`` event handler
+    (:py:meth:`sqlalchemy.orm.events.SessionEvents.before_flush`)
+    to point :py:attr:`.Account.latest_balance` and
+    :py:attr:`.Account.latest_statement` at new :py:class:`~.AccountBalance`
+    and :py:class:`~.OFXStatement` instances, for ones that were not created
+    through :py:meth:`.Account.set_balance` or followed by
+    :py:meth:`.Account.set_latest_statement`.
+
+    :param session: current database session
+    :type session: sqlalchemy.orm.session.Session
+    """
+    for obj in session.new:
+        if not isinstance(obj, (AccountBalance, OFXStatement)):
+            continue
+        acct = obj.account
+        if acct is None:
+            acct = session.get(Account, obj.account_id)
+        if acct is None:
+            continue
+        if isinstance(obj, AccountBalance):
+            acct.latest_balance = obj
+        else:
+            acct.set_latest_statement(obj)
+
+
+def handle_pay_period_sums_invalidation(session):
+    """
+    ``before_flush`` event handler
+    (:py:meth:`sqlalchemy.orm.events.SessionEvents.before_flush`)
+    to delete the materialized :py:class:`~.PayPeriodBudgetSum` rows for every
+    pay period affected by new, changed or deleted :py:class:`~.Transaction`,
+    :py:class:`~.BudgetTransaction`, :py:class:`~.ScheduledTransaction` or
+    :py:class:`~.Budget` instances, and record those periods to be
+    recalculated once the flush has written the changes; see
+    :py:func:`~.handle_pay_period_sums_update`. Both the old and new dates of
+    changed instances are affected. Changes that could affect an unbounded
+    number of pay periods (i.e. recurring ScheduledTransactions or a change to
+    :py:attr:`~.Budget.is_periodic`) affect every period that has stored sums.
+
+    :param session: current database session
+    :type session: sqlalchemy.orm.session.Session
+    """
+    start_dates = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Transaction):
+            dates = _attr_values(obj, 'date')
+        elif isinstance(obj, BudgetTransaction):
+            dates = [
+                t.date for t in _attr_values(obj, 'transaction')
+            ] + [
+                x.date for x in (
+                    session.get(Transaction, i)
+                    for i in _attr_values(obj, 'trans_id')
+                ) if x is not None
+            ]
+        elif isinstance(obj, ScheduledTransaction):
+            if any(
+                len(_attr_values(obj, a)) > 0 for a in [
+                    'day_of_month', 'num_per_period', 'day_of_week',
+                    'annual_month', 'annual_day'
+                ]
+            ):
+                # recurring now or before this change
+                dates = None
+            else:
+                dates = _attr_values(obj, 'date')
+        elif isinstance(obj, Budget):
+            if obj not in session.deleted and not inspect(
+                obj
+            ).attrs.is_periodic.history.has_changes():
+                continue
+            dates = None
+        else:
+            continue
+        if dates is None or None in dates or len(dates) == 0:
+            logger.debug('All stored pay period sums affected by %s', obj)
+            start_dates.update(PayPeriodBudgetSum.stored_start_dates(session))
+            break
+        start_dates.update(period_start_for_date(d) for d in dates)
+    if len(start_dates) > 0:
+        PayPeriodBudgetSum.invalidate(session, start_dates)
+        session.info.setdefault(PAY_PERIOD_SUMS_KEY, set()).update(
+            start_dates
         )
-        for stmt in obj.all_statements:
-            for txn in stmt.ofx_trans:
-                txn.update_is_fields()
-        logger.debug('Done with update_is_fields() for %s', obj)
+
+
+def handle_pay_period_sums_update(session, flush_context):
+    """
+    ``after_flush_postexec`` event handler
+    (:py:meth:`sqlalchemy.orm.events.SessionEvents.after_flush_postexec`) to
+    recalculate and store the :py:class:`~.PayPeriodBudgetSum` rows deleted
+    by :py:func:`~.handle_pay_period_sums_invalidation`, in the same
+    transaction as the changes that they were calculated from. Reads of the
+    stored sums never write to the database.
+
+    :param session: current database session
+    :type session: sqlalchemy.orm.session.Session
+    :param flush_context: internal SQLAlchemy object
+    :type flush_context: sqlalchemy.orm.session.UOWTransaction
+    """
+    start_dates = session.info.pop(PAY_PERIOD_SUMS_KEY, None)
+    if not start_dates:
+        return
+    BiweeklyPayPeriod.store_budget_sums(start_dates, session)
+
+
+def handle_orm_bulk_execute(orm_execute_state):
+    """
+    ``do_orm_execute`` event handler
+    (:py:meth:`sqlalchemy.orm.events.SessionEvents.do_orm_execute`) to
+    recalculate all materialized :py:class:`~.PayPeriodBudgetSum` rows when an
+    ORM-enabled bulk UPDATE or DELETE statement is executed against a model
+    that affects pay period sums. Such statements bypass the unit of work, so
+    :py:func:`~.handle_pay_period_sums_invalidation` never sees the affected
+    instances; the statement is invoked here and the sums are stored in the
+    same transaction. Bulk statements against any other model also mark the
+    transaction as having changed data, for :py:func:`~.data_version`.
+
+    :param orm_execute_state: the ORM statement execution state
+    :type orm_execute_state: sqlalchemy.orm.ORMExecuteState
+    :return: the statement result, if the statement was invoked here
+    :rtype: sqlalchemy.engine.Result
+    """
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not PayPeriodBudgetSum:
+        orm_execute_state.session.info[DATA_CHANGED_KEY] = True
+    if mapper is None or mapper.class_ not in (
+        Transaction, BudgetTransaction, ScheduledTransaction, Budget
+    ):
+        return
+    session = orm_execute_state.session
+    start_dates = PayPeriodBudgetSum.stored_start_dates(session)
+    # delete first, in case the statement deletes referenced Budgets
+    PayPeriodBudgetSum.invalidate(session, start_dates)
+    result = orm_execute_state.invoke_statement()
+    logger.debug(
+        'Recalculating all pay period sums for bulk statement on %s',
+        mapper.class_.__name__
+    )
+    BiweeklyPayPeriod.store_budget_sums(start_dates, session)
+    return result
+
+
+def handle_after_flush_data_changed(session, flush_context):
+    """
+    ``after_flush`` event handler
+    (:py:meth:`sqlalchemy.orm.events.SessionEvents.after_flush`) to mark the
+    session's current transaction as having changed data, if any instances
+    other than :py:class:`~.PayPeriodBudgetSum` were flushed. The data version
+    is bumped when the transaction commits; see
+    :py:func:`~.handle_after_commit`.
+
+    :param session: current database session
+    :type session: sqlalchemy.orm.session.Session
+    :param flush_context: internal SQLAlchemy object
+    :type flush_context: sqlalchemy.orm.session.UOWTransaction
+    """
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(obj, PayPeriodBudgetSum):
+            session.info[DATA_CHANGED_KEY] = True
+            return
+
+
+def handle_after_commit(session):
+    """
+    ``after_commit`` event handler
+    (:py:meth:`sqlalchemy.orm.events.SessionEvents.after_commit`) to call
+    :py:func:`~.bump_data_version` if the committed transaction changed data,
+    and start background reclassification of the OFXTransactions of any
+    Accounts whose regexes were changed (see
+    :py:func:`~.handle_account_re_change`).
+
+    :param session: current database session
+    :type session: sqlalchemy.orm.session.Session
+    """
+    if session.info.pop(DATA_CHANGED_KEY, False):
+        logger.debug('Data version bumped to %d', bump_data_version())
+    for acct_id in sorted(session.info.pop(RECLASSIFY_KEY, [])):
+        start_reclassify(acct_id)
+
+
+def handle_after_rollback(session):
+    """
+    ``after_rollback`` event handler
+    (:py:meth:`sqlalchemy.orm.events.SessionEvents.after_rollback`) to clear
+    the data-changed marker set by :py:func:`~.handle_after_flush_data_changed`
+    or :py:func:`~.handle_orm_bulk_execute`, any pending reclassification
+    set by :py:func:`~.handle_account_re_change`, and any pay periods still to
+    be recalculated by :py:func:`~.handle_pay_period_sums_update`.
+
+    :param session: current database session
+    :type session: sqlalchemy.orm.session.Session
+    """
+    session.info.pop(DATA_CHANGED_KEY, None)
+    session.info.pop(RECLASSIFY_KEY, None)
+    session.info.pop(PAY_PERIOD_SUMS_KEY, None)
 
 
 def handle_before_flush(session, flush_context, instances):
@@ -253,6 +530,10 @@ def handle_before_flush(session, flush_context, instances):
     specific cases:
 
     * :py:func:`~.handle_new_or_deleted_budget_transaction`
+    * :py:func:`~.handle_ofx_transaction_new_or_change`
+    * :py:func:`~.handle_account_re_change`
+    * :py:func:`~.handle_account_latest_pointers`
+    * :py:func:`~.handle_pay_period_sums_invalidation`
 
     :param session: current database session
     :type session: sqlalchemy.orm.session.Session
@@ -264,6 +545,8 @@ def handle_before_flush(session, flush_context, instances):
     handle_new_or_deleted_budget_transaction(session)
     handle_ofx_transaction_new_or_change(session)
     handle_account_re_change(session)
+    handle_account_latest_pointers(session)
+    handle_pay_period_sums_invalidation(session)
     logger.debug('handle_before_flush done')
 
 
@@ -325,3 +608,28 @@ def init_event_listeners(db_session, engine):
         'before_flush',
         handle_before_flush
     )
+    event.listen(
+        db_session,
+        'do_orm_execute',
+        handle_orm_bulk_execute
+    )
+    event.listen(
+        db_session,
+        'after_flush',
+        handle_after_flush_data_changed
+    )
+    event.listen(
+        db_session,
+        'after_flush_postexec',
+        handle_pay_period_sums_update
+    )
+    event.listen(
+        db_session,
+        'after_commit',
+        handle_after_commit
+    )
+    event.listen(
+        db_session,
+        'after_rollback',
+        handle_after_rollback
+    )
@@ -36,14 +36,22 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 """
 
 import logging
+import time
 from sqlalchemy import func
+from sqlalchemy.sql.expression import null
 from decimal import Decimal
 
+from biweeklybudget import settings
 from biweeklybudget.db import db_session
+from biweeklybudget.db_event_handlers import data_version
 from biweeklybudget.utils import dtnow, fmt_currency
 from biweeklybudget.models.account import Account
+from biweeklybudget.models.account_balance import AccountBalance
 from biweeklybudget.models.budget_model import Budget
+from biweeklybudget.models.budget_transaction import BudgetTransaction
+from biweeklybudget.models.ofx_statement import OFXStatement
 from biweeklybudget.models.ofx_transaction import OFXTransaction
+from biweeklybudget.models.transaction import Transaction
 from biweeklybudget.biweeklypayperiod import BiweeklyPayPeriod
 
 logger = logging.getLogger(__name__)
@@ -51,60 +59,80 @@ logger = logging.getLogger(__name__)
 
 class NotificationsController(object):
 
+    #: cached result of :py:meth:`~.get_notifications`; a 3-tuple of the
+    #: :py:func:`~.data_version` it was calculated at, the time it expires,
+    #: and the notifications list.
+    _cache = None
+
     @staticmethod
     def num_stale_accounts(sess=None):
         """
-        Return the number of accounts with stale data.
-
-        @TODO This is a hack because I just cannot figure out how to do this
-        natively in SQLAlchemy.
+        Return the number of active accounts with stale data, i.e. whose
+        :py:attr:`.Account.latest_statement` is older than
+        :py:attr:`~biweeklybudget.settings.STALE_DATA_TIMEDELTA`. This is the
+        same as :py:attr:`.Account.is_stale`, calculated in a single query.
 
         :return: count of accounts with stale data
         :rtype: int
         """
         if sess is None:
             sess = db_session
-        return sum(
-            1 if a.is_stale else 0 for a in sess.query(
-                Account).filter(Account.is_active.__eq__(True)).all()
-        )
+        cutoff = dtnow() - settings.STALE_DATA_TIMEDELTA
+        return sess.query(func.count(Account.id)).join(
+            OFXStatement, Account.latest_statement_id == OFXStatement.id
+        ).filter(
+            Account.is_active.__eq__(True),
+            OFXStatement.as_of < cutoff
+        ).scalar()
 
     @staticmethod
     def budget_account_sum(sess=None):
         """
-        Return the sum of current balances for all is_budget_source accounts.
+        Return the sum of current balances for all is_budget_source accounts,
+        i.e. the ledger amount of :py:attr:`.Account.latest_balance` for each,
+        calculated in a single query.
 
         :return: Combined balance of all budget source accounts
-        :rtype: float
+        :rtype: decimal.Decimal
         """
         if sess is None:
             sess = db_session
-        sum = Decimal('0.0')
-        for acct in sess.query(Account).filter(
-                Account.is_budget_source.__eq__(True),
-                Account.is_active.__eq__(True)
-        ):
-            if acct.balance is not None:
-                sum += acct.balance.ledger
-        return sum
+        res = sess.query(func.sum(AccountBalance.ledger)).join(
+            Account, Account.latest_balance_id == AccountBalance.id
+        ).filter(
+            Account.is_budget_source.__eq__(True),
+            Account.is_active.__eq__(True)
+        ).scalar()
+        if res is None:
+            return Decimal('0.0')
+        return res
 
     @staticmethod
     def budget_account_unreconciled(sess=None):
         """
-        Return the sum of unreconciled txns for all is_budget_source accounts.
+        Return the sum of unreconciled txns for all is_budget_source accounts
+        (the sum of :py:attr:`.Account.unreconciled_sum`), calculated in a
+        single query.
 
         :return: Combined unreconciled amount of all budget source accounts
-        :rtype: float
+        :rtype: decimal.Decimal
         """
         if sess is None:
             sess = db_session
-        sum = Decimal('0.0')
-        for acct in sess.query(Account).filter(
-                Account.is_budget_source.__eq__(True),
-                Account.is_active.__eq__(True)
-        ):
-            sum += acct.unreconciled_sum
-        return sum
+        res = sess.query(func.sum(BudgetTransaction.amount)).join(
+            Transaction, BudgetTransaction.trans_id == Transaction.id
+        ).join(
+            Account, Transaction.account_id == Account.id
+        ).filter(
+            Transaction.reconcile.__eq__(null()),
+            Transaction.date.__ge__(settings.RECONCILE_BEGIN_DATE),
+            Transaction.date.__le__(dtnow()),
+            Account.is_budget_source.__eq__(True),
+            Account.is_active.__eq__(True)
+        ).scalar()
+        if res is None:
+            return Decimal('0.0')
+        return res
 
     @staticmethod
     def standing_budgets_sum(sess=None):
@@ -128,7 +156,9 @@ class NotificationsController(object):
     def pp_sum(sess=None):
         """
         Return the overall allocated sum for the current payperiod minus the
-        sum of all reconciled Transactions for the pay period.
+        sum of all reconciled Transactions for the pay period. The sums are
+        read from the materialized :py:class:`~.PayPeriodBudgetSum` table via
+        :py:meth:`~.BiweeklyPayPeriod.load_budget_sums` when possible.
 
         :return: overall allocated sum for the current pay period minus the sum
           of all reconciled Transactions for the pay period.
@@ -137,6 +167,7 @@ class NotificationsController(object):
         if sess is None:
             sess = db_session
         pp = BiweeklyPayPeriod.period_for_date(dtnow(), sess)
+        BiweeklyPayPeriod.load_budget_sums([pp], sess)
         allocated = pp.overall_sums['allocated']
         spent = pp.overall_sums['spent']
         logger.debug('PayPeriod=%s; allocated=%s; spent=%s',
@@ -155,6 +186,36 @@ class NotificationsController(object):
             sess = db_session
         return OFXTransaction.unreconciled(sess).count()
 
+    @staticmethod
+    def cached_notifications():
+        """
+        Return :py:meth:`~.get_notifications`, cached until either the
+        :py:func:`~.data_version` changes (i.e. this process commits a change
+        to the database) or
+        :py:attr:`~biweeklybudget.settings.NOTIFICATIONS_CACHE_SECONDS` pass.
+
+        :return: list of notification dicts
+        :rtype: list
+        """
+        ttl = settings.NOTIFICATIONS_CACHE_SECONDS
+        if ttl <= 0:
+            return NotificationsController.get_notifications()
+        version = data_version()
+        now = time.time()
+        cache = NotificationsController._cache
+        if cache is not None and cache[0] == version and cache[1] > now:
+            return cache[2]
+        res = NotificationsController.get_notifications()
+        NotificationsController._cache = (version, now + ttl, res)
+        return res
+
+    @staticmethod
+    def clear_cache():
+        """
+        Clear the cache used by :py:meth:`~.cached_notifications`.
+        """
+        NotificationsController._cache = None
+
     @staticmethod
     def get_notifications():
         """
@@ -39,6 +39,7 @@ from .accounts import *
 from .budgets import *
 from .credit_payoffs import *
 from .index import *
+from .jobs import *
 from .ofx import *
 from .payperiods import *
 from .reconcile import *
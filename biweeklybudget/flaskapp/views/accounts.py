@@ -42,6 +42,7 @@ from decimal import Decimal
 from datetime import datetime
 import json
 import re
+from sqlalchemy.orm import joinedload
 
 from biweeklybudget.flaskapp.app import app
 from biweeklybudget.flaskapp.views.formhandlerview import FormHandlerView
@@ -51,6 +52,7 @@ from biweeklybudget.models.plaid_accounts import PlaidAccount
 from biweeklybudget.models.plaid_items import PlaidItem
 from biweeklybudget.models.transaction import Transaction
 from biweeklybudget.db import db_session
+from biweeklybudget.reclassify import job_status
 from biweeklybudget.interest import (
     INTEREST_CALCULATION_NAMES, MIN_PAYMENT_FORMULA_NAMES
 )
@@ -90,13 +92,22 @@ class AccountsView(MethodView):
         }
         return render_template(
             'accounts.html',
-            bank_accounts=db_session.query(Account).filter(
+            bank_accounts=db_session.query(Account).options(
+                joinedload(Account.latest_balance),
+                joinedload(Account.latest_statement)
+            ).filter(
                 Account.acct_type == AcctType.Bank,
                 Account.is_active == True).all(),  # noqa
-            credit_accounts=db_session.query(Account).filter(
+            credit_accounts=db_session.query(Account).options(
+                joinedload(Account.latest_balance),
+                joinedload(Account.latest_statement)
+            ).filter(
                 Account.acct_type == AcctType.Credit,
                 Account.is_active == True).all(),  # noqa
-            investment_accounts=db_session.query(Account).filter(
+            investment_accounts=db_session.query(Account).options(
+                joinedload(Account.latest_balance),
+                joinedload(Account.latest_statement)
+            ).filter(
                 Account.acct_type == AcctType.Investment,
                 Account.is_active == True).all(),  # noqa
             interest_class_names=INTEREST_CALCULATION_NAMES.keys(),
@@ -133,13 +144,22 @@ class OneAccountView(MethodView):
         }
         return render_template(
             'accounts.html',
-            bank_accounts=db_session.query(Account).filter(
+            bank_accounts=db_session.query(Account).options(
+                joinedload(Account.latest_balance),
+                joinedload(Account.latest_statement)
+            ).filter(
                 Account.acct_type == AcctType.Bank,
                 Account.is_active == True).all(),  # noqa
-            credit_accounts=db_session.query(Account).filter(
+            credit_accounts=db_session.query(Account).options(
+                joinedload(Account.latest_balance),
+                joinedload(Account.latest_statement)
+            ).filter(
                 Account.acct_type == AcctType.Credit,
                 Account.is_active == True).all(),  # noqa
-            investment_accounts=db_session.query(Account).filter(
+            investment_accounts=db_session.query(Account).options(
+                joinedload(Account.latest_balance),
+                joinedload(Account.latest_statement)
+            ).filter(
                 Account.acct_type == AcctType.Investment,
                 Account.is_active == True).all(),  # noqa
             account_id=acct_id,
@@ -162,6 +182,20 @@ class AccountAjax(MethodView):
         return jsonify(acct.as_dict)
 
 
+class AccountReclassifyAjax(MethodView):
+    """
+    Handle GET /ajax/account/<int:account_id>/reclassify endpoint; return
+    the status of the latest background reclassification of the Account's
+    OFXTransactions (see :py:func:`biweeklybudget.reclassify.job_status`).
+    """
+
+    def get(self, account_id):
+        res = job_status(account_id)
+        if res is None:
+            res = {'account_id': account_id, 'state': None}
+        return jsonify(res)
+
+
 class AccountFormHandler(FormHandlerView):
     """
     Handle POST /forms/account
@@ -452,6 +486,10 @@ app.add_url_rule(
     '/ajax/account/<int:account_id>',
     view_func=AccountAjax.as_view('account_ajax')
 )
+app.add_url_rule(
+    '/ajax/account/<int:account_id>/reclassify',
+    view_func=AccountReclassifyAjax.as_view('account_reclassify_ajax')
+)
 app.add_url_rule(
     '/accounts/<int:acct_id>',
     view_func=OneAccountView.as_view('account_view')
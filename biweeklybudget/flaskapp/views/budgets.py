@@ -38,7 +38,8 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 import logging
 from flask.views import MethodView
 from flask import render_template, jsonify
-from datetime import datetime
+from collections import defaultdict
+from datetime import datetime, timedelta
 from decimal import Decimal
 from sqlalchemy import func
 
@@ -49,7 +50,10 @@ from biweeklybudget.models.budget_transaction import BudgetTransaction
 from biweeklybudget.flaskapp.views.formhandlerview import FormHandlerView
 from biweeklybudget.models.account import Account
 from biweeklybudget.models.utils import do_budget_transfer
-from biweeklybudget.biweeklypayperiod import BiweeklyPayPeriod
+from biweeklybudget.biweeklypayperiod import (
+    PERIOD_INTERVAL_DAYS, period_start_for_date, period_start_for_index,
+    period_index_sql
+)
 from biweeklybudget.models.transaction import Transaction
 from biweeklybudget.models.projects import Project, BoMItem
 from biweeklybudget.utils import dtnow
@@ -346,27 +350,65 @@ class BudgetSpendingChartView(MethodView):
         raise RuntimeError('Unknown aggregation type: %s' % aggregation)
 
     def _by_pay_period(self):
-        min_txn = db_session.query(Transaction).order_by(
-            Transaction.date.asc()
-        ).first()
+        """
+        Return the spending per periodic budget for every pay period from the
+        one containing the oldest Transaction through the last one that has
+        ended. Sums are calculated with a single GROUP BY query, with the pay
+        period of each Transaction calculated in SQL by
+        :py:func:`~.period_index_sql`.
+        """
         budget_names = self._budget_names()
         logger.debug('budget_names=%s', budget_names)
-        records = []
-        budgets_present = set()
-        pp = BiweeklyPayPeriod.period_for_date(min_txn.date, db_session)
+        min_date = db_session.query(func.min(Transaction.date)).scalar()
+        if min_date is None:
+            return jsonify({'data': [], 'keys': []})
         dt_now = dtnow().date()
-        while pp.end_date <= dt_now:
-            sums = pp.budget_sums
-            logger.debug('sums=%s', sums)
-            records.append({
-                budget_names[y]: sums[y]['spent'] for y in sums.keys()
-                if y in budget_names
-            })
-            records[-1]['date'] = pp.start_date.strftime('%Y-%m-%d')
-            budgets_present.update(
-                [budget_names[y] for y in sums.keys() if y in budget_names]
+        first_start = period_start_for_date(min_date)
+        # the last pay period that has ended
+        last_start = period_start_for_date(dt_now)
+        if last_start + timedelta(days=PERIOD_INTERVAL_DAYS - 1) > dt_now:
+            last_start -= timedelta(days=PERIOD_INTERVAL_DAYS)
+        if last_start < first_start:
+            return jsonify({'data': [], 'keys': []})
+        active_periodic = [
+            x.id for x in db_session.query(Budget).filter(
+                Budget.is_active.__eq__(True),
+                Budget.is_periodic.__eq__(True),
+                Budget.id.in_(list(budget_names.keys()))
+            ).all()
+        ]
+        period_idx = period_index_sql(Transaction.date).label('period_idx')
+        sums = defaultdict(dict)
+        for idx, budg_id, spent in db_session.query(
+            period_idx,
+            BudgetTransaction.budget_id,
+            func.sum(BudgetTransaction.amount)
+        ).join(
+            Transaction, BudgetTransaction.trans_id == Transaction.id
+        ).join(
+            Budget, BudgetTransaction.budget_id == Budget.id
+        ).filter(
+            Budget.is_periodic.__eq__(True),
+            BudgetTransaction.budget_id.in_(list(budget_names.keys())),
+            Transaction.date >= first_start,
+            Transaction.date < last_start + timedelta(
+                days=PERIOD_INTERVAL_DAYS
             )
-            pp = pp.next
+        ).group_by(
+            period_idx, BudgetTransaction.budget_id
+        ).all():
+            sums[period_start_for_index(idx)][budg_id] = spent
+        records = []
+        budgets_present = set(budget_names[x] for x in active_periodic)
+        start = first_start
+        while start <= last_start:
+            rec = {budget_names[x]: Decimal('0.0') for x in active_periodic}
+            for budg_id, spent in sums[start].items():
+                rec[budget_names[budg_id]] = spent
+                budgets_present.add(budget_names[budg_id])
+            rec['date'] = start.strftime('%Y-%m-%d')
+            records.append(rec)
+            start += timedelta(days=PERIOD_INTERVAL_DAYS)
         res = {
             'data': records,
             'keys': sorted(list(budgets_present))
@@ -374,28 +416,38 @@ class BudgetSpendingChartView(MethodView):
         return jsonify(res)
 
     def _by_month(self):
+        """
+        Return the spending per budget for every month that has Transactions
+        against an active budget, up to today, calculated with a single
+        GROUP BY query.
+        """
         dt_now = dtnow().date()
         budget_names = self._budget_names()
         logger.debug('budget_names=%s', budget_names)
+        year = func.year(Transaction.date).label('year')
+        month = func.month(Transaction.date).label('month')
         records = {}
         budgets_present = set()
-        for t in db_session.query(Transaction).filter(
+        for y, m, budg_id, amt in db_session.query(
+            year, month, BudgetTransaction.budget_id,
+            func.sum(BudgetTransaction.amount)
+        ).join(
+            Transaction, BudgetTransaction.trans_id == Transaction.id
+        ).filter(
             Transaction.budget_transactions.any(
                 BudgetTransaction.budget.has(is_active=True)
             ),
+            BudgetTransaction.budget_id.in_(list(budget_names.keys())),
             Transaction.date.__le__(dt_now)
+        ).group_by(
+            year, month, BudgetTransaction.budget_id
         ).all():
-            for bt in t.budget_transactions:
-                if bt.budget_id not in budget_names:
-                    continue
-                budg_name = bt.budget.name
-                budgets_present.add(budg_name)
-                ds = t.date.strftime('%Y-%m')
-                if ds not in records:
-                    records[ds] = {'date': ds}
-                if budg_name not in records[ds]:
-                    records[ds][budg_name] = Decimal('0')
-                records[ds][budg_name] += bt.amount
+            budg_name = budget_names[budg_id]
+            budgets_present.add(budg_name)
+            ds = '%04d-%02d' % (y, m)
+            if ds not in records:
+                records[ds] = {'date': ds}
+            records[ds][budg_name] = amt
         result = [records[k] for k in sorted(records.keys())]
         res = {
             'data': result,
@@ -37,8 +37,8 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 
 import logging
 import json
-from decimal import Decimal, ROUND_UP
-from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_UP
+from datetime import timedelta
 
 from flask.views import MethodView
 from flask import render_template, request, jsonify
@@ -46,17 +46,34 @@ from flask import render_template, request, jsonify
 from biweeklybudget.flaskapp.jsonencoder import MagicJSONEncoder
 from biweeklybudget.flaskapp.app import app
 from biweeklybudget.db import db_session
-from biweeklybudget.interest import InterestHelper
+from biweeklybudget.interest import (
+    InterestHelper, payment_settings_kwargs, sweep_amounts
+)
+from biweeklybudget.jobs import enqueue
 from biweeklybudget.models.dbsetting import DBSetting
 from biweeklybudget.utils import fmt_currency, dtnow
 from biweeklybudget.models.account import NoInterestChargedError, Account
 from biweeklybudget.models.ofx_statement import OFXStatement
 from biweeklybudget.models.ofx_transaction import OFXTransaction
 from biweeklybudget.flaskapp.views.formhandlerview import FormHandlerView
+from biweeklybudget.flaskapp.views.jobs import job_response
 
 logger = logging.getLogger(__name__)
 
 
+def payment_settings_json():
+    """
+    Return the JSON string credit payoff payment settings stored in the
+    ``credit-payoff`` :py:class:`~.DBSetting`, or the JSON for no settings.
+
+    :rtype: str
+    """
+    setting = db_session.query(DBSetting).get('credit-payoff')
+    if setting is None:
+        return json.dumps({'increases': [], 'onetimes': []})
+    return setting.value
+
+
 class CreditPayoffsView(MethodView):
     """
     Render the top-level GET /accounts/credit-payoff view using
@@ -72,7 +89,7 @@ class CreditPayoffsView(MethodView):
         :return: list of payoffs suitable for rendering
         :rtype: list
         """
-        res = ih.calculate_payoffs()
+        res = ih.cached_payoffs()
         payoffs = []
         for methname in sorted(res.keys(), reverse=True):
             tmp = {
@@ -128,26 +145,10 @@ class CreditPayoffsView(MethodView):
         :return: payment settings dict
         :rtype: dict
         """
-        res = {'increases': {}, 'onetimes': {}}
-        j = json.loads(settings_json)
-        for i in j['increases']:
-            if not i['enabled']:
-                continue
-            d = datetime.strptime(i['date'], '%Y-%m-%d').date()
-            res['increases'][d] = Decimal(i['amount'])
-        for i in j['onetimes']:
-            if not i['enabled']:
-                continue
-            d = datetime.strptime(i['date'], '%Y-%m-%d').date()
-            res['onetimes'][d] = Decimal(i['amount'])
-        return res
+        return payment_settings_kwargs(settings_json)
 
     def get(self):
-        setting = db_session.query(DBSetting).get('credit-payoff')
-        if setting is None:
-            pymt_settings_json = json.dumps({'increases': [], 'onetimes': []})
-        else:
-            pymt_settings_json = setting.value
+        pymt_settings_json = payment_settings_json()
         pymt_settings_kwargs = self._payment_settings_dict(pymt_settings_json)
         try:
             ih = InterestHelper(db_session, **pymt_settings_kwargs)
@@ -168,6 +169,80 @@ class CreditPayoffsView(MethodView):
         )
 
 
+class CreditPayoffsCalculateAjax(MethodView):
+    """
+    Handle POST /ajax/credit-payoff/calculate endpoint; enqueue a background
+    job (see :py:mod:`biweeklybudget.jobs`) to calculate credit payoffs with
+    the current payment settings via :py:func:`~.payoffs_job`, and return
+    :py:func:`~.job_response`.
+    """
+
+    def post(self):
+        return job_response(enqueue(
+            'payoffs', {'payment_settings': payment_settings_json()}
+        ))
+
+
+class CreditPayoffSweepAjax(MethodView):
+    """
+    Handle GET /ajax/credit-payoff/sweep endpoint; return the payoff months,
+    total payments and total interest of each payoff method for a range of
+    maximum total monthly payments, via
+    :py:meth:`~.InterestHelper.payoff_sweep`.
+
+    Accepts optional ``min``, ``max`` and ``step`` query parameters for the
+    range of amounts (default 500 to 5000 by 50). See
+    :py:func:`~.sweep_amounts`.
+    """
+
+    def get(self):
+        try:
+            amounts = sweep_amounts(
+                self._decimal_arg('min', '500'),
+                self._decimal_arg('max', '5000'),
+                self._decimal_arg('step', '50')
+            )
+        except ValueError as ex:
+            return jsonify({
+                'success': False,
+                'message': str(ex)
+            }), 400
+        try:
+            ih = InterestHelper(db_session)
+        except NoInterestChargedError as ex:
+            return jsonify({
+                'success': False,
+                'message': 'No interest charge found for account %s (%d)' % (
+                    ex.account.name, ex.account.id
+                )
+            }), 500
+        return jsonify({
+            'amounts': amounts,
+            'methods': ih.payoff_sweep(amounts)
+        })
+
+    def _decimal_arg(self, name, default):
+        """
+        Return the specified query parameter as a Decimal.
+
+        :param name: query parameter name
+        :type name: str
+        :param default: default value if the parameter is not set
+        :type default: str
+        :return: value of the parameter
+        :rtype: decimal.Decimal
+        :raises: ValueError if the parameter is not a number
+        """
+        val = request.args.get(name, default)
+        try:
+            res = Decimal(val)
+        except InvalidOperation:
+            raise ValueError('Invalid %s: %s' % (name, val))
+        if not res.is_finite():
+            raise ValueError('Invalid %s: %s' % (name, val))
+        return res
+
+
 class PayoffSettingsFormHandler(MethodView):
     """
     Handle POST /settings/credit-payoff
@@ -300,6 +375,14 @@ app.add_url_rule(
     '/accounts/credit-payoff',
     view_func=CreditPayoffsView.as_view('credit_payoffs_view')
 )
+app.add_url_rule(
+    '/ajax/credit-payoff/calculate',
+    view_func=CreditPayoffsCalculateAjax.as_view('credit_payoffs_calculate')
+)
+app.add_url_rule(
+    '/ajax/credit-payoff/sweep',
+    view_func=CreditPayoffSweepAjax.as_view('credit_payoffs_sweep')
+)
 app.add_url_rule(
     '/settings/credit-payoff',
     view_func=PayoffSettingsFormHandler.as_view('payoff_settings_form')
@@ -36,13 +36,14 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 """
 
 from flask.views import MethodView
-from flask import render_template, jsonify
-from copy import copy
-from sqlalchemy import asc
+from flask import render_template, jsonify, request
+from datetime import datetime
+from sqlalchemy.orm import joinedload
 
 from biweeklybudget.flaskapp.app import app
 from biweeklybudget.biweeklypayperiod import BiweeklyPayPeriod
-from biweeklybudget.models.account import Account, AcctType, AccountBalance
+from biweeklybudget.balance_history import BalanceHistory, DEFAULT_MAX_POINTS
+from biweeklybudget.models.account import Account, AcctType
 from biweeklybudget.models.budget_model import Budget
 from biweeklybudget.db import db_session
 from biweeklybudget.utils import dtnow
@@ -67,9 +68,8 @@ class IndexView(MethodView):
         for i in range(0, 8):
             x = x.next
             periods.append(x)
-        # trigger calculation/cache of data before passing on to jinja
-        for p in periods:
-            p.overall_sums
+        # load and cache sums for all periods before passing on to jinja
+        BiweeklyPayPeriod.load_budget_sums(periods, db_session)
         accts = {a.name: a.id for a in db_session.query(Account).all()}
         budgets = {}
         active_budgets = {}
@@ -82,13 +82,22 @@ class IndexView(MethodView):
                 active_budgets[b.id] = k
         return render_template(
             'index.html',
-            bank_accounts=db_session.query(Account).filter(
+            bank_accounts=db_session.query(Account).options(
+                joinedload(Account.latest_balance),
+                joinedload(Account.latest_statement)
+            ).filter(
                 Account.acct_type == AcctType.Bank,
                 Account.is_active == True).all(),  # noqa
-            credit_accounts=db_session.query(Account).filter(
+            credit_accounts=db_session.query(Account).options(
+                joinedload(Account.latest_balance),
+                joinedload(Account.latest_statement)
+            ).filter(
                 Account.acct_type == AcctType.Credit,
                 Account.is_active == True).all(),  # noqa
-            investment_accounts=db_session.query(Account).filter(
+            investment_accounts=db_session.query(Account).options(
+                joinedload(Account.latest_balance),
+                joinedload(Account.latest_statement)
+            ).filter(
                 Account.acct_type == AcctType.Investment,
                 Account.is_active == True).all(),  # noqa
             standing_budgets=standing,
@@ -106,43 +115,44 @@ class IndexView(MethodView):
 class AcctBalanaceChartView(MethodView):
     """
     Handle GET /ajax/chart-data/account-balances endpoint.
+
+    Accepts optional ``start`` and ``end`` query parameters (``%Y-%m-%d``
+    dates), ``resolution`` (``day``, ``week`` or ``month``; default ``day``)
+    and ``max_points`` (default 500). See :py:class:`~.BalanceHistory`.
     """
 
     def get(self):
-        accounts = {
-            x.id: x.name for x in db_session.query(Account).all()
-        }
-        acct_names = accounts.values()
-        datedict = {x: None for x in acct_names}
-        data = {}
-        for bal in db_session.query(AccountBalance).order_by(
-            asc(AccountBalance.overall_date)
-        ).all():
-            ds = bal.overall_date.strftime('%Y-%m-%d')
-            if ds not in data:
-                data[ds] = copy(datedict)
-                data[ds]['date'] = ds
-            if bal.ledger is None:
-                data[ds][bal.account.name] = 0.0
-            else:
-                data[ds][bal.account.name] = float(bal.ledger)
-        resdata = []
-        last = None
-        for k in sorted(data.keys()):
-            if last is None:
-                last = data[k]
-                continue
-            d = copy(data[k])
-            for subk in acct_names:
-                if d[subk] is None:
-                    d[subk] = last[subk]
-            last = d
-            resdata.append(d)
-        res = {
-            'data': resdata,
-            'keys': sorted(acct_names)
-        }
-        return jsonify(res)
+        try:
+            hist = BalanceHistory(
+                db_session,
+                start_date=self._date_arg('start'),
+                end_date=self._date_arg('end'),
+                resolution=request.args.get('resolution', 'day'),
+                max_points=int(
+                    request.args.get('max_points', DEFAULT_MAX_POINTS)
+                )
+            )
+        except ValueError as ex:
+            return jsonify({
+                'success': False,
+                'message': str(ex)
+            }), 400
+        return jsonify(hist.chart_data())
+
+    def _date_arg(self, name):
+        """
+        Return the specified query parameter as a date, or None if not set.
+
+        :param name: query parameter name
+        :type name: str
+        :return: date value of the parameter
+        :rtype: datetime.date
+        :raises: ValueError if the parameter is not a ``%Y-%m-%d`` date
+        """
+        val = request.args.get(name)
+        if val is None:
+            return None
+        return datetime.strptime(val, '%Y-%m-%d').date()
 
 
 app.add_url_rule('/', view_func=IndexView.as_view('index_view'))
@@ -0,0 +1,153 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import json
+import logging
+from time import monotonic, sleep
+
+from flask.views import MethodView
+from flask import jsonify, url_for, Response
+
+from biweeklybudget.flaskapp.app import app
+from biweeklybudget.flaskapp.jsonencoder import MagicJSONEncoder
+from biweeklybudget.jobs import job_status, ACTIVE_STATES
+
+logger = logging.getLogger(__name__)
+
+#: Number of seconds between checks of a job's status when streaming events
+EVENTS_POLL_INTERVAL = 0.5
+
+#: Number of seconds without a status change after which a keep-alive
+#: comment is sent on the event stream
+EVENTS_KEEPALIVE = 15
+
+
+def wants_background(values):
+    """
+    Return whether a request asked for its work to be done in a background
+    job, via a ``background`` parameter of ``true`` or ``1``.
+
+    :param values: request parameters, i.e. ``request.args``
+    :type values: dict
+    :rtype: bool
+    """
+    return str(values.get('background', '')).lower() in ['true', '1']
+
+
+def job_response(job_id):
+    """
+    Return a 202 Accepted JSON response for a newly-enqueued background job,
+    with ``job_id``, ``status_url`` (see :py:class:`~.JobAjax`) and
+    ``events_url`` (see :py:class:`~.JobEventsAjax`) keys.
+
+    :param job_id: ID of the enqueued job
+    :type job_id: int
+    :rtype: flask.Response
+    """
+    resp = jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status_url': url_for('job_ajax', job_id=job_id),
+        'events_url': url_for('job_events_ajax', job_id=job_id)
+    })
+    resp.status_code = 202
+    return resp
+
+
+def _not_found(job_id):
+    resp = jsonify({
+        'success': False, 'error_message': 'No job with ID %d' % job_id
+    })
+    resp.status_code = 404
+    return resp
+
+
+class JobAjax(MethodView):
+    """
+    Handle GET /ajax/jobs/<int:job_id> endpoint; return the status of a
+    background job (see :py:attr:`.Job.status`).
+    """
+
+    def get(self, job_id):
+        res = job_status(job_id)
+        if res is None:
+            return _not_found(job_id)
+        return jsonify(res)
+
+
+class JobEventsAjax(MethodView):
+    """
+    Handle GET /ajax/jobs/<int:job_id>/events endpoint; stream the status of
+    a background job as Server-Sent Events. An event is sent with the JSON
+    job status (see :py:attr:`.Job.status`) initially and whenever it changes,
+    and the stream ends once the job has finished.
+    """
+
+    def _events(self, job_id, status):
+        last_sent = monotonic()
+        yield 'data: %s\n\n' % json.dumps(status, cls=MagicJSONEncoder)
+        while status['state'] in ACTIVE_STATES:
+            sleep(EVENTS_POLL_INTERVAL)
+            new_status = job_status(job_id)
+            if new_status != status:
+                status = new_status
+                last_sent = monotonic()
+                yield 'data: %s\n\n' % json.dumps(
+                    status, cls=MagicJSONEncoder
+                )
+            elif monotonic() - last_sent >= EVENTS_KEEPALIVE:
+                last_sent = monotonic()
+                yield ': keepalive\n\n'
+
+    def get(self, job_id):
+        status = job_status(job_id)
+        if status is None:
+            return _not_found(job_id)
+        return Response(
+            self._events(job_id, status), mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+
+app.add_url_rule(
+    '/ajax/jobs/<int:job_id>',
+    view_func=JobAjax.as_view('job_ajax')
+)
+app.add_url_rule(
+    '/ajax/jobs/<int:job_id>/events',
+    view_func=JobEventsAjax.as_view('job_events_ajax')
+)
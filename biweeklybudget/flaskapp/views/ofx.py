@@ -41,18 +41,55 @@ from flask import render_template, jsonify, request
 from datatables import DataTable
 from sqlalchemy import or_
 import pickle
+import zlib
+import json
 from base64 import b64decode
+from werkzeug.exceptions import RequestEntityTooLarge
 
 from biweeklybudget.flaskapp.app import app
 from biweeklybudget.models.ofx_transaction import OFXTransaction
 from biweeklybudget.models.account import Account
 from biweeklybudget.db import db_session
 from biweeklybudget.flaskapp.views.searchableajaxview import SearchableAjaxView
-from biweeklybudget.ofxapi.local import OfxApiLocal
+from biweeklybudget.ofxapi.local import OfxApiLocal, statement_result
 from biweeklybudget.ofxapi.exceptions import DuplicateFileException
+from biweeklybudget.ofxapi.encoding import decode_statements
+from biweeklybudget.flaskapp.views.jobs import wants_background, job_response
+from biweeklybudget.jobs import enqueue
 
 logger = logging.getLogger(__name__)
 
+#: Maximum decompressed size in bytes of a gzip-compressed request body to
+#: :py:class:`~.OfxStatementsBatchPost`, used unless Flask's
+#: ``MAX_CONTENT_LENGTH`` is set.
+MAX_DECOMPRESSED_LENGTH = 64 * 1024 * 1024
+
+
+def gunzip_limited(data, max_length):
+    """
+    Decompress gzip-compressed ``data``, without ever decompressing more than
+    ``max_length`` bytes of it.
+
+    :param data: gzip-compressed data
+    :type data: bytes
+    :param max_length: maximum decompressed length in bytes
+    :type max_length: int
+    :return: decompressed data
+    :rtype: bytes
+    :raises: :py:exc:`werkzeug.exceptions.RequestEntityTooLarge` if the data
+      decompresses to more than ``max_length`` bytes, or
+      :py:exc:`ValueError` if it is incomplete or invalid
+    """
+    d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    res = d.decompress(data, max_length + 1)
+    if len(res) > max_length:
+        raise RequestEntityTooLarge(
+            'Request body decompresses to more than %d bytes' % max_length
+        )
+    if not d.eof or len(d.unused_data) > 0:
+        raise ValueError('Request body is not a single complete gzip stream')
+    return res
+
 
 class OfxView(MethodView):
     """
@@ -118,6 +155,20 @@ class OfxAccounts(MethodView):
         return jsonify(api.get_accounts())
 
 
+class OfxStatementFilenames(MethodView):
+    """
+    Handle GET /api/ofx/statement_filenames endpoint.
+
+    This returns the JSON-ified return value from
+    :py:meth:`~.OfxApiLocal.get_statement_filenames` and will usually be called
+    from :py:meth:`~.OfxApiRemote.get_statement_filenames`.
+    """
+
+    def get(self):
+        api = OfxApiLocal(db_session)
+        return jsonify(api.get_statement_filenames())
+
+
 class OfxStatementPost(MethodView):
     """
     Handle POST /api/ofx/statement endpoint.
@@ -223,6 +274,93 @@ class OfxStatementPost(MethodView):
         return resp
 
 
+class OfxStatementsBatchPost(MethodView):
+    """
+    Handle POST /api/ofx/statements endpoint.
+
+    This is a ReST API bridge between
+    :py:meth:`~.OfxApiRemote.update_statements_ofx` on the client side and
+    :py:meth:`~.OfxApiLocal.update_statements_ofx` on the server side, to
+    upload multiple statements in one request.
+    """
+
+    def _error(self, msg, status_code=400):
+        resp = jsonify({'success': False, 'message': msg})
+        resp.status_code = status_code
+        return resp
+
+    def post(self):
+        """
+        Handle POST to /api/ofx/statements (from
+        :py:meth:`~.OfxApiRemote.update_statements_ofx`) to upload new OFX
+        Statements (via :py:meth:`~.OfxApiLocal.update_statements_ofx`).
+
+        The request body is JSON, optionally gzip-compressed with a
+        ``Content-Encoding: gzip`` header, with a ``statements`` key whose
+        value is a list of objects with the following keys:
+
+        - ``acct_id`` (int) the Account ID the Statement is for
+        - ``mtime`` (str) ISO8601 file modification time of the OFX file, or
+          null
+        - ``filename`` (str) the file name of the OFX file
+        - ``ofx`` (object) the statement encoded by
+          :py:func:`~biweeklybudget.ofxapi.encoding.encode_ofx`
+
+        Returns a JSON object with a ``results`` key, a list with one object
+        per statement, in order, with the following fields:
+
+        - ``success`` (bool) whether the statement was successfully added
+        - ``message`` (str) message describing success or error message
+        - ``duplicate`` (bool) whether the statement was a duplicate
+          (:py:exc:`~.DuplicateFileException`)
+        - ``statement_id`` (int) ID of the new statement or, for duplicates,
+          of the existing statement
+        - ``count_new`` (int) count of new transactions added
+        - ``count_updated`` (int) count of transactions updated
+
+        If the ``background`` query parameter is ``true``, the statements are
+        decoded and then processed in a background job (see
+        :py:mod:`biweeklybudget.jobs`), and the response is that of
+        :py:func:`~.job_response`; the job's result is the object described
+        above.
+
+        HTTP Status Codes:
+
+        - 200 - Batch was processed; see ``results`` for each statement
+        - 202 - Batch was queued to be processed in the background
+        - 400 - Request could not be decoded
+        - 413 - Request body decompresses to more than Flask's
+          ``MAX_CONTENT_LENGTH`` (or :py:data:`~.MAX_DECOMPRESSED_LENGTH`)
+        """
+        try:
+            body = request.get_data()
+            if request.headers.get('Content-Encoding', '') == 'gzip':
+                body = gunzip_limited(
+                    body,
+                    app.config.get('MAX_CONTENT_LENGTH') or
+                    MAX_DECOMPRESSED_LENGTH
+                )
+            data = json.loads(body)
+            statements = decode_statements(data['statements'])
+        except RequestEntityTooLarge as ex:
+            logger.error('OFX Statements batch post too large: %s',
+                         ex.description)
+            return self._error(ex.description, status_code=413)
+        except Exception as ex:
+            logger.error('Error decoding OFX Statements batch post',
+                         exc_info=True)
+            return self._error('Unable to decode request: %s' % ex)
+        if wants_background(request.args):
+            return job_response(enqueue(
+                'ofx_statements', {'statements': data['statements']}
+            ))
+        api = OfxApiLocal(db_session)
+        results = [
+            statement_result(r) for r in api.update_statements_ofx(statements)
+        ]
+        return jsonify({'success': True, 'results': results})
+
+
 class OfxAjax(SearchableAjaxView):
     """
     Handle GET /ajax/ofx endpoint.
@@ -334,6 +472,14 @@ app.add_url_rule(
     '/api/ofx/accounts',
     view_func=OfxAccounts.as_view('ofx_api_accounts')
 )
+app.add_url_rule(
+    '/api/ofx/statements',
+    view_func=OfxStatementsBatchPost.as_view('ofx_api_statements')
+)
+app.add_url_rule(
+    '/api/ofx/statement_filenames',
+    view_func=OfxStatementFilenames.as_view('ofx_api_statement_filenames')
+)
 app.add_url_rule(
     '/api/ofx/statement',
     view_func=OfxStatementPost.as_view('ofx_api_statement')
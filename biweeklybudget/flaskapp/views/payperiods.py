@@ -77,9 +77,8 @@ class PayPeriodsView(MethodView):
         for i in range(0, 8):
             x = x.next
             periods.append(x)
-        # trigger calculation/cache of data before passing on to jinja
-        for p in periods:
-            p.overall_sums
+        # load and cache sums for all periods before passing on to jinja
+        BiweeklyPayPeriod.load_budget_sums(periods, db_session)
         return render_template(
             'payperiods.html',
             periods=periods,
@@ -119,6 +118,16 @@ class PayPeriodView(MethodView):
         d = datetime.strptime(period_date, '%Y-%m-%d').date()
         pp = BiweeklyPayPeriod.period_for_date(d, db_session)
         curr_pp = BiweeklyPayPeriod.period_for_date(dtnow(), db_session)
+        # hold on to the surrounding periods, so the sums loaded for them are
+        # the ones rendered; only their overall sums are shown
+        pp_prev = pp.previous
+        pp_next = pp.next
+        pp_following = pp_next.next
+        pp_last = pp_following.next
+        BiweeklyPayPeriod.load_budget_sums(
+            [pp_prev, pp_next, pp_following, pp_last], db_session
+        )
+        BiweeklyPayPeriod.prefetch_data([pp], db_session)
         budgets = {}
         active_budgets = {}
         for b in db_session.query(Budget).all():
@@ -180,21 +189,20 @@ class PayPeriodView(MethodView):
         return render_template(
             'payperiod.html',
             pp=pp,
-            pp_prev_date=pp.previous.start_date,
-            pp_prev_sums=pp.previous.overall_sums,
-            pp_prev_suffix=self.suffix_for_period(curr_pp, pp.previous),
-            pp_curr_date=pp.start_date,
+            pp_prev=pp_prev,
+            pp_prev_sums=pp_prev.overall_sums,
+            pp_prev_suffix=self.suffix_for_period(curr_pp, pp_prev),
             pp_curr_sums=pp.overall_sums,
             pp_curr_suffix=self.suffix_for_period(curr_pp, pp),
-            pp_next_date=pp.next.start_date,
-            pp_next_sums=pp.next.overall_sums,
-            pp_next_suffix=self.suffix_for_period(curr_pp, pp.next),
-            pp_following_date=pp.next.next.start_date,
-            pp_following_sums=pp.next.next.overall_sums,
-            pp_following_suffix=self.suffix_for_period(curr_pp, pp.next.next),
-            pp_last_date=pp.next.next.next.start_date,
-            pp_last_sums=pp.next.next.next.overall_sums,
-            pp_last_suffix=self.suffix_for_period(curr_pp, pp.next.next.next),
+            pp_next=pp_next,
+            pp_next_sums=pp_next.overall_sums,
+            pp_next_suffix=self.suffix_for_period(curr_pp, pp_next),
+            pp_following=pp_following,
+            pp_following_sums=pp_following.overall_sums,
+            pp_following_suffix=self.suffix_for_period(curr_pp, pp_following),
+            pp_last=pp_last,
+            pp_last_sums=pp_last.overall_sums,
+            pp_last_suffix=self.suffix_for_period(curr_pp, pp_last),
             budget_sums=pp.budget_sums,
             budgets=budgets,
             standing=standing,
@@ -51,6 +51,8 @@ from biweeklybudget.models.plaid_accounts import PlaidAccount
 from biweeklybudget.plaid_updater import PlaidUpdater
 from biweeklybudget.version import VERSION
 from biweeklybudget.db import db_session
+from biweeklybudget.flaskapp.views.jobs import wants_background, job_response
+from biweeklybudget.jobs import enqueue
 
 from plaid.models import (
     LinkTokenCreateRequest, ItemPublicTokenExchangeRequest,
@@ -256,6 +258,11 @@ class PlaidUpdate(MethodView):
         text human-readable summary of the update operation.
       * Otherwise, return a templated view of the update operation results, as
         would be returned to a browser.
+
+      If the ``background`` query parameter is ``true``, the update is run in
+      a background job (see :py:mod:`biweeklybudget.jobs`) instead, and the
+      response is that of :py:func:`~.job_response`. The job's result is the
+      JSON list of update results.
     """
 
     def post(self):
@@ -277,6 +284,8 @@ class PlaidUpdate(MethodView):
         kwargs = {}
         if 'num_days' in request.args:
             kwargs['num_days'] = int(request.args['num_days'])
+        if wants_background(request.args):
+            kwargs['background'] = True
         return self._update(ids, **kwargs)
 
     def get(self):
@@ -290,9 +299,11 @@ class PlaidUpdate(MethodView):
         kwargs = {}
         if 'num_days' in request.args:
             kwargs['num_days'] = int(request.args['num_days'])
+        if wants_background(request.args):
+            kwargs['background'] = True
         return self._update(ids, **kwargs)
 
-    def _update(self, ids: str, num_days: int = 30):
+    def _update(self, ids: str, num_days: int = 30, background: bool = False):
         """
         Handle an update for Plaid accounts by instantiating a
         :py:class:`~.PlaidUpdater`, calling its :py:meth:`~.PlaidUpdater.update`
@@ -304,11 +315,19 @@ class PlaidUpdate(MethodView):
         :type ids: str
         :param num_days: number of days to retrieve transactions for; default 30
         :type num_days: int
+        :param background: whether to run the update in a background job and
+          return a 202 response with the job ID
+        :type background: bool
         """
         logger.info(
-            'Handle Plaid Update request; item_ids=%s num_days=%d',
-            ids, num_days
+            'Handle Plaid Update request; item_ids=%s num_days=%d '
+            'background=%s', ids, num_days, background
         )
+        if background:
+            return job_response(enqueue('plaid_update', {
+                'item_ids': 'ALL' if ids == 'ALL' else ids.split(','),
+                'num_days': num_days
+            }))
         updater = PlaidUpdater()
         if ids == 'ALL':
             items = PlaidUpdater.available_items()
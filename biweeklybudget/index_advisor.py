@@ -0,0 +1,333 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+from pytz import UTC
+from sqlalchemy import func, null, desc
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from biweeklybudget.biweeklypayperiod import (
+    BiweeklyPayPeriod, period_start_for_date, period_index_sql
+)
+from biweeklybudget.cliutils import set_log_debug, set_log_info
+from biweeklybudget.models import (
+    Account, AccountBalance, BudgetTransaction, FuelFill, OFXStatement,
+    OFXTransaction, ScheduledTransaction, Transaction
+)
+from biweeklybudget.utils import dtnow
+
+logger = logging.getLogger(__name__)
+
+#: ID used for Account, Budget and Vehicle parameters of the explained
+#: queries; the query plan does not depend on the actual value.
+SAMPLE_ID = 1
+
+#: Tables that queries are expected to scan in full, keyed by the query
+#: description from :py:meth:`~.IndexAdvisor.queries`. These queries read
+#: every row of the table, so no index can avoid the scan and it is not
+#: reported.
+EXPECTED_FULL_SCANS = {
+    'Accounts with latest balance and statement': ['accounts']
+}
+
+
+def _utc(d):
+    """
+    Return a UTC datetime for midnight on date ``d``.
+
+    :param d: date
+    :type d: datetime.date
+    :rtype: datetime.datetime
+    """
+    return datetime(d.year, d.month, d.day, tzinfo=UTC)
+
+
+class Explain(Executable, ClauseElement):
+    """
+    Executable construct that wraps a statement in ``EXPLAIN``, so that the
+    statement's parameters are bound and processed the same way they are when
+    the statement itself is executed.
+    """
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        """
+        :param statement: the statement to explain
+        :type statement: sqlalchemy.sql.expression.Select
+        """
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    return 'EXPLAIN ' + compiler.process(element.statement, **kw)
+
+
+class IndexAdvisor(object):
+    """
+    Run the most frequent query shapes of the application under MySQL
+    ``EXPLAIN`` and report any that need a full scan of a table.
+    """
+
+    def __init__(self, db_session):
+        """
+        Initialize the advisor.
+
+        :param db_session: active database session to use
+        :type db_session: sqlalchemy.orm.session.Session
+        """
+        self._db = db_session
+
+    def queries(self):
+        """
+        Return a list of 2-tuples of a description and statement for each of
+        the query shapes to check. Parameters are representative values:
+        the current pay period, :py:const:`~.SAMPLE_ID` for primary keys, and
+        so on.
+
+        :return: list of (description, statement) tuples
+        :rtype: list
+        """
+        now = dtnow()
+        pp = BiweeklyPayPeriod(period_start_for_date(now), self._db)
+        month_ago = now - timedelta(days=31)
+        return [
+            (
+                'Transactions in pay period',
+                pp.filter_query(self._db.query(Transaction), Transaction.date)
+            ),
+            (
+                'Active ScheduledTransactions',
+                self._db.query(ScheduledTransaction).filter(
+                    ScheduledTransaction.is_active.__eq__(True)
+                )
+            ),
+            (
+                'Active ScheduledTransactions by date in pay period',
+                pp._scheduled_transactions_date()
+            ),
+            (
+                'OFXTransactions in pay period',
+                self._db.query(OFXTransaction).filter(
+                    OFXTransaction.date_posted.__ge__(_utc(pp.start_date)),
+                    OFXTransaction.date_posted.__lt__(
+                        _utc(pp.end_date + timedelta(days=1))
+                    )
+                )
+            ),
+            ('Transaction.unreconciled', Transaction.unreconciled(self._db)),
+            (
+                'OFXTransaction.unreconciled',
+                OFXTransaction.unreconciled(self._db)
+            ),
+            (
+                'Account.unreconciled',
+                self._db.query(Transaction).filter(
+                    Transaction.reconcile.__eq__(null()),
+                    Transaction.account_id.__eq__(SAMPLE_ID),
+                    Transaction.date.__ge__(month_ago.date()),
+                    Transaction.date.__le__(now.date())
+                )
+            ),
+            (
+                'OFXTransactions for account by date',
+                self._db.query(OFXTransaction).filter(
+                    OFXTransaction.account_id.__eq__(SAMPLE_ID),
+                    OFXTransaction.date_posted.__ge__(month_ago)
+                )
+            ),
+            (
+                'AccountBalances for account by date',
+                self._db.query(AccountBalance).filter(
+                    AccountBalance.account_id.__eq__(SAMPLE_ID),
+                    AccountBalance.overall_date.__ge__(month_ago)
+                ).order_by(AccountBalance.overall_date)
+            ),
+            (
+                'OFXTransaction.first_statement_by_date',
+                self._db.query(OFXStatement).filter(
+                    OFXStatement.account_id.__eq__(SAMPLE_ID),
+                    OFXStatement.as_of.__ge__(_utc(now.date()))
+                ).order_by(OFXStatement.as_of.asc()).limit(1)
+            ),
+            (
+                'Budget spending by pay period',
+                self._db.query(
+                    period_index_sql(Transaction.date),
+                    BudgetTransaction.budget_id,
+                    func.sum(BudgetTransaction.amount)
+                ).join(
+                    Transaction, BudgetTransaction.trans_id == Transaction.id
+                ).filter(
+                    BudgetTransaction.budget_id.in_([SAMPLE_ID]),
+                    Transaction.date.__le__(now.date())
+                ).group_by(
+                    period_index_sql(Transaction.date),
+                    BudgetTransaction.budget_id
+                )
+            ),
+            (
+                'FuelFill._previous_entry',
+                self._db.query(FuelFill).filter(
+                    FuelFill.vehicle_id.__eq__(SAMPLE_ID),
+                    FuelFill.odometer_miles.__lt__(100000)
+                ).order_by(desc(FuelFill.odometer_miles)).limit(1)
+            ),
+            (
+                'Accounts with latest balance and statement',
+                self._db.query(Account).outerjoin(
+                    AccountBalance, Account.latest_balance_id == AccountBalance.id
+                ).outerjoin(
+                    OFXStatement, Account.latest_statement_id == OFXStatement.id
+                )
+            ),
+        ]
+
+    def explain(self, query):
+        """
+        Run ``EXPLAIN`` for a query and return the resulting rows.
+
+        :param query: the query to explain
+        :type query: sqlalchemy.orm.query.Query
+        :return: list of dicts, one per EXPLAIN output row
+        :rtype: list
+        """
+        return [
+            dict(r._mapping)
+            for r in self._db.execute(Explain(query.statement))
+        ]
+
+    @staticmethod
+    def full_scans(rows, min_rows=0):
+        """
+        Given the rows returned by :py:meth:`~.explain`, return the ones that
+        are a full table scan (access type ``ALL``) and examine at least
+        ``min_rows`` rows.
+
+        :param rows: MySQL EXPLAIN output rows
+        :type rows: list
+        :param min_rows: ignore scans estimated to examine fewer rows than this
+        :type min_rows: int
+        :return: list of the matching rows
+        :rtype: list
+        """
+        return [
+            r for r in rows
+            if r.get('type') == 'ALL' and (r.get('rows') or 0) >= min_rows
+        ]
+
+    def check(self, min_rows=0):
+        """
+        Explain every query returned by :py:meth:`~.queries` and return a list
+        of string descriptions of all full table scans found, other than those
+        listed in :py:data:`~.EXPECTED_FULL_SCANS`.
+
+        :param min_rows: ignore scans estimated to examine fewer rows than this
+        :type min_rows: int
+        :return: list of full table scan descriptions
+        :rtype: list
+        """
+        problems = []
+        for desc_str, query in self.queries():
+            rows = self.explain(query)
+            logger.debug('EXPLAIN for %s: %s', desc_str, rows)
+            for r in self.full_scans(rows, min_rows=min_rows):
+                if r.get('table') in EXPECTED_FULL_SCANS.get(desc_str, []):
+                    logger.debug(
+                        'Ignoring expected full scan of %s for %s',
+                        r.get('table'), desc_str
+                    )
+                    continue
+                problems.append(
+                    '%s: full scan of table %s (rows=%s, possible_keys=%s, '
+                    'Extra=%s)' % (
+                        desc_str, r.get('table'), r.get('rows'),
+                        r.get('possible_keys'), r.get('Extra')
+                    )
+                )
+        return problems
+
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description='EXPLAIN the most frequent queries and report any that '
+                    'do full table scans'
+    )
+    p.add_argument('-v', '--verbose', dest='verbose', action='count', default=0,
+                   help='verbose output. specify twice for debug-level output.')
+    p.add_argument('-m', '--min-rows', dest='min_rows', type=int,
+                   action='store', default=0,
+                   help='ignore full scans of tables estimated to have fewer '
+                        'than this many rows (default: 0)')
+    args = p.parse_args()
+    return args
+
+
+def main():
+    global logger
+    logging.basicConfig(
+        level=logging.WARNING,
+        format="[%(asctime)s %(levelname)s] %(message)s"
+    )
+    logger = logging.getLogger()
+
+    args = parse_args()
+
+    # set logging level
+    if args.verbose > 1:
+        set_log_debug(logger)
+    elif args.verbose == 1:
+        set_log_info(logger)
+
+    from biweeklybudget.db import init_db, db_session
+    init_db()
+    problems = IndexAdvisor(db_session).check(min_rows=args.min_rows)
+    for p in problems:
+        print(p)
+    if len(problems) > 0:
+        print('Found %d full table scans.' % len(problems))
+        raise SystemExit(1)
+    print('No full table scans found.')
+
+
+if __name__ == "__main__":
+    main()
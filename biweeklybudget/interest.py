@@ -35,16 +35,34 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 ################################################################################
 """
 
+import hashlib
+import json
 import logging
-from datetime import timedelta
-from decimal import Decimal
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from decimal import Context, Decimal
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import wait as wait_connections
 from dateutil.relativedelta import relativedelta
 from calendar import monthrange
+from sqlalchemy.orm import sessionmaker
 
+from biweeklybudget import settings
 from biweeklybudget.models.account import Account, AcctType
+from biweeklybudget.models.credit_payoff_result import CreditPayoffResult
+from biweeklybudget.version import VERSION
 
 logger = logging.getLogger(__name__)
 
+#: Decimal precision used internally by :py:meth:`~.AdbCompoundedDaily.calculate`
+#: for the closed-form interest calculation; results are rounded to the
+#: current context's precision.
+KERNEL_PRECISION = 50
+
+#: Decimal context for the interest calculation, using KERNEL_PRECISION
+_KERNEL_CONTEXT = Context(prec=KERNEL_PRECISION)
+
 
 class InterestHelper(object):
 
@@ -139,10 +157,103 @@ class InterestHelper(object):
         logger.debug('Minimum payments by account_id: %s', res)
         return res
 
-    def calculate_payoffs(self):
+    @property
+    def inputs_hash(self):
+        """
+        Return a hex SHA-256 hash of everything that the results of
+        :py:meth:`~.calculate_payoffs` depend on: each account's balance, APR,
+        last interest charge, billing period, interest calculation and minimum
+        payment formula, the payment increases and onetimes, the payoff methods
+        and the biweeklybudget version.
+
+        :rtype: str
+        """
+        inputs = {
+            'version': VERSION,
+            'methods': sorted(
+                x for x in PAYOFF_METHOD_NAMES.keys()
+                if PAYOFF_METHOD_NAMES[x]['cls'].show_in_ui
+            ),
+            'statements': [
+                [
+                    a_id,
+                    stmt._interest_cls.__class__.__name__,
+                    str(stmt.apr),
+                    str(stmt.principal),
+                    str(stmt.interest),
+                    stmt._min_pay_cls.__class__.__name__,
+                    stmt.start_date.isoformat(),
+                    stmt.end_date.isoformat()
+                ] for a_id, stmt in sorted(self._statements.items())
+            ],
+            'increases': [
+                [d.isoformat(), str(amt)]
+                for d, amt in sorted(self._increases.items())
+            ],
+            'onetimes': [
+                [d.isoformat(), str(amt)]
+                for d, amt in sorted(self._onetimes.items())
+            ]
+        }
+        return hashlib.sha256(
+            json.dumps(inputs, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+
+    def cached_payoffs(self, progress=None):
+        """
+        Return the results of :py:meth:`~.calculate_payoffs`, from the
+        :py:class:`~.CreditPayoffResult` stored for the current
+        :py:attr:`~.inputs_hash` if there is one. Otherwise, calculate them
+        and store them, unless any payoff method failed (failures, such as
+        timeouts, may not happen again). Results are stored through a separate
+        short-lived session, so that this never commits or rolls back the
+        session that this instance was created with (i.e. the request's
+        ``db_session`` when rendering a page).
+
+        :param progress: optional callable, passed to
+          :py:meth:`~.calculate_payoffs`; not called for stored results
+        :type progress: callable
+        :return: return value of :py:meth:`~.calculate_payoffs`
+        :rtype: dict
+        """
+        key = self.inputs_hash
+        cached = self._sess.query(CreditPayoffResult).get(key)
+        if cached is not None:
+            logger.debug('Using stored credit payoff results for %s', key)
+            return payoffs_from_json(cached.result)
+        res = self.calculate_payoffs(progress=progress)
+        if any('error' in x for x in res.values()):
+            return res
+        sess = sessionmaker(bind=self._sess.get_bind())()
+        try:
+            CreditPayoffResult.store(sess, key, payoffs_to_json(res))
+        finally:
+            sess.close()
+        return res
+
+    def calculate_payoffs(self, progress=None, workers=None, timeout=None):
         """
         Calculate payoffs for each account/statement.
 
+        When ``workers`` is greater than one, each payoff method is simulated
+        in its own worker process, with up to ``workers`` of them running at
+        once. A method that takes longer than ``timeout`` seconds has its
+        process terminated. Otherwise, the methods are calculated one after
+        another in the current process, and a method that is still simulating
+        after ``timeout`` seconds is stopped. Either way, a method that times
+        out is reported with an error like a method that failed.
+
+        :param progress: optional callable, called with the int number of
+          payoff methods calculated so far, the int total, and the name of the
+          method after each method
+        :type progress: callable
+        :param workers: number of payoff methods to calculate at once in worker
+          processes; defaults to
+          :py:attr:`~biweeklybudget.settings.PAYOFF_WORKERS`
+        :type workers: int
+        :param timeout: seconds to allow each payoff method, or 0 for no limit;
+          defaults to :py:attr:`~biweeklybudget.settings.PAYOFF_METHOD_TIMEOUT`
+        :type timeout: int
         :return: dict of payoff information. Keys are payoff method names.
           Values are dicts, with keys "description" (str description of the
           payoff method), "doc" (the docstring of the class), and "results".
@@ -151,43 +262,223 @@ class InterestHelper(object):
           "total_interest" (Decimal) and ``next_payment`` (Decimal).
         :rtype: dict
         """
+        if workers is None:
+            workers = settings.PAYOFF_WORKERS
+        if timeout is None:
+            timeout = settings.PAYOFF_METHOD_TIMEOUT
         res = {}
+        methods = []
         max_total = sum(list(self.min_payments.values()))
-        for name in sorted(PAYOFF_METHOD_NAMES.keys()):
+        names = [
+            x for x in sorted(PAYOFF_METHOD_NAMES.keys())
+            if PAYOFF_METHOD_NAMES[x]['cls'].show_in_ui
+        ]
+        for name in names:
             cls = PAYOFF_METHOD_NAMES[name]['cls']
             klass = cls(
                 max_total, increases=self._increases, onetimes=self._onetimes
             )
-            if not cls.show_in_ui:
-                continue
             res[name] = {
                 'description': PAYOFF_METHOD_NAMES[name]['description'],
                 'doc': PAYOFF_METHOD_NAMES[name]['doc']
             }
-            try:
-                res[name]['results'] = self._calc_payoff_method(klass)
-            except Exception as ex:
-                res[name]['error'] = str(ex)
+            methods.append((name, klass))
+        if workers > 1:
+            calculated = self._calc_payoff_methods_parallel(
+                methods, workers, timeout
+            )
+        else:
+            calculated = self._calc_payoff_methods_serial(methods, timeout)
+        for count, (name, results, error) in enumerate(calculated, start=1):
+            if error is None:
+                res[name]['results'] = results
+            else:
+                res[name]['error'] = error
                 logger.error('Minimum payment method %s failed: %s',
-                             name, ex)
+                             name, error)
+            if progress is not None:
+                progress(count, len(names), name)
+        return res
+
+    def payoff_sweep(self, amounts):
+        """
+        Calculate the payoff of all accounts with each payoff method, for each
+        of a list of maximum total monthly payment amounts, with no increases
+        or onetimes; see :py:meth:`~.PayoffSimulation.sweep`.
+
+        :param amounts: maximum total monthly payment amounts, i.e. from
+          :py:func:`~.sweep_amounts`
+        :type amounts: list
+        :return: dict of payoff information. Keys are payoff method names.
+          Values are dicts, with keys "description" (str description of the
+          payoff method) and "results", a list with a dict for each of
+          ``amounts``. Each has a "max_total" key with the amount, and either
+          "payoff_months" (int, the most months to pay off any account),
+          "total_payments" (Decimal) and "total_interest" (Decimal) for all
+          accounts, or "error" (str).
+        :rtype: dict
+        """
+        sim = PayoffSimulation(list(self._statements.values()))
+        res = {}
+        for name in sorted(PAYOFF_METHOD_NAMES.keys()):
+            cls = PAYOFF_METHOD_NAMES[name]['cls']
+            if not cls.show_in_ui:
+                continue
+            res[name] = {
+                'description': PAYOFF_METHOD_NAMES[name]['description'],
+                'results': []
+            }
+            for amt, (calc, error) in zip(amounts, sim.sweep(cls, amounts)):
+                if error is not None:
+                    res[name]['results'].append(
+                        {'max_total': amt, 'error': error}
+                    )
+                    continue
+                results = self._payoff_method_results(calc).values()
+                res[name]['results'].append({
+                    'max_total': amt,
+                    'payoff_months': max(
+                        [r['payoff_months'] for r in results] + [0]
+                    ),
+                    'total_payments': sum(
+                        r['total_payments'] for r in results
+                    ),
+                    'total_interest': sum(
+                        r['total_interest'] for r in results
+                    )
+                })
         return res
 
-    def _calc_payoff_method(self, cls):
+    def _calc_payoff_methods_serial(self, methods, timeout):
+        """
+        Generator to calculate payoffs using each method in turn, in the
+        current process. Yields a 3-tuple for each method of its name, the
+        return value of :py:meth:`~._calc_payoff_method` (or None on error) and
+        the str error message (or None on success).
+
+        :param methods: list of (name, payoff method instance) 2-tuples
+        :type methods: list
+        :param timeout: seconds to allow each method, or 0 for no limit
+        :type timeout: int
+        """
+        for name, klass in methods:
+            try:
+                results = self._calc_payoff_method(klass, timeout=timeout)
+            except Exception as ex:
+                yield name, None, str(ex)
+                continue
+            yield name, results, None
+
+    def _calc_payoff_methods_parallel(self, methods, workers, timeout):
+        """
+        Generator to calculate payoffs using each method in its own worker
+        process, running :py:func:`~._payoff_method_process` with a snapshot
+        of the statements. Yields the same 3-tuples as
+        :py:meth:`~._calc_payoff_methods_serial`, in the order that the methods
+        finish.
+
+        :param methods: list of (name, payoff method instance) 2-tuples
+        :type methods: list
+        :param workers: number of worker processes to run at once
+        :type workers: int
+        :param timeout: seconds to allow each method before terminating its
+          worker process, or 0 (or None) for no limit
+        :type timeout: int
+        """
+        statements = list(self._statements.values())
+        pending = deque(methods)
+        # receiving Connection to (name, Process, deadline); the deadline is
+        # None if there is no timeout
+        running = {}
+        try:
+            while pending or running:
+                while pending and len(running) < workers:
+                    name, klass = pending.popleft()
+                    recv_conn, send_conn = Pipe(duplex=False)
+                    proc = Process(
+                        target=_payoff_method_process,
+                        args=(send_conn, klass, statements),
+                        daemon=True
+                    )
+                    proc.start()
+                    send_conn.close()
+                    running[recv_conn] = (
+                        name, proc,
+                        time.monotonic() + timeout if timeout else None
+                    )
+                wait_timeout = None
+                if timeout:
+                    next_deadline = min(x[2] for x in running.values())
+                    wait_timeout = max(0, next_deadline - time.monotonic())
+                ready = wait_connections(
+                    list(running.keys()), timeout=wait_timeout
+                )
+                for conn in ready:
+                    name, proc, _ = running.pop(conn)
+                    try:
+                        calc, error = conn.recv()
+                    except EOFError:
+                        proc.join()
+                        calc = None
+                        error = 'Worker process exited with code %s' % (
+                            proc.exitcode
+                        )
+                    conn.close()
+                    proc.join()
+                    if error is not None:
+                        yield name, None, error
+                        continue
+                    yield name, self._payoff_method_results(calc), None
+                now = time.monotonic()
+                for conn in list(running.keys()):
+                    name, proc, deadline = running[conn]
+                    if deadline is None or deadline > now:
+                        continue
+                    del running[conn]
+                    proc.terminate()
+                    proc.join()
+                    conn.close()
+                    yield name, None, 'Timed out after %s seconds' % timeout
+        finally:
+            for conn, (_, proc, _) in running.items():
+                proc.terminate()
+                proc.join()
+                conn.close()
+
+    def _calc_payoff_method(self, cls, timeout=None):
         """
         Calculate payoffs using one method.
 
         :param cls: payoff method class
         :type cls: biweeklybudget.interest._PayoffMethod
+        :param timeout: seconds to allow the simulation to run, if any; see
+          :py:meth:`~.PayoffSimulation.run`
+        :type timeout: int
         :return: Dict with integer `account_id` as the key, and values are
           dicts with keys "payoff_months" (int), "total_payments" (Decimal),
           "total_interest" (Decimal), "next_payment" (Decimal).
         :rtype: dict
         """
+        return self._payoff_method_results(
+            calculate_payoffs(
+                cls, list(self._statements.values()), timeout=timeout
+            )
+        )
+
+    def _payoff_method_results(self, calc):
+        """
+        Given the return value of :py:func:`~.calculate_payoffs` for this
+        instance's statements, return the results dict described in
+        :py:meth:`~._calc_payoff_method`.
+
+        :param calc: return value of :py:func:`~.calculate_payoffs`
+        :type calc: list
+        :rtype: dict
+        """
         balances = {
             x: self._statements[x].principal for x in self._statements.keys()
         }
         res = {}
-        calc = calculate_payoffs(cls, list(self._statements.values()))
         for idx, result in enumerate(calc):
             a_id = list(self._statements.keys())[idx]
             res[a_id] = {
@@ -199,6 +490,56 @@ class InterestHelper(object):
         return res
 
 
+def _payoff_method_process(conn, payment_method, statements):
+    """
+    Target of the worker processes started by
+    :py:meth:`~.InterestHelper._calc_payoff_methods_parallel`. Runs
+    :py:func:`~.calculate_payoffs` and sends a 2-tuple of its return value (or
+    None on error) and the str error message (or None on success) over
+    ``conn``. This is a module-level function, and its arguments and the
+    result are picklable, so it can run in a spawned process.
+
+    :param conn: sending end of the pipe to the parent process
+    :type conn: multiprocessing.connection.Connection
+    :param payment_method: method used for calculating payment amount to
+      make on each statement
+    :type payment_method: _PayoffMethod
+    :param statements: statements to pay, list of :py:class:`~.CCStatement`
+    :type statements: list
+    """
+    try:
+        res = (calculate_payoffs(payment_method, statements), None)
+    except Exception as ex:
+        res = (None, str(ex))
+    conn.send(res)
+    conn.close()
+
+
+def _transaction_runs(first_d, last_d, transactions):
+    """
+    Split a billing period into runs of days that only have a transaction on
+    their first day, if at all. Yield a 2-tuple for each run, in order, of the
+    amount to adjust the balance by at the start of the run and the int number
+    of days in the run.
+
+    :param first_d: date of beginning of statement period
+    :type first_d: datetime.date
+    :param last_d: last date of statement period
+    :type last_d: datetime.date
+    :param transactions: dict of datetime.date to amount to adjust the balance
+      by on the specified dates; dates outside the period are ignored
+    :type transactions: dict
+    """
+    start = first_d
+    amount = transactions.get(first_d, Decimal(0))
+    for d in sorted(transactions):
+        if first_d < d <= last_d:
+            yield amount, (d - start).days
+            start = d
+            amount = transactions[d]
+    yield amount, (last_d - start).days + 1
+
+
 class _InterestCalculation(object):
 
     #: Human-readable string name of the interest calculation type.
@@ -239,15 +580,56 @@ class _InterestCalculation(object):
         """
         raise NotImplementedError("Must implement in subclass")
 
+    def calculate_payment(self, principal, period, amount):
+        """
+        Calculate interest for a billing period with a single payment, made on
+        the period's :py:attr:`~._BillingPeriod.payment_date`. This is the
+        same as :py:meth:`~.calculate` with that one transaction.
+
+        :param principal: balance at beginning of statement period
+        :type principal: decimal.Decimal
+        :param period: the billing period
+        :type period: _BillingPeriod
+        :param amount: amount of the payment
+        :type amount: decimal.Decimal
+        :return: dict describing the result: end_balance (float),
+          interest_paid (float)
+        :rtype: dict
+        """
+        return self.calculate(
+            principal, period.start_date, period.end_date,
+            {period.payment_date: Decimal('-1') * amount}
+        )
+
 
 class AdbCompoundedDaily(_InterestCalculation):
     """
     Average Daily Balance method, compounded daily (like American Express).
+
+    Rather than stepping through each day of the billing period, each run of
+    days between transactions is compounded in closed form, with
+    :py:data:`~.KERNEL_PRECISION` digits of precision. Results are the same
+    as compounding day by day, to well under a cent.
     """
 
     #: Human-readable string name of the interest calculation type.
     description = 'Average Daily Balance Compounded Daily (AmEx)'
 
+    def __init__(self, apr):
+        """
+        :param apr: Annual Percentage Rate as a decimal
+        :type apr: decimal.Decimal
+        """
+        super(AdbCompoundedDaily, self).__init__(apr)
+        #: daily periodic rate and ``1 + rate``, and the cache of
+        #: :py:meth:`~._growth_factors` per number of days, calculated with
+        #: KERNEL_PRECISION
+        self._rates = None
+        self._growth = {}
+        #: cache of :py:meth:`~._payment_factors` per
+        #: :py:func:`~._payment_runs`
+        self._factors = {}
+
     def calculate(self, principal, first_d, last_d, transactions={}):
         """
         Calculate compound interest for the specified principal.
@@ -265,28 +647,131 @@ class AdbCompoundedDaily(_InterestCalculation):
           interest_paid (float)
         :rtype: dict
         """
-        dpr = self._apr / Decimal(365.0)
-        interest = Decimal(0.0)
-        num_days = 0
-        bal_total = Decimal(0.0)
-        bal = principal
+        return self._compound(
+            principal, _transaction_runs(first_d, last_d, transactions)
+        )
 
-        d = first_d
-        while d <= last_d:
-            num_days += 1
-            if d in transactions:
-                bal += transactions[d]
-            int_amt = bal * dpr
-            interest += int_amt
-            bal += int_amt
-            bal_total += bal
-            d += timedelta(days=1)
-        adb = bal_total / Decimal(num_days)
-        final = adb * self._apr * num_days / Decimal(365.0)
-        bal += final * dpr
+    def calculate_payment(self, principal, period, amount):
+        """
+        Calculate interest for a billing period with a single payment on its
+        payment date, like :py:meth:`~._InterestCalculation.calculate_payment`.
+        :py:meth:`~._compound` is linear in the principal and the payment, so
+        this uses factors cached per length of the runs of days before and
+        after the payment; see :py:meth:`~._payment_factors`.
+
+        :param principal: balance at beginning of statement period
+        :type principal: decimal.Decimal
+        :param period: the billing period
+        :type period: _BillingPeriod
+        :param amount: amount of the payment
+        :type amount: decimal.Decimal
+        :return: dict describing the result: end_balance (float),
+          interest_paid (float)
+        :rtype: dict
+        """
+        runs = _payment_runs(period)
+        factors = self._factors.get(runs)
+        if factors is None:
+            factors = self._payment_factors(*runs)
+            self._factors[runs] = factors
+        a, b, c, d = factors
+        mul = _KERNEL_CONTEXT.multiply
+        sub = _KERNEL_CONTEXT.subtract
         return {
-            'interest_paid': final,
-            'end_balance': bal
+            'interest_paid': +sub(mul(c, principal), mul(d, amount)),
+            'end_balance': +sub(mul(a, principal), mul(b, amount))
+        }
+
+    def _payment_factors(self, before, after):
+        """
+        Return the factors ``(a, b, c, d)`` for a billing period with
+        ``before`` days before its payment date and ``after`` days from it,
+        such that for a single payment on the payment date the end balance is
+        ``a * principal - b * amount`` and the interest paid is
+        ``c * principal - d * amount``. This is :py:meth:`~._compound` of the
+        runs ``[(0, before), (-amount, after)]``, with the same precision.
+
+        :param before: number of days before the payment date
+        :type before: int
+        :param after: number of days from the payment date to the period end
+        :type after: int
+        :rtype: tuple
+        """
+        ctx = _KERNEL_CONTEXT
+        add = ctx.add
+        mul = ctx.multiply
+        growth_b, total_b = self._growth_factors(before)
+        growth_a, total_a = self._growth_factors(after)
+        dpr = self._rates[0]
+        dpr_sq = mul(dpr, dpr)
+        # sum of the daily balances per unit of principal
+        total_p = add(total_b, mul(growth_b, total_a))
+        return (
+            add(mul(growth_b, growth_a), mul(dpr_sq, total_p)),
+            add(growth_a, mul(dpr_sq, total_a)),
+            mul(dpr, total_p),
+            mul(dpr, total_a)
+        )
+
+    def _growth_factors(self, days):
+        """
+        Return a 2-tuple of the factor that a balance grows by when compounded
+        daily for ``days`` days, and the factor that gives the sum of its
+        daily balances over those days. Cached per number of days.
+
+        :param days: number of days
+        :type days: int
+        :rtype: tuple
+        """
+        factors = self._growth.get(days)
+        if factors is not None:
+            return factors
+        ctx = _KERNEL_CONTEXT
+        if self._rates is None:
+            dpr = ctx.divide(self._apr, Decimal(365.0))
+            self._rates = (dpr, ctx.add(1, dpr))
+        dpr, rate = self._rates
+        if dpr == 0:
+            factors = (Decimal(1), Decimal(days))
+        else:
+            # closed form of compounding daily over a run of days with no
+            # transactions: the balance grows by ``rate`` each day, and the
+            # sum of the daily balances is a geometric series
+            growth = ctx.power(rate, days)
+            factors = (
+                growth,
+                ctx.divide(
+                    ctx.multiply(rate, ctx.subtract(growth, 1)), dpr
+                )
+            )
+        self._growth[days] = factors
+        return factors
+
+    def _compound(self, principal, runs):
+        """
+        Calculate interest for a billing period, given the runs of days that
+        only have a transaction on their first day, as yielded by
+        :py:func:`~._transaction_runs`.
+        """
+        ctx = _KERNEL_CONTEXT
+        add = ctx.add
+        mul = ctx.multiply
+        bal = principal
+        bal_total = Decimal(0)
+        for amount, days in runs:
+            growth, total_factor = self._growth_factors(days)
+            bal = add(bal, amount)
+            bal_total = add(bal_total, mul(bal, total_factor))
+            bal = mul(bal, growth)
+        # the average daily balance times the APR, prorated for the number of
+        # days in the period, i.e. ``bal_total / num_days * apr * num_days /
+        # 365``
+        dpr = self._rates[0]
+        final = mul(bal_total, dpr)
+        bal = add(bal, mul(final, dpr))
+        return {
+            'interest_paid': +final,
+            'end_balance': +bal
         }
 
 
@@ -298,6 +783,8 @@ class SimpleInterest(_InterestCalculation):
     #: Human-readable string name of the interest calculation type.
     description = 'Interest charged once on the balance at end of period.'
 
+    _days_per_year = Decimal(365.0)
+
     def calculate(self, principal, first_d, last_d, transactions={}):
         """
         Calculate compound interest for the specified principal.
@@ -315,21 +802,42 @@ class SimpleInterest(_InterestCalculation):
           interest_paid (float)
         :rtype: dict
         """
-        num_days = 0
+        num_days = (last_d - first_d).days + 1
         bal = principal
-
-        d = first_d
-        while d <= last_d:
-            num_days += 1
-            if d in transactions:
+        for d in sorted(transactions):
+            if first_d <= d <= last_d:
                 bal += transactions[d]
-            d += timedelta(days=1)
         final = bal * self._apr * num_days / Decimal(365.0)
         return {
             'interest_paid': final,
             'end_balance': bal + final
         }
 
+    def calculate_payment(self, principal, period, amount):
+        """
+        Calculate interest for a billing period with a single payment, like
+        :py:meth:`~._InterestCalculation.calculate_payment` but without
+        building a transactions dict; the payment is always within the period.
+
+        :param principal: balance at beginning of statement period
+        :type principal: decimal.Decimal
+        :param period: the billing period
+        :type period: _BillingPeriod
+        :param amount: amount of the payment
+        :type amount: decimal.Decimal
+        :return: dict describing the result: end_balance (float),
+          interest_paid (float)
+        :rtype: dict
+        """
+        # the runs before and after the payment cover the whole period
+        num_days = sum(_payment_runs(period))
+        bal = principal - amount
+        final = bal * self._apr * num_days / self._days_per_year
+        return {
+            'interest_paid': final,
+            'end_balance': bal + final
+        }
+
 
 class _BillingPeriod(object):
 
@@ -443,6 +951,9 @@ class MinPaymentAmEx(_MinPaymentFormula):
     #: human-readable string description of the formula
     description = 'AmEx - Greatest of Interest Plus 1% of Principal, or $35'
 
+    _pct = Decimal('.01')
+    _floor = Decimal('35')
+
     def __init__(self):
         super(MinPaymentAmEx, self).__init__()
 
@@ -458,9 +969,9 @@ class MinPaymentAmEx(_MinPaymentFormula):
         :return: minimum payment for the statement
         :rtype: decimal.Decimal
         """
-        amt = interest + (balance * Decimal('.01'))
+        amt = interest + (balance * self._pct)
         if amt < 35:
-            amt = Decimal('35')
+            amt = self._floor
         return amt
 
 
@@ -478,6 +989,10 @@ class MinPaymentDiscover(_MinPaymentFormula):
     description = 'Discover - Greatest of 2% of Principal, or $20 plus ' \
                   'Interest, or $35'
 
+    _pct = Decimal('0.02')
+    _floor = Decimal(35)
+    _base = Decimal(20)
+
     def __init__(self):
         super(MinPaymentDiscover, self).__init__()
 
@@ -494,9 +1009,9 @@ class MinPaymentDiscover(_MinPaymentFormula):
         :rtype: decimal.Decimal
         """
         options = [
-            Decimal(35),
-            balance * Decimal('0.02'),
-            Decimal(20) + interest
+            self._floor,
+            balance * self._pct,
+            self._base + interest
         ]
         return max(options)
 
@@ -518,6 +1033,10 @@ class MinPaymentCiti(_MinPaymentFormula):
     description = 'Citi - Greatest of 1.5% of Principal, or 1% of Principal ' \
                   'plus interest and fees, or $25, or Principal'
 
+    _pct = Decimal('0.01')
+    _round_pct = Decimal('0.015')
+    _floor = Decimal('25')
+
     def __init__(self):
         super(MinPaymentCiti, self).__init__()
 
@@ -535,10 +1054,10 @@ class MinPaymentCiti(_MinPaymentFormula):
         """
         options = [
             25,
-            (balance * Decimal('0.01')) + interest,
-            round(balance * Decimal('0.015'))
+            (balance * self._pct) + interest,
+            round(balance * self._round_pct)
         ]
-        if balance < Decimal('25'):
+        if balance < self._floor:
             options.append(balance)
         return max(options)
 
@@ -552,6 +1071,9 @@ class _PayoffMethod(object):
     #: human-readable string name of the payoff method
     description = None
 
+    #: whether the payments depend on the maximum total payment
+    uses_max_total = True
+
     def __init__(self, max_total_payment=None, increases={}, onetimes={}):
         """
         Initialize a payment method.
@@ -616,8 +1138,49 @@ class _PayoffMethod(object):
         :return: list of payment amounts to make, same order as ``statements``
         :rtype: list
         """
+        return self.allocate(
+            statements[0].billing_period,
+            [s.principal for s in statements],
+            [s.minimum_payment for s in statements],
+            [s.apr for s in statements]
+        )
+
+    def allocate(self, period, principals, minimums, aprs):
+        """
+        Given the current billing period and lists of the principal, minimum
+        payment and APR of each statement to pay, return a list of payment
+        amounts to make on each of the statements. This is the implementation
+        of :py:meth:`~.find_payments`, and is used directly by
+        :py:class:`~.PayoffSimulation`.
+
+        :param period: billing period of the first statement
+        :type period: _BillingPeriod
+        :param principals: principal of each statement
+        :type principals: list
+        :param minimums: minimum payment of each statement
+        :type minimums: list
+        :param aprs: APR of each statement
+        :type aprs: list
+        :return: list of payment amounts to make, same order as the arguments
+        :rtype: list
+        """
         raise NotImplementedError()
 
+    def _pay_extra_on(self, idx, max_total, minimums):
+        """
+        Return a list of the minimum payments, except for the payment at index
+        ``idx``, which is whatever remains of ``max_total``.
+        """
+        min_sum = sum(minimums)
+        if min_sum > max_total:
+            raise TypeError(
+                'ERROR: Max total payment of %s is less than sum of minimum '
+                'payments (%s)' % (max_total, min_sum)
+            )
+        res = list(minimums)
+        res[idx] = max_total - (min_sum - minimums[idx])
+        return res
+
 
 class MinPaymentMethod(_PayoffMethod):
     """
@@ -626,18 +1189,14 @@ class MinPaymentMethod(_PayoffMethod):
 
     description = 'Minimum Payment Only'
     show_in_ui = True
+    uses_max_total = False
 
-    def find_payments(self, statements):
+    def allocate(self, period, principals, minimums, aprs):
         """
-        Given a list of statements, return a list of payment amounts to make
-        on each of the statements.
-
-        :param statements: statements to pay, list of :py:class:`~.CCStatement`
-        :type statements: list
-        :return: list of payment amounts to make, same order as ``statements``
-        :rtype: list
+        Return a list of payment amounts to make on each statement; see
+        :py:meth:`~._PayoffMethod.allocate`.
         """
-        return [s.minimum_payment for s in statements]
+        return list(minimums)
 
 
 class FixedPaymentMethod(_PayoffMethod):
@@ -648,17 +1207,12 @@ class FixedPaymentMethod(_PayoffMethod):
     description = 'TESTING ONLY - Fixed Payment for All Statements'
     show_in_ui = False
 
-    def find_payments(self, statements):
+    def allocate(self, period, principals, minimums, aprs):
         """
-        Given a list of statements, return a list of payment amounts to make
-        on each of the statements.
-
-        :param statements: statements to pay, list of :py:class:`~.CCStatement`
-        :type statements: list
-        :return: list of payment amounts to make, same order as ``statements``
-        :rtype: list
+        Return a list of payment amounts to make on each statement; see
+        :py:meth:`~._PayoffMethod.allocate`.
         """
-        return [self._max_total for _ in statements]
+        return [self._max_total for _ in minimums]
 
 
 class HighestBalanceFirstMethod(_PayoffMethod):
@@ -669,39 +1223,19 @@ class HighestBalanceFirstMethod(_PayoffMethod):
     description = 'Highest to Lowest Balance'
     show_in_ui = True
 
-    def find_payments(self, statements):
+    def allocate(self, period, principals, minimums, aprs):
         """
-        Given a list of statements, return a list of payment amounts to make
-        on each of the statements.
-
-        :param statements: statements to pay, list of :py:class:`~.CCStatement`
-        :type statements: list
-        :return: list of payment amounts to make, same order as ``statements``
-        :rtype: list
+        Return a list of payment amounts to make on each statement; see
+        :py:meth:`~._PayoffMethod.allocate`.
         """
-        max_total = self.max_total_for_period(statements[0].billing_period)
-        min_sum = sum([s.minimum_payment for s in statements])
-        if min_sum > max_total:
-            raise TypeError(
-                'ERROR: Max total payment of %s is less than sum of minimum '
-                'payments (%s)' % (max_total, min_sum)
-            )
+        max_total = self.max_total_for_period(period)
         max_bal = Decimal('0.00')
         max_idx = None
-        for idx, stmt in enumerate(statements):
-            if stmt.principal > max_bal:
-                max_bal = stmt.principal
+        for idx, principal in enumerate(principals):
+            if principal > max_bal:
+                max_bal = principal
                 max_idx = idx
-        res = [None for _ in statements]
-        max_pay = max_total - (
-            min_sum - statements[max_idx].minimum_payment
-        )
-        for idx, stmt in enumerate(statements):
-            if idx == max_idx:
-                res[idx] = max_pay
-            else:
-                res[idx] = statements[idx].minimum_payment
-        return res
+        return self._pay_extra_on(max_idx, max_total, minimums)
 
 
 class HighestInterestRateFirstMethod(_PayoffMethod):
@@ -712,39 +1246,19 @@ class HighestInterestRateFirstMethod(_PayoffMethod):
     description = 'Highest to Lowest Interest Rate'
     show_in_ui = True
 
-    def find_payments(self, statements):
+    def allocate(self, period, principals, minimums, aprs):
         """
-        Given a list of statements, return a list of payment amounts to make
-        on each of the statements.
-
-        :param statements: statements to pay, list of :py:class:`~.CCStatement`
-        :type statements: list
-        :return: list of payment amounts to make, same order as ``statements``
-        :rtype: list
+        Return a list of payment amounts to make on each statement; see
+        :py:meth:`~._PayoffMethod.allocate`.
         """
-        max_total = self.max_total_for_period(statements[0].billing_period)
-        min_sum = sum([s.minimum_payment for s in statements])
-        if min_sum > max_total:
-            raise TypeError(
-                'ERROR: Max total payment of %s is less than sum of minimum '
-                'payments (%s)' % (max_total, min_sum)
-            )
+        max_total = self.max_total_for_period(period)
         max_apr = Decimal('0.00')
         max_idx = None
-        for idx, stmt in enumerate(statements):
-            if stmt.apr > max_apr:
-                max_apr = stmt.apr
+        for idx, apr in enumerate(aprs):
+            if apr > max_apr:
+                max_apr = apr
                 max_idx = idx
-        res = [None for _ in statements]
-        max_pay = max_total - (
-            min_sum - statements[max_idx].minimum_payment
-        )
-        for idx, stmt in enumerate(statements):
-            if idx == max_idx:
-                res[idx] = max_pay
-            else:
-                res[idx] = statements[idx].minimum_payment
-        return res
+        return self._pay_extra_on(max_idx, max_total, minimums)
 
 
 class LowestBalanceFirstMethod(_PayoffMethod):
@@ -756,39 +1270,19 @@ class LowestBalanceFirstMethod(_PayoffMethod):
     description = 'Lowest to Highest Balance (a.k.a. Snowball Method)'
     show_in_ui = True
 
-    def find_payments(self, statements):
+    def allocate(self, period, principals, minimums, aprs):
         """
-        Given a list of statements, return a list of payment amounts to make
-        on each of the statements.
-
-        :param statements: statements to pay, list of :py:class:`~.CCStatement`
-        :type statements: list
-        :return: list of payment amounts to make, same order as ``statements``
-        :rtype: list
+        Return a list of payment amounts to make on each statement; see
+        :py:meth:`~._PayoffMethod.allocate`.
         """
-        max_total = self.max_total_for_period(statements[0].billing_period)
-        min_sum = sum([s.minimum_payment for s in statements])
-        if min_sum > max_total:
-            raise TypeError(
-                'ERROR: Max total payment of %s is less than sum of minimum '
-                'payments (%s)' % (max_total, min_sum)
-            )
+        max_total = self.max_total_for_period(period)
         min_bal = Decimal('+Infinity')
         min_idx = None
-        for idx, stmt in enumerate(statements):
-            if stmt.principal < min_bal:
-                min_bal = stmt.principal
+        for idx, principal in enumerate(principals):
+            if principal < min_bal:
+                min_bal = principal
                 min_idx = idx
-        res = [None for _ in statements]
-        min_pay = max_total - (
-            min_sum - statements[min_idx].minimum_payment
-        )
-        for idx, stmt in enumerate(statements):
-            if idx == min_idx:
-                res[idx] = min_pay
-            else:
-                res[idx] = statements[idx].minimum_payment
-        return res
+        return self._pay_extra_on(min_idx, max_total, minimums)
 
 
 class LowestInterestRateFirstMethod(_PayoffMethod):
@@ -799,105 +1293,293 @@ class LowestInterestRateFirstMethod(_PayoffMethod):
     description = 'Lowest to Highest Interest Rate'
     show_in_ui = True
 
-    def find_payments(self, statements):
+    def allocate(self, period, principals, minimums, aprs):
         """
-        Given a list of statements, return a list of payment amounts to make
-        on each of the statements.
-
-        :param statements: statements to pay, list of :py:class:`~.CCStatement`
-        :type statements: list
-        :return: list of payment amounts to make, same order as ``statements``
-        :rtype: list
+        Return a list of payment amounts to make on each statement; see
+        :py:meth:`~._PayoffMethod.allocate`.
         """
-        max_total = self.max_total_for_period(statements[0].billing_period)
-        min_sum = sum([s.minimum_payment for s in statements])
-        if min_sum > max_total:
-            raise TypeError(
-                'ERROR: Max total payment of %s is less than sum of minimum '
-                'payments (%s)' % (max_total, min_sum)
-            )
+        max_total = self.max_total_for_period(period)
         min_apr = Decimal('+Infinity')
         min_idx = None
-        for idx, stmt in enumerate(statements):
-            if stmt.apr < min_apr:
-                min_apr = stmt.apr
+        for idx, apr in enumerate(aprs):
+            if apr < min_apr:
+                min_apr = apr
                 min_idx = idx
-        res = [None for _ in statements]
-        min_pay = max_total - (
-            min_sum - statements[min_idx].minimum_payment
-        )
-        for idx, stmt in enumerate(statements):
-            if idx == min_idx:
-                res[idx] = min_pay
-            else:
-                res[idx] = statements[idx].minimum_payment
-        return res
+        return self._pay_extra_on(min_idx, max_total, minimums)
 
 
-def calculate_payoffs(payment_method, statements):
+def calculate_payoffs(payment_method, statements, timeout=None):
     """
     Calculate the amount of time (in years) and total amount of money required
     to pay off the cards associated with the given list of statements. Return a
     list of (`float` number of years, `decimal.Decimal` amount paid,
     `decimal.Decimal` first payment amount) tuples for each item in
-    `statements`.
+    `statements`. This is a shortcut for :py:meth:`~.PayoffSimulation.run`.
 
     :param payment_method: method used for calculating payment amount to make
       on each statement; subclass of _PayoffMethod
     :type payment_method: _PayoffMethod
     :param statements: list of :py:class:`~.CCStatement` objects to pay off.
     :type statements: list
+    :param timeout: seconds to allow the simulation to run, if any; see
+      :py:meth:`~.PayoffSimulation.run`
+    :type timeout: int
     :return: list of (`float` number of billing periods, `decimal.Decimal`
       amount paid, `decimal.Decimal` first payment amount) tuples for each item
       in `statements`
     :rtype: list
     """
-    def unpaid(s): return [x for x in s.keys() if s[x]['done'] is False]
-    payoffs = {}
-    logger.debug(
-        'calculating payoff via %s for: %s', payment_method, statements
-    )
-    for idx, stmt in enumerate(statements):
-        payoffs[stmt] = {
-            'months': 0, 'amt': Decimal('0.0'), 'idx': idx, 'done': False,
-            'next_pymt_amt': None
-        }
-    while len(unpaid(payoffs)) > 0:
-        u = unpaid(payoffs)
-        to_pay = payment_method.find_payments(u)
-        for stmt, p_amt in dict(zip(u, to_pay)).items():
-            if stmt.principal <= Decimal('0'):
-                payoffs[stmt]['done'] = True
-                continue
-            if stmt.principal <= p_amt:
-                payoffs[stmt]['done'] = True
-                payoffs[stmt]['months'] += 1  # increment months
-                payoffs[stmt]['amt'] += stmt.principal
-                if payoffs[stmt]['next_pymt_amt'] is None:
-                    payoffs[stmt]['next_pymt_amt'] = stmt.principal
-                continue
-            payoffs[stmt]['months'] += 1  # increment months
-            payoffs[stmt]['amt'] += p_amt
-            if payoffs[stmt]['next_pymt_amt'] is None:
-                payoffs[stmt]['next_pymt_amt'] = p_amt
-            new_s = stmt.pay(Decimal('-1') * p_amt)
-            payoffs[new_s] = payoffs[stmt]
-            del payoffs[stmt]
-    res = []
-    for s in sorted(payoffs, key=lambda x: payoffs[x]['idx']):
-        tmp = (
-            payoffs[s]['months'],
-            payoffs[s]['amt'],
-            payoffs[s]['next_pymt_amt']
+    return PayoffSimulation(statements).run(payment_method, timeout=timeout)
+
+
+#: Cache of the :py:class:`~._BillingPeriod` starting on each date, as
+#: returned by :py:func:`~._period_starting`
+_periods_by_start = {}
+
+
+def _period_starting(start_date):
+    """
+    Return the :py:class:`~._BillingPeriod` that starts on the given date and
+    ends at the end of its month, i.e. the
+    :py:attr:`~._BillingPeriod.next_period` of a period that ends the day
+    before. Periods are cached, as billing periods are immutable.
+
+    :param start_date: first date of the billing period
+    :type start_date: datetime.date
+    :rtype: _BillingPeriod
+    """
+    period = _periods_by_start.get(start_date)
+    if period is None:
+        period = _BillingPeriod(start_date, start_date=start_date)
+        _periods_by_start[start_date] = period
+    return period
+
+
+#: Cache of the billing period after each billing period end date, as
+#: returned by :py:func:`~._next_period`
+_next_periods = {}
+
+
+def _next_period(period):
+    """
+    Return the billing period that starts on the day after ``period`` ends,
+    from :py:func:`~._period_starting`. Cached by end date, so that stepping
+    through periods in :py:class:`~.PayoffSimulation` is a single lookup.
+
+    :param period: the billing period
+    :type period: _BillingPeriod
+    :rtype: _BillingPeriod
+    """
+    nxt = _next_periods.get(period.end_date)
+    if nxt is None:
+        nxt = _period_starting(period.end_date + timedelta(days=1))
+        _next_periods[period.end_date] = nxt
+    return nxt
+
+
+#: Cache of the number of days in a billing period before and after its
+#: payment date, as returned by :py:func:`~._payment_runs`
+_runs_by_period = {}
+
+
+def _payment_runs(period):
+    """
+    Return a 2-tuple of the int number of days in a billing period before its
+    :py:attr:`~._BillingPeriod.payment_date`, and the number of days from the
+    payment date to the end of the period. Cached by start and end date.
+
+    :param period: the billing period
+    :type period: _BillingPeriod
+    :rtype: tuple
+    """
+    key = (period.start_date, period.end_date)
+    runs = _runs_by_period.get(key)
+    if runs is None:
+        pay_d = period.payment_date
+        runs = (
+            (pay_d - period.start_date).days,
+            (period.end_date - pay_d).days + 1
+        )
+        _runs_by_period[key] = runs
+    return runs
+
+
+class PayoffSimulation(object):
+    """
+    Simulate paying off a group of credit cards, one billing period at a time.
+
+    The principal, last interest charge, APR, interest calculation, minimum
+    payment formula and current billing period of each card are held in
+    parallel lists, so each simulated month only calculates the minimum
+    payments, asks the payoff method to :py:meth:`~._PayoffMethod.allocate`
+    the payments, and calculates interest for each card that is still unpaid.
+    It does not create any new :py:class:`~.CCStatement` instances, and
+    billing periods are shared via :py:func:`~._period_starting` and
+    :py:func:`~._next_period`.
+
+    Until a payoff method pays more than the minimum on a card, the card's
+    balance doesn't depend on the payoff method. So each card's balances
+    when paying only the minimum are calculated once, as needed, and shared
+    by every :py:meth:`~.run` of the same instance; only cards that have
+    been paid more than the minimum are simulated separately in each run.
+    This makes running many payoff methods and maximum payments on the same
+    statements, as :py:meth:`~.sweep` does, much cheaper.
+
+    The results are the same as repeatedly calling
+    :py:meth:`~.CCStatement.pay` for each unpaid card with the amounts from
+    :py:meth:`~._PayoffMethod.find_payments`.
+
+    :param statements: the current statement of each card to pay off
+    :type statements: list
+    """
+
+    def __init__(self, statements):
+        self._payments = [
+            s._interest_cls.calculate_payment for s in statements
+        ]
+        self._minimums = [s._min_pay_cls.calculate for s in statements]
+        self._aprs = [s.apr for s in statements]
+        # for each card, the (principal, interest, billing period, minimum
+        # payment) of each month when paying only the minimum every month
+        self._tracks = [
+            [(
+                s.principal, s.interest, s.billing_period,
+                s._min_pay_cls.calculate(s.principal, s.interest)
+            )] for s in statements
+        ]
+
+    def run(self, payment_method, timeout=None):
+        """
+        Run the simulation with a payoff method, and return a list of
+        (`int` number of billing periods, `decimal.Decimal` amount paid,
+        `decimal.Decimal` first payment amount) tuples for each statement.
+
+        :param payment_method: method used for calculating payment amount to
+          make on each statement
+        :type payment_method: _PayoffMethod
+        :param timeout: if set (and not 0), the number of seconds after which
+          to stop simulating; checked once per simulated month
+        :type timeout: int
+        :rtype: list
+        :raises: :py:exc:`TimeoutError` if the simulation runs longer than
+          ``timeout`` seconds
+        """
+        logger.debug(
+            'simulating payoff via %s for %d statements', payment_method,
+            len(self._tracks)
         )
-        if payoffs[s]['next_pymt_amt'] is None:
-            tmp = (
-                payoffs[s]['months'],
-                payoffs[s]['amt'],
-                Decimal('0.0')
+        payments = self._payments
+        minimums_for = self._minimums
+        aprs = self._aprs
+        tracks = self._tracks
+        allocate = payment_method.allocate
+        count = len(self._tracks)
+        principals = [None for _ in range(count)]
+        interests = [None for _ in range(count)]
+        periods = [None for _ in range(count)]
+        # cards that have only been paid their minimum payments so far
+        on_track = [True for _ in range(count)]
+        months = [0 for _ in range(count)]
+        amounts = [Decimal('0.0') for _ in range(count)]
+        first_pymts = [None for _ in range(count)]
+        unpaid = list(range(count))
+        unpaid_aprs = list(aprs)
+        zero = Decimal('0')
+        deadline = None
+        if timeout:
+            deadline = time.monotonic() + timeout
+        while len(unpaid) > 0:
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError('Timed out after %s seconds' % timeout)
+            unpaid_principals = []
+            minimums = []
+            for i in unpaid:
+                if on_track[i]:
+                    track = tracks[i]
+                    if len(track) > months[i]:
+                        principal, interest, period, minimum = track[months[i]]
+                    else:
+                        # extend the minimum payment track by one month
+                        principal, _, period, minimum = track[-1]
+                        period = _next_period(period)
+                        res = payments[i](principal, period, minimum)
+                        principal = res['end_balance']
+                        interest = res['interest_paid']
+                        minimum = minimums_for[i](principal, interest)
+                        track.append((principal, interest, period, minimum))
+                    principals[i] = principal
+                    interests[i] = interest
+                    periods[i] = period
+                else:
+                    principal = principals[i]
+                    minimum = minimums_for[i](principal, interests[i])
+                unpaid_principals.append(principal)
+                minimums.append(minimum)
+            to_pay = allocate(
+                periods[unpaid[0]], unpaid_principals, minimums, unpaid_aprs
             )
-        res.append(tmp)
-    return res
+            still_unpaid = []
+            for i, p_amt, minimum in zip(unpaid, to_pay, minimums):
+                principal = principals[i]
+                if principal <= zero:
+                    continue
+                months[i] += 1
+                if principal <= p_amt:
+                    amounts[i] += principal
+                    if first_pymts[i] is None:
+                        first_pymts[i] = principal
+                    continue
+                amounts[i] += p_amt
+                if first_pymts[i] is None:
+                    first_pymts[i] = p_amt
+                still_unpaid.append(i)
+                if on_track[i] and p_amt == minimum:
+                    continue
+                on_track[i] = False
+                period = _next_period(periods[i])
+                res = payments[i](principal, period, p_amt)
+                principals[i] = res['end_balance']
+                interests[i] = res['interest_paid']
+                periods[i] = period
+            if len(still_unpaid) < len(unpaid):
+                unpaid_aprs = [aprs[i] for i in still_unpaid]
+            unpaid = still_unpaid
+        return [
+            (
+                months[i], amounts[i],
+                Decimal('0.0') if first_pymts[i] is None else first_pymts[i]
+            ) for i in range(count)
+        ]
+
+    def sweep(self, method_cls, amounts):
+        """
+        Run the simulation with a payoff method for each of a list of maximum
+        total monthly payments, with no increases or onetimes. Return a list
+        of 2-tuples, in the same order as ``amounts``, of the return value of
+        :py:meth:`~.run` (or None on error) and the str error message (or
+        None on success), i.e. if the maximum total payment is less than the
+        sum of the minimum payments.
+
+        Runs with the same amount, or of payoff methods that don't use the
+        maximum total payment, are only simulated once.
+
+        :param method_cls: payoff method class
+        :type method_cls: type
+        :param amounts: maximum total monthly payments
+        :type amounts: list
+        :rtype: list
+        """
+        if not method_cls.uses_max_total:
+            amounts = [None for _ in amounts]
+        results = {}
+        for amt in amounts:
+            if amt in results:
+                continue
+            try:
+                results[amt] = (self.run(method_cls(amt)), None)
+            except TypeError as ex:
+                results[amt] = (None, str(ex))
+        return [results[amt] for amt in amounts]
 
 
 class CCStatement(object):
@@ -1043,6 +1725,132 @@ class CCStatement(object):
         })
 
 
+def payment_settings_kwargs(settings_json):
+    """
+    Given the JSON string credit payoff payment settings (the value of the
+    ``credit-payoff`` :py:class:`~.DBSetting`), return a dict of the enabled
+    increases and onetimes as expected by :py:class:`~.InterestHelper` kwargs.
+
+    :param settings_json: payment settings JSON
+    :type settings_json: str
+    :return: payment settings dict
+    :rtype: dict
+    """
+    res = {'increases': {}, 'onetimes': {}}
+    j = json.loads(settings_json)
+    for key in ['increases', 'onetimes']:
+        for i in j[key]:
+            if not i['enabled']:
+                continue
+            d = datetime.strptime(i['date'], '%Y-%m-%d').date()
+            res[key][d] = Decimal(i['amount'])
+    return res
+
+
+#: Maximum number of amounts returned by :py:func:`~.sweep_amounts`
+MAX_SWEEP_POINTS = 500
+
+
+def sweep_amounts(low, high, step):
+    """
+    Return the list of maximum total monthly payment amounts from ``low`` to
+    ``high`` (inclusive) in increments of ``step``, for
+    :py:meth:`~.InterestHelper.payoff_sweep`.
+
+    :param low: lowest amount
+    :type low: decimal.Decimal
+    :param high: highest amount
+    :type high: decimal.Decimal
+    :param step: increment between amounts
+    :type step: decimal.Decimal
+    :return: list of decimal.Decimal amounts
+    :rtype: list
+    :raises: ValueError if the amounts are negative, ``step`` is not positive,
+      ``high`` is less than ``low``, or there would be more than
+      :py:data:`~.MAX_SWEEP_POINTS` amounts
+    """
+    if low < 0 or step <= 0 or high < low:
+        raise ValueError(
+            'Invalid payment sweep from %s to %s by %s' % (low, high, step)
+        )
+    if (high - low) / step >= MAX_SWEEP_POINTS:
+        raise ValueError(
+            'Payment sweep from %s to %s by %s would have more than %d '
+            'amounts' % (low, high, step, MAX_SWEEP_POINTS)
+        )
+    res = []
+    amt = low
+    while amt <= high:
+        res.append(amt)
+        amt += step
+    return res
+
+
+def payoffs_to_json(payoffs):
+    """
+    Encode the return value of :py:meth:`~.InterestHelper.calculate_payoffs`
+    as JSON, with Decimals as strings so that they can be decoded exactly by
+    :py:func:`~.payoffs_from_json`.
+
+    :param payoffs: return value of
+      :py:meth:`~.InterestHelper.calculate_payoffs`
+    :type payoffs: dict
+    :rtype: str
+    """
+    return json.dumps(payoffs, sort_keys=True, default=str)
+
+
+def payoffs_from_json(payoffs_json):
+    """
+    Decode JSON from :py:func:`~.payoffs_to_json` to the return value of
+    :py:meth:`~.InterestHelper.calculate_payoffs` that it was encoded from.
+
+    :param payoffs_json: JSON payoff results
+    :type payoffs_json: str
+    :rtype: dict
+    """
+    res = json.loads(payoffs_json)
+    for meth in res.values():
+        if 'results' not in meth:
+            continue
+        meth['results'] = {
+            int(a_id): {
+                'payoff_months': r['payoff_months'],
+                'total_payments': Decimal(r['total_payments']),
+                'total_interest': Decimal(r['total_interest']),
+                'next_payment': Decimal(r['next_payment'])
+            } for a_id, r in meth['results'].items()
+        }
+    return res
+
+
+def payoffs_job(db, params, progress):
+    """
+    Background job function (see :py:mod:`biweeklybudget.jobs`) to run
+    :py:meth:`~.InterestHelper.calculate_payoffs`, or return its stored
+    results via :py:meth:`~.InterestHelper.cached_payoffs`.
+
+    :param db: active database session to use
+    :type db: sqlalchemy.orm.session.Session
+    :param params: job parameters; ``payment_settings`` is the payment
+      settings JSON string, as for :py:func:`~.payment_settings_kwargs`
+    :type params: dict
+    :param progress: progress callable
+    :type progress: callable
+    :return: dict with ``min_payments_sum`` (the sum of all accounts' minimum
+      payments) and ``payoffs`` (the return value of
+      :py:meth:`~.InterestHelper.cached_payoffs`) keys
+    :rtype: dict
+    """
+    ih = InterestHelper(
+        db, **payment_settings_kwargs(params['payment_settings'])
+    )
+    return {
+        'min_payments_sum': sum(ih.min_payments.values()),
+        'payoffs': ih.cached_payoffs(progress=progress)
+    }
+
+
 def subclass_dict(klass):
     d = {}
     for cls in klass.__subclasses__():
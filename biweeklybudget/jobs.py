@@ -0,0 +1,453 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import importlib
+import json
+import logging
+import os
+import socket
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait as futures_wait
+from threading import Lock
+from time import monotonic, sleep
+
+from sqlalchemy.orm import sessionmaker
+
+from biweeklybudget import settings
+from biweeklybudget.flaskapp.jsonencoder import MagicJSONEncoder
+from biweeklybudget.models.job import Job
+from biweeklybudget.utils import dtnow
+
+logger = logging.getLogger(__name__)
+
+#: Job type name to the ``module:function`` path of the function that runs
+#: it. Each function is called with the database session to use, the dict of
+#: job parameters, and a ``progress`` callable taking the int number of units
+#: of work done, and optionally the int total and a string message. It returns
+#: a JSON-serializable result.
+JOB_TYPES = {
+    'ofx_statements': 'biweeklybudget.ofxapi.local:update_statements_job',
+    'payoffs': 'biweeklybudget.interest:payoffs_job',
+    'plaid_update': 'biweeklybudget.plaid_updater:plaid_update_job',
+    'reclassify': 'biweeklybudget.reclassify:reclassify_job',
+}
+
+#: Job states that mean the job has not finished yet
+ACTIVE_STATES = ['queued', 'running']
+
+#: Minimum number of seconds between writes of a running job's progress to
+#: the database
+PROGRESS_INTERVAL = 0.5
+
+_runner = None
+_runner_lock = Lock()
+
+
+def job_function(job_type):
+    """
+    Return the function that runs jobs of the given type.
+
+    :param job_type: job type name; a key in :py:data:`~.JOB_TYPES`
+    :type job_type: str
+    :return: job function
+    :rtype: callable
+    :raises: :py:exc:`KeyError` if the job type is unknown
+    """
+    modname, funcname = JOB_TYPES[job_type].split(':')
+    return getattr(importlib.import_module(modname), funcname)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobProgress(object):
+    """
+    ``progress`` callable passed to job functions; records the job's progress
+    in the database, at most once every :py:data:`~.PROGRESS_INTERVAL`
+    seconds.
+
+    :param runner: the runner running the job
+    :type runner: JobRunner
+    :param job_id: ID of the job
+    :type job_id: int
+    """
+
+    def __init__(self, runner, job_id):
+        self._runner = runner
+        self._job_id = job_id
+        self._values = {}
+        self._last_write = None
+
+    def __call__(self, done, total=None, message=None):
+        self._values['done'] = done
+        if total is not None:
+            self._values['total'] = total
+        if message is not None:
+            self._values['message'] = message[:254]
+        if (
+            self._last_write is None or
+            monotonic() - self._last_write >= PROGRESS_INTERVAL
+        ):
+            self.flush()
+
+    def flush(self):
+        """Write any progress not yet written to the database."""
+        if not self._values:
+            return
+        self._runner._update(self._job_id, **self._values)
+        self._values = {}
+        self._last_write = monotonic()
+
+
+class JobRunner(object):
+    """
+    Runs long-running background jobs in a pool of worker threads in this
+    process, with their state, progress and results persisted in the ``jobs``
+    table (:py:class:`~.Job`). Web requests enqueue a job and return
+    immediately, and the job's status can then be read from any process that
+    shares the database.
+
+    Jobs are claimed with a conditional UPDATE of their state from ``queued``
+    to ``running``, so each job is only run once even if more than one process
+    shares the database. Jobs with the same ``job_key`` are run one at a time,
+    in the order they were submitted, within a process; a job is only handed
+    to the worker pool once the previous job with its key has finished, so
+    waiting jobs do not tie up worker threads.
+
+    :param session_factory: callable returning a new database session, used
+      to read and write the ``jobs`` table independently of the sessions in
+      use by callers and jobs
+    :type session_factory: callable
+    :param work_session: scoped session passed to job functions, and removed
+      after each job; defaults to :py:data:`biweeklybudget.db.db_session`
+    :type work_session: sqlalchemy.orm.scoping.scoped_session
+    :param workers: number of worker threads; defaults to
+      :py:attr:`~biweeklybudget.settings.JOB_WORKERS`
+    :type workers: int
+    """
+
+    def __init__(self, session_factory, work_session=None, workers=None):
+        self._session_factory = session_factory
+        if work_session is None:
+            from biweeklybudget.db import db_session as work_session
+        self._work_session = work_session
+        if workers is None:
+            workers = settings.JOB_WORKERS
+        self._workers = workers
+        self._executor = None
+        self._futures = {}
+        #: job_key of each job submitted to the executor and not yet finished,
+        #: to a deque of the IDs of jobs with that key waiting to be submitted
+        self._key_queues = {}
+        self._lock = Lock()
+        #: ``hostname:pid`` identifying this process in :py:attr:`.Job.worker`
+        self.worker_name = '%s:%d' % (socket.gethostname(), os.getpid())
+
+    def enqueue(self, job_type, params=None, job_key=None):
+        """
+        Add a job to the ``jobs`` table and submit it to the worker pool.
+
+        :param job_type: job type name; a key in :py:data:`~.JOB_TYPES`
+        :type job_type: str
+        :param params: JSON-serializable dict of parameters for the job
+        :type params: dict
+        :param job_key: optional key identifying what the job operates on
+        :type job_key: str
+        :return: ID of the new job
+        :rtype: int
+        """
+        # fail in the caller, not the worker, for an unknown job type
+        job_function(job_type)
+        with self._session_factory() as s:
+            job = Job(
+                job_type=job_type, job_key=job_key, state='queued', done=0,
+                params=json.dumps(params or {}), created=dtnow()
+            )
+            s.add(job)
+            s.commit()
+            job_id = job.id
+        logger.info('Queued job %d (%s, key=%s)', job_id, job_type, job_key)
+        self._submit(job_id, job_key)
+        return job_id
+
+    def status(self, job_id):
+        """
+        Return the :py:attr:`.Job.status` of a job, or None if there is no
+        such job.
+
+        :param job_id: ID of the job
+        :type job_id: int
+        :rtype: dict
+        """
+        with self._session_factory() as s:
+            job = s.get(Job, job_id)
+            if job is None:
+                return None
+            return job.status
+
+    def statuses_for_key(self, job_key, limit=10):
+        """
+        Return the :py:attr:`.Job.status` of the latest jobs with the given
+        ``job_key``, newest first.
+
+        :param job_key: job key
+        :type job_key: str
+        :param limit: maximum number of jobs to return
+        :type limit: int
+        :rtype: list
+        """
+        with self._session_factory() as s:
+            return [
+                j.status for j in s.query(Job).filter(
+                    Job.job_key.__eq__(job_key)
+                ).order_by(Job.id.desc()).limit(limit).all()
+            ]
+
+    def wait(self, job_id, timeout=None):
+        """
+        Wait for a job submitted by this runner to finish, and return its
+        status.
+
+        :param job_id: ID of the job
+        :type job_id: int
+        :param timeout: maximum number of seconds to wait, or None for no limit
+        :type timeout: float
+        :rtype: dict
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            with self._lock:
+                f = self._futures.get(job_id)
+                waiting = any(job_id in q for q in self._key_queues.values())
+            remaining = None if deadline is None else deadline - monotonic()
+            if f is not None:
+                futures_wait([f], timeout=remaining)
+                break
+            if not waiting or (remaining is not None and remaining <= 0):
+                break
+            # waiting for an earlier job with the same key to finish
+            sleep(0.05)
+        return self.status(job_id)
+
+    def recover(self):
+        """
+        Recover jobs left over by processes that have exited: jobs that were
+        running in a process on this host that is no longer alive are marked
+        failed, and all queued jobs are submitted to the worker pool. Jobs
+        running in processes on other hosts are left alone.
+
+        This must be called before this process runs any jobs. Jobs recorded
+        as running with this process's own PID were left by an earlier
+        process that had the same PID (i.e. PID 1 before a container restart),
+        so they are also marked failed.
+        """
+        hostname = socket.gethostname()
+        with self._session_factory() as s:
+            for job in s.query(Job).filter(Job.state.__eq__('running')).all():
+                host, _, pid = (job.worker or '').rpartition(':')
+                if host != hostname:
+                    continue
+                if int(pid) != os.getpid() and _pid_alive(int(pid)):
+                    continue
+                logger.warning(
+                    'Job %d was interrupted by exit of worker %s',
+                    job.id, job.worker
+                )
+                job.state = 'failed'
+                job.error = 'Interrupted by exit of worker %s' % job.worker
+                job.finished = dtnow()
+            s.commit()
+            queued = s.query(Job.id, Job.job_key).filter(
+                Job.state.__eq__('queued')
+            ).order_by(Job.id).all()
+        for job_id, job_key in queued:
+            logger.info('Resubmitting queued job %d', job_id)
+            self._submit(job_id, job_key)
+
+    def shutdown(self, wait=True):
+        """
+        Shut down the worker pool. Queued jobs that have not started remain
+        queued in the database.
+
+        :param wait: whether to wait for running jobs to finish
+        :type wait: bool
+        """
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+            self._key_queues = {}
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _submit(self, job_id, job_key):
+        with self._lock:
+            if job_key is not None:
+                if job_key in self._key_queues:
+                    self._key_queues[job_key].append(job_id)
+                    return
+                self._key_queues[job_key] = deque()
+            self._submit_locked(job_id, job_key)
+
+    def _submit_locked(self, job_id, job_key):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._workers, thread_name_prefix='job'
+            )
+        f = self._executor.submit(self._run, job_id, job_key)
+        self._futures[job_id] = f
+        f.add_done_callback(lambda _: self._forget(job_id))
+
+    def _forget(self, job_id):
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+    def _submit_next(self, job_key):
+        """Submit the next waiting job with ``job_key``, if any."""
+        if job_key is None:
+            return
+        with self._lock:
+            q = self._key_queues.get(job_key)
+            if not q:
+                self._key_queues.pop(job_key, None)
+                return
+            self._submit_locked(q.popleft(), job_key)
+
+    def _update(self, job_id, **values):
+        with self._session_factory() as s:
+            s.query(Job).filter(Job.id.__eq__(job_id)).update(
+                values, synchronize_session=False
+            )
+            s.commit()
+
+    def _claim(self, job_id):
+        """
+        Mark a queued job as running by this process. Return its type and
+        parameters, or None if it is no longer queued (i.e. another process
+        claimed it).
+        """
+        with self._session_factory() as s:
+            count = s.query(Job).filter(
+                Job.id.__eq__(job_id), Job.state.__eq__('queued')
+            ).update({
+                'state': 'running', 'started': dtnow(),
+                'worker': self.worker_name
+            }, synchronize_session=False)
+            s.commit()
+            if count != 1:
+                return None
+            job = s.get(Job, job_id)
+            return job.job_type, json.loads(job.params or '{}')
+
+    def _run(self, job_id, job_key):
+        """
+        Worker thread target; claim and run one job, and record its result.
+        """
+        try:
+            self._run_job(job_id)
+        finally:
+            self._submit_next(job_key)
+
+    def _run_job(self, job_id):
+        claimed = self._claim(job_id)
+        if claimed is None:
+            logger.debug('Job %d already claimed; skipping', job_id)
+            return
+        job_type, params = claimed
+        logger.info('Running job %d (%s)', job_id, job_type)
+        progress = JobProgress(self, job_id)
+        db = self._work_session
+        try:
+            result = job_function(job_type)(db, params, progress)
+            values = {
+                'state': 'done',
+                'result': json.dumps(result, cls=MagicJSONEncoder)
+            }
+            logger.info('Job %d (%s) done', job_id, job_type)
+        except Exception as ex:
+            logger.error(
+                'Error running job %d (%s)', job_id, job_type, exc_info=True
+            )
+            db.rollback()
+            values = {'state': 'failed', 'error': str(ex) or repr(ex)}
+        finally:
+            db.remove()
+        progress.flush()
+        values['finished'] = dtnow()
+        self._update(job_id, **values)
+
+
+def runner():
+    """
+    Return the process-wide :py:class:`~.JobRunner`, creating it on first use
+    (and recovering any jobs left over by exited processes).
+
+    :rtype: JobRunner
+    """
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            from biweeklybudget.db import engine
+            _runner = JobRunner(sessionmaker(bind=engine))
+            _runner.recover()
+        return _runner
+
+
+def enqueue(job_type, params=None, job_key=None):
+    """
+    Enqueue a job with the process-wide runner; see
+    :py:meth:`~.JobRunner.enqueue`.
+
+    :return: ID of the new job
+    :rtype: int
+    """
+    return runner().enqueue(job_type, params=params, job_key=job_key)
+
+
+def job_status(job_id):
+    """
+    Return the status of a job, or None; see :py:meth:`~.JobRunner.status`.
+
+    :rtype: dict
+    """
+    return runner().status(job_id)
@@ -39,10 +39,13 @@ from biweeklybudget.models.account import Account, AcctType
 from biweeklybudget.models.account_balance import AccountBalance
 from biweeklybudget.models.budget_model import Budget
 from biweeklybudget.models.budget_transaction import BudgetTransaction
+from biweeklybudget.models.credit_payoff_result import CreditPayoffResult
 from biweeklybudget.models.dbsetting import DBSetting
 from biweeklybudget.models.fuel import FuelFill, Vehicle
+from biweeklybudget.models.job import Job
 from biweeklybudget.models.ofx_statement import OFXStatement
 from biweeklybudget.models.ofx_transaction import OFXTransaction
+from biweeklybudget.models.pay_period_budget_sum import PayPeriodBudgetSum
 from biweeklybudget.models.plaid_accounts import PlaidAccount
 from biweeklybudget.models.plaid_items import PlaidItem
 from biweeklybudget.models.projects import Project, BoMItem
@@ -38,7 +38,7 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 import logging
 from sqlalchemy import (
     Column, Integer, String, Boolean, Text, Enum, Numeric, inspect, or_,
-    ForeignKeyConstraint
+    ForeignKeyConstraint, ForeignKey, select, update, func
 )
 from datetime import timedelta
 from sqlalchemy.ext.hybrid import hybrid_property
@@ -50,6 +50,7 @@ from biweeklybudget.models.base import Base, ModelAsDict
 from biweeklybudget.models.account_balance import AccountBalance
 from biweeklybudget.models.transaction import Transaction
 from biweeklybudget.models.plaid_accounts import PlaidAccount
+from biweeklybudget.models.ofx_statement import OFXStatement
 from biweeklybudget.models.ofx_transaction import OFXTransaction
 from biweeklybudget.utils import dtnow
 from biweeklybudget.prime_rate import PrimeRateCalculator
@@ -160,7 +161,35 @@ class Account(Base, ModelAsDict):
 
     #: Relationship to all :py:class:`~.OFXStatement` for this Account
     all_statements = relationship(
-        'OFXStatement', order_by='OFXStatement.as_of'
+        'OFXStatement', order_by='OFXStatement.as_of',
+        foreign_keys='OFXStatement.account_id'
+    )
+
+    #: ID of the latest :py:class:`~.AccountBalance` for this Account
+    latest_balance_id = Column(
+        Integer, ForeignKey('account_balances.id', use_alter=True),
+        nullable=True
+    )
+
+    #: Relationship to the latest :py:class:`~.AccountBalance` for this
+    #: Account; maintained by :py:meth:`~.set_balance` and
+    #: :py:func:`~.handle_account_latest_pointers`
+    latest_balance = relationship(
+        'AccountBalance', foreign_keys=[latest_balance_id], post_update=True
+    )
+
+    #: ID of the latest (by ``as_of``) :py:class:`~.OFXStatement` for this
+    #: Account
+    latest_statement_id = Column(
+        Integer, ForeignKey('ofx_statements.id', use_alter=True),
+        nullable=True
+    )
+
+    #: Relationship to the latest (by ``as_of``) :py:class:`~.OFXStatement`
+    #: for this Account; maintained by :py:meth:`~.set_latest_statement` and
+    #: :py:func:`~.handle_account_latest_pointers`
+    latest_statement = relationship(
+        'OFXStatement', foreign_keys=[latest_statement_id], post_update=True
     )
 
     #: regex for matching transactions as interest charges
@@ -274,10 +303,56 @@ class Account(Base, ModelAsDict):
     def set_balance(self, **kwargs):
         """
         Create an AccountBalance object for this account and associate it with
-        the account. Add it to the current session.
+        the account. Add it to the current session, and set it as
+        :py:attr:`~.latest_balance`.
         """
         kwargs['account'] = self
-        inspect(self).session.add(AccountBalance(**kwargs))
+        bal = AccountBalance(**kwargs)
+        inspect(self).session.add(bal)
+        self.latest_balance = bal
+
+    def set_latest_statement(self, stmt):
+        """
+        Set :py:attr:`~.latest_statement` to ``stmt``, if it is at least as
+        recent as the current latest statement. Statements for past dates
+        (i.e. when backfilling) leave the current latest statement in place.
+
+        :param stmt: new statement for this account
+        :type stmt: biweeklybudget.models.ofx_statement.OFXStatement
+        """
+        cur = self.latest_statement
+        if (
+            cur is None or cur.as_of is None or
+            (stmt.as_of is not None and stmt.as_of >= cur.as_of)
+        ):
+            self.latest_statement = stmt
+
+    @staticmethod
+    def update_latest_pointers(db):
+        """
+        Recalculate :py:attr:`~.latest_balance_id` and
+        :py:attr:`~.latest_statement_id` for all accounts from the
+        ``account_balances`` and ``ofx_statements`` tables, with one UPDATE
+        statement each. This is only needed after balances or statements are
+        added without the ORM event handlers (i.e. bulk loads).
+
+        :param db: active database session to use for queries
+        :type db: sqlalchemy.orm.session.Session
+        """
+        db.execute(update(Account).values(
+            latest_balance_id=select(
+                func.max(AccountBalance.id)
+            ).where(
+                AccountBalance.account_id == Account.id
+            ).scalar_subquery()
+        ))
+        db.execute(update(Account).values(
+            latest_statement_id=select(OFXStatement.id).where(
+                OFXStatement.account_id == Account.id
+            ).order_by(
+                OFXStatement.as_of.desc(), OFXStatement.id.desc()
+            ).limit(1).scalar_subquery()
+        ))
 
     @property
     def ofx_statement(self):
@@ -287,9 +362,7 @@ class Account(Base, ModelAsDict):
         :return: latest OFXStatement for this Account
         :rtype: biweeklybudget.models.ofx_statement.OFXStatement
         """
-        if len(self.all_statements) < 1:
-            return None
-        return self.all_statements[-1]
+        return self.latest_statement
 
     @property
     def balance(self):
@@ -299,10 +372,7 @@ class Account(Base, ModelAsDict):
         :return: latest AccountBalance for this Account
         :rtype: biweeklybudget.models.account_balance.AccountBalance
         """
-        sess = inspect(self).session
-        res = sess.query(AccountBalance).with_parent(self).order_by(
-            AccountBalance.id.desc()).limit(1).first()
-        return res
+        return self.latest_balance
 
     @property
     def unreconciled(self):
@@ -35,7 +35,7 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 ################################################################################
 """
 
-from sqlalchemy import Column, Integer, Numeric, ForeignKey
+from sqlalchemy import Column, Integer, Numeric, ForeignKey, Index
 from sqlalchemy_utc import UtcDateTime
 from sqlalchemy.orm import relationship
 from biweeklybudget.models.base import Base, ModelAsDict
@@ -46,6 +46,10 @@ class AccountBalance(Base, ModelAsDict):
 
     __tablename__ = 'account_balances'
     __table_args__ = (
+        Index(
+            'ix_account_balances_account_id_overall_date',
+            'account_id', 'overall_date'
+        ),
         {'mysql_engine': 'InnoDB'}
     )
 
@@ -57,7 +61,7 @@ class AccountBalance(Base, ModelAsDict):
 
     #: Relationship to :py:class:`~.Account` this balance is for
     account = relationship(
-        "Account", backref="all_balances"
+        "Account", backref="all_balances", foreign_keys=[account_id]
     )
 
     #: Ledger balance, or investment account value, or credit card balance
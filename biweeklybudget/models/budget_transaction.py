@@ -35,7 +35,7 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 ################################################################################
 """
 
-from sqlalchemy import Column, Integer, Numeric, ForeignKey
+from sqlalchemy import Column, Integer, Numeric, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from biweeklybudget.models.base import Base, ModelAsDict
 
@@ -49,6 +49,10 @@ class BudgetTransaction(Base, ModelAsDict):
 
     __tablename__ = 'budget_transactions'
     __table_args__ = (
+        Index(
+            'ix_budget_transactions_budget_id_trans_id',
+            'budget_id', 'trans_id'
+        ),
         {'mysql_engine': 'InnoDB'}
     )
 
@@ -0,0 +1,117 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import logging
+from sqlalchemy import Column, String, Text, delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy_utc import UtcDateTime
+
+from biweeklybudget.models.base import Base, ModelAsDict
+from biweeklybudget.utils import dtnow
+
+logger = logging.getLogger(__name__)
+
+
+class CreditPayoffResult(Base, ModelAsDict):
+    """
+    Cached credit card payoff calculation results; the return value of
+    :py:meth:`~.InterestHelper.calculate_payoffs` for one set of inputs, keyed
+    by :py:attr:`~.InterestHelper.inputs_hash`. When any of the inputs change,
+    so does the hash, so stale results are never used; only the most recent
+    :py:attr:`~.KEEP` results are kept.
+    """
+
+    __tablename__ = 'credit_payoff_results'
+    __table_args__ = (
+        {'mysql_engine': 'InnoDB'}
+    )
+
+    #: Number of most recent results to keep when storing a new one
+    KEEP = 20
+
+    #: Hex SHA-256 hash of the calculation inputs
+    inputs_hash = Column(String(64), primary_key=True)
+
+    #: JSON-encoded payoff results, as returned by
+    #: :py:func:`~.payoffs_to_json`
+    result = Column(Text, nullable=False)
+
+    #: When the result was calculated
+    created = Column(UtcDateTime)
+
+    def __repr__(self):
+        return "<CreditPayoffResult(inputs_hash=%s)>" % self.inputs_hash
+
+    @staticmethod
+    def store(db, inputs_hash, result):
+        """
+        Store a result, delete all but the :py:attr:`~.KEEP` most recent
+        results, and commit. If another process stored a result for the same
+        inputs first, keep that one.
+
+        :param db: active database session to use
+        :type db: sqlalchemy.orm.session.Session
+        :param inputs_hash: hash of the calculation inputs
+        :type inputs_hash: str
+        :param result: JSON-encoded payoff results
+        :type result: str
+        """
+        logger.debug('Storing credit payoff result for inputs %s', inputs_hash)
+        db.add(CreditPayoffResult(
+            inputs_hash=inputs_hash, result=result, created=dtnow()
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            logger.debug(
+                'Credit payoff result for inputs %s already stored',
+                inputs_hash
+            )
+            db.rollback()
+            return
+        old = db.execute(
+            select(CreditPayoffResult.inputs_hash).order_by(
+                CreditPayoffResult.created.desc()
+            ).offset(CreditPayoffResult.KEEP)
+        ).scalars().all()
+        if len(old) == 0:
+            return
+        logger.debug('Deleting %d old credit payoff results', len(old))
+        db.execute(delete(CreditPayoffResult).where(
+            CreditPayoffResult.inputs_hash.in_(old)
+        ))
+        db.commit()
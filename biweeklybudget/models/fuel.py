@@ -38,7 +38,7 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 import logging
 from sqlalchemy import (
     Column, Integer, String, Boolean, Date, ForeignKey, SmallInteger, Numeric,
-    desc, inspect
+    Index, desc, inspect
 )
 from decimal import Decimal, ROUND_FLOOR
 from sqlalchemy.orm import relationship, validates
@@ -74,6 +74,10 @@ class FuelFill(Base, ModelAsDict):
 
     __tablename__ = 'fuellog'
     __table_args__ = (
+        Index(
+            'ix_fuellog_vehicle_id_odometer_miles',
+            'vehicle_id', 'odometer_miles'
+        ),
         {'mysql_engine': 'InnoDB'}
     )
 
@@ -0,0 +1,137 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import logging
+import json
+from sqlalchemy import Column, Integer, String, Text, Index
+from sqlalchemy.dialects import mysql
+from sqlalchemy_utc import UtcDateTime
+
+from biweeklybudget.models.base import Base, ModelAsDict
+
+logger = logging.getLogger(__name__)
+
+
+class Job(Base, ModelAsDict):
+    """
+    A unit of long-running work run in the background by
+    :py:class:`biweeklybudget.jobs.JobRunner`, and its state, progress and
+    result.
+    """
+
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        Index('ix_jobs_state_id', 'state', 'id'),
+        Index('ix_jobs_job_key_id', 'job_key', 'id'),
+        {'mysql_engine': 'InnoDB'}
+    )
+
+    #: Primary Key
+    id = Column(Integer, primary_key=True)
+
+    #: Name of the job type; a key in :py:data:`biweeklybudget.jobs.JOB_TYPES`
+    job_type = Column(String(50), nullable=False)
+
+    #: Optional key identifying what the job operates on, i.e.
+    #: ``account:3``, used to look up the latest job for it.
+    job_key = Column(String(100))
+
+    #: JSON-encoded parameters passed to the job function. LONGTEXT on MySQL,
+    #: as these can include whole OFX statement batches.
+    params = Column(Text().with_variant(mysql.LONGTEXT(), 'mysql'))
+
+    #: State of the job; one of ``queued``, ``running``, ``done`` or ``failed``
+    state = Column(String(10), nullable=False, default='queued')
+
+    #: Number of units of work done so far
+    done = Column(Integer)
+
+    #: Total number of units of work, if known
+    total = Column(Integer)
+
+    #: Latest progress message
+    message = Column(String(254))
+
+    #: JSON-encoded return value of the job function, once done
+    result = Column(Text().with_variant(mysql.LONGTEXT(), 'mysql'))
+
+    #: Error message, if failed
+    error = Column(Text)
+
+    #: ``hostname:pid`` of the process that ran (or is running) the job
+    worker = Column(String(100))
+
+    #: When the job was queued
+    created = Column(UtcDateTime)
+
+    #: When the job started running
+    started = Column(UtcDateTime)
+
+    #: When the job finished
+    finished = Column(UtcDateTime)
+
+    def __repr__(self):
+        return "<Job(id=%s, job_type=%s, state=%s)>" % (
+            self.id, self.job_type, self.state
+        )
+
+    @property
+    def status(self):
+        """
+        Return a JSON-serializable dict describing the job's state, progress
+        and (decoded) result.
+
+        :rtype: dict
+        """
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'job_key': self.job_key,
+            'state': self.state,
+            'done': self.done,
+            'total': self.total,
+            'message': self.message,
+            'result': None if self.result is None else json.loads(self.result),
+            'error': self.error,
+            'created': self._isoformat(self.created),
+            'started': self._isoformat(self.started),
+            'finished': self._isoformat(self.finished)
+        }
+
+    @staticmethod
+    def _isoformat(dt):
+        return None if dt is None else dt.isoformat()
@@ -36,7 +36,7 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 """
 
 from sqlalchemy import (
-    Column, Integer, String, ForeignKey, Numeric, UniqueConstraint
+    Column, Integer, String, ForeignKey, Numeric, UniqueConstraint, Index
 )
 from sqlalchemy_utc import UtcDateTime
 from sqlalchemy.orm import relationship
@@ -48,6 +48,7 @@ class OFXStatement(Base, ModelAsDict):
     __tablename__ = 'ofx_statements'
     __table_args__ = (
         UniqueConstraint('account_id', 'filename'),
+        Index('ix_ofx_statements_account_id_as_of', 'account_id', 'as_of'),
         {'mysql_engine': 'InnoDB'}
     )
 
@@ -59,7 +60,7 @@ class OFXStatement(Base, ModelAsDict):
 
     #: Relationship to the :py:class:`~.Account` this statement is for
     account = relationship(
-        "Account", uselist=False
+        "Account", uselist=False, foreign_keys=[account_id]
     )
 
     #: Filename parsed from
@@ -37,7 +37,7 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 
 from sqlalchemy import (
     Column, String, PrimaryKeyConstraint, Text, Numeric, Boolean, ForeignKey,
-    Integer, inspect
+    Integer, Index, inspect
 )
 from sqlalchemy.sql.expression import null
 from sqlalchemy_utc import UtcDateTime
@@ -54,12 +54,135 @@ from biweeklybudget.settings import RECONCILE_BEGIN_DATE
 
 logger = logging.getLogger(__name__)
 
+#: List of 2-tuples of :py:class:`~.Account` regex attribute name and the
+#: :py:class:`~.OFXTransaction` boolean field it sets.
+IS_FIELD_REGEXES = [
+    ('re_interest_charge', 'is_interest_charge'),
+    ('re_interest_paid', 'is_interest_payment'),
+    ('re_payment', 'is_payment'),
+    ('re_late_fee', 'is_late_fee'),
+    ('re_other_fee', 'is_other_fee')
+]
+
+#: OFXTransaction name used for manually-entered interest charges, which
+#: always keep their ``is_interest_charge`` value.
+MANUAL_INTEREST_NAME = 'Interest Charged - MANUALLY ENTERED'
+
+#: Cache of Account ID to :py:class:`~.IsFieldMatcher`; see
+#: :py:func:`~.matcher_for_account`.
+_matcher_cache = {}
+
+
+class IsFieldMatcher(object):
+    """
+    Compiled form of an :py:class:`~.Account`'s ``re_*`` regexes, that
+    determines which ``is_*`` fields of an :py:class:`~.OFXTransaction` match
+    a transaction name. When possible, all of the regexes are combined into
+    one pattern of optional lookaheads, so that a name is checked against all
+    of them in a single pass.
+    """
+
+    def __init__(self, patterns):
+        """
+        :param patterns: tuple of regex strings (or None), in the order of
+          :py:const:`~.IS_FIELD_REGEXES`
+        :type patterns: tuple
+        """
+        #: the regex strings this matcher was built from
+        self.patterns = patterns
+        self._compiled = []
+        for (acct_attr, fname), r_str in zip(IS_FIELD_REGEXES, patterns):
+            if r_str is None:
+                continue
+            try:
+                self._compiled.append((fname, re.compile(r_str, re.I)))
+            except Exception:
+                logger.error(
+                    'Error compiling regex for Account field %s (%s)',
+                    acct_attr, r_str, exc_info=True
+                )
+        self._combined = None
+        if len(self._compiled) > 1 and not any(
+            c.groups > 0 for _, c in self._compiled
+        ):
+            # groups in the patterns would be renumbered when combined
+            try:
+                self._combined = re.compile(''.join(
+                    '(?=(?P<%s>%s))?' % (fname, c.pattern)
+                    for fname, c in self._compiled
+                ), re.I)
+            except Exception:
+                logger.debug(
+                    'Unable to combine regexes %s', patterns, exc_info=True
+                )
+
+    def match(self, name):
+        """
+        Return the set of ``is_*`` field names whose regex matches ``name``.
+
+        :param name: OFXTransaction name
+        :type name: str
+        :return: set of matching field names
+        :rtype: set
+        """
+        if name is None:
+            return set()
+        if self._combined is not None:
+            return set(
+                k for k, v in self._combined.match(name).groupdict().items()
+                if v is not None
+            )
+        return set(
+            fname for fname, c in self._compiled if c.match(name)
+        )
+
+
+def matcher_for_account(acct):
+    """
+    Return the :py:class:`~.IsFieldMatcher` for an :py:class:`~.Account`.
+    Matchers are cached by Account ID, and rebuilt whenever any of the
+    Account's ``re_*`` regexes differ from the ones the cached matcher was
+    built from.
+
+    :param acct: the Account to get the matcher for
+    :type acct: biweeklybudget.models.account.Account
+    :return: matcher for the Account's current regexes
+    :rtype: IsFieldMatcher
+    """
+    patterns = tuple(getattr(acct, a) for a, _ in IS_FIELD_REGEXES)
+    m = _matcher_cache.get(acct.id)
+    if m is not None and m.patterns == patterns:
+        return m
+    m = IsFieldMatcher(patterns)
+    if acct.id is not None:
+        _matcher_cache[acct.id] = m
+    return m
+
+
+def clear_matcher_cache(acct_id=None):
+    """
+    Remove the cached :py:class:`~.IsFieldMatcher` for one Account, or for
+    all Accounts if ``acct_id`` is None.
+
+    :param acct_id: Account ID to remove the matcher for, or None for all
+    :type acct_id: int
+    """
+    if acct_id is None:
+        _matcher_cache.clear()
+    else:
+        _matcher_cache.pop(acct_id, None)
+
 
 class OFXTransaction(Base, ModelAsDict):
 
     __tablename__ = 'ofx_trans'
     __table_args__ = (
         PrimaryKeyConstraint('account_id', 'fitid'),
+        Index('ix_ofx_trans_date_posted', 'date_posted'),
+        Index(
+            'ix_ofx_trans_account_id_date_posted',
+            'account_id', 'date_posted'
+        ),
         {'mysql_engine': 'InnoDB'}
     )
 
@@ -243,38 +366,58 @@ class OFXTransaction(Base, ModelAsDict):
         Method to update all ``is_*`` fields on this instance, given the
         ``re_*`` properties of :py:attr:`~.account`.
         """
-        fields = {
-            're_interest_charge': 'is_interest_charge',
-            're_interest_paid': 'is_interest_payment',
-            're_payment': 'is_payment',
-            're_late_fee': 'is_late_fee',
-            're_other_fee': 'is_other_fee'
-        }
         acct = self.account
         if acct is None:
             from biweeklybudget.models.account import Account
             sess = inspect(self).session
             acct = sess.query(Account).get(self.account_id)
-        for fname in fields.values():
+        self._set_is_fields(matcher_for_account(acct))
+
+    def _set_is_fields(self, matcher):
+        """
+        Set all ``is_*`` fields on this instance according to ``matcher``.
+
+        :param matcher: matcher for this transaction's Account
+        :type matcher: IsFieldMatcher
+        """
+        matched = matcher.match(self.name)
+        for _, fname in IS_FIELD_REGEXES:
             if (
                 fname == 'is_interest_charge' and
-                self.name == 'Interest Charged - MANUALLY ENTERED'
+                self.name == MANUAL_INTEREST_NAME
             ):
                 continue
-            setattr(self, fname, False)
-        for acct_attr, self_attr in fields.items():
-            if (
-                self_attr == 'is_interest_charge' and
-                self.name == 'Interest Charged - MANUALLY ENTERED'
-            ):
-                continue
-            r_str = getattr(acct, acct_attr)
-            if r_str is None:
+            setattr(self, fname, fname in matched)
+
+    @staticmethod
+    def update_is_fields_many(txns, db):
+        """
+        Update the ``is_*`` fields on all OFXTransactions in ``txns``, like
+        :py:meth:`~.update_is_fields`. Any Accounts that are not already
+        associated with the transactions are loaded in a single query.
+
+        :param txns: the OFXTransactions to update
+        :type txns: list
+        :param db: active database session to use for queries
+        :type db: sqlalchemy.orm.session.Session
+        """
+        from biweeklybudget.models.account import Account
+        pairs = [(t, t.account) for t in txns]
+        missing = set(t.account_id for t, a in pairs if a is None)
+        loaded = {}
+        if len(missing) > 0:
+            loaded = {
+                a.id: a for a in db.query(Account).filter(
+                    Account.id.in_(missing)
+                ).all()
+            }
+        for txn, acct in pairs:
+            if acct is None:
+                acct = loaded.get(txn.account_id)
+            if acct is None:
+                logger.error(
+                    'Cannot update is_ fields on %s; Account %s not found',
+                    txn, txn.account_id
+                )
                 continue
-            try:
-                if re.match(r_str, self.name, re.I):
-                    setattr(self, self_attr, True)
-            except Exception:
-                logger.error('Error performing regex comparison on %s using '
-                             'Account %s field %s (%s)', self, acct,
-                             acct_attr, r_str, exc_info=True)
+            txn._set_is_fields(matcher_for_account(acct))
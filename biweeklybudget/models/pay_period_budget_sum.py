@@ -0,0 +1,139 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import logging
+from sqlalchemy import (
+    Column, Integer, Numeric, Date, ForeignKey, PrimaryKeyConstraint, delete
+)
+from sqlalchemy.orm import relationship
+
+from biweeklybudget.models.base import Base, ModelAsDict
+
+logger = logging.getLogger(__name__)
+
+
+class PayPeriodBudgetSum(Base, ModelAsDict):
+    """
+    Materialized per-budget sums for one pay period; the persisted form of
+    the ``allocated``, ``spent`` and ``trans_total`` values calculated by
+    :py:meth:`~.BiweeklyPayPeriod._make_budget_sums`. Rows are read by
+    :py:meth:`~.BiweeklyPayPeriod.load_budget_sums` and recalculated in the
+    same transaction whenever a flush changes data that they were calculated
+    from; see :py:func:`~.handle_pay_period_sums_invalidation` and
+    :py:func:`~.handle_pay_period_sums_update`. Rows are only stored for
+    periods affected by such a write or by
+    :py:meth:`~.PayPeriodSumsManager.rebuild`, never on read.
+    """
+
+    __tablename__ = 'pay_period_budget_sums'
+    __table_args__ = (
+        PrimaryKeyConstraint('start_date', 'budget_id'),
+        {'mysql_engine': 'InnoDB'}
+    )
+
+    #: Start date of the pay period
+    start_date = Column(Date, nullable=False)
+
+    #: ID of the Budget these sums are for
+    budget_id = Column(Integer, ForeignKey('budgets.id'), nullable=False)
+
+    #: Relationship - the :py:class:`~.Budget` these sums are for
+    budget = relationship('Budget', uselist=False)
+
+    #: Sum of all amounts allocated against the budget in the period
+    allocated = Column(
+        Numeric(precision=10, scale=4), nullable=False, default=0.0
+    )
+
+    #: Sum of all actual Transaction amounts against the budget in the period
+    spent = Column(Numeric(precision=10, scale=4), nullable=False, default=0.0)
+
+    #: Sum of spent amounts for Transactions, or allocated amounts for
+    #: ScheduledTransactions, against the budget in the period
+    trans_total = Column(
+        Numeric(precision=10, scale=4), nullable=False, default=0.0
+    )
+
+    #: Number of transactions in the period that reference the budget
+    trans_count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return "<PayPeriodBudgetSum(start_date=%s, budget_id=%s)>" % (
+            self.start_date, self.budget_id
+        )
+
+    @staticmethod
+    def invalidate(db, start_dates=None):
+        """
+        Delete materialized sums for the pay periods starting on each of
+        ``start_dates``, or for all pay periods if ``start_dates`` is None.
+        This executes immediately in the session's current transaction.
+
+        :param db: active database session to use for queries
+        :type db: sqlalchemy.orm.session.Session
+        :param start_dates: pay period start dates to invalidate, or None
+        :type start_dates: set
+        """
+        stmt = delete(PayPeriodBudgetSum)
+        if start_dates is not None:
+            if len(start_dates) == 0:
+                return
+            stmt = stmt.where(
+                PayPeriodBudgetSum.start_date.in_(sorted(start_dates))
+            )
+            logger.debug(
+                'Invalidating pay period budget sums for: %s',
+                sorted(start_dates)
+            )
+        else:
+            logger.debug('Invalidating ALL pay period budget sums')
+        db.execute(stmt)
+
+    @staticmethod
+    def stored_start_dates(db):
+        """
+        Return the set of start dates of all pay periods that have stored
+        sums.
+
+        :param db: active database session to use for queries
+        :type db: sqlalchemy.orm.session.Session
+        :return: set of pay period start dates
+        :rtype: set
+        """
+        return set(
+            r[0] for r in db.query(PayPeriodBudgetSum.start_date).distinct()
+        )
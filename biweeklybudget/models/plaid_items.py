@@ -36,7 +36,7 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 """
 
 import logging
-from sqlalchemy import Column, String
+from sqlalchemy import Column, String, Text
 from sqlalchemy_utc import UtcDateTime
 from sqlalchemy.orm import relationship
 
@@ -67,6 +67,11 @@ class PlaidItem(Base, ModelAsDict):
     #: When this item was last updated
     last_updated = Column(UtcDateTime)
 
+    #: Cursor returned by the last successful Plaid ``/transactions/sync``
+    #: call for this item; the next sync only returns changes since then.
+    #: None if the item has never been synced.
+    sync_cursor = Column(Text)
+
     #: Relationship to all :py:class:`~.PlaidAccount` for this Item
     all_accounts = relationship(
         'PlaidAccount', order_by='PlaidAccount.account_id'
@@ -37,7 +37,7 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 
 from sqlalchemy import (
     Column, Integer, String, Boolean, Date, SmallInteger, Numeric,
-    ForeignKey, func
+    ForeignKey, Index, func
 )
 from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import case
@@ -59,6 +59,7 @@ class ScheduledTransaction(Base, ModelAsDict):
 
     __tablename__ = 'scheduled_transactions'
     __table_args__ = (
+        Index('ix_scheduled_transactions_is_active_date', 'is_active', 'date'),
         {'mysql_engine': 'InnoDB'}
     )
 
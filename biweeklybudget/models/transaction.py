@@ -37,7 +37,8 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 
 import logging
 from sqlalchemy import (
-    Column, Integer, Numeric, String, Date, ForeignKey, inspect, func, select
+    Column, Integer, Numeric, String, Date, ForeignKey, Index, inspect, func,
+    select
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.expression import null
@@ -63,6 +64,8 @@ class Transaction(Base, ModelAsDict):
 
     __tablename__ = 'transactions'
     __table_args__ = (
+        Index('ix_transactions_date', 'date'),
+        Index('ix_transactions_account_id_date', 'account_id', 'date'),
         {'mysql_engine': 'InnoDB'}
     )
 
@@ -0,0 +1,258 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+from datetime import datetime
+from decimal import Decimal
+
+from ofxparse.ofxparse import (
+    Ofx, Signon, Account, InvestmentAccount, Statement, InvestmentStatement,
+    Transaction, Position, Institution, AccountType
+)
+
+#: Version of the statement encoding produced by :py:func:`~.encode_ofx`.
+SCHEMA_VERSION = 1
+
+#: Transaction fields, in the order they appear in each encoded transaction
+#: row, and the type of each.
+TRANSACTION_FIELDS = [
+    ('id', str),
+    ('type', str),
+    ('date', datetime),
+    ('amount', Decimal),
+    ('payee', str),
+    ('memo', str),
+    ('sic', str),
+    ('mcc', str),
+    ('checknum', str),
+]
+
+#: Investment position fields, in the order they appear in each encoded
+#: position row, and the type of each.
+POSITION_FIELDS = [
+    ('date', datetime),
+    ('units', Decimal),
+    ('unit_price', Decimal),
+    ('market_value', Decimal),
+]
+
+#: Optional Bank/Credit statement balance fields, and the type of each.
+STATEMENT_FIELDS = [
+    ('balance', Decimal),
+    ('balance_date', datetime),
+    ('available_balance', Decimal),
+    ('available_balance_date', datetime),
+]
+
+
+def _encode_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(value, typ):
+    if value is None:
+        return None
+    if typ is datetime:
+        return datetime.fromisoformat(value)
+    return typ(value)
+
+
+def _encode_row(obj, fields):
+    return [_encode_value(getattr(obj, name, None)) for name, _ in fields]
+
+
+def _decode_row(cls, row, fields):
+    if len(row) != len(fields):
+        raise ValueError(
+            'Expected %d fields for %s, got %d' % (
+                len(fields), cls.__name__, len(row)
+            )
+        )
+    obj = cls()
+    for (name, typ), value in zip(fields, row):
+        if value is not None:
+            setattr(obj, name, _decode_value(value, typ))
+        elif getattr(obj, name, None) is not None:
+            # the attribute was missing (or None) when encoded; don't leave a
+            # constructor default that the original object didn't have
+            delattr(obj, name)
+    return obj
+
+
+def encode_ofx(ofx):
+    """
+    Encode the parts of a parsed OFX statement that
+    :py:meth:`~.OfxApiLocal.update_statement_ofx` uses as a JSON-serializable
+    dict. Unlike pickling the whole ``ofxparse.ofxparse.Ofx`` object, this is
+    a fixed schema that is safe to decode from untrusted input.
+    Transactions and positions are encoded as lists of values in the order of
+    :py:data:`~.TRANSACTION_FIELDS` and :py:data:`~.POSITION_FIELDS`;
+    decimals and datetimes are encoded as strings.
+
+    :param ofx: Ofx instance for parsed file
+    :type ofx: ``ofxparse.ofxparse.Ofx``
+    :return: encoded statement
+    :rtype: dict
+    """
+    acct = ofx.account
+    res = {
+        'version': SCHEMA_VERSION,
+        'status': getattr(ofx, 'status', None),
+        'dtserver': ofx.signon.dtserver,
+        'account': {
+            'type': acct.type,
+            'curdef': acct.curdef,
+            'account_id': acct.account_id,
+            'routing_number': acct.routing_number,
+            'account_type': acct.account_type,
+            'fid': None,
+            'brokerid': getattr(acct, 'brokerid', None)
+        },
+        'statement': {},
+        'transactions': [],
+        'positions': []
+    }
+    if acct.institution is not None:
+        res['account']['fid'] = acct.institution.fid
+    stmt = acct.statement
+    if acct.type == AccountType.Investment:
+        res['positions'] = [
+            _encode_row(p, POSITION_FIELDS) for p in stmt.positions
+        ]
+        return res
+    for name, _ in STATEMENT_FIELDS:
+        if hasattr(stmt, name):
+            res['statement'][name] = _encode_value(getattr(stmt, name))
+    res['transactions'] = [
+        _encode_row(t, TRANSACTION_FIELDS) for t in stmt.transactions
+    ]
+    return res
+
+
+def decode_ofx(data):
+    """
+    Decode a statement encoded by :py:func:`~.encode_ofx` back into an
+    ``ofxparse.ofxparse.Ofx`` instance that can be passed to
+    :py:meth:`~.OfxApiLocal.update_statement_ofx`.
+
+    :param data: encoded statement
+    :type data: dict
+    :return: Ofx instance with the encoded fields set
+    :rtype: ``ofxparse.ofxparse.Ofx``
+    :raises: :py:exc:`ValueError` if ``data`` does not match the schema
+    """
+    try:
+        if data['version'] != SCHEMA_VERSION:
+            raise ValueError(
+                'Unsupported statement encoding version: %s' % data['version']
+            )
+        a = data['account']
+        ofx = Ofx()
+        if data['status'] is not None:
+            ofx.status = data['status']
+        ofx.signon = Signon({
+            'code': 0, 'severity': None, 'message': None,
+            'dtserver': data['dtserver'], 'language': None, 'dtprofup': None,
+            'org': None, 'fid': a['fid'], 'intu.bid': None
+        })
+        if a['type'] == AccountType.Investment:
+            acct = InvestmentAccount()
+            acct.statement = InvestmentStatement()
+            acct.statement.positions = [
+                _decode_row(Position, row, POSITION_FIELDS)
+                for row in data['positions']
+            ]
+        else:
+            acct = Account()
+            acct.statement = Statement()
+            for name, typ in STATEMENT_FIELDS:
+                if name in data['statement']:
+                    setattr(
+                        acct.statement, name,
+                        _decode_value(data['statement'][name], typ)
+                    )
+            acct.statement.transactions = [
+                _decode_row(Transaction, row, TRANSACTION_FIELDS)
+                for row in data['transactions']
+            ]
+        acct.type = a['type']
+        acct.curdef = a['curdef']
+        acct.account_id = a['account_id']
+        acct.routing_number = a['routing_number']
+        acct.account_type = a['account_type']
+        acct.institution = None
+        if a['fid'] is not None:
+            acct.institution = Institution()
+            acct.institution.fid = a['fid']
+        if a['brokerid'] is not None:
+            acct.brokerid = a['brokerid']
+        ofx.account = acct
+        ofx.accounts = [acct]
+    except (KeyError, TypeError, ArithmeticError) as ex:
+        raise ValueError('Invalid encoded statement: %r' % ex)
+    return ofx
+
+
+def decode_statements(statements):
+    """
+    Decode the ``statements`` list of a ``POST /api/ofx/statements`` request
+    body into arguments for :py:meth:`~.OfxApiLocal.update_statements_ofx`.
+
+    :param statements: list of dicts with ``acct_id``, ``mtime`` (ISO8601 or
+      None), ``filename`` and ``ofx`` (encoded by :py:func:`~.encode_ofx`) keys
+    :type statements: list
+    :return: list of 4-tuples of (``acct_id``, ``ofx``, ``mtime``,
+      ``filename``)
+    :rtype: list
+    :raises: :py:exc:`ValueError` if a statement can not be decoded
+    """
+    res = []
+    for stmt in statements:
+        try:
+            mtime = stmt['mtime']
+            if mtime is not None:
+                mtime = datetime.fromisoformat(mtime)
+            res.append((
+                stmt['acct_id'], decode_ofx(stmt['ofx']), mtime,
+                stmt['filename']
+            ))
+        except (KeyError, TypeError) as ex:
+            raise ValueError('Invalid statement: %r' % ex)
+    return res
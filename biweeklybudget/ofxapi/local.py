@@ -40,12 +40,13 @@ from datetime import datetime
 from pytz import UTC
 
 from ofxparse import AccountType, OfxParser
-from biweeklybudget.db import db_session, upsert_record
+from biweeklybudget.db import db_session, bulk_upsert_records
 from biweeklybudget.models.ofx_transaction import OFXTransaction
 from biweeklybudget.models.ofx_statement import OFXStatement
 from biweeklybudget.models.account import Account
 from biweeklybudget.utils import dtnow
 from biweeklybudget.ofxapi.exceptions import DuplicateFileException
+from biweeklybudget.ofxapi.encoding import decode_statements
 
 logger = logging.getLogger(__name__)
 
@@ -100,6 +101,25 @@ class OfxApiLocal(object):
         logger.debug('Query found %d ofxgetter-enabled Accounts', len(result))
         return result
 
+    def get_statement_filenames(self):
+        """
+        Return the :py:attr:`~.OFXStatement.account_id` and
+        :py:attr:`~.OFXStatement.filename` of every
+        :py:class:`~biweeklybudget.models.ofx_statement.OFXStatement` already
+        in the database, so that callers can skip files that have already been
+        imported without parsing them.
+
+        :return: list of 2-item ``[account_id, filename]`` lists
+        :rtype: list
+        """
+        result = [
+            [acct_id, fname] for acct_id, fname in self._db.query(
+                OFXStatement.account_id, OFXStatement.filename
+            ).all()
+        ]
+        logger.debug('Query found %d existing OFXStatements', len(result))
+        return result
+
     def update_statement_ofx(self, acct_id, ofx, mtime=None, filename=None):
         """
         Update a single statement for the specified account, from an OFX file.
@@ -146,6 +166,41 @@ class OfxApiLocal(object):
         db_session.commit()
         return s.id, count_new, count_upd
 
+    def update_statements_ofx(self, statements, progress=None):
+        """
+        Update multiple statements, in order, from OFX files. Each statement is
+        handled by :py:meth:`~.update_statement_ofx` and committed separately;
+        if one fails, the session is rolled back and the remaining statements
+        are still processed.
+
+        :param statements: list of 4-tuples of (``acct_id``, ``ofx``,
+          ``mtime``, ``filename``), as for :py:meth:`~.update_statement_ofx`
+        :type statements: list
+        :param progress: optional callable, called with the int number of
+          statements processed so far and the int total after each statement
+        :type progress: callable
+        :returns: list with one item per statement; either the 3-tuple return
+          value of :py:meth:`~.update_statement_ofx` or the exception that it
+          raised (i.e. :py:exc:`~.DuplicateFileException`)
+        :rtype: list
+        """
+        results = []
+        for acct_id, ofx, mtime, filename in statements:
+            try:
+                results.append(self.update_statement_ofx(
+                    acct_id, ofx, mtime=mtime, filename=filename
+                ))
+            except Exception as ex:
+                logger.debug(
+                    'Error updating statement %s for account %s', filename,
+                    acct_id, exc_info=True
+                )
+                db_session.rollback()
+                results.append(ex)
+            if progress is not None:
+                progress(len(results), len(statements))
+        return results
+
     def _new_updated_counts(self):
         """
         Return integer counts of the number of :py:class:`~.OFXTransaction`
@@ -235,6 +290,7 @@ class OfxApiLocal(object):
         stmt.ledger_bal_as_of = \
             ofx.account.statement.balance_date.replace(tzinfo=UTC)
         db_session.add(stmt)
+        acct.set_latest_statement(stmt)
         acct.set_balance(
             overall_date=stmt.as_of,
             ledger=stmt.ledger_bal,
@@ -242,19 +298,24 @@ class OfxApiLocal(object):
             avail=stmt.avail_bal,
             avail_date=stmt.avail_bal_as_of
         )
+        records = []
         for txn in ofx.account.statement.transactions:
             try:
-                kwargs = OFXTransaction.params_from_ofxparser_transaction(
-                    txn, acct.id, stmt, cat_memo=acct.ofx_cat_memo_to_name
+                records.append(
+                    OFXTransaction.params_from_ofxparser_transaction(
+                        txn, acct.id, stmt, cat_memo=acct.ofx_cat_memo_to_name
+                    )
                 )
             except RuntimeError as ex:
                 logger.error(ex)
                 continue
-            upsert_record(
-                OFXTransaction,
-                ['account_id', 'fitid'],
-                **kwargs
-            )
+        count_new, count_upd = bulk_upsert_records(
+            OFXTransaction, ['account_id', 'fitid'], records
+        )
+        logger.debug(
+            'Upserted %d OFXTransactions: %d new, %d updated', len(records),
+            count_new, count_upd
+        )
         return stmt
 
     def _update_investment(self, acct, ofx, stmt):
@@ -287,9 +348,72 @@ class OfxApiLocal(object):
         if value != 0:
             stmt.ledger_bal = value
         db_session.add(stmt)
+        acct.set_latest_statement(stmt)
         acct.set_balance(
             overall_date=stmt.as_of,
             ledger=stmt.ledger_bal,
             ledger_date=stmt.ledger_bal_as_of
         )
         return stmt
+
+
+def statement_result(res):
+    """
+    Convert one item of the return value of
+    :py:meth:`~.OfxApiLocal.update_statements_ofx` to a JSON-serializable
+    dict, as returned for each statement by the ``POST /api/ofx/statements``
+    endpoint.
+
+    :param res: 3-tuple result or exception for one statement
+    :return: dict with ``success``, ``duplicate``, ``message`` and, where
+      applicable, ``statement_id``, ``count_new`` and ``count_updated`` keys
+    :rtype: dict
+    """
+    if isinstance(res, DuplicateFileException):
+        return {
+            'success': False,
+            'duplicate': True,
+            'message': 'File %s is a duplicate of stmt %d for account %d' % (
+                res.filename, res.stmt_id, res.acct_id
+            ),
+            'statement_id': res.stmt_id
+        }
+    if isinstance(res, Exception):
+        return {
+            'success': False,
+            'duplicate': False,
+            'message': 'Exception: %s' % str(res)
+        }
+    stmt_id, count_new, count_upd = res
+    return {
+        'success': True,
+        'duplicate': False,
+        'message': 'Successfully inserted Statement %d with %d new and %d '
+                   'updated Transactions' % (stmt_id, count_new, count_upd),
+        'statement_id': stmt_id,
+        'count_new': count_new,
+        'count_updated': count_upd
+    }
+
+
+def update_statements_job(db, params, progress):
+    """
+    Background job function (see :py:mod:`biweeklybudget.jobs`) to run
+    :py:meth:`~.OfxApiLocal.update_statements_ofx`.
+
+    :param db: active database session to use
+    :type db: sqlalchemy.orm.session.Session
+    :param params: job parameters; ``statements`` is the list of statements
+      in the format accepted by :py:func:`~.decode_statements`
+    :type params: dict
+    :param progress: progress callable
+    :type progress: callable
+    :return: dict with a ``results`` list of :py:func:`~.statement_result`
+      for each statement
+    :rtype: dict
+    """
+    statements = decode_statements(params['statements'])
+    results = OfxApiLocal(db).update_statements_ofx(
+        statements, progress=progress
+    )
+    return {'results': [statement_result(r) for r in results]}
@@ -37,11 +37,14 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 
 import logging
 import pickle
+import gzip
+import json
 from base64 import b64encode
 
 import requests
 
 from biweeklybudget.ofxapi.exceptions import DuplicateFileException
+from biweeklybudget.ofxapi.encoding import encode_ofx
 
 try:
     from urllib.parse import urljoin
@@ -50,6 +53,10 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+#: Maximum number of statements to upload in one request in
+#: :py:meth:`~.OfxApiRemote.update_statements_ofx`.
+BATCH_SIZE = 25
+
 
 class OfxApiRemote(object):
     """
@@ -85,16 +92,16 @@ class OfxApiRemote(object):
         self._cert_path = client_cert_path
         self._key_path = client_key_path
         self._ca_bundle = ca_bundle
-        self._requests_kwargs = {}
+        # one pooled Session, so that all requests reuse keep-alive connections
+        self._session = requests.Session()
         if ca_bundle is not None:
-            self._requests_kwargs['verify'] = ca_bundle
+            self._session.verify = ca_bundle
         if client_cert_path is not None:
             if client_key_path is not None:
-                self._requests_kwargs['cert'] = (
-                    client_cert_path, client_key_path
-                )
+                self._session.cert = (client_cert_path, client_key_path)
             else:
-                self._requests_kwargs['cert'] = client_cert_path
+                self._session.cert = client_cert_path
+        self._batch_supported = True
 
     def get_accounts(self):
         """
@@ -120,10 +127,34 @@ class OfxApiRemote(object):
         """
         url = urljoin(self._base_url, '/api/ofx/accounts')
         logger.debug('GET ofx accounts from: %s', url)
-        r = requests.get(url, **self._requests_kwargs)
+        r = self._session.get(url)
         logger.debug('API Response: HTTP %d; text: %s', r.status_code, r.text)
         return r.json()
 
+    def get_statement_filenames(self):
+        """
+        Return the account ID and filename of every
+        :py:class:`~biweeklybudget.models.ofx_statement.OFXStatement` already
+        in the database. If the server does not support this endpoint, return
+        an empty list; callers will then rely on
+        :py:exc:`~.DuplicateFileException` from
+        :py:meth:`~.update_statement_ofx` instead.
+
+        :return: list of 2-item ``[account_id, filename]`` lists
+        :rtype: list
+        """
+        url = urljoin(self._base_url, '/api/ofx/statement_filenames')
+        logger.debug('GET ofx statement filenames from: %s', url)
+        r = self._session.get(url)
+        logger.debug('API Response: HTTP %d', r.status_code)
+        if r.status_code == 404:
+            logger.warning(
+                'Server does not support %s; not skipping existing '
+                'statements', url
+            )
+            return []
+        return r.json()
+
     def update_statement_ofx(self, acct_id, ofx, mtime=None, filename=None):
         """
         Update a single statement for the specified account, from an OFX file.
@@ -145,6 +176,118 @@ class OfxApiRemote(object):
           type; :py:exc:`~.DuplicateFileException` if the file (according to the
           OFX signon date/time) has already been recorded.
         """
+        res = self.update_statements_ofx([(acct_id, ofx, mtime, filename)])[0]
+        if isinstance(res, Exception):
+            raise res
+        return res
+
+    def update_statements_ofx(self, statements, batch_size=BATCH_SIZE):
+        """
+        Update multiple statements, in order, from OFX files. Statements are
+        uploaded ``batch_size`` at a time to the ``/api/ofx/statements``
+        endpoint, encoded with
+        :py:func:`~biweeklybudget.ofxapi.encoding.encode_ofx` in a gzipped
+        JSON body. If the server does not support that endpoint, fall back to
+        uploading them one at a time to ``/api/ofx/statement``.
+
+        :param statements: list of 4-tuples of (``acct_id``, ``ofx``,
+          ``mtime``, ``filename``), as for :py:meth:`~.update_statement_ofx`
+        :type statements: list
+        :param batch_size: maximum number of statements per request
+        :type batch_size: int
+        :returns: list with one item per statement; either the 3-tuple return
+          value of :py:meth:`~.update_statement_ofx` or the exception for that
+          statement (i.e. :py:exc:`~.DuplicateFileException` or
+          :py:exc:`RuntimeError`)
+        :rtype: list
+        :raises: :py:exc:`RuntimeError` if the whole request fails
+        """
+        results = []
+        for idx in range(0, len(statements), batch_size):
+            batch = statements[idx:idx + batch_size]
+            if self._batch_supported:
+                res = self._post_batch(batch)
+                if res is not None:
+                    results.extend(res)
+                    continue
+            for acct_id, ofx, mtime, filename in batch:
+                try:
+                    results.append(self._post_statement_pickle(
+                        acct_id, ofx, mtime=mtime, filename=filename
+                    ))
+                except (DuplicateFileException, RuntimeError) as ex:
+                    results.append(ex)
+        return results
+
+    def _post_batch(self, statements):
+        """
+        POST one batch of statements to ``/api/ofx/statements``.
+
+        :param statements: list of 4-tuples of (``acct_id``, ``ofx``,
+          ``mtime``, ``filename``)
+        :type statements: list
+        :returns: list of results as for :py:meth:`~.update_statements_ofx`,
+          or None if the server does not support the batch endpoint
+        :rtype: list
+        """
+        payload = {'statements': [
+            {
+                'acct_id': acct_id,
+                'mtime': None if mtime is None else mtime.isoformat(),
+                'filename': filename,
+                'ofx': encode_ofx(ofx)
+            } for acct_id, ofx, mtime, filename in statements
+        ]}
+        body = gzip.compress(json.dumps(payload).encode('utf-8'))
+        url = urljoin(self._base_url, '/api/ofx/statements')
+        logger.debug('POST %d ofx statements (%d bytes) to: %s',
+                     len(statements), len(body), url)
+        r = self._session.post(url, data=body, headers={
+            'Content-Type': 'application/json',
+            'Content-Encoding': 'gzip'
+        })
+        logger.debug('API Response: HTTP %d; text: %s', r.status_code, r.text)
+        if r.status_code in [404, 405]:
+            logger.warning(
+                'Server does not support %s; uploading statements one at a '
+                'time', url
+            )
+            self._batch_supported = False
+            return None
+        try:
+            resp = r.json()
+        except Exception:
+            raise RuntimeError(
+                'API response could not be JSON deserialized: %s' % r.text
+            )
+        if r.status_code != 200:
+            raise RuntimeError('OFX API Error: %s' % resp.get('message'))
+        results = []
+        for (acct_id, _, _, filename), res in zip(
+            statements, resp['results']
+        ):
+            if res['success']:
+                results.append((
+                    res['statement_id'], res['count_new'],
+                    res['count_updated']
+                ))
+            elif res['duplicate']:
+                results.append(DuplicateFileException(
+                    acct_id, filename, res['statement_id']
+                ))
+            else:
+                results.append(
+                    RuntimeError('OFX API Error: %s' % res['message'])
+                )
+        return results
+
+    def _post_statement_pickle(self, acct_id, ofx, mtime=None, filename=None):
+        """
+        Upload a single statement to the legacy ``/api/ofx/statement``
+        endpoint, for servers that do not support ``/api/ofx/statements``.
+        Parameters, return value and exceptions are the same as for
+        :py:meth:`~.update_statement_ofx`.
+        """
         encodedofx = b64encode(pickle.dumps(ofx))
         encodedmtime = b64encode(pickle.dumps(mtime))
         if not isinstance(encodedofx, type('foo')):
@@ -158,7 +301,7 @@ class OfxApiRemote(object):
         }
         url = urljoin(self._base_url, '/api/ofx/statement')
         logger.debug('POST ofx statement to: %s; data: %s', url, postdata)
-        r = requests.post(url, json=postdata, **self._requests_kwargs)
+        r = self._session.post(url, json=postdata)
         logger.debug('API Response: HTTP %d; text: %s', r.status_code, r.text)
         try:
             resp = r.json()
@@ -39,14 +39,20 @@ from datetime import datetime
 import os
 import argparse
 import logging
+from contextlib import contextmanager
 from copy import deepcopy
 from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
 import importlib
 import json
+import queue
+import threading
+import time
 
 from ofxparse import OfxParser
 from biweeklybudget.vendored.ofxclient.account \
     import Account as OfxClientAccount
+from biweeklybudget.vendored.ofxclient.session import close_sessions
 
 from biweeklybudget.vault import Vault
 from biweeklybudget.cliutils import set_log_debug, set_log_info
@@ -121,6 +127,43 @@ class OfxGetter(object):
         logger.debug('Initialized %d accounts', len(self._accounts))
         self.now_str = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
 
+    def institution_key(self, account_name):
+        """
+        Return a hashable key identifying the institution that the specified
+        account is downloaded from, used to limit the number of concurrent
+        downloads from one institution in :py:meth:`~.get_all`. For
+        ofxclient accounts this is the institution OFX URL, org and FI ID; for
+        ScreenScraper accounts it is the scraper module and class name.
+
+        :param account_name: account name
+        :type account_name: str
+        :return: institution key
+        :rtype: tuple
+        """
+        data = self._account_data[account_name]['config']
+        if 'class_name' in data:
+            return data['module_name'], data['class_name']
+        inst = data['institution']
+        return inst['url'], inst['org'], inst['id']
+
+    @contextmanager
+    def _quiet_ofxclient(self):
+        """
+        Context manager to disable logging for ofxclient (which logs via the
+        root logger, and has bad logging) unless we're in debug mode.
+        """
+        if logger.getEffectiveLevel() == logging.DEBUG:
+            yield
+            return
+        logger.debug('Disabling logging for ofxclient, which has bad logging')
+        oldlvl = logging.getLogger().getEffectiveLevel()
+        logging.getLogger().setLevel(logging.WARNING)
+        try:
+            yield
+        finally:
+            logging.getLogger().setLevel(oldlvl)
+            logger.debug('Re-enabling ofxclient logging')
+
     def get_ofx(self, account_name, write_to_file=True, days=30):
         """
         Download OFX from the specified account. Return it as a string.
@@ -136,26 +179,148 @@ class OfxGetter(object):
         :rtype: str
         """
         fname = None
-        logger.debug('Downloading OFX for account: %s', account_name)
-        if 'class_name' in self._account_data[account_name]['config']:
-            ofxdata = self._get_ofx_scraper(account_name, days=days)
-        else:
-            acct = self._accounts[account_name]
-            if logger.getEffectiveLevel() != logging.DEBUG:
-                logger.debug(
-                    'Disabling logging for ofxclient, which has bad logging'
-                )
-                oldlvl = logging.getLogger().getEffectiveLevel()
-                logging.getLogger().setLevel(logging.WARNING)
-            ofxdata = acct.download(days=days).read()
-            if logger.getEffectiveLevel() != logging.DEBUG:
-                logging.getLogger().setLevel(oldlvl)
-                logger.debug('Re-enabling ofxclient logging')
+        with self._quiet_ofxclient():
+            ofxdata = self._download_ofx(account_name, days=days)
         if write_to_file:
             fname = self._write_ofx_file(account_name, ofxdata)
         self._ofx_to_db(account_name, fname, ofxdata)
         return ofxdata
 
+    def get_all(self, account_names=None, days=30, workers=1,
+                per_institution=1):
+        """
+        Download OFX for multiple accounts concurrently, write each to a file,
+        and put it to the DB.
+
+        Downloads are run in a pool of ``workers`` threads, with at most
+        ``per_institution`` downloads from any one institution (see
+        :py:meth:`~.institution_key`) at a time. All database updates are made
+        from the calling thread, one statement at a time, in the order that
+        the downloads finish. Exceptions from individual accounts are logged
+        and do not stop the other accounts.
+
+        :param account_names: names of the accounts to download; defaults to
+          all accounts
+        :type account_names: list
+        :param days: number of days of data to download
+        :type days: int
+        :param workers: number of download threads
+        :type workers: int
+        :param per_institution: maximum number of concurrent downloads from
+          one institution
+        :type per_institution: int
+        :return: dict of account name to dict with keys ``success`` (bool),
+          ``download`` (float seconds spent downloading and writing the file)
+          and ``db`` (float seconds spent putting the statement to the DB)
+        :rtype: dict
+        """
+        if account_names is None:
+            account_names = sorted(self._account_data.keys())
+        results = {}
+        # resolve institutions up front, so every account that reaches the
+        # worker threads produces exactly one item in ``downloaded``
+        keys = {}
+        for name in account_names:
+            try:
+                keys[name] = self.institution_key(name)
+            except Exception:
+                logger.error(
+                    'Unable to determine institution for account %s', name,
+                    exc_info=True
+                )
+                results[name] = {
+                    'success': False, 'download': 0.0, 'db': 0.0
+                }
+        pending = [name for name in account_names if name in keys]
+        num_pending = len(pending)
+        running = {}
+        cond = threading.Condition()
+        downloaded = queue.Queue()
+
+        def next_account():
+            # the first pending account whose institution is under its limit
+            with cond:
+                while pending:
+                    for name in pending:
+                        key = keys[name]
+                        if running.get(key, 0) < per_institution:
+                            pending.remove(name)
+                            running[key] = running.get(key, 0) + 1
+                            return name, key
+                    cond.wait()
+            return None, None
+
+        def worker():
+            while True:
+                name, key = next_account()
+                if name is None:
+                    return
+                start = time.monotonic()
+                fname = ofxdata = None
+                try:
+                    ofxdata = self._download_ofx(name, days=days)
+                    fname = self._write_ofx_file(name, ofxdata)
+                except Exception:
+                    logger.error(
+                        'Failed to download account %s', name, exc_info=True
+                    )
+                finally:
+                    with cond:
+                        running[key] -= 1
+                        cond.notify_all()
+                downloaded.put(
+                    (name, fname, ofxdata, time.monotonic() - start)
+                )
+
+        with self._quiet_ofxclient():
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for _ in range(min(workers, num_pending)):
+                    pool.submit(worker)
+                for _ in range(num_pending):
+                    name, fname, ofxdata, elapsed = downloaded.get()
+                    results[name] = {
+                        'success': False, 'download': elapsed, 'db': 0.0
+                    }
+                    if ofxdata is None:
+                        continue
+                    start = time.monotonic()
+                    try:
+                        self._ofx_to_db(name, fname, ofxdata)
+                        results[name]['success'] = True
+                    except Exception:
+                        logger.error(
+                            'Failed to update account %s in DB', name,
+                            exc_info=True
+                        )
+                    results[name]['db'] = time.monotonic() - start
+        # close the institutions' keep-alive connections
+        close_sessions()
+        for name in account_names:
+            logger.info(
+                'Account %s: %s; download %.3fs, DB update %.3fs', name,
+                'OK' if results[name]['success'] else 'FAILED',
+                results[name]['download'], results[name]['db']
+            )
+        return results
+
+    def _download_ofx(self, account_name, days=30):
+        """
+        Download OFX from the specified account, via either ofxclient or the
+        account's ScreenScraper class.
+
+        :param account_name: account name to download
+        :type account_name: str
+        :param days: number of days of data to download
+        :type days: int
+        :return: OFX string
+        :rtype: str
+        """
+        logger.debug('Downloading OFX for account: %s', account_name)
+        if 'class_name' in self._account_data[account_name]['config']:
+            return self._get_ofx_scraper(account_name, days=days)
+        acct = self._accounts[account_name]
+        return acct.download(days=days).read()
+
     def _ofx_to_db(self, account_name, fname, ofxdata):
         """
         Put OFX Data to the DB
@@ -267,6 +432,14 @@ def parse_args():
     p.add_argument('-d', '--days', dest='days', action='store', type=int,
                    default=30,
                    help='number of days of history to get; default 30')
+    p.add_argument('-j', '--jobs', dest='jobs', action='store', type=int,
+                   default=1,
+                   help='number of accounts to download concurrently when '
+                        'downloading all accounts; default 1')
+    p.add_argument('--per-institution', dest='per_institution',
+                   action='store', type=int, default=1,
+                   help='maximum number of concurrent downloads from any one '
+                        'institution; default 1')
     p.add_argument('ACCOUNT_NAME', type=str, action='store', default=None,
                    nargs='?',
                    help='Account name; omit to download all accounts')
@@ -333,17 +506,12 @@ def main():
         getter.get_ofx(args.ACCOUNT_NAME, days=args.days)
         raise SystemExit(0)
     # else all of them
-    total = 0
-    success = 0
-    for acctname in sorted(OfxGetter.accounts(client).keys()):
-        try:
-            total += 1
-            getter.get_ofx(acctname, days=args.days)
-            success += 1
-        except Exception:
-            logger.error(
-                'Failed to download account %s', acctname, exc_info=True
-            )
+    results = getter.get_all(
+        days=args.days, workers=max(1, args.jobs),
+        per_institution=max(1, args.per_institution)
+    )
+    total = len(results)
+    success = len([x for x in results.values() if x['success']])
     if success != total:
         logger.warning('Downloaded %d of %d accounts', success, total)
         raise SystemExit(1)
@@ -0,0 +1,141 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+from collections.abc import Mapping
+from datetime import date
+
+#: Sort date used for entries that do not have a date (i.e. "per period"
+#: ScheduledTransactions), so that they sort before all other entries.
+NO_DATE_SORT = date.min
+
+
+class PayPeriodEntry(Mapping):
+    """
+    Compact, read-only representation of one :py:class:`~.Transaction` or one
+    occurrence of a :py:class:`~.ScheduledTransaction` within a
+    :py:class:`~.BiweeklyPayPeriod`; see
+    :py:meth:`~.BiweeklyPayPeriod._trans_dict` for the fields.
+
+    Fields are stored in ``__slots__`` instead of a per-instance dict, and the
+    sort key is calculated once when the entry is created. Fields can be read
+    as attributes (``entry.amount``) or, for compatibility with code and
+    templates that used the previous per-entry dicts, by key
+    (``entry['amount']``); entries compare equal to the equivalent dict. Use
+    :py:attr:`~.as_dict` to get an actual (mutable) dict; this is also what
+    :py:class:`~.MagicJSONEncoder` uses to serialize entries.
+    """
+
+    __slots__ = (
+        'type', 'id', 'date', 'sched_type', 'sched_trans_id', 'description',
+        'amount', 'budgeted_amount', 'account_id', 'account_name',
+        'reconcile_id', 'planned_budget_id', 'planned_budget_name', 'budgets',
+        'sort_key'
+    )
+
+    #: keys of entries for ScheduledTransactions
+    _sched_trans_keys = (
+        'type', 'id', 'date', 'sched_type', 'sched_trans_id', 'description',
+        'amount', 'budgeted_amount', 'account_id', 'account_name',
+        'reconcile_id', 'budgets'
+    )
+
+    #: keys of entries for Transactions
+    _trans_keys = _sched_trans_keys + (
+        'planned_budget_id', 'planned_budget_name'
+    )
+
+    def __init__(self, type, id, date, sched_type, sched_trans_id,
+                 description, amount, budgeted_amount, account_id,
+                 account_name, reconcile_id, budgets, planned_budget_id=None,
+                 planned_budget_name=None):
+        setter = super(PayPeriodEntry, self).__setattr__
+        setter('type', type)
+        setter('id', id)
+        setter('date', date)
+        setter('sched_type', sched_type)
+        setter('sched_trans_id', sched_trans_id)
+        setter('description', description)
+        setter('amount', amount)
+        setter('budgeted_amount', budgeted_amount)
+        setter('account_id', account_id)
+        setter('account_name', account_name)
+        setter('reconcile_id', reconcile_id)
+        setter('budgets', budgets)
+        setter('planned_budget_id', planned_budget_id)
+        setter('planned_budget_name', planned_budget_name)
+        setter('sort_key', (
+            NO_DATE_SORT if date is None else date, amount
+        ))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('PayPeriodEntry is read-only')
+
+    def __delattr__(self, name):
+        raise AttributeError('PayPeriodEntry is read-only')
+
+    def _keys(self):
+        if self.type == 'Transaction':
+            return self._trans_keys
+        return self._sched_trans_keys
+
+    def __getitem__(self, key):
+        if key not in self._keys():
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def __repr__(self):
+        return '<PayPeriodEntry(%s %s, date=%s, amount=%s)>' % (
+            self.type, self.id, self.date, self.amount
+        )
+
+    @property
+    def as_dict(self):
+        """
+        Return a new dict of this entry's fields, in the format described in
+        :py:meth:`~.BiweeklyPayPeriod._trans_dict`. The dict is only built
+        when this is accessed.
+
+        :return: dict describing this entry
+        :rtype: dict
+        """
+        return {k: getattr(self, k) for k in self._keys()}
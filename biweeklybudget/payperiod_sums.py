@@ -0,0 +1,262 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import argparse
+import logging
+from datetime import timedelta
+
+from sqlalchemy import func
+
+from biweeklybudget.biweeklypayperiod import (
+    BiweeklyPayPeriod, period_start_for_date, PERIOD_INTERVAL_DAYS
+)
+from biweeklybudget.cliutils import set_log_debug, set_log_info
+from biweeklybudget.models import (
+    Budget, PayPeriodBudgetSum, ScheduledTransaction, Transaction
+)
+from biweeklybudget.utils import dtnow
+
+logger = logging.getLogger(__name__)
+
+#: number of pay periods to load and store per batch
+BATCH_SIZE = 26
+
+
+class PayPeriodSumsManager(object):
+    """
+    Class to rebuild and check the materialized
+    :py:class:`~.PayPeriodBudgetSum` table. Sums are recalculated
+    automatically when changes are made through the ORM (see
+    :py:func:`~.handle_pay_period_sums_update`), but changes made with raw SQL
+    bypass that and require a rebuild. Pay periods without stored sums are
+    calculated on every read until a change or a rebuild stores them.
+    """
+
+    def __init__(self, db_session):
+        """
+        Initialize the manager.
+
+        :param db_session: active database session to use
+        :type db_session: sqlalchemy.orm.session.Session
+        """
+        self._db = db_session
+
+    def period_start_dates(self, periods_ahead=BATCH_SIZE):
+        """
+        Return a list of the start dates of all pay periods from the one
+        containing the earliest Transaction through ``periods_ahead`` periods
+        after the current one, or the one containing the latest Transaction or
+        date-type ScheduledTransaction, whichever is later.
+
+        :param periods_ahead: number of periods after the current one
+        :type periods_ahead: int
+        :return: list of pay period start dates
+        :rtype: list
+        """
+        today = dtnow().date()
+        min_date, max_date = self._db.query(
+            func.min(Transaction.date), func.max(Transaction.date)
+        ).one()
+        max_st_date = self._db.query(
+            func.max(ScheduledTransaction.date)
+        ).scalar()
+        start = period_start_for_date(min(
+            x for x in [min_date, today] if x is not None
+        ))
+        end = max(
+            x for x in [
+                max_date, max_st_date,
+                today + timedelta(days=PERIOD_INTERVAL_DAYS * periods_ahead)
+            ] if x is not None
+        )
+        res = []
+        while start <= end:
+            res.append(start)
+            start += timedelta(days=PERIOD_INTERVAL_DAYS)
+        return res
+
+    def _batches(self, start_dates):
+        """
+        Yield lists of up to :py:const:`~.BATCH_SIZE` new (not interned)
+        :py:class:`~.BiweeklyPayPeriod` instances for ``start_dates``, with
+        their data already loaded via :py:meth:`~.BiweeklyPayPeriod.prefetch_data`.
+
+        :param start_dates: list of pay period start dates
+        :type start_dates: list
+        :return: generator of lists of BiweeklyPayPeriod
+        """
+        for i in range(0, len(start_dates), BATCH_SIZE):
+            periods = [
+                BiweeklyPayPeriod(d, self._db)
+                for d in start_dates[i:i + BATCH_SIZE]
+            ]
+            BiweeklyPayPeriod.prefetch_data(periods, self._db)
+            yield periods
+
+    def rebuild(self, periods_ahead=BATCH_SIZE):
+        """
+        Delete all PayPeriodBudgetSum rows and calculate and store them for
+        every period returned by :py:meth:`~.period_start_dates`.
+
+        :param periods_ahead: number of periods after the current one
+        :type periods_ahead: int
+        :return: number of pay periods stored
+        :rtype: int
+        """
+        start_dates = self.period_start_dates(periods_ahead=periods_ahead)
+        logger.info(
+            'Rebuilding pay period sums for %d periods from %s to %s',
+            len(start_dates), start_dates[0], start_dates[-1]
+        )
+        PayPeriodBudgetSum.invalidate(self._db)
+        self._db.commit()
+        for i in range(0, len(start_dates), BATCH_SIZE):
+            batch = start_dates[i:i + BATCH_SIZE]
+            BiweeklyPayPeriod.store_budget_sums(set(batch), self._db)
+            self._db.commit()
+            logger.debug('Stored sums through %s', batch[-1])
+        return len(start_dates)
+
+    def check(self):
+        """
+        Compare every stored PayPeriodBudgetSum row with the sums calculated
+        from the current transactions, and return a list of string
+        descriptions of all differences found.
+
+        :return: list of differences between stored and calculated sums
+        :rtype: list
+        """
+        rows = {}
+        for r in self._db.query(PayPeriodBudgetSum).all():
+            rows.setdefault(r.start_date, []).append(r)
+        logger.info('Checking stored sums for %d pay periods', len(rows))
+        budgets = self._db.query(Budget).all()
+        problems = []
+        for periods in self._batches(sorted(rows.keys())):
+            for p in periods:
+                problems.extend(self._compare(
+                    p, p._budget_sums_from_rows(rows[p.start_date], budgets)
+                ))
+        return problems
+
+    def _compare(self, period, stored):
+        """
+        Compare the stored budget sums for ``period`` with the calculated
+        ones.
+
+        :param period: the pay period to compare
+        :type period: BiweeklyPayPeriod
+        :param stored: budget sums built from stored rows
+        :type stored: dict
+        :return: list of differences
+        :rtype: list
+        """
+        res = []
+        actual = period.budget_sums
+        for budg_id in sorted(set(actual.keys()) | set(stored.keys())):
+            if budg_id not in stored:
+                res.append('%s budget %d: missing from stored sums' % (
+                    period.start_date, budg_id
+                ))
+                continue
+            if budg_id not in actual:
+                res.append('%s budget %d: stored but not calculated' % (
+                    period.start_date, budg_id
+                ))
+                continue
+            for k in ['allocated', 'spent', 'trans_total']:
+                if stored[budg_id][k] != actual[budg_id][k]:
+                    res.append('%s budget %d: stored %s %s != calculated %s' % (
+                        period.start_date, budg_id, k, stored[budg_id][k],
+                        actual[budg_id][k]
+                    ))
+        return res
+
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description='Rebuild or check the materialized pay period budget sums'
+    )
+    p.add_argument('-v', '--verbose', dest='verbose', action='count', default=0,
+                   help='verbose output. specify twice for debug-level output.')
+    p.add_argument('-p', '--periods-ahead', dest='periods_ahead', type=int,
+                   action='store', default=BATCH_SIZE,
+                   help='when rebuilding, number of pay periods after the '
+                        'current one to store sums for (default: %d)'
+                        '' % BATCH_SIZE)
+    p.add_argument('ACTION', choices=['rebuild', 'check'],
+                   help='"rebuild" to delete and recalculate all stored sums, '
+                        '"check" to compare stored sums with calculated ones')
+    args = p.parse_args()
+    return args
+
+
+def main():
+    global logger
+    logging.basicConfig(
+        level=logging.WARNING,
+        format="[%(asctime)s %(levelname)s] %(message)s"
+    )
+    logger = logging.getLogger()
+
+    args = parse_args()
+
+    # set logging level
+    if args.verbose > 1:
+        set_log_debug(logger)
+    elif args.verbose == 1:
+        set_log_info(logger)
+
+    from biweeklybudget.db import init_db, db_session
+    init_db()
+    mgr = PayPeriodSumsManager(db_session)
+    if args.ACTION == 'rebuild':
+        count = mgr.rebuild(periods_ahead=args.periods_ahead)
+        print('Stored budget sums for %d pay periods.' % count)
+        return
+    problems = mgr.check()
+    for p in problems:
+        print(p)
+    if len(problems) > 0:
+        print('Found %d differences; run "payperiodsums rebuild" to '
+              'fix.' % len(problems))
+        raise SystemExit(1)
+    print('All stored pay period budget sums are consistent.')
+
+
+if __name__ == "__main__":
+    main()
@@ -35,13 +35,17 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 ################################################################################
 """
 
+import json
 import logging
-from datetime import datetime, timedelta, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, time
+from time import monotonic
 from decimal import Decimal, ROUND_HALF_DOWN
 from typing import Optional, List, Dict
 
 from pytz import UTC
 
+from biweeklybudget import settings
 from biweeklybudget.db import db_session, upsert_record
 from biweeklybudget.models.ofx_transaction import OFXTransaction
 from biweeklybudget.models.ofx_statement import OFXStatement
@@ -50,19 +54,29 @@ from biweeklybudget.models.plaid_items import PlaidItem
 from biweeklybudget.models.plaid_accounts import PlaidAccount
 from biweeklybudget.utils import plaid_client, dtnow
 
+from plaid import ApiException
 from plaid.models import (
-    ItemGetRequest, TransactionsGetRequest, TransactionsGetRequestOptions
+    ItemGetRequest, TransactionsSyncRequest, TransactionsSyncRequestOptions
 )
 
 logger = logging.getLogger(__name__)
 
+#: Number of transactions to request per ``/transactions/sync`` page (the
+#: maximum that Plaid allows).
+SYNC_PAGE_SIZE = 500
+
+#: Maximum number of times to restart a ``/transactions/sync`` pagination
+#: that fails because the Item's transactions changed during pagination.
+MAX_SYNC_RESTARTS = 3
+
 
 class PlaidUpdateResult:
     """Describes the result of updating a single account via Plaid."""
 
     def __init__(
         self, item: PlaidItem, success: bool, updated: int, added: int,
-        exc: Optional[Exception], stmt_ids: Optional[List[int]]
+        exc: Optional[Exception], stmt_ids: Optional[List[int]],
+        removed: int = 0, fetch_time: float = 0.0, db_time: float = 0.0
     ):
         """
         Store the result of an update.
@@ -73,6 +87,9 @@ class PlaidUpdateResult:
         :param added: count of added transactions
         :param exc: exception encountered, if any
         :param stmt_ids: list of added Statement IDs
+        :param removed: count of removed transactions
+        :param fetch_time: seconds spent retrieving the item's data from Plaid
+        :param db_time: seconds spent writing the item's data to the database
         """
         self.item = item
         self.success = success
@@ -80,6 +97,9 @@ class PlaidUpdateResult:
         self.added = added
         self.exc = exc
         self.stmt_ids = stmt_ids
+        self.removed = removed
+        self.fetch_time = fetch_time
+        self.db_time = db_time
 
     @property
     def as_dict(self):
@@ -89,7 +109,10 @@ class PlaidUpdateResult:
             'exception': str(self.exc),
             'statement_ids': self.stmt_ids,
             'added': self.added,
-            'updated': self.updated
+            'updated': self.updated,
+            'removed': self.removed,
+            'fetch_time': self.fetch_time,
+            'db_time': self.db_time
         }
 
 
@@ -111,60 +134,131 @@ class PlaidUpdater:
             PlaidItem.institution_name
         ).all()
 
-    def update(self, items=None, days=30):
+    def update(self, items=None, days=30, workers=None, progress=None):
         """
         Update account balances and transactions from Plaid, for either all
         Plaid Items that are available or a specified list of Item IDs.
 
+        Data is retrieved from Plaid for up to ``workers`` Items at a time in a
+        pool of threads. All database updates are made from the calling thread,
+        one Item at a time, in the order that the Items' data is retrieved, so
+        the total time is close to that of the slowest single Item.
+
         :param items: a list of :py:class:`~.PlaidItem` objects to update
         :type items: list or None
         :param days: number of days of transactions to get from Plaid
         :type days: int
-        :return: list of :py:class:`~.PlaidUpdateResult` instances
+        :param workers: number of threads to retrieve data from Plaid with;
+          defaults to :py:attr:`~biweeklybudget.settings.PLAID_UPDATE_WORKERS`
+        :type workers: int
+        :param progress: optional callable, called with the int number of
+          Items updated so far and the int total after each Item is written
+        :type progress: callable
+        :return: list of :py:class:`~.PlaidUpdateResult` instances, in the same
+          order as ``items``
         :rtype: list
         """
         if items is None:
             items = self.available_items()
+        if workers is None:
+            workers = settings.PLAID_UPDATE_WORKERS
         logger.debug(
-            'Running Plaid update for %d items: %s',
-            len(items), items
+            'Running Plaid update for %d items with %d workers: %s',
+            len(items), workers, items
         )
-        result = []
-        for item in items:
-            result.append(self._do_item(item, days=days))
-        return result
-
-    def _do_item(self, item, days):
+        if not items:
+            return []
+        results: Dict[str, PlaidUpdateResult] = {}
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(workers, len(items)))
+        ) as pool:
+            futures = {}
+            for item in items:
+                logger.info('Plaid update for %s', item)
+                # worker threads must not touch the (thread-local) DB session,
+                # so read everything they need from the item here
+                futures[pool.submit(
+                    self._fetch_item, repr(item), item.access_token,
+                    item.sync_cursor, days
+                )] = item
+            for f in as_completed(futures):
+                item = futures[f]
+                results[item.item_id] = self._write_item(item, *f.result())
+                if progress is not None:
+                    progress(len(results), len(items))
+        return [results[item.item_id] for item in items]
+
+    def _fetch_item(
+        self, name: str, access_token: str, cursor: Optional[str], days: int
+    ):
         """
-        Request transactions from Plaid for one Item. Update balances and
-        transactions for each Account in that item.
-
-        :param item: the item to update
-        :type item: PlaidItem
-        :param days: number of days of transactions to get from Plaid
-        :type days: int
-        :rtype: PlaidUpdateResult
+        Request new, changed and removed transactions from Plaid for one Item,
+        since its stored :py:attr:`~.PlaidItem.sync_cursor`. This is run in a
+        worker thread, and must not use the database.
+
+        :param name: description of the Item, for logging
+        :param access_token: Plaid access token for the Item
+        :param cursor: the Item's stored sync cursor
+        :param days: number of days of transactions to get from Plaid, the
+          first time that the item is synced
+        :return: 3-tuple of the retrieved data (the current time followed by
+          the return value of :py:meth:`~._sync_transactions`) or None, the
+          exception raised or None, and the time taken in seconds
+        :rtype: tuple
         """
-        logger.info('Plaid update for %s', item)
+        start = monotonic()
         try:
             end_date: datetime = dtnow()
-            start_date: datetime = end_date - timedelta(days=days)
             iteminfo = self.client.item_get(
-                ItemGetRequest(access_token=item.access_token)
+                ItemGetRequest(access_token=access_token)
             )
             logger.info(
-                'Item %s transactions status: %s', item,
+                'Item %s transactions status: %s', name,
                 iteminfo.get('status', {}).get('transactions')
             )
             logger.debug(
-                'Downloading Plaid transactions for item: %s from %s to %s',
-                item, start_date, end_date
+                'Syncing Plaid transactions for item: %s from cursor %s',
+                name, cursor
+            )
+            data = (end_date, *self._sync_transactions(
+                access_token, cursor, days
+            ))
+            return data, None, monotonic() - start
+        except Exception as ex:
+            logger.error(
+                'Exception encountered when retrieving item from Plaid: %s',
+                name, exc_info=True
             )
+            return None, ex, monotonic() - start
+
+    def _write_item(
+        self, item: PlaidItem, data: Optional[tuple],
+        exc: Optional[Exception], fetch_time: float
+    ):
+        """
+        Update balances and apply the transaction changes retrieved by
+        :py:meth:`~._fetch_item` for each Account in one Item, then store the
+        Item's new cursor.
+
+        :param item: the item to update
+        :type item: PlaidItem
+        :param data: data retrieved by :py:meth:`~._fetch_item`, or None if
+          retrieval failed
+        :param exc: exception raised during retrieval, if any
+        :param fetch_time: seconds taken to retrieve the data from Plaid
+        :rtype: PlaidUpdateResult
+        """
+        if exc is not None:
+            return PlaidUpdateResult(
+                item, False, 0, 0, exc, None, fetch_time=fetch_time
+            )
+        start = monotonic()
+        try:
+            end_date: datetime
             txns: List[dict]
+            rm_txns: List[dict]
             accts: Dict
-            txns, accts = self._get_transactions(
-                item.access_token, start_date, end_date
-            )
+            end_date, txns, rm_txns, accts, cursor = data
             accounts: Dict[str, PlaidAccount] = {}
             pa: PlaidAccount
             for pa in db_session.query(PlaidAccount).filter(
@@ -174,11 +268,17 @@ class PlaidUpdater:
             stmt_ids: List[int] = []
             added: int = 0
             updated: int = 0
+            removed: int = 0
             txns_per_acct: Dict[str, list] = {}
             for t in txns:
                 if t['account_id'] not in txns_per_acct:
                     txns_per_acct[t['account_id']] = []
                 txns_per_acct[t['account_id']].append(t)
+            rm_per_acct: Dict[str, list] = {}
+            for t in rm_txns:
+                rm_per_acct.setdefault(t['account_id'], []).append(
+                    t['transaction_id']
+                )
             for plaid_account_id in accts.keys():
                 plaid_acct: PlaidAccount = accounts[plaid_account_id]
                 acct: Optional[Account] = plaid_acct.account
@@ -188,6 +288,10 @@ class PlaidUpdater:
                         'not mapped to an Account.', item, plaid_acct
                     )
                     continue
+                if plaid_account_id in rm_per_acct:
+                    removed += self._remove_transactions(
+                        acct, rm_per_acct[plaid_account_id]
+                    )
                 sid, a, u = self._stmt_for_acct(
                     acct, accts[plaid_account_id],
                     txns_per_acct.get(plaid_account_id, []), end_date
@@ -195,55 +299,135 @@ class PlaidUpdater:
                 added += a
                 updated += u
                 stmt_ids.append(sid)
+            item.sync_cursor = cursor
             item.last_updated = dtnow()
             db_session.add(item)
             db_session.commit()
             return PlaidUpdateResult(
-                item, True, updated, added, None, stmt_ids
+                item, True, updated, added, None, stmt_ids, removed=removed,
+                fetch_time=fetch_time, db_time=monotonic() - start
             )
         except Exception as ex:
             logger.error(
                 'Exception encountered when updating item: %s (%s)',
                 item.institution_name, item.item_id, exc_info=True
             )
+            db_session.rollback()
             return PlaidUpdateResult(
-                item, False, 0, 0, ex, None
+                item, False, 0, 0, ex, None, fetch_time=fetch_time,
+                db_time=monotonic() - start
             )
 
-    def _get_transactions(
-            self, access_token: str, start_dt: datetime, end_dt: datetime
+    def _sync_transactions(
+        self, access_token: str, cursor: Optional[str], days: int
     ):
-        kwargs = {
-            'access_token': access_token,
-            'start_date': start_dt.date(),
-            'end_date': end_dt.date(),
-            'options': TransactionsGetRequestOptions()
-        }
-        txns: List[dict] = []
-        accts: dict = {}
-        req = TransactionsGetRequest(**kwargs)
-        logger.debug('Issuing transactions get request')
-        resp = self.client.transactions_get(req)
-        txns = resp['transactions']
-        for acct in resp['accounts']:
-            accts[acct['account_id']] = acct
-        logger.debug(
-            'Got %d transactions; expecting %d total',
-            len(txns), resp['total_transactions']
-        )
-        while len(txns) < resp['total_transactions']:
-            kwargs['options'] = TransactionsGetRequestOptions(
-                offset=len(txns)
-            )
-            req = TransactionsGetRequest(**kwargs)
+        """
+        Page through Plaid ``/transactions/sync`` from ``cursor`` until there
+        are no more changes. If the item's transactions change during
+        pagination, restart from ``cursor`` (as Plaid requires), up to
+        :py:data:`~.MAX_SYNC_RESTARTS` times.
+
+        :param access_token: Plaid access token for the item
+        :param cursor: cursor from the last sync, or None to request the
+          item's full history (limited to ``days`` days)
+        :param days: number of days of history to request on the first sync
+        :return: 4-tuple of list of added and modified transactions, list of
+          removed transactions, dict of Plaid account ID to account
+          information, and the new cursor
+        :rtype: tuple
+        """
+        restarts = 0
+        while True:
+            changed: List[dict] = []
+            removed: List[dict] = []
+            accts: dict = {}
+            next_cursor: Optional[str] = cursor
+            try:
+                while True:
+                    kwargs = {
+                        'access_token': access_token, 'count': SYNC_PAGE_SIZE
+                    }
+                    if next_cursor:
+                        kwargs['cursor'] = next_cursor
+                    else:
+                        kwargs['options'] = TransactionsSyncRequestOptions(
+                            days_requested=days
+                        )
+                    logger.debug(
+                        'Issuing transactions sync request with cursor=%s',
+                        next_cursor
+                    )
+                    resp = self.client.transactions_sync(
+                        TransactionsSyncRequest(**kwargs)
+                    )
+                    changed.extend(resp['added'])
+                    changed.extend(resp['modified'])
+                    removed.extend(resp['removed'])
+                    for acct in resp['accounts']:
+                        accts[acct['account_id']] = acct
+                    next_cursor = resp['next_cursor']
+                    if not resp['has_more']:
+                        break
+            except ApiException as ex:
+                if (
+                    self._api_error_code(ex) !=
+                    'TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION' or
+                    restarts >= MAX_SYNC_RESTARTS
+                ):
+                    raise
+                restarts += 1
+                logger.warning(
+                    'Transactions changed during sync pagination; restarting '
+                    'from cursor %s', cursor
+                )
+                continue
             logger.debug(
-                'Issuing transactions get request with offset=%d', len(txns)
+                'Got %d added or modified and %d removed transactions',
+                len(changed), len(removed)
             )
-            resp = self.client.transactions_get(req)
-            txns.extend(resp['transactions'])
-            for acct in resp['accounts']:
-                accts[acct['account_id']] = acct
-        return txns, accts
+            return changed, removed, accts, next_cursor
+
+    @staticmethod
+    def _api_error_code(ex: ApiException) -> Optional[str]:
+        """
+        Return the Plaid ``error_code`` from an ApiException's response body,
+        or None if it cannot be determined.
+        """
+        try:
+            return json.loads(ex.body)['error_code']
+        except Exception:
+            return None
+
+    def _remove_transactions(self, account: Account, txn_ids: List[str]):
+        """
+        Delete the OFXTransactions for ``account`` that Plaid reports as
+        removed. Transactions stored under their payment reference number
+        rather than the Plaid transaction ID can't be matched and are left in
+        place, as are transactions that have already been reconciled.
+
+        :param account: the account the transactions were removed from
+        :param txn_ids: list of removed Plaid transaction IDs
+        :return: number of OFXTransactions deleted
+        :rtype: int
+        """
+        count = 0
+        for t in db_session.query(OFXTransaction).filter(
+            OFXTransaction.account_id == account.id,
+            OFXTransaction.fitid.in_(txn_ids)
+        ).all():
+            if t.reconcile is not None:
+                logger.warning(
+                    'Not removing reconciled OFXTransaction %s for '
+                    'Account %s', t.fitid, account.id
+                )
+                continue
+            db_session.delete(t)
+            count += 1
+        logger.info(
+            'Account "%s" - removed %d of %d OFXTransaction(s) deleted in '
+            'Plaid', account.name, count, len(txn_ids)
+        )
+        return count
 
     def _stmt_for_acct(
         self, account: Account, plaid_acct_info: dict, plaid_txns: List[dict],
@@ -333,6 +517,7 @@ class PlaidUpdater:
             stmt.avail_bal_as_of = end_dt
         stmt.currency = plaid_acct_info['balances']['iso_currency_code']
         db_session.add(stmt)
+        account.set_latest_statement(stmt)
         account.set_balance(
             overall_date=stmt.as_of,
             ledger=stmt.ledger_bal,
@@ -378,8 +563,35 @@ class PlaidUpdater:
         stmt.ledger_bal_as_of = end_dt
         stmt.currency = plaid_acct_info['balances']['iso_currency_code']
         db_session.add(stmt)
+        account.set_latest_statement(stmt)
         account.set_balance(
             overall_date=stmt.as_of,
             ledger=stmt.ledger_bal,
             ledger_date=stmt.ledger_bal_as_of
         )
+
+
+def plaid_update_job(db, params, progress):
+    """
+    Background job function (see :py:mod:`biweeklybudget.jobs`) to run
+    :py:meth:`~.PlaidUpdater.update`.
+
+    :param db: active database session to use
+    :type db: sqlalchemy.orm.session.Session
+    :param params: job parameters; ``item_ids`` is a list of
+      :py:class:`~.PlaidItem` IDs to update, or the string ``ALL``, and
+      ``num_days`` is the number of days of transactions to retrieve
+    :type params: dict
+    :param progress: progress callable
+    :type progress: callable
+    :return: list of :py:attr:`~.PlaidUpdateResult.as_dict` for each Item
+    :rtype: list
+    """
+    if params['item_ids'] == 'ALL':
+        items = PlaidUpdater.available_items()
+    else:
+        items = [db.query(PlaidItem).get(x) for x in params['item_ids']]
+    results = PlaidUpdater().update(
+        items=items, days=params['num_days'], progress=progress
+    )
+    return [r.as_dict for r in results]
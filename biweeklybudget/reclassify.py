@@ -0,0 +1,228 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import logging
+from collections import defaultdict
+
+from sqlalchemy import func
+
+from biweeklybudget.jobs import runner, ACTIVE_STATES
+from biweeklybudget.models.account import Account
+from biweeklybudget.models.ofx_transaction import (
+    OFXTransaction, IS_FIELD_REGEXES, MANUAL_INTEREST_NAME,
+    matcher_for_account
+)
+
+logger = logging.getLogger(__name__)
+
+#: Number of OFXTransactions classified and updated per chunk (and commit)
+CHUNK_SIZE = 1000
+
+
+def reclassify_account(db, acct_id, progress=None, chunk_size=CHUNK_SIZE):
+    """
+    Recalculate the ``is_*`` fields of every :py:class:`~.OFXTransaction` of
+    an Account from the Account's current ``re_*`` regexes, like
+    :py:meth:`~.OFXTransaction.update_is_fields` but without loading the
+    transactions as ORM objects. Transactions are read ``chunk_size`` at a
+    time (by FITID); each chunk is classified with the Account's
+    :py:class:`~.IsFieldMatcher`, and the transactions whose fields changed
+    are updated with one bulk UPDATE per distinct combination of field values,
+    then committed.
+
+    :param db: active database session to use
+    :type db: sqlalchemy.orm.session.Session
+    :param acct_id: ID of the Account to reclassify transactions for
+    :type acct_id: int
+    :param progress: optional callable, called with the int number of
+      transactions processed so far and the int total after each chunk
+    :type progress: callable
+    :param chunk_size: number of transactions to read and update at a time
+    :type chunk_size: int
+    :return: number of transactions updated
+    :rtype: int
+    """
+    acct = db.query(Account).get(acct_id)
+    matcher = matcher_for_account(acct)
+    total = db.query(func.count(OFXTransaction.fitid)).filter(
+        OFXTransaction.account_id.__eq__(acct_id)
+    ).scalar()
+    logger.info(
+        'Reclassifying %d OFXTransactions for Account %d', total, acct_id
+    )
+    fields = [f for _, f in IS_FIELD_REGEXES]
+    done = 0
+    updated = 0
+    last_fitid = None
+    while True:
+        q = db.query(
+            OFXTransaction.fitid, OFXTransaction.name,
+            *[getattr(OFXTransaction, f) for f in fields]
+        ).filter(OFXTransaction.account_id.__eq__(acct_id))
+        if last_fitid is not None:
+            q = q.filter(OFXTransaction.fitid.__gt__(last_fitid))
+        rows = q.order_by(OFXTransaction.fitid).limit(chunk_size).all()
+        if len(rows) == 0:
+            break
+        changes = defaultdict(list)
+        for row in rows:
+            matched = matcher.match(row.name)
+            values = {f: f in matched for f in fields}
+            if row.name == MANUAL_INTEREST_NAME:
+                del values['is_interest_charge']
+            if any(getattr(row, f) != v for f, v in values.items()):
+                changes[tuple(sorted(values.items()))].append(row.fitid)
+        for values, fitids in changes.items():
+            db.query(OFXTransaction).filter(
+                OFXTransaction.account_id.__eq__(acct_id),
+                OFXTransaction.fitid.in_(fitids)
+            ).update(dict(values), synchronize_session=False)
+            updated += len(fitids)
+        db.commit()
+        done += len(rows)
+        last_fitid = rows[-1].fitid
+        logger.debug(
+            'Reclassified %d of %d OFXTransactions for Account %d',
+            done, total, acct_id
+        )
+        if progress is not None:
+            progress(done, total)
+    logger.info(
+        'Done reclassifying Account %d; updated %d of %d OFXTransactions',
+        acct_id, updated, total
+    )
+    return updated
+
+
+def reclassify_job(db, params, progress):
+    """
+    Background job function (see :py:mod:`biweeklybudget.jobs`) to run
+    :py:func:`~.reclassify_account`.
+
+    :param db: active database session to use
+    :type db: sqlalchemy.orm.session.Session
+    :param params: job parameters; ``account_id`` is the Account ID
+    :type params: dict
+    :param progress: progress callable
+    :type progress: callable
+    :return: dict with ``updated`` count of transactions
+    :rtype: dict
+    """
+    return {'updated': reclassify_account(db, params['account_id'], progress)}
+
+
+def _job_key(acct_id):
+    return 'reclassify:%d' % acct_id
+
+
+def start_reclassify(acct_id):
+    """
+    Enqueue a background job (see :py:mod:`biweeklybudget.jobs`) to
+    reclassify an Account's OFXTransactions with
+    :py:func:`~.reclassify_account`, and return immediately. Jobs for the same
+    Account run one at a time, so if a reclassification of the Account is
+    already running, another one is run when it finishes and the latest
+    regexes are always applied; if one is already queued, nothing is done.
+    Progress can be checked with :py:func:`~.job_status`.
+
+    :param acct_id: ID of the Account to reclassify transactions for
+    :type acct_id: int
+    """
+    r = runner()
+    key = _job_key(acct_id)
+    if any(j['state'] == 'queued' for j in r.statuses_for_key(key, limit=2)):
+        logger.debug(
+            'Reclassify already queued for Account %d; not re-queueing',
+            acct_id
+        )
+        return
+    r.enqueue('reclassify', {'account_id': acct_id}, job_key=key)
+
+
+def job_status(acct_id):
+    """
+    Return a dict describing the latest background reclassification of an
+    Account, or None if it has never been reclassified. Keys are
+    ``account_id``, ``job_id`` (see :py:func:`biweeklybudget.jobs.job_status`),
+    ``state`` (one of ``queued``, ``running``, ``done`` or ``failed``),
+    ``done`` and ``total`` counts of transactions, ``updated`` count of
+    transactions whose fields changed (once done), ``error`` (if failed), and
+    ``rerun`` (whether another run is queued behind a running one).
+
+    :param acct_id: Account ID
+    :type acct_id: int
+    :return: job status
+    :rtype: dict
+    """
+    jobs = runner().statuses_for_key(_job_key(acct_id), limit=2)
+    if len(jobs) == 0:
+        return None
+    job = jobs[0]
+    rerun = False
+    if (
+        len(jobs) > 1 and job['state'] == 'queued' and
+        jobs[1]['state'] == 'running'
+    ):
+        job = jobs[1]
+        rerun = True
+    return {
+        'account_id': acct_id,
+        'job_id': job['id'],
+        'state': job['state'],
+        'done': job['done'],
+        'total': job['total'],
+        'updated': (job['result'] or {}).get('updated'),
+        'error': job['error'],
+        'rerun': rerun
+    }
+
+
+def wait(acct_id, timeout=None):
+    """
+    Wait for the background reclassifications of an Account in this process,
+    if any, to finish.
+
+    :param acct_id: Account ID
+    :type acct_id: int
+    :param timeout: maximum number of seconds to wait for each job, or None
+      for no limit
+    :type timeout: float
+    """
+    r = runner()
+    for job in r.statuses_for_key(_job_key(acct_id)):
+        if job['state'] in ACTIVE_STATES:
+            r.wait(job['id'], timeout=timeout)
@@ -0,0 +1,235 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+from calendar import monthrange
+from collections import namedtuple, OrderedDict, defaultdict
+from datetime import timedelta, date
+
+from biweeklybudget.biweeklypayperiod import PERIOD_INTERVAL_DAYS
+
+#: A single occurrence of a :py:class:`~.ScheduledTransaction`, as returned by
+#: :py:meth:`~.RecurrenceEngine.expand`. ``date`` is None for
+#: "per period" ScheduledTransactions, which do not have a specific date.
+Occurrence = namedtuple('Occurrence', ['date', 'sched_type', 'sched_trans'])
+
+
+class RecurrenceEngine(object):
+    """
+    Expand a set of :py:class:`~.ScheduledTransaction` objects into their
+    individual occurrences over a range of pay periods, in one pass.
+
+    All date math is done on proleptic Gregorian ordinals (integers), so each
+    schedule is expanded with simple integer arithmetic per period (or per
+    month, or per year) instead of a query or a day-by-day walk per period.
+    Schedules are pre-sorted and grouped by their recurrence parameters when
+    the engine is constructed, so one engine can be used to expand many
+    ranges.
+    """
+
+    def __init__(self, sched_trans):
+        """
+        Initialize the engine.
+
+        :param sched_trans: the ScheduledTransactions to expand. Callers
+          should normally pass only active ScheduledTransactions.
+        :type sched_trans: list of :py:class:`~.ScheduledTransaction`
+        """
+        #: list of (ordinal, ScheduledTransaction) for "date" schedules
+        self._date = []
+        #: day of month to list of "monthly" ScheduledTransactions
+        self._monthly = defaultdict(list)
+        #: (month, day) to list of "annual" ScheduledTransactions
+        self._annual = defaultdict(list)
+        #: "per period" ScheduledTransactions
+        self._per_period = []
+        #: day of week to list of "weekly" ScheduledTransactions
+        self._weekly = defaultdict(list)
+        for t in sched_trans:
+            stype = t.schedule_type
+            if stype == 'date':
+                self._date.append((t.date.toordinal(), t))
+            elif stype == 'monthly':
+                self._monthly[t.day_of_month].append(t)
+            elif stype == 'annual':
+                self._annual[(t.annual_month, t.annual_day)].append(t)
+            elif stype == 'per period':
+                self._per_period.append(t)
+            elif stype == 'weekly':
+                self._weekly[t.day_of_week].append(t)
+        self._date.sort(key=lambda x: x[0])
+
+    def expand(self, start_date, end_date):
+        """
+        Return all occurrences of the engine's ScheduledTransactions in every
+        pay period from the one starting on ``start_date`` through the one
+        containing ``end_date``, grouped by pay period. ``start_date`` should
+        be the start date of a pay period, i.e. a
+        :py:attr:`~.BiweeklyPayPeriod.start_date`.
+
+        The return value is an OrderedDict with one entry for every pay
+        period in the range, in order, even if it has no occurrences. Keys
+        are pay period start dates and values are lists of
+        :py:data:`~.Occurrence`, sorted by date. Per-period occurrences
+        (which have no date) sort first; occurrences on the same date keep
+        the order of the ScheduledTransactions passed to the constructor
+        within each schedule type.
+
+        * "date" schedules occur once, on their date.
+        * "monthly" schedules occur on their day of the month, in every month
+          that has that day.
+        * "annual" schedules occur on their month and day in every year that
+          has that date (i.e. February 29th only in leap years).
+        * "weekly" schedules occur on their day of the week, twice in every
+          pay period.
+        * "per period" schedules occur ``num_per_period`` times in every pay
+          period.
+
+        :param start_date: start date of the first pay period
+        :type start_date: datetime.date
+        :param end_date: last date of the range
+        :type end_date: datetime.date
+        :return: pay period start dates to lists of occurrences
+        :rtype: collections.OrderedDict
+        """
+        first = start_date
+        first_ord = first.toordinal()
+        num_periods = (
+            end_date.toordinal() - first_ord
+        ) // PERIOD_INTERVAL_DAYS + 1
+        last_ord = first_ord + (num_periods * PERIOD_INTERVAL_DAYS) - 1
+        # each bucket is a list of (ordinal, sched_type, ScheduledTransaction)
+        buckets = [[] for _ in range(num_periods)]
+
+        def _add(ordinal, stype, t):
+            buckets[(ordinal - first_ord) // PERIOD_INTERVAL_DAYS].append(
+                (ordinal, stype, t)
+            )
+
+        for ordinal, t in self._date:
+            if first_ord <= ordinal <= last_ord:
+                _add(ordinal, 'date', t)
+        self._expand_monthly(first_ord, last_ord, _add)
+        self._expand_annual(first_ord, last_ord, _add)
+        # weekdays repeat every 7 days and periods are 14 days long, so the
+        # offset from the period start is the same for every period
+        first_weekday = first.weekday()
+        offsets = sorted(
+            ((dow - first_weekday) % 7, self._weekly[dow])
+            for dow in self._weekly
+        )
+        for idx in range(num_periods):
+            start_ord = first_ord + (idx * PERIOD_INTERVAL_DAYS)
+            for t in self._per_period:
+                for _ in range(t.num_per_period):
+                    buckets[idx].append((0, 'per period', t))
+            for week_offset in [0, 7]:
+                for offset, sts in offsets:
+                    for t in sts:
+                        buckets[idx].append(
+                            (start_ord + offset + week_offset, 'weekly', t)
+                        )
+        res = OrderedDict()
+        for idx, bucket in enumerate(buckets):
+            bucket.sort(key=lambda x: x[0])
+            res[first + timedelta(days=idx * PERIOD_INTERVAL_DAYS)] = [
+                Occurrence(
+                    date.fromordinal(o) if o > 0 else None, stype, t
+                ) for o, stype, t in bucket
+            ]
+        return res
+
+    def _expand_monthly(self, first_ord, last_ord, add):
+        """
+        Expand "monthly" schedules for every month from the one containing
+        ``first_ord`` through the one containing ``last_ord``, calling
+        ``add(ordinal, 'monthly', sched_trans)`` for each occurrence in that
+        range.
+
+        :param first_ord: ordinal of the first date in the range
+        :type first_ord: int
+        :param last_ord: ordinal of the last date in the range
+        :type last_ord: int
+        :param add: callable to add an occurrence
+        :type add: callable
+        """
+        if len(self._monthly) == 0:
+            return
+        days = sorted(self._monthly.keys())
+        d = date.fromordinal(first_ord)
+        year, month = d.year, d.month
+        month_ord = date(year, month, 1).toordinal()
+        while month_ord <= last_ord:
+            days_in_month = monthrange(year, month)[1]
+            for day in days:
+                if day > days_in_month:
+                    break
+                ordinal = month_ord + day - 1
+                if first_ord <= ordinal <= last_ord:
+                    for t in self._monthly[day]:
+                        add(ordinal, 'monthly', t)
+            month_ord += days_in_month
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    def _expand_annual(self, first_ord, last_ord, add):
+        """
+        Expand "annual" schedules for every year from the one containing
+        ``first_ord`` through the one containing ``last_ord``, calling
+        ``add(ordinal, 'annual', sched_trans)`` for each occurrence in that
+        range.
+
+        :param first_ord: ordinal of the first date in the range
+        :type first_ord: int
+        :param last_ord: ordinal of the last date in the range
+        :type last_ord: int
+        :param add: callable to add an occurrence
+        :type add: callable
+        """
+        if len(self._annual) == 0:
+            return
+        for year in range(
+            date.fromordinal(first_ord).year,
+            date.fromordinal(last_ord).year + 1
+        ):
+            for (month, day), sts in self._annual.items():
+                try:
+                    ordinal = date(year, month, day).toordinal()
+                except ValueError:
+                    # i.e. February 29th in a non-leap year
+                    continue
+                if first_ord <= ordinal <= last_ord:
+                    for t in sts:
+                        add(ordinal, 'annual', t)
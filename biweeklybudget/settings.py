@@ -63,6 +63,11 @@ _TIMEDELTA_VARS = [
 _INT_VARS = [
     'DEFAULT_ACCOUNT_ID',
     'FUEL_BUDGET_ID',
+    'NOTIFICATIONS_CACHE_SECONDS',
+    'PLAID_UPDATE_WORKERS',
+    'JOB_WORKERS',
+    'PAYOFF_WORKERS',
+    'PAYOFF_METHOD_TIMEOUT',
     'BIWEEKLYBUDGET_TEST_TIMESTAMP'
 ]
 _STRING_VARS = [
@@ -153,6 +158,13 @@ RECONCILE_BEGIN_DATE = None
 #: (integer) that will be converted to a number of days.
 STALE_DATA_TIMEDELTA = timedelta(days=2)
 
+#: int - Number of seconds that the notifications shown at the top of every
+#: page are cached for. The cache is also invalidated whenever the web
+#: application commits a change to the database, so this only limits how long
+#: changes made by other processes (such as ``ofxgetter``) or the passage of
+#: time take to be reflected. Set to 0 to disable caching.
+NOTIFICATIONS_CACHE_SECONDS = 60
+
 #: string - *(optional)* Filesystem path to download OFX statements to, and for
 #: backfill_ofx to read them from.
 STATEMENTS_SAVE_PATH = None
@@ -193,6 +205,29 @@ PLAID_COUNTRY_CODES = None
 #: Since this is a single-user app, we just hard-code to "1"
 PLAID_USER_ID = '1'
 
+#: int - Number of Plaid Items to retrieve data from Plaid for at the same time
+#: when updating multiple Items. Database updates are always made one Item at a
+#: time.
+PLAID_UPDATE_WORKERS = 4
+
+#: int - Number of worker threads in each web application process that run
+#: background jobs (see :py:mod:`biweeklybudget.jobs`), such as Plaid updates,
+#: OFX statement uploads, reclassification and payoff calculations.
+JOB_WORKERS = 2
+
+#: int - Number of credit card payoff methods to calculate at the same time, each
+#: in its own worker process, when calculating credit payoffs (see
+#: :py:meth:`biweeklybudget.interest.InterestHelper.calculate_payoffs`). When
+#: set to 1, the methods are calculated one after another in the calling process.
+PAYOFF_WORKERS = 1
+
+#: int - Number of seconds to allow each credit card payoff method to calculate
+#: for. A method that takes longer is stopped and reported as failed. With
+#: :py:attr:`~biweeklybudget.settings.PAYOFF_WORKERS` greater than 1 its worker
+#: process is terminated; otherwise the simulation checks the time once per
+#: simulated month. Set to 0 for no limit.
+PAYOFF_METHOD_TIMEOUT = 60
+
 if 'SETTINGS_MODULE' in os.environ:
     logger.debug('Attempting to import settings module %s',
                  os.environ['SETTINGS_MODULE'])
@@ -46,6 +46,7 @@ from io import BytesIO
 from sqlalchemy import func
 from decimal import Decimal
 
+import biweeklybudget.reclassify as reclassify
 from biweeklybudget.utils import dtnow
 from biweeklybudget.models.account import Account
 from biweeklybudget.models.txn_reconcile import TxnReconcile
@@ -457,6 +458,7 @@ class TestOfxApi(AcceptanceHelper):
         acct.re_interest_paid = None
         acct.re_payment = 'INTERNET PAYMENT - THANK.*'
         testdb.commit()
+        reclassify.wait(3, timeout=60)
         assert acct.re_interest_charge == '^INTEREST CHARGED TO'
         assert acct.re_interest_paid is None
         assert acct.re_payment == 'INTERNET PAYMENT - THANK.*'
@@ -45,7 +45,9 @@ from selenium.webdriver.support.ui import Select
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import NoSuchElementException
 from decimal import Decimal
+from sqlalchemy import event
 
+from biweeklybudget.db import engine
 from biweeklybudget.utils import dtnow
 from biweeklybudget.tests.acceptance_helpers import AcceptanceHelper
 from biweeklybudget.settings import PAY_PERIOD_START_DATE
@@ -3112,3 +3114,35 @@ class TestSkipScheduled(AcceptanceHelper):
                 '<a href="javascript:txnReconcileModal(2)">Yes (2)</a>'
             ]
         ])
+
+
+@pytest.mark.acceptance
+@pytest.mark.usefixtures('refreshdb')
+class TestPayPeriodQueries(object):
+
+    def test_surrounding_period_sums(self):
+        from biweeklybudget.flaskapp.app import app
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            res = app.test_client().get(
+                '/payperiod/%s' % dtnow().strftime('%Y-%m-%d')
+            )
+        finally:
+            event.remove(
+                engine, 'before_cursor_execute', before_cursor_execute
+            )
+        assert res.status_code == 200
+        # the sums of all four surrounding periods are loaded in one query,
+        # and their data (if any) with the current period's in two batches;
+        # none of them are calculated again when rendering
+        assert len([
+            s for s in statements if 'FROM pay_period_budget_sums' in s
+        ]) == 1
+        assert len([
+            s for s in statements if 'FROM scheduled_transactions' in s
+        ]) <= 2
@@ -39,11 +39,17 @@ import pytest
 from decimal import Decimal
 
 from biweeklybudget.tests.acceptance_helpers import AcceptanceHelper
+from biweeklybudget.db_event_handlers import data_version
+from biweeklybudget.biweeklypayperiod import BiweeklyPayPeriod
+from biweeklybudget.payperiod_sums import PayPeriodSumsManager
+import biweeklybudget.reclassify as reclassify
 from biweeklybudget.models.transaction import Transaction
 from biweeklybudget.models.account import Account
 from biweeklybudget.models.budget_model import Budget
 from biweeklybudget.models.ofx_transaction import OFXTransaction
 from biweeklybudget.models.ofx_statement import OFXStatement
+from biweeklybudget.models.pay_period_budget_sum import PayPeriodBudgetSum
+from biweeklybudget.models.scheduled_transaction import ScheduledTransaction
 
 
 @pytest.mark.acceptance
@@ -184,6 +190,8 @@ class TestIsFieldsSet(AcceptanceHelper):
         acct = testdb.query(Account).get(1)
         acct.re_interest_paid = None
         testdb.commit()
+        reclassify.wait(1, timeout=60)
+        assert reclassify.job_status(1)['state'] == 'done'
         assert acct.re_interest_charge == '^interest-charge'
         assert acct.re_interest_paid is None
         assert acct.re_payment == '^(payment|thank you)'
@@ -297,6 +305,8 @@ class TestIsFieldsSet(AcceptanceHelper):
         acct = testdb.query(Account).get(1)
         acct.re_interest_paid = None
         testdb.commit()
+        reclassify.wait(1, timeout=60)
+        assert reclassify.job_status(1)['state'] == 'done'
         assert acct.re_interest_charge == '^interest-charge'
         assert acct.re_interest_paid is None
         assert acct.re_payment == '^(payment|thank you)'
@@ -331,6 +341,11 @@ class TestIsFieldsSet(AcceptanceHelper):
         acct.re_payment = '^Late Fee'
         acct.re_late_fee = '^foobarbaz'
         testdb.commit()
+        # reclassification runs in the background after commit
+        reclassify.wait(1, timeout=60)
+        status = reclassify.job_status(1)
+        assert status['state'] == 'done'
+        assert status['done'] == status['total']
         # re-confirm
         txn1 = testdb.query(OFXTransaction).get((1, 'BankOne-9-1'))
         assert txn1.name == 'BankOne-9-1'
@@ -353,3 +368,72 @@ class TestIsFieldsSet(AcceptanceHelper):
         assert txn3.is_interest_charge is False
         assert txn3.is_other_fee is False
         assert txn3.is_interest_payment is False
+
+
+@pytest.mark.acceptance
+@pytest.mark.usefixtures('class_refresh_db', 'refreshdb')
+class TestDataVersion(AcceptanceHelper):
+
+    def test_data_version(self, testdb):
+        start = data_version()
+        # commit without changes does not bump the version
+        testdb.commit()
+        assert data_version() == start
+        # rolled back changes do not bump the version
+        b = testdb.query(Budget).get(1)
+        b.description = 'foo'
+        testdb.flush()
+        testdb.rollback()
+        assert data_version() == start
+        # committed changes do
+        b = testdb.query(Budget).get(1)
+        b.description = 'bar'
+        testdb.commit()
+        assert data_version() == start + 1
+        # as do bulk updates
+        testdb.query(Budget).filter(Budget.id.__eq__(1)).update(
+            {'description': 'baz'}
+        )
+        testdb.commit()
+        assert data_version() == start + 2
+
+
+@pytest.mark.acceptance
+@pytest.mark.usefixtures('class_refresh_db', 'refreshdb')
+class TestPayPeriodSums(AcceptanceHelper):
+
+    def test_pay_period_sums(self, testdb):
+        mgr = PayPeriodSumsManager(testdb)
+        mgr.rebuild(periods_ahead=2)
+        start_dates = PayPeriodBudgetSum.stored_start_dates(testdb)
+        assert len(start_dates) > 0
+        # reading missing sums does not store them
+        d = max(start_dates)
+        testdb.query(PayPeriodBudgetSum).filter(
+            PayPeriodBudgetSum.start_date.__eq__(d)
+        ).delete()
+        testdb.commit()
+        pp = BiweeklyPayPeriod(d, testdb)
+        BiweeklyPayPeriod.load_budget_sums([pp], testdb)
+        assert pp.overall_sums is not None
+        assert PayPeriodBudgetSum.stored_start_dates(testdb) == (
+            start_dates - {d}
+        )
+        # changed Transactions recalculate (and store) their periods
+        t = testdb.query(Transaction).get(1)
+        t.budget_transactions[0].amount += Decimal('10.00')
+        testdb.commit()
+        assert mgr.check() == []
+        # recurring ScheduledTransactions recalculate all stored periods
+        st = testdb.query(ScheduledTransaction).filter(
+            ScheduledTransaction.day_of_month.isnot(None)
+        ).first()
+        st.amount += Decimal('5.00')
+        testdb.commit()
+        assert mgr.check() == []
+        # as do bulk updates
+        testdb.query(ScheduledTransaction).filter(
+            ScheduledTransaction.id.__eq__(st.id)
+        ).update({'amount': Decimal('99.00')})
+        testdb.commit()
+        assert mgr.check() == []
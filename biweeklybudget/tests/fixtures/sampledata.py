@@ -101,6 +101,9 @@ class SampleDataLoader(object):
             reconciled_at=datetime(2017, 4, 10, 8, 9, 11, tzinfo=UTC)
         ))
         self.db.flush()
+        # statements are added directly, and this session may not have the
+        # event handlers registered
+        Account.update_latest_pointers(self.db)
         self.db.commit()
 
     def _plaid_items(self):
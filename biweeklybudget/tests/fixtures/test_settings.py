@@ -78,6 +78,10 @@ PAY_PERIOD_START_DATE = date(2017, 7, 21)
 #: :py:class:`~.OFXTransaction` before this date will be ignored.
 RECONCILE_BEGIN_DATE = date(2017, 1, 1)
 
+#: Acceptance tests restore database dumps out-of-band, so notifications must
+#: not be cached.
+NOTIFICATIONS_CACHE_SECONDS = 0
+
 #: Account ID to show first in dropdown lists
 DEFAULT_ACCOUNT_ID = 1
 
@@ -0,0 +1,103 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import pytest
+import logging
+from sqlalchemy import text
+
+from biweeklybudget.tests.migrations.migration_test_helpers import MigrationTest
+
+logger = logging.getLogger(__name__)
+
+
+def index_names(engine, table):
+    conn = engine.connect()
+    res = set(
+        r._mapping['Key_name'] for r in conn.execute(
+            text('SHOW INDEX FROM %s;' % table)
+        )
+    )
+    conn.close()
+    return res
+
+
+@pytest.mark.migrations
+class TestAddCompositeIndexes(MigrationTest):
+    """
+    Test for revision 2a2e0b160768
+    """
+
+    migration_rev = '2a2e0b160768'
+
+    def data_setup(self, engine):
+        """method to setup sample data in empty tables"""
+        pass
+
+    def verify_before(self, engine):
+        """method to verify data before forward migration, and after reverse"""
+        names = index_names(engine, 'transactions')
+        assert 'fk_transactions_account_id_accounts' in names
+        assert 'ix_transactions_date' not in names
+        assert 'ix_transactions_account_id_date' not in names
+        names = index_names(engine, 'budget_transactions')
+        assert 'fk_budget_transactions_budget_id_budgets' in names
+        assert 'ix_budget_transactions_budget_id_trans_id' not in names
+        assert 'ix_fuellog_vehicle_id_odometer_miles' not in index_names(
+            engine, 'fuellog'
+        )
+
+    def verify_after(self, engine):
+        """method to verify data after forward migration"""
+        names = index_names(engine, 'transactions')
+        assert 'fk_transactions_account_id_accounts' not in names
+        assert 'ix_transactions_date' in names
+        assert 'ix_transactions_account_id_date' in names
+        names = index_names(engine, 'ofx_trans')
+        assert 'ix_ofx_trans_date_posted' in names
+        assert 'ix_ofx_trans_account_id_date_posted' in names
+        names = index_names(engine, 'account_balances')
+        assert 'fk_account_balances_account_id_accounts' not in names
+        assert 'ix_account_balances_account_id_overall_date' in names
+        assert 'ix_ofx_statements_account_id_as_of' in index_names(
+            engine, 'ofx_statements'
+        )
+        names = index_names(engine, 'budget_transactions')
+        assert 'fk_budget_transactions_budget_id_budgets' not in names
+        assert 'ix_budget_transactions_budget_id_trans_id' in names
+        assert 'ix_fuellog_vehicle_id_odometer_miles' in index_names(
+            engine, 'fuellog'
+        )
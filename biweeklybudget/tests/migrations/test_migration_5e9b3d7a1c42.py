@@ -0,0 +1,77 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import pytest
+import logging
+from sqlalchemy import text, inspect
+
+from biweeklybudget.tests.migrations.migration_test_helpers import MigrationTest
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.mark.migrations
+class TestAddJobsTable(MigrationTest):
+    """
+    Test for revision 5e9b3d7a1c42
+    """
+
+    migration_rev = '5e9b3d7a1c42'
+
+    def data_setup(self, engine):
+        """method to setup sample data in empty tables"""
+        return
+
+    def verify_before(self, engine):
+        """method to verify data before forward migration, and after reverse"""
+        assert 'jobs' not in inspect(engine).get_table_names()
+
+    def verify_after(self, engine):
+        """method to verify data after forward migration"""
+        conn = engine.connect()
+        result = conn.execute(text('SELECT * FROM jobs WHERE 1=2;'))
+        columns = result.keys()
+        conn.close()
+        for col in [
+            'id', 'job_type', 'job_key', 'params', 'state', 'done', 'total',
+            'message', 'result', 'error', 'worker', 'created', 'started',
+            'finished'
+        ]:
+            assert col in columns
+        indexes = [i['name'] for i in inspect(engine).get_indexes('jobs')]
+        assert 'ix_jobs_state_id' in indexes
+        assert 'ix_jobs_job_key_id' in indexes
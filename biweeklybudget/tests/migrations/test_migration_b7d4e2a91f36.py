@@ -0,0 +1,90 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import pytest
+import logging
+from sqlalchemy import text, inspect
+from sqlalchemy.dialects import mysql
+
+from biweeklybudget.tests.migrations.migration_test_helpers import MigrationTest
+
+logger = logging.getLogger(__name__)
+
+
+def column_types(engine):
+    return {
+        c['name']: c['type'] for c in inspect(engine).get_columns('jobs')
+    }
+
+
+@pytest.mark.migrations
+class TestJobsParamsResultLongtext(MigrationTest):
+    """
+    Test for revision b7d4e2a91f36
+    """
+
+    migration_rev = 'b7d4e2a91f36'
+
+    def data_setup(self, engine):
+        """method to setup sample data in empty tables"""
+        return
+
+    def verify_before(self, engine):
+        """method to verify data before forward migration, and after reverse"""
+        types = column_types(engine)
+        assert not isinstance(types['params'], mysql.LONGTEXT)
+        assert not isinstance(types['result'], mysql.LONGTEXT)
+
+    def verify_after(self, engine):
+        """method to verify data after forward migration"""
+        types = column_types(engine)
+        assert isinstance(types['params'], mysql.LONGTEXT)
+        assert isinstance(types['result'], mysql.LONGTEXT)
+        params = 'x' * 100000
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    "INSERT INTO jobs (job_type, params, state) "
+                    "VALUES ('foo', :params, 'queued');"
+                ),
+                {'params': params}
+            )
+            res = conn.execute(
+                text("SELECT params FROM jobs WHERE job_type='foo';")
+            ).scalar()
+            conn.execute(text("DELETE FROM jobs WHERE job_type='foo';"))
+        assert res == params
@@ -0,0 +1,104 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import pytest
+import logging
+from sqlalchemy import text
+
+from biweeklybudget.tests.migrations.migration_test_helpers import MigrationTest
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.mark.migrations
+class TestAddAccountLatestPointers(MigrationTest):
+    """
+    Test for revision d84952239b31
+    """
+
+    migration_rev = 'd84952239b31'
+
+    def data_setup(self, engine):
+        """method to setup sample data in empty tables"""
+        sql = [
+            "INSERT INTO accounts SET id=1, name='acct1', acct_type=1, "
+            "reconcile_trans=1;",
+            "INSERT INTO accounts SET id=2, name='acct2', acct_type=2, "
+            "reconcile_trans=1;",
+            "INSERT INTO accounts SET id=3, name='acct3', acct_type=1, "
+            "reconcile_trans=1;",
+            "INSERT INTO account_balances SET id=1, account_id=1, "
+            "ledger=1.0, overall_date='2017-01-03 00:00:00';",
+            "INSERT INTO account_balances SET id=2, account_id=2, "
+            "ledger=2.0, overall_date='2017-01-03 00:00:00';",
+            "INSERT INTO account_balances SET id=3, account_id=1, "
+            "ledger=3.0, overall_date='2017-01-01 00:00:00';",
+            "INSERT INTO ofx_statements SET id=1, account_id=1, "
+            "filename='a', as_of='2017-01-03 00:00:00';",
+            "INSERT INTO ofx_statements SET id=2, account_id=1, "
+            "filename='b', as_of='2017-01-01 00:00:00';",
+            "INSERT INTO ofx_statements SET id=3, account_id=2, "
+            "filename='c', as_of='2017-01-02 00:00:00';",
+        ]
+        conn = engine.connect()
+        for s in sql:
+            logger.debug('Executing: %s', s)
+            conn.execute(text(s))
+        conn.commit()
+        conn.close()
+
+    def verify_before(self, engine):
+        """method to verify data before forward migration, and after reverse"""
+        conn = engine.connect()
+        columns = conn.execute(
+            text('SELECT * FROM accounts WHERE 1=2;')
+        ).keys()
+        conn.close()
+        assert 'latest_balance_id' not in columns
+        assert 'latest_statement_id' not in columns
+
+    def verify_after(self, engine):
+        """method to verify data after forward migration"""
+        conn = engine.connect()
+        res = [
+            tuple(r) for r in conn.execute(text(
+                'SELECT id, latest_balance_id, latest_statement_id '
+                'FROM accounts ORDER BY id;'
+            ))
+        ]
+        conn.close()
+        assert res == [(1, 3, 1), (2, 2, 3), (3, None, None)]
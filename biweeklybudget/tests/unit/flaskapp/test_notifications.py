@@ -35,8 +35,9 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 ################################################################################
 """
 import sys
+from decimal import Decimal
+from sqlalchemy.orm import configure_mappers
 
-from biweeklybudget.models.account import Account
 from biweeklybudget.flaskapp.notifications import NotificationsController
 
 # https://code.google.com/p/mock/issues/detail?id=249
@@ -56,17 +57,46 @@ pb = '%s.NotificationsController' % pbm
 class TestNotifications(object):
 
     def test_num_stale_accounts(self):
-        accts = [
-            Mock(is_stale=True, is_active=True),
-            Mock(is_stale=False, is_active=True)
-        ]
         with patch('%s.db_session' % pbm) as mock_db:
-            mock_db.query.return_value.filter.return_value\
-                .all.return_value = accts
+            mock_db.query.return_value.join.return_value.filter.return_value\
+                .scalar.return_value = 1
             res = NotificationsController.num_stale_accounts()
         assert res == 1
-        assert mock_db.mock_calls[0] == call.query(Account)
-        assert mock_db.mock_calls[2] == call.query().filter().all()
+        assert mock_db.mock_calls[-1] == call.query().join().filter().scalar()
+
+    def test_budget_account_sum(self):
+        with patch('%s.db_session' % pbm) as mock_db:
+            mock_db.query.return_value.join.return_value.filter.return_value\
+                .scalar.return_value = Decimal('12.34')
+            res = NotificationsController.budget_account_sum()
+        assert res == Decimal('12.34')
+
+    def test_budget_account_sum_none(self):
+        with patch('%s.db_session' % pbm) as mock_db:
+            mock_db.query.return_value.join.return_value.filter.return_value\
+                .scalar.return_value = None
+            res = NotificationsController.budget_account_sum()
+        assert res == Decimal('0.0')
+
+    def test_budget_account_unreconciled_none(self):
+        # Transaction.reconcile is a backref from TxnReconcile
+        configure_mappers()
+        with patch('%s.db_session' % pbm) as mock_db:
+            mock_db.query.return_value.join.return_value.join.return_value\
+                .filter.return_value.scalar.return_value = None
+            res = NotificationsController.budget_account_unreconciled()
+        assert res == Decimal('0.0')
+
+    def test_pp_sum(self):
+        mock_pp = Mock(overall_sums={'allocated': 100, 'spent': 30})
+        mock_sess = Mock()
+        with patch('%s.BiweeklyPayPeriod' % pbm) as mock_bpp:
+            mock_bpp.period_for_date.return_value = mock_pp
+            res = NotificationsController.pp_sum(sess=mock_sess)
+        assert res == 70
+        assert mock_bpp.load_budget_sums.mock_calls == [
+            call([mock_pp], mock_sess)
+        ]
 
     def test_get_notifications_no_stale(self):
         with patch.multiple(
@@ -212,3 +242,42 @@ class TestNotifications(object):
                            'Unreconciled OFXTransactions</a>.'
             }
         ]
+
+
+class TestCachedNotifications(object):
+
+    def setup_method(self):
+        NotificationsController.clear_cache()
+
+    def teardown_method(self):
+        NotificationsController.clear_cache()
+
+    def _get(self, version, now, ttl=60):
+        with patch.multiple(
+            pbm, data_version=DEFAULT, time=DEFAULT, settings=DEFAULT
+        ) as mocks:
+            with patch('%s.get_notifications' % pb) as mock_get:
+                mocks['data_version'].return_value = version
+                mocks['time'].time.return_value = now
+                mocks['settings'].NOTIFICATIONS_CACHE_SECONDS = ttl
+                mock_get.return_value = ['n%d-%d' % (version, now)]
+                res = NotificationsController.cached_notifications()
+        return res, mock_get.call_count
+
+    def test_cached(self):
+        assert self._get(1, 100) == (['n1-100'], 1)
+        assert self._get(1, 159) == (['n1-100'], 0)
+
+    def test_version_changed(self):
+        assert self._get(1, 100) == (['n1-100'], 1)
+        assert self._get(2, 101) == (['n2-101'], 1)
+        assert self._get(2, 102) == (['n2-101'], 0)
+
+    def test_expired(self):
+        assert self._get(1, 100) == (['n1-100'], 1)
+        assert self._get(1, 160) == (['n1-160'], 1)
+
+    def test_disabled(self):
+        assert self._get(1, 100, ttl=0) == (['n1-100'], 1)
+        assert self._get(1, 100, ttl=0) == (['n1-100'], 1)
+        assert NotificationsController._cache is None
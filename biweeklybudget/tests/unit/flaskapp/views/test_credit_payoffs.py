@@ -0,0 +1,108 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+from decimal import Decimal
+from unittest.mock import Mock, patch, call
+
+from biweeklybudget.flaskapp.views.credit_payoffs import CreditPayoffSweepAjax
+from biweeklybudget.models.account import NoInterestChargedError
+
+pbm = 'biweeklybudget.flaskapp.views.credit_payoffs'
+
+
+class TestCreditPayoffSweepAjax:
+
+    def _get(self, args):
+        with patch(f'{pbm}.request', Mock(args=args)):
+            with patch(f'{pbm}.jsonify') as m_jsonify:
+                with patch(f'{pbm}.InterestHelper') as m_ih:
+                    with patch(f'{pbm}.db_session') as m_db:
+                        m_ih.return_value.payoff_sweep.return_value = 'sweep'
+                        res = CreditPayoffSweepAjax().get()
+        return res, m_jsonify, m_ih, m_db
+
+    def test_get(self):
+        res, m_jsonify, m_ih, m_db = self._get(
+            {'min': '100', 'max': '200', 'step': '25.5'}
+        )
+        assert res is m_jsonify.return_value
+        amounts = [
+            Decimal('100'), Decimal('125.5'), Decimal('151.0'),
+            Decimal('176.5')
+        ]
+        assert m_ih.mock_calls == [
+            call(m_db), call().payoff_sweep(amounts)
+        ]
+        assert m_jsonify.mock_calls == [call({
+            'amounts': amounts,
+            'methods': 'sweep'
+        })]
+
+    def test_get_defaults(self):
+        _, m_jsonify, m_ih, _ = self._get({})
+        amounts = m_jsonify.mock_calls[0][1][0]['amounts']
+        assert len(amounts) == 91
+        assert amounts[0] == Decimal('500')
+        assert amounts[-1] == Decimal('5000')
+
+    def test_get_invalid(self):
+        for args in [
+            {'min': 'foo'},
+            {'step': 'NaN'},
+            {'step': '0'},
+            {'min': '600', 'max': '500'},
+            {'min': '0', 'max': '100000', 'step': '1'}
+        ]:
+            res, m_jsonify, m_ih, _ = self._get(args)
+            assert res[1] == 400
+            assert m_ih.mock_calls == []
+            assert m_jsonify.mock_calls[0][1][0]['success'] is False
+
+    def test_get_no_interest(self):
+        acct = Mock(id=3)
+        type(acct).name = 'CreditOne'
+        with patch(f'{pbm}.request', Mock(args={})):
+            with patch(f'{pbm}.jsonify') as m_jsonify:
+                with patch(f'{pbm}.InterestHelper') as m_ih:
+                    with patch(f'{pbm}.db_session'):
+                        m_ih.side_effect = NoInterestChargedError(acct)
+                        res = CreditPayoffSweepAjax().get()
+        assert res == (m_jsonify.return_value, 500)
+        assert m_jsonify.mock_calls == [call({
+            'success': False,
+            'message': 'No interest charge found for account CreditOne (3)'
+        })]
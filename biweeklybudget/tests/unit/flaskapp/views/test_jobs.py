@@ -0,0 +1,156 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+from unittest.mock import Mock, patch, call
+
+from biweeklybudget.flaskapp.views.jobs import (
+    wants_background, job_response, JobAjax, JobEventsAjax
+)
+
+pbm = 'biweeklybudget.flaskapp.views.jobs'
+
+
+def status(state, done=0):
+    return {'id': 3, 'state': state, 'done': done}
+
+
+class TestWantsBackground:
+
+    def test_true(self):
+        assert wants_background({'background': 'true'}) is True
+        assert wants_background({'background': 'True'}) is True
+        assert wants_background({'background': '1'}) is True
+
+    def test_false(self):
+        assert wants_background({}) is False
+        assert wants_background({'background': 'false'}) is False
+        assert wants_background({'background': '0'}) is False
+
+
+class TestJobResponse:
+
+    def test_response(self):
+        mock_resp = Mock()
+        with patch(f'{pbm}.jsonify') as m_jsonify:
+            with patch(f'{pbm}.url_for') as m_url_for:
+                m_jsonify.return_value = mock_resp
+                m_url_for.side_effect = lambda e, job_id: f'/{e}/{job_id}'
+                res = job_response(3)
+        assert res == mock_resp
+        assert mock_resp.status_code == 202
+        assert m_jsonify.mock_calls == [call({
+            'success': True,
+            'job_id': 3,
+            'status_url': '/job_ajax/3',
+            'events_url': '/job_events_ajax/3'
+        })]
+
+
+class TestJobAjax:
+
+    def test_get(self):
+        with patch(f'{pbm}.job_status') as m_status:
+            with patch(f'{pbm}.jsonify') as m_jsonify:
+                m_status.return_value = status('running')
+                res = JobAjax().get(3)
+        assert res is m_jsonify.return_value
+        assert m_status.mock_calls == [call(3)]
+        assert m_jsonify.mock_calls == [call(status('running'))]
+
+    def test_get_not_found(self):
+        with patch(f'{pbm}.job_status') as m_status:
+            with patch(f'{pbm}.jsonify') as m_jsonify:
+                m_status.return_value = None
+                res = JobAjax().get(3)
+        assert res is m_jsonify.return_value
+        assert res.status_code == 404
+        assert m_jsonify.mock_calls == [call({
+            'success': False, 'error_message': 'No job with ID 3'
+        })]
+
+
+class TestJobEventsAjax:
+
+    def test_get(self):
+        with patch(f'{pbm}.job_status') as m_status:
+            with patch(f'{pbm}.Response') as m_response:
+                m_status.return_value = status('queued')
+                res = JobEventsAjax().get(3)
+        assert res is m_response.return_value
+        assert m_response.mock_calls[0][2] == {
+            'mimetype': 'text/event-stream',
+            'headers': {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        }
+
+    def test_get_not_found(self):
+        with patch(f'{pbm}.job_status') as m_status:
+            with patch(f'{pbm}.jsonify') as m_jsonify:
+                m_status.return_value = None
+                res = JobEventsAjax().get(3)
+        assert res is m_jsonify.return_value
+        assert res.status_code == 404
+
+    def test_events(self):
+        statuses = [
+            status('running', done=1),
+            status('running', done=1),
+            status('running', done=1),
+            status('done', done=2),
+        ]
+        mono = iter([0, 1, 2, 20, 21, 22, 23])
+        with patch(f'{pbm}.job_status') as m_status:
+            with patch(f'{pbm}.sleep') as m_sleep:
+                with patch(f'{pbm}.monotonic') as m_mono:
+                    m_status.side_effect = statuses
+                    m_mono.side_effect = lambda: next(mono)
+                    res = list(JobEventsAjax()._events(3, status('queued')))
+        assert res == [
+            'data: {"id": 3, "state": "queued", "done": 0}\n\n',
+            'data: {"id": 3, "state": "running", "done": 1}\n\n',
+            ': keepalive\n\n',
+            'data: {"id": 3, "state": "done", "done": 2}\n\n',
+        ]
+        assert m_sleep.mock_calls == [call(0.5)] * 4
+        assert m_status.mock_calls == [call(3)] * 4
+
+    def test_events_finished(self):
+        with patch(f'{pbm}.job_status') as m_status:
+            with patch(f'{pbm}.sleep') as m_sleep:
+                res = list(JobEventsAjax()._events(3, status('failed')))
+        assert res == ['data: {"id": 3, "state": "failed", "done": 0}\n\n']
+        assert m_sleep.mock_calls == []
+        assert m_status.mock_calls == []
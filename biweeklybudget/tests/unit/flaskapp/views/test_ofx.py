@@ -0,0 +1,109 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import gzip
+import json
+import pytest
+from unittest.mock import Mock, patch, call
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from biweeklybudget.flaskapp.views.ofx import (
+    gunzip_limited, OfxStatementsBatchPost
+)
+
+pbm = 'biweeklybudget.flaskapp.views.ofx'
+
+
+class TestGunzipLimited:
+
+    def test_decompress(self):
+        data = b'foo' * 1000
+        assert gunzip_limited(gzip.compress(data), 3000) == data
+
+    def test_too_large(self):
+        with pytest.raises(RequestEntityTooLarge):
+            gunzip_limited(gzip.compress(b'\0' * 3001), 3000)
+
+    def test_truncated(self):
+        with pytest.raises(ValueError):
+            gunzip_limited(gzip.compress(b'foo' * 1000)[:-10], 3000)
+
+    def test_trailing_data(self):
+        with pytest.raises(ValueError):
+            gunzip_limited(gzip.compress(b'foo') + b'bar', 3000)
+
+
+class TestOfxStatementsBatchPost:
+
+    def _post(self, body, max_length=None):
+        req = Mock(args={}, headers={'Content-Encoding': 'gzip'})
+        req.get_data.return_value = gzip.compress(body)
+        with patch(f'{pbm}.request', req):
+            with patch(f'{pbm}.jsonify') as m_jsonify:
+                with patch.dict(
+                    f'{pbm}.app.config', {'MAX_CONTENT_LENGTH': max_length}
+                ):
+                    with patch(f'{pbm}.decode_statements') as m_decode:
+                        with patch(f'{pbm}.OfxApiLocal') as m_api:
+                            with patch(f'{pbm}.db_session'):
+                                m_api.return_value.update_statements_ofx \
+                                    .return_value = []
+                                res = OfxStatementsBatchPost().post()
+        return res, m_jsonify, m_decode
+
+    def test_post(self):
+        body = json.dumps({'statements': ['foo']}).encode()
+        res, m_jsonify, m_decode = self._post(body, max_length=1000)
+        assert res is m_jsonify.return_value
+        assert m_decode.mock_calls == [call(['foo'])]
+        assert m_jsonify.mock_calls == [
+            call({'success': True, 'results': []})
+        ]
+
+    def test_post_too_large(self):
+        body = json.dumps({'statements': ['x' * 2000]}).encode()
+        res, m_jsonify, m_decode = self._post(body, max_length=1000)
+        assert res is m_jsonify.return_value
+        assert res.status_code == 413
+        assert m_decode.mock_calls == []
+        assert m_jsonify.mock_calls[0][1][0]['success'] is False
+
+    def test_post_default_limit(self):
+        with patch(f'{pbm}.MAX_DECOMPRESSED_LENGTH', 1000):
+            res, m_jsonify, m_decode = self._post(b'\0' * 1001)
+        assert res.status_code == 413
+        assert m_decode.mock_calls == []
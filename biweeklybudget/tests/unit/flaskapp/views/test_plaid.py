@@ -867,6 +867,51 @@ class TestPlaidUpdate:
         assert m_form.mock_calls == []
         assert m_update.mock_calls == [call(self.cls, '1,2,3', num_days=25)]
 
+    def test_get_update_background(self):
+        mock_req = Mock(args={'item_ids': '1,2,3', 'background': 'true'})
+        mock_update = Mock()
+        with patch(f'{self.pb}._form', autospec=True) as m_form:
+            with patch(f'{self.pb}._update', autospec=True) as m_update:
+                m_update.return_value = mock_update
+                with patch(f'{pbm}.request', mock_req):
+                    res = self.cls.get()
+        assert res == mock_update
+        assert m_form.mock_calls == []
+        assert m_update.mock_calls == [
+            call(self.cls, '1,2,3', background=True)
+        ]
+
+    def test_update_background(self):
+        with patch.multiple(
+            pbm,
+            PlaidUpdater=DEFAULT,
+            enqueue=DEFAULT,
+            job_response=DEFAULT
+        ) as mocks:
+            mocks['enqueue'].return_value = 12
+            res = self.cls._update('id1,id2', num_days=5, background=True)
+        assert res is mocks['job_response'].return_value
+        assert mocks['enqueue'].mock_calls == [
+            call('plaid_update', {'item_ids': ['id1', 'id2'], 'num_days': 5})
+        ]
+        assert mocks['job_response'].mock_calls == [call(12)]
+        assert mocks['PlaidUpdater'].mock_calls == []
+
+    def test_update_background_all(self):
+        with patch.multiple(
+            pbm,
+            PlaidUpdater=DEFAULT,
+            enqueue=DEFAULT,
+            job_response=DEFAULT
+        ) as mocks:
+            mocks['enqueue'].return_value = 12
+            res = self.cls._update('ALL', background=True)
+        assert res is mocks['job_response'].return_value
+        assert mocks['enqueue'].mock_calls == [
+            call('plaid_update', {'item_ids': 'ALL', 'num_days': 30})
+        ]
+        assert mocks['PlaidUpdater'].mock_calls == []
+
     def test_form(self):
         accts = [
             Mock(spec_set=Account, id='AID1'),
@@ -0,0 +1,95 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+import sys
+from datetime import datetime
+from decimal import Decimal
+from pytz import UTC
+
+from biweeklybudget.models.account import Account
+from biweeklybudget.models.account_balance import AccountBalance
+from biweeklybudget.models.ofx_statement import OFXStatement
+
+# https://code.google.com/p/mock/issues/detail?id=249
+# py>=3.4 should use unittest.mock not the mock package on pypi
+if (
+        sys.version_info[0] < 3 or
+        sys.version_info[0] == 3 and sys.version_info[1] < 4
+):
+    from mock import Mock, patch  # noqa
+else:
+    from unittest.mock import Mock, patch  # noqa
+
+pbm = 'biweeklybudget.models.account'
+
+
+class TestAccountLatestPointers(object):
+
+    def test_set_balance(self):
+        acct = Account(name='a')
+        mock_sess = Mock()
+        with patch('%s.inspect' % pbm) as mock_inspect:
+            mock_inspect.return_value.session = mock_sess
+            acct.set_balance(ledger=Decimal('1.23'))
+        bal = mock_sess.add.call_args[0][0]
+        assert isinstance(bal, AccountBalance)
+        assert bal.ledger == Decimal('1.23')
+        assert bal.account is acct
+        assert acct.latest_balance is bal
+        assert acct.balance is bal
+
+    def test_set_latest_statement_none(self):
+        acct = Account(name='a')
+        stmt = OFXStatement(as_of=datetime(2017, 1, 1, tzinfo=UTC))
+        acct.set_latest_statement(stmt)
+        assert acct.latest_statement is stmt
+        assert acct.ofx_statement is stmt
+
+    def test_set_latest_statement_newer(self):
+        acct = Account(name='a')
+        old = OFXStatement(as_of=datetime(2017, 1, 1, tzinfo=UTC))
+        new = OFXStatement(as_of=datetime(2017, 1, 2, tzinfo=UTC))
+        acct.latest_statement = old
+        acct.set_latest_statement(new)
+        assert acct.latest_statement is new
+
+    def test_set_latest_statement_older(self):
+        acct = Account(name='a')
+        old = OFXStatement(as_of=datetime(2017, 1, 1, tzinfo=UTC))
+        new = OFXStatement(as_of=datetime(2017, 1, 2, tzinfo=UTC))
+        acct.latest_statement = new
+        acct.set_latest_statement(old)
+        assert acct.latest_statement is new
@@ -0,0 +1,98 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+import sys
+from datetime import datetime, timedelta
+from pytz import UTC
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from biweeklybudget.models.credit_payoff_result import CreditPayoffResult
+
+# https://code.google.com/p/mock/issues/detail?id=249
+# py>=3.4 should use unittest.mock not the mock package on pypi
+if (
+        sys.version_info[0] < 3 or
+        sys.version_info[0] == 3 and sys.version_info[1] < 4
+):
+    from mock import patch
+else:
+    from unittest.mock import patch
+
+pbm = 'biweeklybudget.models.credit_payoff_result'
+
+
+class TestCreditPayoffResultStore(object):
+
+    def setup_method(self):
+        self.engine = create_engine('sqlite://')
+        CreditPayoffResult.__table__.create(self.engine)
+        self.sess = sessionmaker(bind=self.engine)()
+
+    def teardown_method(self):
+        self.sess.close()
+        self.engine.dispose()
+
+    def _store(self, inputs_hash, result, minutes):
+        with patch('%s.dtnow' % pbm) as mock_dtnow:
+            mock_dtnow.return_value = datetime(
+                2017, 7, 28, 12, 0, 0, tzinfo=UTC
+            ) + timedelta(minutes=minutes)
+            CreditPayoffResult.store(self.sess, inputs_hash, result)
+
+    def test_store(self):
+        self._store('a' * 64, '{"foo": 1}', 0)
+        r = self.sess.query(CreditPayoffResult).get('a' * 64)
+        assert r.result == '{"foo": 1}'
+        assert r.created == datetime(2017, 7, 28, 12, 0, 0, tzinfo=UTC)
+
+    def test_store_existing(self):
+        self._store('a' * 64, '{"foo": 1}', 0)
+        other = sessionmaker(bind=self.engine)()
+        CreditPayoffResult.store(other, 'a' * 64, '{"foo": 2}')
+        other.close()
+        assert self.sess.query(CreditPayoffResult).count() == 1
+        assert self.sess.query(
+            CreditPayoffResult
+        ).get('a' * 64).result == '{"foo": 1}'
+
+    def test_store_prunes_oldest(self):
+        with patch.object(CreditPayoffResult, 'KEEP', 3):
+            for i in range(5):
+                self._store('%064d' % i, '{}', i)
+        assert sorted(
+            r.inputs_hash for r in self.sess.query(CreditPayoffResult).all()
+        ) == ['%064d' % i for i in [2, 3, 4]]
@@ -43,7 +43,9 @@ from pytz import UTC
 from sqlalchemy.orm.query import Query
 from sqlalchemy.sql.expression import null
 
-from biweeklybudget.models.ofx_transaction import OFXTransaction
+from biweeklybudget.models.ofx_transaction import (
+    OFXTransaction, IsFieldMatcher, matcher_for_account, clear_matcher_cache
+)
 from biweeklybudget.models.ofx_statement import OFXStatement
 from biweeklybudget.models.account import Account
 from biweeklybudget.tests.unit_helpers import binexp_to_dict
@@ -179,3 +181,104 @@ class TestParamsFromOfxparserTransaction(object):
         assert str(
             OFXTransaction.is_interest_payment.__ne__(True)
         ) == str(kall[1][7])
+
+
+class TestIsFieldMatcher(object):
+
+    def test_combined(self):
+        m = IsFieldMatcher(('^int', None, '.*payment', '^late', '.*fee'))
+        assert m._combined is not None
+        assert m.match('Interest Charge') == {'is_interest_charge'}
+        assert m.match('LATE FEE') == {'is_late_fee', 'is_other_fee'}
+        assert m.match('Online Payment') == {'is_payment'}
+        assert m.match('foo') == set()
+        assert m.match(None) == set()
+
+    def test_not_combined_with_groups(self):
+        m = IsFieldMatcher((r'^(a)\1', None, None, '^b', None))
+        assert m._combined is None
+        assert m.match('AA') == {'is_interest_charge'}
+        assert m.match('ab') == set()
+        assert m.match('bar') == {'is_late_fee'}
+
+    def test_invalid_regex(self):
+        m = IsFieldMatcher(('^int', '(', None, None, None))
+        assert m._combined is None
+        assert m.match('interest') == {'is_interest_charge'}
+
+
+class TestMatcherForAccount(object):
+
+    def setup_method(self):
+        clear_matcher_cache()
+
+    def teardown_method(self):
+        clear_matcher_cache()
+
+    def test_cache(self):
+        acct = Account(id=3, re_payment='^pay')
+        m1 = matcher_for_account(acct)
+        assert matcher_for_account(acct) is m1
+        acct.re_payment = '^payment'
+        m2 = matcher_for_account(acct)
+        assert m2 is not m1
+        assert m2.patterns == (None, None, '^payment', None, None)
+        assert matcher_for_account(acct) is m2
+        clear_matcher_cache(3)
+        assert matcher_for_account(acct) is not m2
+
+    def test_no_id(self):
+        acct = Account(re_payment='^pay')
+        assert matcher_for_account(acct) is not matcher_for_account(acct)
+
+
+class TestUpdateIsFields(object):
+
+    def setup_method(self):
+        clear_matcher_cache()
+
+    def teardown_method(self):
+        clear_matcher_cache()
+
+    def test_update_is_fields(self):
+        acct = Account(
+            id=1, re_interest_charge='^int', re_payment='^pay',
+            re_late_fee='.*fee'
+        )
+        t = OFXTransaction(account=acct, name='Payment Late Fee')
+        t.is_interest_charge = True
+        t.update_is_fields()
+        assert t.is_payment is True
+        assert t.is_late_fee is True
+        assert t.is_interest_charge is False
+        assert t.is_interest_payment is False
+        assert t.is_other_fee is False
+
+    def test_manually_entered(self):
+        acct = Account(id=1, re_payment='.*')
+        t = OFXTransaction(
+            account=acct, name='Interest Charged - MANUALLY ENTERED'
+        )
+        t.is_interest_charge = True
+        t.update_is_fields()
+        assert t.is_interest_charge is True
+        assert t.is_payment is True
+
+    def test_many(self):
+        acct1 = Account(id=1, re_payment='^pay')
+        acct2 = Account(id=2, re_payment='^foo')
+        t1 = OFXTransaction(account=acct1, name='Payment')
+        t2 = OFXTransaction(account_id=2, name='Payment')
+        t3 = OFXTransaction(account_id=2, name='Foo')
+        t4 = OFXTransaction(account_id=4, name='Foo')
+        m_db = Mock()
+        m_db.query.return_value.filter.return_value.all.return_value = [
+            acct2
+        ]
+        OFXTransaction.update_is_fields_many([t1, t2, t3, t4], m_db)
+        assert m_db.query.mock_calls[0] == call(Account)
+        assert m_db.query.return_value.filter.call_count == 1
+        assert t1.is_payment is True
+        assert t2.is_payment is False
+        assert t3.is_payment is True
+        assert t4.is_payment is None
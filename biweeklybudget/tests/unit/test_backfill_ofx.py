@@ -0,0 +1,183 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import os
+import sys
+import shutil
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from biweeklybudget.backfill_ofx import OfxBackfiller, parse_ofx_file
+from biweeklybudget.ofxapi.exceptions import DuplicateFileException
+
+# https://code.google.com/p/mock/issues/detail?id=249
+# py>=3.4 should use unittest.mock not the mock package on pypi
+if (
+        sys.version_info[0] < 3 or
+        sys.version_info[0] == 3 and sys.version_info[1] < 4
+):
+    from mock import patch, call, Mock, DEFAULT  # noqa
+else:
+    from unittest.mock import patch, call, Mock, DEFAULT  # noqa
+
+pbm = 'biweeklybudget.backfill_ofx'
+
+FIXTURE = os.path.abspath(os.path.join(
+    os.path.dirname(__file__), '..', 'fixtures',
+    'CreditOne_2017-07-28_05-30-00.ofx'
+))
+
+
+def make_files(path, names):
+    os.makedirs(str(path))
+    for idx, name in enumerate(names):
+        p = os.path.join(str(path), name)
+        shutil.copy(FIXTURE, p)
+        # oldest first
+        os.utime(p, (1500000000 + idx, 1500000000 + idx))
+
+
+class TestParseOfxFile(object):
+
+    def test_parse(self):
+        ofx, mtime = parse_ofx_file(FIXTURE)
+        assert ofx.account.account_id == 'CreditOneAcctId'
+        assert mtime.tzinfo is not None
+        assert mtime.timestamp() == os.path.getmtime(FIXTURE)
+
+
+class TestOfxBackfiller(object):
+
+    def setup_method(self):
+        self.client = Mock()
+        self.client.get_accounts.return_value = {
+            'acct1': {'id': 3},
+            'acct2': {'id': 5}
+        }
+        self.client.get_statement_filenames.return_value = [
+            [3, 'b.ofx'], [5, 'a.ofx']
+        ]
+        self.client.update_statements_ofx.side_effect = \
+            lambda stmts: [(1, 2, 3) for _ in stmts]
+
+    def written(self):
+        res = []
+        for c in self.client.update_statements_ofx.mock_calls:
+            res.extend(c[1][0])
+        return res
+
+    def test_run_serial(self, tmpdir):
+        make_files(tmpdir.join('acct1'), ['c.qfx', 'b.ofx', 'a.ofx', 'x.txt'])
+        cls = OfxBackfiller(self.client, str(tmpdir))
+        with patch('%s.parse_ofx_file' % pbm, autospec=True) as m_parse:
+            m_parse.side_effect = lambda p: (os.path.basename(p), 'mtime')
+            cls.run()
+        assert m_parse.mock_calls == [
+            call(str(tmpdir.join('acct1', 'c.qfx'))),
+            call(str(tmpdir.join('acct1', 'a.ofx')))
+        ]
+        assert self.client.mock_calls == [
+            call.get_accounts(),
+            call.get_statement_filenames(),
+            call.update_statements_ofx([
+                (3, 'c.qfx', 'mtime', 'c.qfx'),
+                (3, 'a.ofx', 'mtime', 'a.ofx')
+            ])
+        ]
+        assert (3, 'a.ofx') in cls._existing
+        assert cls._executor is None
+
+    def test_run_batches_and_results(self, tmpdir):
+        make_files(tmpdir.join('acct2'), ['c.ofx', 'd.ofx', 'e.ofx'])
+        self.client.update_statements_ofx.side_effect = [
+            [DuplicateFileException(5, 'c.ofx', 2), (3, 1, 0)],
+            [RuntimeError('foo')]
+        ]
+        cls = OfxBackfiller(self.client, str(tmpdir), batch_size=2)
+        with patch('%s.parse_ofx_file' % pbm, autospec=True) as m_parse:
+            m_parse.side_effect = lambda p: (os.path.basename(p), 'mtime')
+            cls.run()
+        assert self.client.update_statements_ofx.mock_calls == [
+            call([(5, 'c.ofx', 'mtime', 'c.ofx'),
+                  (5, 'd.ofx', 'mtime', 'd.ofx')]),
+            call([(5, 'e.ofx', 'mtime', 'e.ofx')])
+        ]
+        assert (5, 'd.ofx') in cls._existing
+        assert (5, 'e.ofx') not in cls._existing
+
+    def test_run_db_error_raised(self, tmpdir):
+        make_files(tmpdir.join('acct2'), ['c.ofx'])
+        self.client.update_statements_ofx.side_effect = [
+            [IntegrityError('stmt', {}, Exception('orig'))]
+        ]
+        cls = OfxBackfiller(self.client, str(tmpdir))
+        with patch('%s.parse_ofx_file' % pbm, autospec=True) as m_parse:
+            m_parse.side_effect = lambda p: (os.path.basename(p), 'mtime')
+            with pytest.raises(IntegrityError):
+                cls.run()
+
+    def test_run_serial_parse_error(self, tmpdir):
+        make_files(tmpdir.join('acct2'), ['c.ofx', 'd.ofx'])
+
+        def se(p):
+            if p.endswith('c.ofx'):
+                raise RuntimeError('foo')
+            return 'd', 'mtime'
+
+        cls = OfxBackfiller(self.client, str(tmpdir))
+        with patch('%s.parse_ofx_file' % pbm, autospec=True) as m_parse:
+            m_parse.side_effect = se
+            cls.run()
+        assert self.written() == [(5, 'd', 'mtime', 'd.ofx')]
+
+    def test_run_parallel(self, tmpdir):
+        names = ['f%d.ofx' % x for x in range(7)]
+        make_files(tmpdir.join('acct1'), names)
+        make_files(tmpdir.join('acct2'), ['a.ofx', 'b.ofx'])
+        cls = OfxBackfiller(self.client, str(tmpdir), jobs=2, batch_size=3)
+        cls.run()
+        assert self.client.update_statements_ofx.call_count == 4
+        written = self.written()
+        assert [x[0] for x in written] == [3] * 7 + [5]
+        assert [x[3] for x in written] == names + ['b.ofx']
+        for x in written:
+            assert x[1].account.account_id == 'CreditOneAcctId'
+        assert [x[2].timestamp() for x in written] == [
+            1500000000 + x for x in range(7)
+        ] + [1500000001]
+        assert cls._executor is None
@@ -0,0 +1,222 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import sys
+import pytest
+from datetime import date
+from decimal import Decimal
+from sqlalchemy.orm.session import Session
+from sqlalchemy.dialects import mysql
+
+from biweeklybudget.balance_history import BalanceHistory
+
+# https://code.google.com/p/mock/issues/detail?id=249
+# py>=3.4 should use unittest.mock not the mock package on pypi
+if (
+        sys.version_info[0] < 3 or
+        sys.version_info[0] == 3 and sys.version_info[1] < 4
+):
+    from mock import Mock, patch, DEFAULT
+else:
+    from unittest.mock import Mock, patch, DEFAULT
+
+pbm = 'biweeklybudget.balance_history'
+pb = '%s.BalanceHistory' % pbm
+
+
+class TestInit(object):
+
+    def test_defaults(self):
+        mock_sess = Mock(spec_set=Session)
+        cls = BalanceHistory(mock_sess)
+        assert cls._db == mock_sess
+        assert cls.start_date is None
+        assert cls.end_date is None
+        assert cls.resolution == 'day'
+        assert cls.max_points == 500
+
+    def test_bad_resolution(self):
+        with pytest.raises(ValueError) as excinfo:
+            BalanceHistory(Mock(), resolution='year')
+        assert 'Invalid resolution "year"' in str(excinfo.value)
+
+    def test_bad_max_points(self):
+        with pytest.raises(ValueError):
+            BalanceHistory(Mock(), max_points=0)
+        with pytest.raises(ValueError):
+            BalanceHistory(Mock(), max_points=5001)
+
+    def test_bad_range(self):
+        with pytest.raises(ValueError):
+            BalanceHistory(
+                Mock(), start_date=date(2017, 2, 1), end_date=date(2017, 1, 1)
+            )
+
+
+class TestBuckets(object):
+
+    def _sql(self, resolution):
+        expr = BalanceHistory(Mock(), resolution=resolution)._bucket_expr()
+        return str(expr.compile(
+            dialect=mysql.dialect(), compile_kwargs={'literal_binds': True}
+        ))
+
+    def test_expr_day(self):
+        assert self._sql('day') == (
+            "datediff(account_balances.overall_date, '1970-01-05')"
+        )
+
+    def test_expr_week(self):
+        assert self._sql('week') == (
+            "floor(datediff(account_balances.overall_date, '1970-01-05') / 7)"
+        )
+
+    def test_expr_month(self):
+        assert self._sql('month') == (
+            '(year(account_balances.overall_date) * 12 + '
+            'month(account_balances.overall_date)) - 1'
+        )
+
+    def test_bucket_date_day(self):
+        cls = BalanceHistory(Mock(), resolution='day')
+        # 2017-07-21 is 17364 days after 1970-01-05
+        assert cls._bucket_date(17364) == date(2017, 7, 21)
+
+    def test_bucket_date_week(self):
+        cls = BalanceHistory(Mock(), resolution='week')
+        assert cls._bucket_date(Decimal('2480')) == date(2017, 7, 17)
+
+    def test_bucket_date_month(self):
+        cls = BalanceHistory(Mock(), resolution='month')
+        assert cls._bucket_date(2017 * 12 + 6) == date(2017, 7, 1)
+        assert cls._bucket_date(2017 * 12 + 11) == date(2017, 12, 1)
+
+
+class TestDownsample(object):
+
+    def test_under_limit(self):
+        points = [1, 2, 3]
+        assert BalanceHistory.downsample(points, 3) is points
+
+    def test_over_limit(self):
+        assert BalanceHistory.downsample(list(range(10)), 3) == [1, 5, 9]
+
+    def test_keeps_last(self):
+        res = BalanceHistory.downsample(list(range(1001)), 500)
+        assert len(res) <= 500
+        assert res[-1] == 1000
+
+
+class TestChartData(object):
+
+    def setup_method(self):
+        self.mock_sess = Mock(spec_set=Session)
+        self.mock_sess.query.return_value = [
+            (1, 'Acct1'), (2, 'Acct2'), (3, 'Acct3')
+        ]
+
+    def test_chart_data(self):
+        with patch.multiple(
+            pb, autospec=True, _initial_balances=DEFAULT,
+            _bucket_balances=DEFAULT
+        ) as mocks:
+            mocks['_initial_balances'].return_value = {3: Decimal('1.5')}
+            mocks['_bucket_balances'].return_value = [
+                (17364, 1, Decimal('10.00')),
+                (17364, 1, Decimal('11.00')),
+                (17366, 2, None),
+                (17366, 1, Decimal('-2.25')),
+                (17370, 2, Decimal('4'))
+            ]
+            res = BalanceHistory(self.mock_sess).chart_data()
+        assert res == {
+            'keys': ['Acct1', 'Acct2', 'Acct3'],
+            'data': [
+                {
+                    'date': '2017-07-21',
+                    'Acct1': 11.0,
+                    'Acct2': None,
+                    'Acct3': 1.5
+                },
+                {
+                    'date': '2017-07-23',
+                    'Acct1': -2.25,
+                    'Acct2': 0.0,
+                    'Acct3': 1.5
+                },
+                {
+                    'date': '2017-07-27',
+                    'Acct1': -2.25,
+                    'Acct2': 4.0,
+                    'Acct3': 1.5
+                }
+            ]
+        }
+
+    def test_downsampled(self):
+        with patch.multiple(
+            pb, autospec=True, _initial_balances=DEFAULT,
+            _bucket_balances=DEFAULT
+        ) as mocks:
+            mocks['_initial_balances'].return_value = {}
+            mocks['_bucket_balances'].return_value = [
+                (17364 + x, 1, Decimal(x)) for x in range(10)
+            ]
+            res = BalanceHistory(self.mock_sess, max_points=3).chart_data()
+        assert [(x['date'], x['Acct1']) for x in res['data']] == [
+            ('2017-07-22', 1.0),
+            ('2017-07-26', 5.0),
+            ('2017-07-30', 9.0)
+        ]
+
+    def test_no_balances(self):
+        with patch.multiple(
+            pb, autospec=True, _initial_balances=DEFAULT,
+            _bucket_balances=DEFAULT
+        ) as mocks:
+            mocks['_initial_balances'].return_value = {}
+            mocks['_bucket_balances'].return_value = []
+            res = BalanceHistory(self.mock_sess).chart_data()
+        assert res == {'keys': ['Acct1', 'Acct2', 'Acct3'], 'data': []}
+
+
+class TestInitialBalances(object):
+
+    def test_no_start_date(self):
+        mock_sess = Mock(spec_set=Session)
+        assert BalanceHistory(mock_sess)._initial_balances() == {}
+        assert mock_sess.mock_calls == []
@@ -36,18 +36,26 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 """
 
 import sys
+import gc
 import pytest
 from datetime import datetime, date, timedelta
 from sqlalchemy.orm.session import Session
 from sqlalchemy import asc
+from sqlalchemy.dialects import mysql
 from decimal import Decimal
 
-from biweeklybudget.biweeklypayperiod import BiweeklyPayPeriod
+from biweeklybudget.biweeklypayperiod import (
+    BiweeklyPayPeriod, clear_period_registry, period_start_for_date,
+    period_start_for_index, period_index_sql
+)
 from biweeklybudget.models.ofx_transaction import OFXTransaction
 from biweeklybudget.models.transaction import Transaction
 from biweeklybudget.models.scheduled_transaction import ScheduledTransaction
 from biweeklybudget.models.budget_model import Budget
 from biweeklybudget.models.budget_transaction import BudgetTransaction
+from biweeklybudget.models.account import Account
+from biweeklybudget.models.pay_period_budget_sum import PayPeriodBudgetSum
+from biweeklybudget.payperiod_entry import PayPeriodEntry
 from biweeklybudget.tests.unit_helpers import binexp_to_dict
 from biweeklybudget.utils import dtnow
 
@@ -112,6 +120,79 @@ class TestProperties(object):
         assert self.cls.previous == BiweeklyPayPeriod(
             date(2017, 3, 3), self.mock_sess)
 
+    def test_next_previous_interned(self):
+        nxt = self.cls.next
+        assert self.cls.next is nxt
+        assert nxt.next.previous is nxt
+        assert nxt.previous.start_date == self.cls.start_date
+        assert nxt.previous is not self.cls
+
+    def test_next_previous_after_clear(self):
+        nxt = self.cls.next
+        prev = self.cls.previous
+        nxt._data_cache['foo'] = 'bar'
+        clear_period_registry(self.mock_sess)
+        assert self.cls.next is not nxt
+        assert self.cls.next._data_cache == {}
+        assert self.cls.previous is not prev
+        assert self.cls.next.start_date == nxt.start_date
+
+
+class TestForStartDate(object):
+
+    def setup_method(self):
+        self.mock_sess = Mock(spec_set=Session)
+        clear_period_registry()
+
+    def test_interned(self):
+        a = BiweeklyPayPeriod.for_start_date(date(2017, 3, 17), self.mock_sess)
+        b = BiweeklyPayPeriod.for_start_date(
+            datetime(2017, 3, 17, 1, 2, 3), self.mock_sess
+        )
+        assert a is b
+        assert a.start_date == date(2017, 3, 17)
+        assert a._db == self.mock_sess
+
+    def test_per_session(self):
+        other = Mock(spec_set=Session)
+        a = BiweeklyPayPeriod.for_start_date(date(2017, 3, 17), self.mock_sess)
+        b = BiweeklyPayPeriod.for_start_date(date(2017, 3, 17), other)
+        assert a is not b
+        assert a == b
+
+    def test_clear_for_session(self):
+        other = Mock(spec_set=Session)
+        a = BiweeklyPayPeriod.for_start_date(date(2017, 3, 17), self.mock_sess)
+        b = BiweeklyPayPeriod.for_start_date(date(2017, 3, 17), other)
+        clear_period_registry(self.mock_sess)
+        assert BiweeklyPayPeriod.for_start_date(
+            date(2017, 3, 17), self.mock_sess) is not a
+        assert BiweeklyPayPeriod.for_start_date(
+            date(2017, 3, 17), other) is b
+
+    def test_clear_on_session_flush(self):
+        sess = Session()
+        a = BiweeklyPayPeriod.for_start_date(date(2017, 3, 17), sess)
+        sess.dispatch.after_flush(sess, Mock())
+        assert BiweeklyPayPeriod.for_start_date(
+            date(2017, 3, 17), sess) is not a
+
+    def test_clear_on_transaction_end(self):
+        sess = Session()
+        a = BiweeklyPayPeriod.for_start_date(date(2017, 3, 17), sess)
+        sess.dispatch.after_transaction_end(sess, Mock())
+        assert BiweeklyPayPeriod.for_start_date(
+            date(2017, 3, 17), sess) is not a
+
+    def test_held_until_cleared(self):
+        a = BiweeklyPayPeriod.for_start_date(date(2017, 3, 17), self.mock_sess)
+        a._sums_cache = {'foo': 'bar'}
+        del a
+        gc.collect()
+        assert BiweeklyPayPeriod.for_start_date(
+            date(2017, 3, 17), self.mock_sess
+        )._sums_cache == {'foo': 'bar'}
+
 
 class TestMagicMethods(object):
 
@@ -170,6 +251,32 @@ class TestForDate(object):
             date(2017, 5, 2), self.mock_sess) == BiweeklyPayPeriod(
             date(2017, 4, 28), self.mock_sess)
 
+    @patch('%s.settings.PAY_PERIOD_START_DATE' % pbm, date(2017, 3, 17))
+    def test_period_for_date_far(self):
+        # 1304 periods after the anchor
+        assert BiweeklyPayPeriod.period_for_date(
+            date(2067, 3, 17), self.mock_sess) == BiweeklyPayPeriod(
+            date(2067, 3, 11), self.mock_sess)
+        assert BiweeklyPayPeriod.period_for_date(
+            datetime(2067, 3, 17, 23, 59, 59), self.mock_sess
+        ) == BiweeklyPayPeriod(date(2067, 3, 11), self.mock_sess)
+        assert BiweeklyPayPeriod.period_for_date(
+            date(1967, 3, 17), self.mock_sess) == BiweeklyPayPeriod(
+            date(1967, 3, 10), self.mock_sess)
+
+    @patch('%s.settings.PAY_PERIOD_START_DATE' % pbm, date(2017, 3, 17))
+    def test_period_for_date_interned(self):
+        a = BiweeklyPayPeriod.period_for_date(
+            date(2017, 3, 20), self.mock_sess
+        )
+        b = BiweeklyPayPeriod.period_for_date(
+            date(2017, 3, 30), self.mock_sess
+        )
+        assert a is b
+        assert a.next is BiweeklyPayPeriod.period_for_date(
+            date(2017, 3, 31), self.mock_sess
+        )
+
 
 class TestFilterQuery(object):
 
@@ -396,6 +503,7 @@ class TestData(object):
         mock_std = Mock()
         mock_stpp = Mock()
         mock_stm = Mock()
+        mock_stm_filtered = Mock()
         mock_stw = Mock()
         mock_sta = Mock()
         mock_sta_filtered = Mock()
@@ -412,6 +520,7 @@ class TestData(object):
             _scheduled_transactions_weekly=DEFAULT,
             _scheduled_transactions_annual=DEFAULT,
             _filter_annual_for_period=DEFAULT,
+            _filter_monthly_for_period=DEFAULT,
             _make_combined_transactions=DEFAULT,
             _make_budget_sums=DEFAULT,
             _make_overall_sums=DEFAULT
@@ -428,6 +537,8 @@ class TestData(object):
             mocks['_scheduled_transactions_annual'
                   ''].return_value.all.return_value = mock_sta
             mocks['_filter_annual_for_period'].return_value = mock_sta_filtered
+            mocks['_filter_monthly_for_period'
+                  ''].return_value = mock_stm_filtered
             mocks['_make_combined_transactions'].return_value = mock_mct
             mocks['_make_budget_sums'].return_value = mock_mbs
             mocks['_make_overall_sums'].return_value = mock_mos
@@ -436,7 +547,7 @@ class TestData(object):
             'transactions': mock_t,
             'st_date': mock_std,
             'st_per_period': mock_stpp,
-            'st_monthly': mock_stm,
+            'st_monthly': mock_stm_filtered,
             'st_weekly': mock_stw,
             'st_annual': mock_sta_filtered,
             'all_trans_list': mock_mct,
@@ -464,6 +575,9 @@ class TestData(object):
         assert mocks['_filter_annual_for_period'].mock_calls == [
             call(self.cls, mock_sta)
         ]
+        assert mocks['_filter_monthly_for_period'].mock_calls == [
+            call(self.cls, mock_stm)
+        ]
         assert mocks['_make_combined_transactions'].mock_calls == [
             call(self.cls)
         ]
@@ -515,6 +629,408 @@ class TestData(object):
         assert mocks['_make_overall_sums'].mock_calls == []
 
 
+class TestPrefetchData(object):
+
+    def setup_method(self):
+        self.mock_sess = Mock(spec_set=Session)
+        self.budgets = [
+            Mock(spec_set=Budget, id=1, is_active=True, is_periodic=True),
+            Mock(spec_set=Budget, id=2, is_active=False, is_periodic=True)
+        ]
+
+        def st(**kwargs):
+            d = {
+                'date': None, 'day_of_month': None, 'num_per_period': None,
+                'day_of_week': None, 'annual_month': None,
+                'annual_day': None, 'amount': Decimal('1.00')
+            }
+            d.update(kwargs)
+            m = Mock(spec_set=ScheduledTransaction, **d)
+            for k, v in [
+                ('date', 'date'), ('day_of_month', 'monthly'),
+                ('num_per_period', 'per period'), ('day_of_week', 'weekly'),
+                ('annual_month', 'annual')
+            ]:
+                if d[k] is not None:
+                    m.schedule_type = v
+                    break
+            return m
+
+        self.t1 = Mock(spec_set=Transaction, date=date(2017, 3, 17))
+        self.t2 = Mock(spec_set=Transaction, date=date(2017, 3, 31))
+        self.t3 = Mock(spec_set=Transaction, date=date(2017, 4, 13))
+        self.std1 = st(date=date(2017, 3, 20))
+        self.std2 = st(date=date(2017, 4, 5))
+        self.std3 = st(date=date(2017, 5, 5))
+        self.stm1 = st(day_of_month=1)
+        self.stm2 = st(day_of_month=20)
+        self.stp1 = st(num_per_period=2, amount=Decimal('5.00'))
+        self.stp2 = st(num_per_period=1, amount=Decimal('9.00'))
+        self.stw1 = st(day_of_week=4, amount=Decimal('2.00'))
+        self.stw2 = st(day_of_week=1, amount=Decimal('3.00'))
+        self.sta1 = st(annual_month=4, annual_day=10)
+        self.results = {
+            Budget: self.budgets,
+            Account: [],
+            Transaction: [self.t1, self.t2, self.t3],
+            ScheduledTransaction: [
+                self.std1, self.std2, self.std3, self.stm1, self.stm2,
+                self.stp1, self.stp2, self.stw1, self.stw2, self.sta1
+            ]
+        }
+
+        def se_query(cls):
+            m = Mock()
+            m.all.return_value = self.results[cls]
+            m.options.return_value = m
+            m.filter.return_value = m
+            m.order_by.return_value = m
+            return m
+
+        self.mock_sess.query.side_effect = se_query
+
+    def test_prefetch(self):
+        p1 = BiweeklyPayPeriod(date(2017, 3, 17), self.mock_sess)
+        p2 = BiweeklyPayPeriod(date(2017, 3, 31), self.mock_sess)
+        with patch.multiple(
+            pb,
+            autospec=True,
+            _make_combined_transactions=DEFAULT,
+            _make_budget_sums=DEFAULT,
+            _make_overall_sums=DEFAULT
+        ) as mocks:
+            BiweeklyPayPeriod.prefetch_data([p2, p1], self.mock_sess)
+        assert self.mock_sess.query.mock_calls == [
+            call(Budget), call(Account), call(Transaction),
+            call(ScheduledTransaction)
+        ]
+        assert p1._data_cache['transactions'] == [self.t1]
+        assert p2._data_cache['transactions'] == [self.t2, self.t3]
+        assert p1._data_cache['st_date'] == [self.std1]
+        assert p2._data_cache['st_date'] == [self.std2]
+        assert p1._data_cache['st_monthly'] == [self.stm2]
+        assert p2._data_cache['st_monthly'] == [self.stm1]
+        for p in [p1, p2]:
+            assert p._data_cache['st_per_period'] == [self.stp2, self.stp1]
+            assert p._data_cache['st_weekly'] == [self.stw2, self.stw1]
+        assert p1._data_cache['st_annual'] == []
+        assert p2._data_cache['st_annual'] == [self.sta1]
+        assert mocks['_make_combined_transactions'].mock_calls == [
+            call(p1), call(p2)
+        ]
+        assert mocks['_make_budget_sums'].mock_calls == [
+            call(p1, budgets=self.budgets), call(p2, budgets=self.budgets)
+        ]
+        assert mocks['_make_overall_sums'].mock_calls == [
+            call(p1), call(p2)
+        ]
+        assert p1.overall_sums == mocks['_make_overall_sums'].return_value
+
+    def test_already_cached(self):
+        p1 = BiweeklyPayPeriod(date(2017, 3, 17), self.mock_sess)
+        p1._data_cache = {'foo': 'bar'}
+        BiweeklyPayPeriod.prefetch_data([p1], self.mock_sess)
+        assert p1._data_cache == {'foo': 'bar'}
+        assert self.mock_sess.mock_calls == []
+
+
+class TestPeriodStartForDate(object):
+
+    def test_date(self):
+        assert period_start_for_date(date(2017, 3, 17)) == date(2017, 3, 17)
+        assert period_start_for_date(date(2017, 3, 30)) == date(2017, 3, 17)
+        assert period_start_for_date(date(2017, 3, 31)) == date(2017, 3, 31)
+
+    def test_datetime(self):
+        assert period_start_for_date(
+            datetime(2017, 3, 30, 23, 59, 59)
+        ) == date(2017, 3, 17)
+
+    def test_before_start(self):
+        assert period_start_for_date(date(2017, 3, 16)) == date(2017, 3, 3)
+
+
+class TestPeriodStartForIndex(object):
+
+    def test_zero(self):
+        assert period_start_for_index(0) == date(2017, 7, 21)
+
+    def test_positive(self):
+        assert period_start_for_index(2) == date(2017, 8, 18)
+
+    def test_negative(self):
+        assert period_start_for_index(-1) == date(2017, 7, 7)
+
+    def test_decimal(self):
+        # MySQL FLOOR() results may come back as Decimal
+        assert period_start_for_index(Decimal('1')) == date(2017, 8, 4)
+
+    def test_round_trip(self):
+        for d in [date(2016, 12, 25), date(2017, 7, 21), date(2019, 7, 4)]:
+            idx = (d - date(2017, 7, 21)).days // 14
+            assert period_start_for_index(idx) == period_start_for_date(d)
+
+
+class TestPeriodIndexSql(object):
+
+    def test_expression(self):
+        expr = period_index_sql(Transaction.date)
+        sql = str(expr.compile(
+            dialect=mysql.dialect(), compile_kwargs={'literal_binds': True}
+        ))
+        assert sql == (
+            "floor(datediff(transactions.date, '2017-07-21') / 14)"
+        )
+
+
+class TestLoadBudgetSums(object):
+
+    def setup_method(self):
+        self.mock_sess = Mock(spec_set=Session)
+        self.budgets = [
+            Mock(spec_set=Budget, id=1, is_active=True, is_periodic=True)
+        ]
+        self.rows = [
+            Mock(spec_set=PayPeriodBudgetSum, start_date=date(2017, 3, 17))
+        ]
+        self.results = {
+            Budget: self.budgets,
+            PayPeriodBudgetSum: self.rows
+        }
+
+        def se_query(cls):
+            m = Mock()
+            m.all.return_value = self.results[cls]
+            m.filter.return_value = m
+            return m
+
+        self.mock_sess.query.side_effect = se_query
+
+    def test_load(self):
+        p1 = BiweeklyPayPeriod(date(2017, 3, 17), self.mock_sess)
+        p2 = BiweeklyPayPeriod(date(2017, 3, 31), self.mock_sess)
+        p3 = BiweeklyPayPeriod(date(2017, 4, 14), self.mock_sess)
+        p3._data_cache = {'foo': 'bar'}
+
+        def se_prefetch(periods, _):
+            for p in periods:
+                p._data_cache = {'budget_sums': {}, 'overall_sums': {}}
+
+        with patch.multiple(
+            pb,
+            autospec=True,
+            _budget_sums_from_rows=DEFAULT,
+            _make_overall_sums=DEFAULT,
+            prefetch_data=DEFAULT
+        ) as mocks:
+            mocks['prefetch_data'].side_effect = se_prefetch
+            BiweeklyPayPeriod.load_budget_sums([p3, p2, p1], self.mock_sess)
+            assert p1.budget_sums is mocks[
+                '_budget_sums_from_rows'].return_value
+            assert p1.overall_sums is mocks['_make_overall_sums'].return_value
+        assert p1._data_cache == {}
+        assert p2.budget_sums == {}
+        assert mocks['_budget_sums_from_rows'].mock_calls == [
+            call(p1, self.rows, self.budgets)
+        ]
+        assert mocks['_make_overall_sums'].mock_calls == [
+            call(p1, budget_sums=mocks['_budget_sums_from_rows'].return_value)
+        ]
+        assert mocks['prefetch_data'].mock_calls == [
+            call([p2], self.mock_sess)
+        ]
+        assert p3._data_cache == {'foo': 'bar'}
+
+    def test_missing_not_stored(self):
+        self.results[PayPeriodBudgetSum] = []
+        p1 = BiweeklyPayPeriod(date(2017, 3, 17), self.mock_sess)
+        with patch('%s.prefetch_data' % pb, autospec=True) as mock_prefetch:
+            BiweeklyPayPeriod.load_budget_sums([p1], self.mock_sess)
+        assert mock_prefetch.mock_calls == [call([p1], self.mock_sess)]
+        assert self.mock_sess.add.mock_calls == []
+        assert self.mock_sess.add_all.mock_calls == []
+        assert self.mock_sess.execute.mock_calls == []
+        assert self.mock_sess.flush.mock_calls == []
+        assert self.mock_sess.commit.mock_calls == []
+
+    def test_nothing_to_load(self):
+        p1 = BiweeklyPayPeriod(date(2017, 3, 17), self.mock_sess)
+        p1._sums_cache = {'budget_sums': {}, 'overall_sums': {}}
+        BiweeklyPayPeriod.load_budget_sums([p1], self.mock_sess)
+        assert self.mock_sess.mock_calls == []
+
+
+class TestStoreBudgetSums(object):
+
+    def test_store(self):
+        mock_sess = Mock(spec_set=Session)
+        dates = {date(2017, 3, 31), date(2017, 3, 17)}
+        stored = []
+
+        def se_prefetch(periods, _):
+            stored.extend(periods)
+
+        def se_rows(p):
+            return [{'start_date': p.start_date}]
+
+        with patch.multiple(
+            pb,
+            autospec=True,
+            _budget_sum_rows=DEFAULT,
+            prefetch_data=DEFAULT
+        ) as mocks:
+            with patch('%s.PayPeriodBudgetSum' % pbm) as mock_ppbs:
+                with patch('%s.insert' % pbm) as mock_insert:
+                    mocks['prefetch_data'].side_effect = se_prefetch
+                    mocks['_budget_sum_rows'].side_effect = se_rows
+                    BiweeklyPayPeriod.store_budget_sums(dates, mock_sess)
+        assert [p.start_date for p in stored] == [
+            date(2017, 3, 17), date(2017, 3, 31)
+        ]
+        assert mock_ppbs.mock_calls == [call.invalidate(mock_sess, dates)]
+        assert mock_insert.mock_calls == [call(mock_ppbs)]
+        assert mock_sess.mock_calls == [
+            call.execute(
+                mock_insert.return_value, [
+                    {'start_date': date(2017, 3, 17)},
+                    {'start_date': date(2017, 3, 31)}
+                ]
+            )
+        ]
+
+    def test_no_dates(self):
+        mock_sess = Mock(spec_set=Session)
+        with patch('%s.prefetch_data' % pb, autospec=True) as mock_prefetch:
+            BiweeklyPayPeriod.store_budget_sums(set(), mock_sess)
+        assert mock_prefetch.mock_calls == []
+        assert mock_sess.mock_calls == []
+
+
+class TestBudgetSumRows(object):
+
+    def test_rows(self):
+        cls = BiweeklyPayPeriod(date(2017, 3, 17), Mock(spec_set=Session))
+        cls._data_cache = {
+            'all_trans_list': [
+                {
+                    'budgets': {1: {}, 2: {}},
+                    'budgeted_amount': Decimal('1.00'),
+                    'planned_budget_id': 3
+                },
+                {
+                    'budgets': {1: {}},
+                    'budgeted_amount': Decimal('1.00'),
+                    'planned_budget_id': 1
+                },
+                {
+                    'budgets': {2: {}},
+                    'budgeted_amount': None
+                }
+            ],
+            'budget_sums': {
+                1: {
+                    'allocated': Decimal('1.00'),
+                    'spent': Decimal('2.00'),
+                    'trans_total': Decimal('3.00')
+                },
+                3: {
+                    'allocated': Decimal('4.00'),
+                    'spent': Decimal('5.00'),
+                    'trans_total': Decimal('6.00')
+                },
+                4: {
+                    'allocated': Decimal('0.0'),
+                    'spent': Decimal('0.0'),
+                    'trans_total': Decimal('0.0')
+                }
+            }
+        }
+        res = cls._budget_sum_rows()
+        assert [
+            (
+                r['start_date'], r['budget_id'], r['allocated'], r['spent'],
+                r['trans_total'], r['trans_count']
+            ) for r in res
+        ] == [
+            (
+                date(2017, 3, 17), 1, Decimal('1.00'), Decimal('2.00'),
+                Decimal('3.00'), 2
+            ),
+            (
+                date(2017, 3, 17), 3, Decimal('4.00'), Decimal('5.00'),
+                Decimal('6.00'), 1
+            ),
+            (
+                date(2017, 3, 17), 4, Decimal('0.0'), Decimal('0.0'),
+                Decimal('0.0'), 0
+            )
+        ]
+
+
+class TestBudgetSumsFromRows(object):
+
+    def test_rows(self):
+        cls = BiweeklyPayPeriod(date(2017, 3, 17), Mock(spec_set=Session))
+
+        def budg(id, is_active=True, is_periodic=True, is_income=False):
+            return Mock(
+                spec_set=Budget, id=id, is_active=is_active,
+                is_periodic=is_periodic, is_income=is_income,
+                starting_balance=Decimal('100.00')
+            )
+
+        def row(budget_id, trans_count=1):
+            return Mock(
+                spec_set=PayPeriodBudgetSum, budget_id=budget_id,
+                allocated=Decimal('10.00'), spent=Decimal('20.00'),
+                trans_total=Decimal('30.00'), trans_count=trans_count
+            )
+
+        budgets = [
+            budg(1),
+            budg(2),
+            budg(3, is_active=False),
+            budg(4, is_active=False),
+            budg(5, is_periodic=False),
+            budg(6, is_income=True)
+        ]
+        rows = [row(1), row(3), row(4, trans_count=0), row(5), row(6)]
+        assert cls._budget_sums_from_rows(rows, budgets) == {
+            1: {
+                'budget_amount': Decimal('100.00'),
+                'allocated': Decimal('10.00'),
+                'spent': Decimal('20.00'),
+                'trans_total': Decimal('30.00'),
+                'is_income': False,
+                'remaining': Decimal('70.00')
+            },
+            2: {
+                'budget_amount': Decimal('100.00'),
+                'allocated': Decimal('0.0'),
+                'spent': Decimal('0.0'),
+                'trans_total': Decimal('0.0'),
+                'is_income': False,
+                'remaining': Decimal('100.00')
+            },
+            3: {
+                'budget_amount': Decimal('100.00'),
+                'allocated': Decimal('10.00'),
+                'spent': Decimal('20.00'),
+                'trans_total': Decimal('30.00'),
+                'is_income': False,
+                'remaining': Decimal('70.00')
+            },
+            6: {
+                'budget_amount': Decimal('100.00'),
+                'allocated': Decimal('10.00'),
+                'spent': Decimal('20.00'),
+                'trans_total': Decimal('30.00'),
+                'is_income': True,
+                'remaining': Decimal('70.00')
+            }
+        }
+
+
 class TestMakeCombinedTransactions(object):
 
     def setup_method(self):
@@ -525,13 +1041,15 @@ class TestMakeCombinedTransactions(object):
 
         def se_trans_dict(_, t):
             if t._mock_name.startswith('per_period'):
-                return {'name': t._mock_name, 'amount': t.amount}
-            print(t)
-            return {
-                'date': date(year=2017, month=3, day=t.day),
-                'name': t._mock_name,
-                'amount': t.amount
-            }
+                d = None
+            else:
+                d = date(year=2017, month=3, day=t.day)
+            return PayPeriodEntry(
+                type='ScheduledTransaction', id=None, date=d, sched_type=None,
+                sched_trans_id=None, description=t._mock_name,
+                amount=t.amount, budgeted_amount=None, account_id=None,
+                account_name=None, reconcile_id=None, budgets={}
+            )
 
         mock_per_periodA = Mock(num_per_period=1, name='per_period_A', amount=8)
         mock_per_periodB = Mock(num_per_period=3, name='per_period_B', amount=9)
@@ -559,36 +1077,16 @@ class TestMakeCombinedTransactions(object):
         with patch('%s._trans_dict' % pb, autospec=True) as mock_t_dict:
             mock_t_dict.side_effect = se_trans_dict
             res = self.cls._make_combined_transactions()
-        assert res == [
-            {'name': 'per_period_A', 'amount': 8},
-            {'name': 'per_period_B', 'amount': 9},
-            {'name': 'per_period_B', 'amount': 9},
-            {'name': 'per_period_B', 'amount': 9},
-            {
-                'name': 't1',
-                'date': date(year=2017, month=3, day=1),
-                'amount': 1
-            },
-            {
-                'name': 'stm1',
-                'date': date(year=2017, month=3, day=3),
-                'amount': 6
-            },
-            {
-                'name': 't2',
-                'date': date(year=2017, month=3, day=4),
-                'amount': 2
-            },
-            {
-                'name': 'std2',
-                'date': date(year=2017, month=3, day=5),
-                'amount': 5
-            },
-            {
-                'name': 't3',
-                'date': date(2017, 3, 6),
-                'amount': 3
-            }
+        assert [(x['description'], x['date'], x['amount']) for x in res] == [
+            ('per_period_A', None, 8),
+            ('per_period_B', None, 9),
+            ('per_period_B', None, 9),
+            ('per_period_B', None, 9),
+            ('t1', date(year=2017, month=3, day=1), 1),
+            ('stm1', date(year=2017, month=3, day=3), 6),
+            ('t2', date(year=2017, month=3, day=4), 2),
+            ('std2', date(year=2017, month=3, day=5), 5),
+            ('t3', date(2017, 3, 6), 3)
         ]
 
 
@@ -714,6 +1212,46 @@ class TestMakeBudgetSums(object):
             assert str(kall[1][idx]) == str(expected[idx])
         assert self.mock_sess.mock_calls[2] == call.query().filter().all()
 
+    def test_budgets_given(self):
+        self.cls._data_cache = {
+            'all_trans_list': [
+                {
+                    'type': 'Transaction',
+                    'amount': Decimal('22.22'),
+                    'budgeted_amount': None,
+                    'budgets': {
+                        1: {'name': 'foo', 'amount': Decimal('22.22')}
+                    }
+                }
+            ]
+        }
+        budgets = [
+            Mock(
+                spec_set=Budget, id=1, is_active=True, is_periodic=True,
+                starting_balance=Decimal('100.00'), is_income=False
+            ),
+            Mock(
+                spec_set=Budget, id=2, is_active=False, is_periodic=True,
+                starting_balance=Decimal('200.00'), is_income=False
+            ),
+            Mock(
+                spec_set=Budget, id=3, is_active=True, is_periodic=False,
+                starting_balance=Decimal('300.00'), is_income=False
+            )
+        ]
+        res = self.cls._make_budget_sums(budgets=budgets)
+        assert res == {
+            1: {
+                'budget_amount': Decimal('100.00'),
+                'allocated': Decimal('22.22'),
+                'spent': Decimal('22.22'),
+                'trans_total': Decimal('22.22'),
+                'is_income': False,
+                'remaining': Decimal('77.78')
+            }
+        }
+        assert self.mock_sess.mock_calls == []
+
     def test_actual_income(self):
         self.cls._data_cache = {
             'all_trans_list': [
@@ -835,6 +1373,30 @@ class TestMakeOverallSums(object):
     def setup_method(self):
         self.mock_sess = Mock(spec_set=Session)
 
+    def test_budget_sums_given(self):
+        cls = BiweeklyPayPeriod(date(2017, 3, 7), self.mock_sess)
+        assert cls._make_overall_sums(budget_sums={
+            1: {
+                'budget_amount': Decimal('123.45'),
+                'allocated': Decimal('53.53'),
+                'spent': Decimal('44.44'),
+                'trans_total': Decimal('55.55'),
+                'is_income': False
+            },
+            2: {
+                'budget_amount': Decimal('0.0'),
+                'allocated': Decimal('-1192.56'),
+                'spent': Decimal('-254.38'),
+                'trans_total': Decimal('-1234.56'),
+                'is_income': True
+            }
+        }) == {
+            'allocated': Decimal('123.45'),
+            'spent': Decimal('44.44'),
+            'income': Decimal('1234.56'),
+            'remaining': Decimal('1190.12')
+        }
+
     def test_past(self):
         cls = BiweeklyPayPeriod(date(2017, 3, 7), self.mock_sess)
         assert cls.is_in_past is True
@@ -1580,6 +2142,67 @@ class TestFilterAnnualForPeriod(object):
         assert result == []
 
 
+class TestFilterMonthlyForPeriod(object):
+
+    def setup_method(self):
+        self.mock_sess = Mock(spec_set=Session)
+
+    def test_in_period(self):
+        # Pay period 2017-03-17 to 2017-03-30
+        cls = BiweeklyPayPeriod(date(2017, 3, 17), self.mock_sess)
+        m_trans1 = Mock(spec_set=ScheduledTransaction, day_of_month=17)
+        m_trans2 = Mock(spec_set=ScheduledTransaction, day_of_month=30)
+        m_trans3 = Mock(spec_set=ScheduledTransaction, day_of_month=31)
+        result = cls._filter_monthly_for_period(
+            [m_trans1, m_trans2, m_trans3]
+        )
+        assert result == [m_trans1, m_trans2]
+
+    def test_day_31_in_30_day_month(self):
+        # Pay period 2017-04-28 to 2017-05-11; there is no April 31st
+        cls = BiweeklyPayPeriod(date(2017, 4, 28), self.mock_sess)
+        m_trans1 = Mock(spec_set=ScheduledTransaction, day_of_month=30)
+        m_trans2 = Mock(spec_set=ScheduledTransaction, day_of_month=31)
+        m_trans3 = Mock(spec_set=ScheduledTransaction, day_of_month=5)
+        result = cls._filter_monthly_for_period(
+            [m_trans1, m_trans2, m_trans3]
+        )
+        assert result == [m_trans1, m_trans3]
+        assert cls._monthly_date(30) == date(2017, 4, 30)
+        assert cls._monthly_date(31) is None
+        assert cls._monthly_date(5) == date(2017, 5, 5)
+
+    def test_day_31_in_february(self):
+        # Pay period 2017-02-17 to 2017-03-02
+        cls = BiweeklyPayPeriod(date(2017, 2, 17), self.mock_sess)
+        for day in [29, 30, 31]:
+            assert cls._monthly_date(day) is None
+        assert cls._monthly_date(28) == date(2017, 2, 28)
+        assert cls._monthly_date(1) == date(2017, 3, 1)
+        # Pay period 2020-02-21 to 2020-03-05 is in a leap year
+        cls = BiweeklyPayPeriod(date(2020, 2, 21), self.mock_sess)
+        assert cls._monthly_date(29) == date(2020, 2, 29)
+        assert cls._monthly_date(30) is None
+
+    def test_sched_trans_date(self):
+        # Pay period 2017-02-17 to 2017-03-02
+        cls = BiweeklyPayPeriod(date(2017, 2, 17), self.mock_sess)
+        m_monthly = Mock(
+            spec_set=ScheduledTransaction, schedule_type='monthly',
+            day_of_month=31
+        )
+        m_annual = Mock(
+            spec_set=ScheduledTransaction, schedule_type='annual',
+            annual_month=2, annual_day=29
+        )
+        assert cls._sched_trans_date(m_monthly) is None
+        assert cls._sched_trans_date(m_annual) is None
+        # Pay period 2020-02-21 to 2020-03-05 is in a leap year
+        cls = BiweeklyPayPeriod(date(2020, 2, 21), self.mock_sess)
+        assert cls._sched_trans_date(m_monthly) is None
+        assert cls._sched_trans_date(m_annual) == date(2020, 2, 29)
+
+
 class TestDatesForWeekdayInPeriod(object):
 
     def setup_method(self):
@@ -0,0 +1,106 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import sys
+from decimal import Decimal
+
+from biweeklybudget.db import bulk_upsert_records
+from biweeklybudget.models import Budget, OFXTransaction
+
+# https://code.google.com/p/mock/issues/detail?id=249
+# py>=3.4 should use unittest.mock not the mock package on pypi
+if (
+        sys.version_info[0] < 3 or
+        sys.version_info[0] == 3 and sys.version_info[1] < 4
+):
+    from mock import patch, call, Mock, DEFAULT  # noqa
+else:
+    from unittest.mock import patch, call, Mock, DEFAULT  # noqa
+
+pbm = 'biweeklybudget.db'
+
+
+class TestBulkUpsertRecords(object):
+
+    def test_compound_key(self):
+        existing = OFXTransaction(
+            account_id=1, fitid='B', amount=Decimal('1.00'), name='old'
+        )
+        records = [
+            {'account_id': 1, 'fitid': 'A', 'amount': Decimal('2.00')},
+            {'account_id': 1, 'fitid': 'B', 'amount': Decimal('3.00')},
+            {'account_id': 1, 'fitid': 'C', 'amount': Decimal('4.00')},
+            {'account_id': 1, 'fitid': 'B', 'amount': Decimal('5.00')},
+            {'account_id': 1, 'fitid': 'A', 'amount': Decimal('6.00')}
+        ]
+        with patch('%s.db_session' % pbm) as mock_sess:
+            with patch('%s.BULK_UPSERT_BATCH_SIZE' % pbm, 2):
+                mock_sess.query.return_value.filter.return_value.all \
+                    .side_effect = [[existing], [], []]
+                res = bulk_upsert_records(
+                    OFXTransaction, ['account_id', 'fitid'], records
+                )
+        assert res == (2, 1)
+        # batches: [A, B] looks up both; [C, B] looks up C; [A] looks up none
+        assert mock_sess.query.mock_calls.count(call(OFXTransaction)) == 2
+        added = [c[1][0] for c in mock_sess.add.mock_calls]
+        assert [(o.fitid, o.amount) for o in added] == [
+            ('A', Decimal('6.00')), ('C', Decimal('4.00'))
+        ]
+        assert existing.amount == Decimal('5.00')
+        assert existing.name == 'old'
+
+    def test_single_key(self):
+        existing = Budget(id=2, name='two')
+        records = [
+            {'id': 2, 'name': 'two-new'},
+            {'id': 3, 'name': 'three'}
+        ]
+        with patch('%s.db_session' % pbm) as mock_sess:
+            mock_sess.query.return_value.filter.return_value.all \
+                .return_value = [existing]
+            res = bulk_upsert_records(Budget, 'id', records)
+        assert res == (1, 1)
+        assert existing.name == 'two-new'
+        assert len(mock_sess.add.mock_calls) == 1
+        assert mock_sess.add.mock_calls[0][1][0].name == 'three'
+
+    def test_empty(self):
+        with patch('%s.db_session' % pbm) as mock_sess:
+            res = bulk_upsert_records(OFXTransaction, ['account_id', 'fitid'], [])
+        assert res == (0, 0)
+        assert mock_sess.mock_calls == []
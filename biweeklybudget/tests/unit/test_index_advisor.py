@@ -0,0 +1,160 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import sys
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm.session import Session
+
+from biweeklybudget.index_advisor import Explain, IndexAdvisor
+from biweeklybudget.models import Transaction
+
+# https://code.google.com/p/mock/issues/detail?id=249
+# py>=3.4 should use unittest.mock not the mock package on pypi
+if (
+        sys.version_info[0] < 3 or
+        sys.version_info[0] == 3 and sys.version_info[1] < 4
+):
+    from mock import patch, call, Mock, DEFAULT  # noqa
+else:
+    from unittest.mock import patch, call, Mock, DEFAULT  # noqa
+
+pbm = 'biweeklybudget.index_advisor'
+
+
+class TestExplain(object):
+
+    def test_compile(self):
+        stmt = select(Transaction.id).where(Transaction.account_id == 2)
+        res = str(Explain(stmt).compile(dialect=mysql.dialect()))
+        assert res == 'EXPLAIN SELECT transactions.id \n' \
+                      'FROM transactions \n' \
+                      'WHERE transactions.account_id = %s'
+
+
+class TestFullScans(object):
+
+    def test_full_scans(self):
+        rows = [
+            {'table': 't1', 'type': 'ALL', 'rows': 10},
+            {'table': 't2', 'type': 'ref', 'rows': 5000},
+            {'table': 't3', 'type': 'ALL', 'rows': 5000},
+            {'table': 't4', 'type': 'range', 'rows': 3},
+            {'table': 't5', 'type': 'ALL', 'rows': None}
+        ]
+        assert IndexAdvisor.full_scans(rows) == [rows[0], rows[2], rows[4]]
+        assert IndexAdvisor.full_scans(rows, min_rows=100) == [rows[2]]
+
+
+class TestCheck(object):
+
+    def test_check(self):
+        mock_sess = Mock(spec_set=Session)
+        cls = IndexAdvisor(mock_sess)
+        q1 = Mock()
+        q2 = Mock()
+        explains = {
+            q1: [
+                {
+                    'table': 'transactions', 'type': 'ALL', 'rows': 500,
+                    'possible_keys': None, 'Extra': 'Using where'
+                },
+                {
+                    'table': 'accounts', 'type': 'eq_ref', 'rows': 1,
+                    'possible_keys': 'PRIMARY', 'Extra': None
+                }
+            ],
+            q2: [
+                {
+                    'table': 'fuellog', 'type': 'range', 'rows': 5,
+                    'possible_keys': 'ix_fuellog_vehicle_id_odometer_miles',
+                    'Extra': 'Using where'
+                }
+            ]
+        }
+        with patch.multiple(
+            '%s.IndexAdvisor' % pbm,
+            queries=DEFAULT, explain=DEFAULT
+        ) as mocks:
+            mocks['queries'].return_value = [('one', q1), ('two', q2)]
+            mocks['explain'].side_effect = lambda q: explains[q]
+            res = cls.check()
+        assert res == [
+            'one: full scan of table transactions (rows=500, '
+            'possible_keys=None, Extra=Using where)'
+        ]
+        assert mocks['explain'].mock_calls == [call(q1), call(q2)]
+
+    def test_check_expected_full_scans(self):
+        mock_sess = Mock(spec_set=Session)
+        cls = IndexAdvisor(mock_sess)
+        q1 = Mock()
+        q2 = Mock()
+        explains = {
+            q1: [
+                {
+                    'table': 'accounts', 'type': 'ALL', 'rows': 20,
+                    'possible_keys': None, 'Extra': None
+                },
+                {
+                    'table': 'account_balances', 'type': 'ALL', 'rows': 9,
+                    'possible_keys': None, 'Extra': None
+                }
+            ],
+            q2: [
+                {
+                    'table': 'accounts', 'type': 'ALL', 'rows': 20,
+                    'possible_keys': None, 'Extra': None
+                }
+            ]
+        }
+        with patch.multiple(
+            '%s.IndexAdvisor' % pbm,
+            queries=DEFAULT, explain=DEFAULT
+        ) as mocks:
+            mocks['queries'].return_value = [
+                ('Accounts with latest balance and statement', q1),
+                ('two', q2)
+            ]
+            mocks['explain'].side_effect = lambda q: explains[q]
+            res = cls.check()
+        assert res == [
+            'Accounts with latest balance and statement: full scan of table '
+            'account_balances (rows=9, possible_keys=None, Extra=None)',
+            'two: full scan of table accounts (rows=20, possible_keys=None, '
+            'Extra=None)'
+        ]
@@ -35,7 +35,12 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 ################################################################################
 """
 
+import os
 import sys
+import json
+import itertools
+import time
+import random
 from datetime import date, timedelta
 from sqlalchemy.orm.session import Session
 import pytest
@@ -51,14 +56,19 @@ from biweeklybudget.interest import (
     _PayoffMethod, MinPaymentMethod, FixedPaymentMethod,
     LowestBalanceFirstMethod, HighestBalanceFirstMethod,
     LowestInterestRateFirstMethod, HighestInterestRateFirstMethod,
-    calculate_payoffs, CCStatement,
+    calculate_payoffs, CCStatement, payment_settings_kwargs, payoffs_job,
+    PayoffSimulation, _period_starting, _next_period, _payment_runs,
+    _payoff_method_process, payoffs_to_json, payoffs_from_json,
+    sweep_amounts, MAX_SWEEP_POINTS,
     INTEREST_CALCULATION_NAMES, MIN_PAYMENT_FORMULA_NAMES,
     PAYOFF_METHOD_NAMES
 )
+from biweeklybudget import settings
 from biweeklybudget.utils import dtnow
 from biweeklybudget.models.account import Account, AcctType
 from biweeklybudget.tests.unit_helpers import binexp_to_dict
 from biweeklybudget.models.account_balance import AccountBalance
+from biweeklybudget.models.credit_payoff_result import CreditPayoffResult
 
 
 # https://code.google.com/p/mock/issues/detail?id=249
@@ -83,6 +93,16 @@ def pctdiff(a, b):
     return abs(a - b) / abs(a)
 
 
+def sleeping_payoff_process(conn, payment_method, statements):
+    """Worker process target for payoff methods, that never finishes"""
+    time.sleep(60)
+
+
+def exiting_payoff_process(conn, payment_method, statements):
+    """Worker process target for payoff methods, that exits without a result"""
+    os._exit(3)
+
+
 class FixedInterest(_InterestCalculation):
     """
     Test class for fixed interest amount.
@@ -272,10 +292,248 @@ class TestInterestHelper(object):
             }
         }
         assert mock_cpm.mock_calls == [
-            call(pm1.return_value),
-            call(pm2.return_value)
+            call(pm1.return_value, timeout=settings.PAYOFF_METHOD_TIMEOUT),
+            call(pm2.return_value, timeout=settings.PAYOFF_METHOD_TIMEOUT)
+        ]
+
+    def test_payoff_sweep(self):
+        amounts = [Decimal('100.00'), Decimal('250.00'), Decimal('600.00')]
+        res = self.cls.payoff_sweep(amounts)
+        assert sorted(res.keys()) == sorted(
+            k for k, v in PAYOFF_METHOD_NAMES.items() if v['cls'].show_in_ui
+        )
+        for name, r in res.items():
+            cls = PAYOFF_METHOD_NAMES[name]['cls']
+            assert r['description'] == PAYOFF_METHOD_NAMES[name]['description']
+            assert [x['max_total'] for x in r['results']] == amounts
+            for x in r['results']:
+                if cls.uses_max_total and x['max_total'] < Decimal('200'):
+                    assert 'error' in x
+                    continue
+                calc = self.cls._calc_payoff_method(cls(x['max_total']))
+                assert x == {
+                    'max_total': x['max_total'],
+                    'payoff_months': max(
+                        c['payoff_months'] for c in calc.values()
+                    ),
+                    'total_payments': sum(
+                        c['total_payments'] for c in calc.values()
+                    ),
+                    'total_interest': sum(
+                        c['total_interest'] for c in calc.values()
+                    )
+                }
+
+    def test_calculate_payoffs_progress(self):
+        pm1 = Mock()
+        pm2 = Mock()
+        type(pm2).show_in_ui = False
+        pm3 = Mock()
+        meth_names = {
+            'PM1': {'description': 'd1', 'doc': 'doc1', 'cls': pm1},
+            'PM2': {'description': 'd2', 'doc': 'doc2', 'cls': pm2},
+            'PM3': {'description': 'd3', 'doc': 'doc3', 'cls': pm3}
+        }
+        mock_progress = Mock()
+        with patch('%s.PAYOFF_METHOD_NAMES' % pbm, meth_names):
+            with patch('%s._calc_payoff_method' % pb) as mock_cpm:
+                mock_cpm.side_effect = ['res1', RuntimeError('foo')]
+                res = self.cls.calculate_payoffs(progress=mock_progress)
+        assert sorted(res.keys()) == ['PM1', 'PM3']
+        assert res['PM3']['error'] == 'foo'
+        assert mock_progress.mock_calls == [
+            call(1, 2, 'PM1'),
+            call(2, 2, 'PM3')
+        ]
+        assert pm2.mock_calls == []
+
+    def test_calculate_payoffs_parallel(self):
+        mock_progress = Mock()
+        res = self.cls.calculate_payoffs(
+            progress=mock_progress, workers=3, timeout=30
+        )
+        assert res == self.cls.calculate_payoffs(workers=1)
+        assert len(mock_progress.mock_calls) == len(res)
+        assert [c[1][0] for c in mock_progress.mock_calls] == list(
+            range(1, len(res) + 1)
+        )
+        assert sorted(c[1][2] for c in mock_progress.mock_calls) == sorted(
+            res.keys()
+        )
+        for name in res.keys():
+            assert 'error' not in res[name]
+
+    def test_calculate_payoffs_parallel_no_timeout(self):
+        res = self.cls.calculate_payoffs(workers=2, timeout=0)
+        assert res == self.cls.calculate_payoffs(workers=1)
+        for name in res.keys():
+            assert 'error' not in res[name]
+            assert 'results' in res[name]
+
+    def test_calculate_payoffs_parallel_settings(self):
+        with patch('%s.settings' % pbm) as mock_settings:
+            mock_settings.PAYOFF_WORKERS = 2
+            mock_settings.PAYOFF_METHOD_TIMEOUT = 45
+            with patch('%s._calc_payoff_methods_parallel' % pb) as mock_par:
+                mock_par.return_value = []
+                self.cls.calculate_payoffs()
+        assert len(mock_par.mock_calls) == 1
+        assert mock_par.mock_calls[0][1][1:] == (2, 45)
+
+    def test_calculate_payoffs_parallel_error(self):
+        with patch('%s.calculate_payoffs' % pbm) as mock_calc:
+            mock_calc.side_effect = TypeError('total too low')
+            res = self.cls.calculate_payoffs(workers=2, timeout=30)
+        for name in res.keys():
+            assert 'results' not in res[name]
+            assert res[name]['error'] == 'total too low'
+
+    def test_calculate_payoffs_parallel_timeout(self):
+        start = time.monotonic()
+        with patch(
+            '%s._payoff_method_process' % pbm, sleeping_payoff_process
+        ):
+            res = self.cls.calculate_payoffs(workers=2, timeout=0.2)
+        assert time.monotonic() - start < 30
+        for name in res.keys():
+            assert 'results' not in res[name]
+            assert res[name]['error'] == 'Timed out after 0.2 seconds'
+
+    def test_calculate_payoffs_parallel_exit(self):
+        with patch(
+            '%s._payoff_method_process' % pbm, exiting_payoff_process
+        ):
+            res = self.cls.calculate_payoffs(workers=2, timeout=30)
+        for name in res.keys():
+            assert res[name]['error'] == 'Worker process exited with code 3'
+
+    def test_payoff_method_process(self):
+        mock_conn = Mock()
+        with patch('%s.calculate_payoffs' % pbm) as mock_calc:
+            mock_calc.return_value = [(1, Decimal('2'), Decimal('3'))]
+            _payoff_method_process(mock_conn, 'meth', ['s1'])
+        assert mock_calc.mock_calls == [call('meth', ['s1'])]
+        assert mock_conn.mock_calls == [
+            call.send(([(1, Decimal('2'), Decimal('3'))], None)),
+            call.close()
+        ]
+
+    def test_payoff_method_process_error(self):
+        mock_conn = Mock()
+        with patch('%s.calculate_payoffs' % pbm) as mock_calc:
+            mock_calc.side_effect = TypeError('total too low')
+            _payoff_method_process(mock_conn, 'meth', ['s1'])
+        assert mock_conn.mock_calls == [
+            call.send((None, 'total too low')),
+            call.close()
+        ]
+
+    def test_inputs_hash(self):
+        h = self.cls.inputs_hash
+        assert len(h) == 64
+        assert InterestHelper(self.mock_sess).inputs_hash == h
+        assert InterestHelper(
+            self.mock_sess, increases={date(2017, 9, 1): Decimal('50')}
+        ).inputs_hash != h
+        assert InterestHelper(
+            self.mock_sess, onetimes={date(2017, 9, 1): Decimal('50')}
+        ).inputs_hash != h
+        self.accts[3].balance.ledger = Decimal('-952.07')
+        assert InterestHelper(self.mock_sess).inputs_hash != h
+        self.accts[3].balance.ledger = Decimal('-952.06')
+        self.accts[4].effective_apr = Decimal('0.1100')
+        assert InterestHelper(self.mock_sess).inputs_hash != h
+        self.accts[4].effective_apr = Decimal('0.1000')
+        self.accts[4].last_interest_charge = Decimal('46.9062')
+        assert InterestHelper(self.mock_sess).inputs_hash != h
+        self.accts[4].last_interest_charge = Decimal('46.9061')
+        self.accts[4].min_payment_class_name = 'MinPaymentAmEx'
+        assert InterestHelper(self.mock_sess).inputs_hash != h
+        self.accts[4].min_payment_class_name = 'MinPaymentDiscover'
+        assert InterestHelper(self.mock_sess).inputs_hash == h
+
+    def test_cached_payoffs_stored(self):
+        payoffs = self.cls.calculate_payoffs()
+        self.mock_sess.reset_mock()
+        self.mock_sess.query.return_value.get.return_value = Mock(
+            result=payoffs_to_json(payoffs)
+        )
+        with patch('%s.calculate_payoffs' % pb) as mock_calc:
+            res = self.cls.cached_payoffs()
+        assert res == payoffs
+        assert mock_calc.mock_calls == []
+        assert self.mock_sess.mock_calls == [
+            call.query(CreditPayoffResult),
+            call.query().get(self.cls.inputs_hash)
         ]
 
+    def test_cached_payoffs_not_stored(self):
+        self.mock_sess.query.return_value.get.return_value = None
+        mock_progress = Mock()
+        payoffs = {
+            'PM1': {
+                'description': 'd1',
+                'doc': 'doc1',
+                'results': {3: {
+                    'payoff_months': 2,
+                    'total_payments': Decimal('1.23'),
+                    'total_interest': Decimal('0.45'),
+                    'next_payment': Decimal('0.67')
+                }}
+            }
+        }
+        with patch('%s.calculate_payoffs' % pb) as mock_calc:
+            with patch('%s.CreditPayoffResult' % pbm) as mock_cpr:
+                with patch('%s.sessionmaker' % pbm) as mock_sm:
+                    mock_calc.return_value = payoffs
+                    res = self.cls.cached_payoffs(progress=mock_progress)
+        assert res == payoffs
+        assert mock_calc.mock_calls == [call(progress=mock_progress)]
+        store_sess = mock_sm.return_value.return_value
+        assert mock_sm.mock_calls == [
+            call(bind=self.mock_sess.get_bind.return_value),
+            call()(),
+            call()().close()
+        ]
+        assert mock_cpr.mock_calls == [
+            call.store(
+                store_sess, self.cls.inputs_hash, payoffs_to_json(payoffs)
+            )
+        ]
+        assert self.mock_sess.commit.mock_calls == []
+        assert self.mock_sess.rollback.mock_calls == []
+
+    def test_cached_payoffs_error(self):
+        self.mock_sess.query.return_value.get.return_value = None
+        payoffs = {
+            'PM1': {'description': 'd1', 'doc': 'doc1', 'results': {}},
+            'PM2': {'description': 'd2', 'doc': 'doc2', 'error': 'foo'}
+        }
+        with patch('%s.calculate_payoffs' % pb) as mock_calc:
+            with patch('%s.CreditPayoffResult' % pbm) as mock_cpr:
+                mock_calc.return_value = payoffs
+                res = self.cls.cached_payoffs()
+        assert res == payoffs
+        assert mock_cpr.mock_calls == []
+
+    def test_payoffs_json(self):
+        payoffs = self.cls.calculate_payoffs()
+        payoffs['Foo'] = {'description': 'd', 'doc': 'doc', 'error': 'bar'}
+        res = payoffs_from_json(payoffs_to_json(payoffs))
+        assert res == payoffs
+        for name in res:
+            for r in res[name].get('results', {}).values():
+                assert isinstance(r['total_payments'], Decimal)
+
+    def test_calculate_payoffs_serial_timeout(self):
+        with patch('%s.time.monotonic' % pbm) as mock_mono:
+            mock_mono.side_effect = itertools.count()
+            res = self.cls.calculate_payoffs(workers=1, timeout=1)
+        assert len(res) == 5
+        for r in res.values():
+            assert r['error'] == 'Timed out after 1 seconds'
+            assert 'results' not in r
+
     def test_calculate_payoff_method(self):
         mock_m = Mock()
         with patch('%s.calculate_payoffs' % pbm) as mock_calc:
@@ -333,8 +591,8 @@ class TestAdbCompoundedDaily(object):
             (date(2017, 1, 1) + timedelta(days=365))
         )
         assert res == {
-            'end_balance': Decimal('110.5487464695276899243379188'),
-            'interest_paid': Decimal('10.54874567794529906536521621')
+            'end_balance': Decimal('110.5487464695276899243379176'),
+            'interest_paid': Decimal('10.54874567794529906536521613')
         }
 
     def test_calculate_transactions(self):
@@ -350,8 +608,8 @@ class TestAdbCompoundedDaily(object):
             }
         )
         assert res == {
-            'end_balance': Decimal('107.5420752170470026908058809'),
-            'interest_paid': Decimal('7.542074651086492634526111808')
+            'end_balance': Decimal('107.5420752170470026908058801'),
+            'interest_paid': Decimal('7.542074651086492634526111763')
         }
 
 
@@ -394,6 +652,112 @@ class TestSimpleInterest(object):
         }
 
 
+def day_loop_adb(apr, principal, first_d, last_d, transactions):
+    """
+    Reference implementation of :py:meth:`~.AdbCompoundedDaily.calculate`
+    that steps through every day of the billing period.
+    """
+    dpr = apr / Decimal(365.0)
+    num_days = 0
+    bal_total = Decimal(0.0)
+    bal = principal
+    d = first_d
+    while d <= last_d:
+        num_days += 1
+        if d in transactions:
+            bal += transactions[d]
+        bal += bal * dpr
+        bal_total += bal
+        d += timedelta(days=1)
+    final = bal_total / Decimal(num_days) * apr * num_days / Decimal(365.0)
+    bal += final * dpr
+    return {'interest_paid': final, 'end_balance': bal}
+
+
+def day_loop_simple(apr, principal, first_d, last_d, transactions):
+    """
+    Reference implementation of :py:meth:`~.SimpleInterest.calculate` that
+    steps through every day of the billing period.
+    """
+    num_days = 0
+    bal = principal
+    d = first_d
+    while d <= last_d:
+        num_days += 1
+        if d in transactions:
+            bal += transactions[d]
+        d += timedelta(days=1)
+    final = bal * apr * num_days / Decimal(365.0)
+    return {'interest_paid': final, 'end_balance': bal + final}
+
+
+def random_periods(seed, count):
+    """
+    Generate ``count`` random billing periods as (apr, principal, first_d,
+    last_d, transactions) tuples, including transactions on the first and last
+    days and outside of the period.
+    """
+    rand = random.Random(seed)
+    for _ in range(count):
+        apr = Decimal(rand.randint(0, 3500)) / Decimal(10000)
+        principal = Decimal(rand.randint(-100000, 5000000)) / Decimal(100)
+        first_d = date(2017, 1, 1) + timedelta(days=rand.randint(0, 3650))
+        last_d = first_d + timedelta(days=rand.randint(0, 62))
+        transactions = {}
+        for _ in range(rand.randint(0, 8)):
+            d = first_d + timedelta(
+                days=rand.randint(-3, (last_d - first_d).days + 3)
+            )
+            transactions[d] = Decimal(
+                rand.randint(-500000, 200000)
+            ) / Decimal(100)
+        if rand.random() < 0.2:
+            transactions[first_d] = Decimal('-25.00')
+        if rand.random() < 0.2:
+            transactions[last_d] = Decimal('12.34')
+        yield apr, principal, first_d, last_d, transactions
+
+
+class TestInterestKernelEquivalence(object):
+    """
+    Randomized tests that the closed-form interest calculations give the
+    same results as stepping through every day of the billing period.
+    """
+
+    @pytest.mark.parametrize('seed', range(10))
+    def test_adb_compounded_daily(self, seed):
+        for apr, principal, first_d, last_d, txns in random_periods(seed, 50):
+            res = AdbCompoundedDaily(apr).calculate(
+                principal, first_d, last_d, transactions=txns
+            )
+            expected = day_loop_adb(apr, principal, first_d, last_d, txns)
+            for k in ['interest_paid', 'end_balance']:
+                assert res[k].quantize(Decimal('0.01')) == \
+                    expected[k].quantize(Decimal('0.01'))
+                assert abs(res[k] - expected[k]) < Decimal('1E-15')
+
+    @pytest.mark.parametrize('seed', range(10))
+    def test_simple_interest(self, seed):
+        for apr, principal, first_d, last_d, txns in random_periods(seed, 50):
+            res = SimpleInterest(apr).calculate(
+                principal, first_d, last_d, transactions=txns
+            )
+            assert res == day_loop_simple(
+                apr, principal, first_d, last_d, txns
+            )
+
+    def test_adb_zero_apr(self):
+        txns = {date(2017, 1, 10): Decimal('-50.00')}
+        res = AdbCompoundedDaily(Decimal('0')).calculate(
+            Decimal('100.00'), date(2017, 1, 1), date(2017, 1, 31),
+            transactions=txns
+        )
+        assert res == {
+            'interest_paid': Decimal('0'),
+            'end_balance': Decimal('50.00')
+        }
+
+
 class TestBillingPeriod(object):
 
     def test_init(self):
@@ -1045,7 +1409,7 @@ class TestCalculatePayoffs(object):
 
         b1 = _BillingPeriod(date(2017, 1, 2))
         i1 = Mock(spec_set=_InterestCalculation)
-        i1.calculate.side_effect = se_interest
+        i1.calculate_payment.side_effect = se_interest
         p1 = Mock(spec_set=_MinPaymentFormula)
         p1.calculate.side_effect = se_minpay_A
         s1 = CCStatement(
@@ -1071,6 +1435,271 @@ class TestCalculatePayoffs(object):
         ]
 
 
+def ccstatement_payoffs(payment_method, statements):
+    """
+    Reference implementation of :py:func:`~.calculate_payoffs` that pays each
+    statement with :py:meth:`~.CCStatement.pay`, for comparison.
+    """
+    payoffs = [[0, Decimal('0.0'), None] for _ in statements]
+    unpaid = list(enumerate(statements))
+    while len(unpaid) > 0:
+        to_pay = payment_method.find_payments([s for _, s in unpaid])
+        still_unpaid = []
+        for (idx, stmt), p_amt in zip(unpaid, to_pay):
+            if stmt.principal <= Decimal('0'):
+                continue
+            payoffs[idx][0] += 1
+            if stmt.principal <= p_amt:
+                payoffs[idx][1] += stmt.principal
+                if payoffs[idx][2] is None:
+                    payoffs[idx][2] = stmt.principal
+                continue
+            payoffs[idx][1] += p_amt
+            if payoffs[idx][2] is None:
+                payoffs[idx][2] = p_amt
+            still_unpaid.append((idx, stmt.pay(Decimal('-1') * p_amt)))
+        unpaid = still_unpaid
+    return [
+        (m, a, Decimal('0.0') if f is None else f) for m, a, f in payoffs
+    ]
+
+
+def random_statements(seed, count):
+    """
+    Generate ``count`` random credit card statements with a mix of interest
+    calculations, minimum payment formulas and billing periods.
+    """
+    rand = random.Random(seed)
+    res = []
+    for _ in range(count):
+        apr = Decimal(rand.randint(0, 3500)) / Decimal(10000)
+        bal = Decimal(rand.randint(-10000, 800000)) / Decimal(100)
+        interest_cls = rand.choice([AdbCompoundedDaily, SimpleInterest])
+        min_pay_cls = rand.choice(
+            [MinPaymentAmEx, MinPaymentCiti, MinPaymentDiscover]
+        )
+        end_d = date(2017, 1, 1) + timedelta(days=rand.randint(0, 730))
+        res.append(CCStatement(
+            interest_cls(apr), bal, min_pay_cls(), _BillingPeriod(end_d),
+            end_balance=bal,
+            interest_amt=Decimal(rand.randint(0, 20000)) / Decimal(100)
+        ))
+    return res
+
+
+class TestPayoffSimulation(object):
+
+    @pytest.mark.parametrize('seed', range(4))
+    @pytest.mark.parametrize('method', [
+        lambda: MinPaymentMethod(),
+        lambda: FixedPaymentMethod(Decimal('450.00')),
+        lambda: LowestBalanceFirstMethod(Decimal('1200.00')),
+        lambda: HighestBalanceFirstMethod(Decimal('1200.00')),
+        lambda: LowestInterestRateFirstMethod(Decimal('1200.00')),
+        lambda: HighestInterestRateFirstMethod(
+            Decimal('1000.00'),
+            increases={date(2018, 6, 1): Decimal('1500.00')},
+            onetimes={date(2018, 2, 15): Decimal('2500.00')}
+        )
+    ])
+    def test_same_as_ccstatement_payoffs(self, seed, method):
+        res = calculate_payoffs(method(), random_statements(seed, 5))
+        assert res == ccstatement_payoffs(
+            method(), random_statements(seed, 5)
+        )
+
+    @pytest.mark.parametrize('cls', [AdbCompoundedDaily, SimpleInterest])
+    def test_calculate_payment(self, cls):
+        rand = random.Random(3)
+        for _ in range(50):
+            icls = cls(Decimal(rand.randint(0, 3500)) / Decimal(10000))
+            principal = Decimal(rand.randint(0, 800000)) / Decimal(100)
+            amt = Decimal(rand.randint(0, 50000)) / Decimal(100)
+            period = _BillingPeriod(
+                date(2017, 1, 1) + timedelta(days=rand.randint(0, 730))
+            )
+            assert icls.calculate_payment(principal, period, amt) == \
+                icls.calculate(
+                    principal, period.start_date, period.end_date,
+                    {period.payment_date: Decimal('-1') * amt}
+                )
+
+    def test_run_twice(self):
+        sim = PayoffSimulation(random_statements(1, 3))
+        res = sim.run(MinPaymentMethod())
+        assert sim.run(MinPaymentMethod()) == res
+        assert sim.run(FixedPaymentMethod(Decimal('450.00'))) != res
+
+    @pytest.mark.parametrize('cls', [
+        MinPaymentMethod, FixedPaymentMethod, LowestBalanceFirstMethod,
+        HighestBalanceFirstMethod, LowestInterestRateFirstMethod,
+        HighestInterestRateFirstMethod
+    ])
+    def test_sweep(self, cls):
+        amounts = [
+            Decimal('1500.00'), Decimal('2000.00'), Decimal('1500.00'),
+            Decimal('3250.00')
+        ]
+        res = PayoffSimulation(random_statements(2, 5)).sweep(cls, amounts)
+        assert len(res) == 4
+        for amt, r in zip(amounts, res):
+            assert r == (
+                calculate_payoffs(cls(amt), random_statements(2, 5)), None
+            )
+
+    def test_sweep_error(self):
+        sim = PayoffSimulation(random_statements(2, 5))
+        res = sim.sweep(
+            LowestBalanceFirstMethod, [Decimal('10.00'), Decimal('3000.00')]
+        )
+        assert res[0][0] is None
+        assert 'is less than sum of minimum payments' in res[0][1]
+        assert res[1] == (
+            calculate_payoffs(
+                LowestBalanceFirstMethod(Decimal('3000.00')),
+                random_statements(2, 5)
+            ),
+            None
+        )
+
+    def test_sweep_runs_once(self):
+        sim = PayoffSimulation(random_statements(2, 5))
+        amounts = [Decimal('1500.00'), Decimal('2000.00'), Decimal('1500.00')]
+        with patch.object(sim, 'run', wraps=sim.run) as mock_run:
+            res = sim.sweep(MinPaymentMethod, amounts)
+        assert len(mock_run.mock_calls) == 1
+        assert res == [res[0], res[0], res[0]]
+        with patch.object(sim, 'run', wraps=sim.run) as mock_run:
+            sim.sweep(FixedPaymentMethod, amounts)
+        assert len(mock_run.mock_calls) == 2
+
+    def test_run_timeout(self):
+        sim = PayoffSimulation(random_statements(1, 3))
+        with patch('%s.time.monotonic' % pbm) as mock_mono:
+            mock_mono.side_effect = [100, 101, 102, 106]
+            with pytest.raises(TimeoutError) as excinfo:
+                sim.run(MinPaymentMethod(), timeout=5)
+        assert str(excinfo.value) == 'Timed out after 5 seconds'
+        assert len(mock_mono.mock_calls) == 4
+        assert sim.run(MinPaymentMethod(), timeout=5) == sim.run(
+            MinPaymentMethod()
+        )
+
+    def test_period_starting(self):
+        p = _period_starting(date(2017, 2, 1))
+        assert p.start_date == date(2017, 2, 1)
+        assert p.end_date == date(2017, 2, 28)
+        assert _period_starting(date(2017, 2, 1)) is p
+
+    def test_next_period(self):
+        p = _period_starting(date(2017, 1, 1))
+        nxt = _next_period(p)
+        assert nxt is _period_starting(date(2017, 2, 1))
+        assert nxt.end_date == date(2017, 2, 28)
+        assert _next_period(p) is nxt
+
+    def test_payment_runs(self):
+        assert _payment_runs(_BillingPeriod(date(2017, 1, 31))) == (15, 16)
+        assert _payment_runs(_BillingPeriod(date(2017, 2, 28))) == (13, 15)
+        assert _payment_runs(
+            _BillingPeriod(date(2017, 1, 31), start_date=date(2017, 1, 31))
+        ) == (0, 1)
+
+
+class TestSweepAmounts(object):
+
+    def test_amounts(self):
+        assert sweep_amounts(
+            Decimal('500'), Decimal('700'), Decimal('50')
+        ) == [
+            Decimal('500'), Decimal('550'), Decimal('600'), Decimal('650'),
+            Decimal('700')
+        ]
+
+    def test_uneven(self):
+        assert sweep_amounts(
+            Decimal('100'), Decimal('200'), Decimal('75')
+        ) == [Decimal('100'), Decimal('175')]
+
+    def test_single(self):
+        assert sweep_amounts(
+            Decimal('100'), Decimal('100'), Decimal('10')
+        ) == [Decimal('100')]
+
+    def test_max_points(self):
+        res = sweep_amounts(
+            Decimal('0'), Decimal(MAX_SWEEP_POINTS - 1), Decimal('1')
+        )
+        assert len(res) == MAX_SWEEP_POINTS
+        with pytest.raises(ValueError) as excinfo:
+            sweep_amounts(Decimal('0'), Decimal(MAX_SWEEP_POINTS), Decimal('1'))
+        assert 'would have more than %d amounts' % MAX_SWEEP_POINTS in str(
+            excinfo.value
+        )
+
+    @pytest.mark.parametrize('low, high, step', [
+        ('-1', '100', '10'),
+        ('100', '50', '10'),
+        ('100', '200', '0'),
+        ('100', '200', '-10')
+    ])
+    def test_invalid(self, low, high, step):
+        with pytest.raises(ValueError) as excinfo:
+            sweep_amounts(Decimal(low), Decimal(high), Decimal(step))
+        assert str(excinfo.value) == 'Invalid payment sweep from %s to %s ' \
+            'by %s' % (low, high, step)
+
+
+class TestPaymentSettingsKwargs(object):
+
+    def test_kwargs(self):
+        j = json.dumps({
+            'increases': [
+                {'enabled': True, 'date': '2017-07-15', 'amount': '100.12'},
+                {'enabled': False, 'date': '2017-08-15', 'amount': '200'}
+            ],
+            'onetimes': [
+                {'enabled': True, 'date': '2017-09-01', 'amount': '50'}
+            ]
+        })
+        assert payment_settings_kwargs(j) == {
+            'increases': {date(2017, 7, 15): Decimal('100.12')},
+            'onetimes': {date(2017, 9, 1): Decimal('50')}
+        }
+
+
+class TestPayoffsJob(object):
+
+    def test_job(self):
+        mock_db = Mock()
+        mock_progress = Mock()
+        j = json.dumps({
+            'increases': [],
+            'onetimes': [
+                {'enabled': True, 'date': '2017-09-01', 'amount': '50'}
+            ]
+        })
+        with patch('%s.InterestHelper' % pbm) as mock_ih:
+            mock_ih.return_value.min_payments = {
+                1: Decimal('10.00'), 2: Decimal('2.50')
+            }
+            mock_ih.return_value.cached_payoffs.return_value = 'payoffs'
+            res = payoffs_job(
+                mock_db, {'payment_settings': j}, mock_progress
+            )
+        assert res == {
+            'min_payments_sum': Decimal('12.50'),
+            'payoffs': 'payoffs'
+        }
+        assert mock_ih.mock_calls == [
+            call(
+                mock_db, increases={},
+                onetimes={date(2017, 9, 1): Decimal('50')}
+            ),
+            call().cached_payoffs(progress=mock_progress)
+        ]
+
+
 class TestModuleConstants(object):
 
     def test_interest(self):
@@ -1175,7 +1804,7 @@ class TestAcceptanceData(object):
             [self.stmt_cc_one]
         )
         assert res == [
-            (28, Decimal('962.9988625702411101133192793'), Decimal('35'))
+            (28, Decimal('962.9988625702411101133192802'), Decimal('35'))
         ]
 
     def test_cc_two_pay_min(self):
@@ -1186,7 +1815,7 @@ class TestAcceptanceData(object):
         assert res == [
             (
                 162,
-                Decimal('8664.861877369277471400473622'),
+                Decimal('8664.861877369277471400473654'),
                 Decimal('109.9730')
             )
         ]
@@ -1202,8 +1831,8 @@ class TestAcceptanceData(object):
             [self.stmt_cc_one, self.stmt_cc_two]
         )
         assert res == [
-            (28, Decimal('962.9988625702411101133192793'), Decimal('35')),
-            (162, Decimal('8664.861877369277471400473622'), Decimal('109.9730'))
+            (28, Decimal('962.9988625702411101133192802'), Decimal('35')),
+            (162, Decimal('8664.861877369277471400473654'), Decimal('109.9730'))
         ]
 
     def test_combined_pay_lowest_ir(self):
@@ -1212,8 +1841,8 @@ class TestAcceptanceData(object):
             [self.stmt_cc_one, self.stmt_cc_two]
         )
         assert res == [
-            (21, Decimal('960.9178327498502165965138131'), Decimal('35')),
-            (56, Decimal('6988.237124948955044765363412'), Decimal('109.9730'))
+            (21, Decimal('960.9178327498502165965138137'), Decimal('35')),
+            (56, Decimal('6988.237124948955044765363422'), Decimal('109.9730'))
         ]
 
     def test_combined_pay_lowest_bal(self):
@@ -1222,8 +1851,8 @@ class TestAcceptanceData(object):
             [self.stmt_cc_one, self.stmt_cc_two]
         )
         assert res == [
-            (21, Decimal('960.9178327498502165965138131'), Decimal('35')),
-            (56, Decimal('6988.237124948955044765363412'), Decimal('109.9730'))
+            (21, Decimal('960.9178327498502165965138137'), Decimal('35')),
+            (56, Decimal('6988.237124948955044765363422'), Decimal('109.9730'))
         ]
 
     def test_combined_pay_highest_ir(self):
@@ -1232,8 +1861,8 @@ class TestAcceptanceData(object):
             [self.stmt_cc_one, self.stmt_cc_two]
         )
         assert res == [
-            (28, Decimal('962.9988625702411101133192793'), Decimal('35')),
-            (55, Decimal('6956.345228060182432444990377'), Decimal('109.9730'))
+            (28, Decimal('962.9988625702411101133192802'), Decimal('35')),
+            (55, Decimal('6956.345228060182432444990373'), Decimal('109.9730'))
         ]
 
     def test_combined_pay_highest_bal(self):
@@ -1242,8 +1871,8 @@ class TestAcceptanceData(object):
             [self.stmt_cc_one, self.stmt_cc_two]
         )
         assert res == [
-            (28, Decimal('962.9988625702411101133192793'), Decimal('35')),
-            (55, Decimal('6956.345228060182432444990377'), Decimal('109.9730'))
+            (28, Decimal('962.9988625702411101133192802'), Decimal('35')),
+            (55, Decimal('6956.345228060182432444990373'), Decimal('109.9730'))
         ]
 
 
@@ -0,0 +1,247 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import os
+import socket
+from tempfile import TemporaryDirectory
+from threading import Event, Lock
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from biweeklybudget.models.job import Job
+from biweeklybudget.jobs import JOB_TYPES, JobRunner, JobProgress, job_function
+
+from unittest.mock import patch, call, Mock
+
+pbm = 'biweeklybudget.jobs'
+tm = 'biweeklybudget.tests.unit.test_jobs'
+
+calls = []
+calls_lock = Lock()
+block = Event()
+
+
+def job_ok(db, params, progress):
+    with calls_lock:
+        calls.append(params)
+    progress(1, total=2, message='half')
+    progress(2)
+    return {'value': params.get('x')}
+
+
+def job_fail(db, params, progress):
+    raise RuntimeError('foo')
+
+
+def job_blocking(db, params, progress):
+    with calls_lock:
+        calls.append(('start', params['x']))
+    block.wait(10)
+    with calls_lock:
+        calls.append(('end', params['x']))
+    return None
+
+
+TEST_JOB_TYPES = {
+    'ok': f'{tm}:job_ok',
+    'fail': f'{tm}:job_fail',
+    'blocking': f'{tm}:job_blocking',
+}
+
+
+class JobsTest(object):
+
+    def setup_method(self):
+        calls.clear()
+        block.clear()
+        # a file database, so that each thread has its own connection
+        self.tmpdir = TemporaryDirectory()
+        self.engine = create_engine(
+            'sqlite:///%s' % os.path.join(self.tmpdir.name, 'jobs.db'),
+            connect_args={'check_same_thread': False, 'timeout': 10}
+        )
+        Job.__table__.create(self.engine)
+        self.factory = sessionmaker(bind=self.engine)
+        self.work = Mock()
+        self.runner = JobRunner(self.factory, work_session=self.work, workers=2)
+        self.patcher = patch.dict(JOB_TYPES, TEST_JOB_TYPES)
+        self.patcher.start()
+
+    def teardown_method(self):
+        block.set()
+        self.runner.shutdown()
+        self.patcher.stop()
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def add_job(self, **kwargs):
+        with self.factory() as s:
+            j = Job(job_type='ok', params='{}', done=0, **kwargs)
+            s.add(j)
+            s.commit()
+            return j.id
+
+
+class TestJobFunction(object):
+
+    def test_job_function(self):
+        with patch.dict(JOB_TYPES, TEST_JOB_TYPES):
+            assert job_function('ok') is job_ok
+
+    def test_unknown(self):
+        with pytest.raises(KeyError):
+            job_function('nonexistent')
+
+
+class TestJobProgress(object):
+
+    def test_throttled(self):
+        mock_runner = Mock()
+        p = JobProgress(mock_runner, 3)
+        with patch(f'{pbm}.monotonic') as mock_mono:
+            mock_mono.return_value = 10.0
+            p(1, total=5, message='foo')
+            mock_mono.return_value = 10.1
+            p(2)
+            p(3, message='bar')
+            mock_mono.return_value = 10.6
+            p(4)
+            p.flush()
+        assert mock_runner.mock_calls == [
+            call._update(3, done=1, total=5, message='foo'),
+            call._update(3, done=4, message='bar')
+        ]
+
+
+class TestJobRunner(JobsTest):
+
+    def test_enqueue_done(self):
+        job_id = self.runner.enqueue('ok', {'x': 2}, job_key='k')
+        res = self.runner.wait(job_id, timeout=10)
+        assert calls == [{'x': 2}]
+        assert res['id'] == job_id
+        assert res['job_type'] == 'ok'
+        assert res['job_key'] == 'k'
+        assert res['state'] == 'done'
+        assert res['done'] == 2
+        assert res['total'] == 2
+        assert res['message'] == 'half'
+        assert res['result'] == {'value': 2}
+        assert res['error'] is None
+        assert res['created'] is not None
+        assert res['finished'] is not None
+        assert self.work.mock_calls == [call.remove()]
+        with self.factory() as s:
+            assert s.get(Job, job_id).worker == self.runner.worker_name
+
+    def test_failed(self):
+        job_id = self.runner.enqueue('fail')
+        res = self.runner.wait(job_id, timeout=10)
+        assert res['state'] == 'failed'
+        assert res['error'] == 'foo'
+        assert res['result'] is None
+        assert self.work.mock_calls == [call.rollback(), call.remove()]
+
+    def test_enqueue_unknown(self):
+        with pytest.raises(KeyError):
+            self.runner.enqueue('nonexistent')
+        with self.factory() as s:
+            assert s.query(Job).count() == 0
+
+    def test_status_none(self):
+        assert self.runner.status(123) is None
+
+    def test_already_claimed(self):
+        job_id = self.add_job(state='running', worker='otherhost:1')
+        self.runner._submit(job_id, None)
+        res = self.runner.wait(job_id, timeout=10)
+        assert res['state'] == 'running'
+        assert calls == []
+
+    def test_statuses_for_key(self):
+        a = self.add_job(state='done', job_key='k')
+        self.add_job(state='done', job_key='other')
+        c = self.add_job(state='failed', job_key='k')
+        d = self.add_job(state='done', job_key='k')
+        res = self.runner.statuses_for_key('k', limit=2)
+        assert [j['id'] for j in res] == [d, c]
+        res = self.runner.statuses_for_key('k')
+        assert [j['id'] for j in res] == [d, c, a]
+
+    def test_same_key_serialized(self):
+        a = self.runner.enqueue('blocking', {'x': 1}, job_key='k')
+        b = self.runner.enqueue('blocking', {'x': 2}, job_key='k')
+        c = self.runner.enqueue('blocking', {'x': 3}, job_key='other')
+        for _ in range(100):
+            with calls_lock:
+                if len(calls) >= 2:
+                    break
+            Event().wait(0.05)
+        with calls_lock:
+            assert sorted(calls) == [('start', 1), ('start', 3)]
+        assert self.runner.status(b)['state'] == 'queued'
+        block.set()
+        for job_id in [a, b, c]:
+            assert self.runner.wait(job_id, timeout=10)['state'] == 'done'
+        assert calls.index(('end', 1)) < calls.index(('start', 2))
+
+    def test_recover(self):
+        host = socket.gethostname()
+        dead = self.add_job(state='running', worker=f'{host}:999999')
+        alive = self.add_job(state='running', worker=f'{host}:999998')
+        remote = self.add_job(state='running', worker='otherhost:999999')
+        queued = self.add_job(state='queued')
+        ours = self.add_job(state='running', worker=f'{host}:{os.getpid()}')
+        with patch(f'{pbm}._pid_alive') as mock_alive:
+            mock_alive.side_effect = lambda pid: pid != 999999
+            self.runner.recover()
+        assert self.runner.wait(queued, timeout=10)['state'] == 'done'
+        assert calls == [{}]
+        res = self.runner.status(dead)
+        assert res['state'] == 'failed'
+        assert res['error'] == (
+            f'Interrupted by exit of worker {host}:999999'
+        )
+        assert self.runner.status(alive)['state'] == 'running'
+        assert self.runner.status(remote)['state'] == 'running'
+        res = self.runner.status(ours)
+        assert res['state'] == 'failed'
+        assert res['error'] == (
+            f'Interrupted by exit of worker {host}:{os.getpid()}'
+        )
@@ -0,0 +1,192 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import os
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from ofxparse import OfxParser
+from ofxparse.ofxparse import (
+    Ofx, Signon, InvestmentAccount, InvestmentStatement, Position,
+    AccountType
+)
+
+from biweeklybudget.ofxapi.encoding import (
+    encode_ofx, decode_ofx, decode_statements, TRANSACTION_FIELDS
+)
+
+FIXTURE = os.path.abspath(os.path.join(
+    os.path.dirname(__file__), '..', 'fixtures',
+    'CreditOne_2017-07-28_05-30-00.ofx'
+))
+
+
+def roundtrip(ofx):
+    return decode_ofx(json.loads(json.dumps(encode_ofx(ofx))))
+
+
+class TestEncoding(object):
+
+    def test_credit_roundtrip(self):
+        with open(FIXTURE, 'rb') as fh:
+            ofx = OfxParser.parse(fh)
+        res = roundtrip(ofx)
+        assert res.status == ofx.status
+        assert res.signon.dtserver == ofx.signon.dtserver
+        for a in [
+            'type', 'curdef', 'account_id', 'routing_number', 'account_type'
+        ]:
+            assert getattr(res.account, a) == getattr(ofx.account, a)
+        assert res.account.institution.fid == '4321'
+        assert not hasattr(res.account, 'brokerid')
+        assert res.account.statement.balance == Decimal('-1234.56')
+        assert res.account.statement.balance_date == datetime(
+            2017, 7, 28, 5, 29, 32
+        )
+        assert not hasattr(res.account.statement, 'available_balance')
+        assert len(res.account.statement.transactions) == 1
+        t1 = ofx.account.statement.transactions[0]
+        t2 = res.account.statement.transactions[0]
+        for name, _ in TRANSACTION_FIELDS:
+            assert getattr(t2, name) == getattr(t1, name)
+
+    def investment_ofx(self, positions):
+        ofx = Ofx()
+        ofx.signon = Signon({
+            'code': 0, 'severity': 'INFO', 'message': '',
+            'dtserver': '20170728053000', 'language': 'ENG',
+            'dtprofup': None, 'org': 'X', 'fid': '1', 'intu.bid': None
+        })
+        acct = InvestmentAccount()
+        acct.type = AccountType.Investment
+        acct.curdef = 'USD'
+        acct.account_id = '999'
+        acct.routing_number = ''
+        acct.account_type = ''
+        acct.institution = None
+        acct.statement = InvestmentStatement()
+        acct.statement.positions = positions
+        ofx.account = acct
+        return ofx
+
+    def test_investment_no_market_value(self):
+        p = Position()
+        p.units = Decimal('10.5')
+        p.unit_price = Decimal('2.25')
+        del p.market_value
+        res = roundtrip(self.investment_ofx([p]))
+        pos = res.account.statement.positions
+        assert len(pos) == 1
+        assert not hasattr(pos[0], 'market_value')
+        assert not hasattr(pos[0], 'date')
+        assert pos[0].units * pos[0].unit_price == Decimal('23.625')
+
+    def test_investment_roundtrip(self):
+        ofx = Ofx()
+        ofx.signon = Signon({
+            'code': 0, 'severity': 'INFO', 'message': '',
+            'dtserver': '20170728053000', 'language': 'ENG',
+            'dtprofup': None, 'org': 'X', 'fid': '1', 'intu.bid': None
+        })
+        acct = InvestmentAccount()
+        acct.type = AccountType.Investment
+        acct.curdef = 'USD'
+        acct.account_id = '999'
+        acct.routing_number = ''
+        acct.account_type = ''
+        acct.institution = None
+        acct.brokerid = 'broker.com'
+        acct.statement = InvestmentStatement()
+        p = Position()
+        p.date = datetime(2017, 7, 1, 12, 0, 0)
+        p.units = Decimal('10.5')
+        p.unit_price = Decimal('2.25')
+        p.market_value = Decimal('23.625')
+        acct.statement.positions = [p]
+        ofx.account = acct
+        res = roundtrip(ofx)
+        assert not hasattr(res, 'status')
+        assert res.account.type == AccountType.Investment
+        assert res.account.institution is None
+        assert res.account.brokerid == 'broker.com'
+        pos = res.account.statement.positions
+        assert len(pos) == 1
+        assert pos[0].date == p.date
+        assert pos[0].units == Decimal('10.5')
+        assert pos[0].unit_price == Decimal('2.25')
+        assert pos[0].market_value == Decimal('23.625')
+
+    def test_decode_invalid(self):
+        with open(FIXTURE, 'rb') as fh:
+            data = encode_ofx(OfxParser.parse(fh))
+        bad_version = dict(data, version=99)
+        with pytest.raises(ValueError, match='version'):
+            decode_ofx(bad_version)
+        missing = dict(data)
+        del missing['account']
+        with pytest.raises(ValueError):
+            decode_ofx(missing)
+        short_row = dict(data, transactions=[data['transactions'][0][:3]])
+        with pytest.raises(ValueError, match='Expected 9 fields'):
+            decode_ofx(short_row)
+        bad_amount = json.loads(json.dumps(data))
+        bad_amount['transactions'][0][3] = 'foo'
+        with pytest.raises(ValueError):
+            decode_ofx(bad_amount)
+
+    def test_decode_statements(self):
+        with open(FIXTURE, 'rb') as fh:
+            data = json.loads(json.dumps(encode_ofx(OfxParser.parse(fh))))
+        res = decode_statements([
+            {
+                'acct_id': 3, 'mtime': '2017-07-28T05:30:00',
+                'filename': 'a.ofx', 'ofx': data
+            },
+            {'acct_id': 4, 'mtime': None, 'filename': 'b.ofx', 'ofx': data}
+        ])
+        assert len(res) == 2
+        assert res[0][0] == 3
+        assert res[0][1].account.statement.balance == Decimal('-1234.56')
+        assert res[0][2:] == (datetime(2017, 7, 28, 5, 30, 0), 'a.ofx')
+        assert res[1][0] == 4
+        assert res[1][2:] == (None, 'b.ofx')
+
+    def test_decode_statements_invalid(self):
+        with pytest.raises(ValueError, match='Invalid statement'):
+            decode_statements([{'mtime': None, 'filename': 'a', 'ofx': {}}])
@@ -0,0 +1,192 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import sys
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+from pytz import UTC
+
+from biweeklybudget.ofxapi.remote import OfxApiRemote
+from biweeklybudget.ofxapi.exceptions import DuplicateFileException
+
+# https://code.google.com/p/mock/issues/detail?id=249
+# py>=3.4 should use unittest.mock not the mock package on pypi
+if (
+        sys.version_info[0] < 3 or
+        sys.version_info[0] == 3 and sys.version_info[1] < 4
+):
+    from mock import patch, call, Mock  # noqa
+else:
+    from unittest.mock import patch, call, Mock  # noqa
+
+pbm = 'biweeklybudget.ofxapi.remote'
+
+
+def response(status, data):
+    r = Mock(status_code=status, text=json.dumps(data))
+    r.json.return_value = data
+    return r
+
+
+class TestOfxApiRemote(object):
+
+    def setup_method(self):
+        with patch('%s.requests.Session' % pbm) as m_sess:
+            self.cls = OfxApiRemote(
+                'http://foo', ca_bundle='/ca', client_cert_path='/cert',
+                client_key_path='/key'
+            )
+        self.session = m_sess.return_value
+        self.mtime = datetime(2017, 7, 28, 5, 30, 0, tzinfo=UTC)
+
+    def test_init(self):
+        assert self.cls._session == self.session
+        assert self.session.verify == '/ca'
+        assert self.session.cert == ('/cert', '/key')
+
+    def test_get_accounts(self):
+        self.session.get.return_value = response(200, {'a': 1})
+        assert self.cls.get_accounts() == {'a': 1}
+        assert self.session.get.call_args_list == [
+            call('http://foo/api/ofx/accounts')
+        ]
+
+    def test_update_statements_ofx(self):
+        self.session.post.side_effect = [
+            response(200, {'success': True, 'results': [
+                {'success': True, 'duplicate': False, 'message': 'ok',
+                 'statement_id': 4, 'count_new': 1, 'count_updated': 2},
+                {'success': False, 'duplicate': True, 'message': 'dupe',
+                 'statement_id': 3},
+            ]}),
+            response(200, {'success': True, 'results': [
+                {'success': False, 'duplicate': False, 'message': 'bad'}
+            ]})
+        ]
+        stmts = [
+            (1, 'ofx1', self.mtime, 'f1'),
+            (1, 'ofx2', None, 'f2'),
+            (2, 'ofx3', self.mtime, 'f3')
+        ]
+        with patch('%s.encode_ofx' % pbm) as m_enc:
+            m_enc.side_effect = lambda x: {'enc': x}
+            res = self.cls.update_statements_ofx(stmts, batch_size=2)
+        assert res[0] == (4, 1, 2)
+        assert isinstance(res[1], DuplicateFileException)
+        assert (res[1].acct_id, res[1].filename, res[1].stmt_id) == (
+            1, 'f2', 3
+        )
+        assert isinstance(res[2], RuntimeError)
+        assert str(res[2]) == 'OFX API Error: bad'
+        assert len(self.session.post.mock_calls) == 2
+        args, kwargs = self.session.post.call_args_list[0]
+        assert args == ('http://foo/api/ofx/statements',)
+        assert kwargs['headers'] == {
+            'Content-Type': 'application/json',
+            'Content-Encoding': 'gzip'
+        }
+        assert json.loads(gzip.decompress(kwargs['data'])) == {
+            'statements': [
+                {
+                    'acct_id': 1, 'mtime': '2017-07-28T05:30:00+00:00',
+                    'filename': 'f1', 'ofx': {'enc': 'ofx1'}
+                },
+                {
+                    'acct_id': 1, 'mtime': None, 'filename': 'f2',
+                    'ofx': {'enc': 'ofx2'}
+                }
+            ]
+        }
+
+    def test_update_statements_ofx_error(self):
+        self.session.post.return_value = response(
+            400, {'success': False, 'message': 'foo'}
+        )
+        with patch('%s.encode_ofx' % pbm, side_effect=lambda x: {}):
+            with pytest.raises(RuntimeError, match='OFX API Error: foo'):
+                self.cls.update_statements_ofx([(1, 'ofx1', None, 'f1')])
+
+    def test_update_statements_ofx_fallback(self):
+        self.session.post.side_effect = [
+            response(404, {}),
+            response(201, {
+                'success': True, 'message': 'ok', 'statement_id': 4,
+                'count_new': 1, 'count_updated': 2
+            }),
+            response(500, {
+                'success': False, 'message': 'dupe', 'account_id': 1,
+                'filename': 'f2', 'statement_id': 3
+            }),
+            response(201, {
+                'success': True, 'message': 'ok', 'statement_id': 5,
+                'count_new': 0, 'count_updated': 0
+            }),
+        ]
+        stmts = [
+            (1, 'ofx1', self.mtime, 'f1'),
+            (1, 'ofx2', None, 'f2')
+        ]
+        with patch('%s.encode_ofx' % pbm, side_effect=lambda x: {}):
+            res = self.cls.update_statements_ofx(stmts)
+            assert res[0] == (4, 1, 2)
+            assert isinstance(res[1], DuplicateFileException)
+            assert self.cls._batch_supported is False
+            # later calls go straight to the old endpoint
+            assert self.cls.update_statement_ofx(
+                1, 'ofx3', filename='f3'
+            ) == (5, 0, 0)
+        assert [c[0][0] for c in self.session.post.call_args_list] == [
+            'http://foo/api/ofx/statements',
+            'http://foo/api/ofx/statement',
+            'http://foo/api/ofx/statement',
+            'http://foo/api/ofx/statement'
+        ]
+
+    def test_update_statement_ofx_raises(self):
+        dupe = DuplicateFileException(1, 'f1', 2)
+        with patch.object(self.cls, 'update_statements_ofx') as m_upd:
+            m_upd.return_value = [dupe]
+            with pytest.raises(DuplicateFileException):
+                self.cls.update_statement_ofx(1, 'ofx', filename='f1')
+            m_upd.return_value = [(1, 2, 3)]
+            assert self.cls.update_statement_ofx(
+                1, 'ofx', mtime=self.mtime, filename='f1'
+            ) == (1, 2, 3)
+        assert m_upd.mock_calls[-1] == call([(1, 'ofx', self.mtime, 'f1')])
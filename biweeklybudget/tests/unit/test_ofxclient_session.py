@@ -0,0 +1,176 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import threading
+from http.client import HTTPConnection, HTTPSConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from biweeklybudget.vendored.ofxclient.account import CreditCardAccount
+from biweeklybudget.vendored.ofxclient.institution import Institution
+from biweeklybudget.vendored.ofxclient.session import (
+    Session, close_sessions
+)
+
+pbm = 'biweeklybudget.vendored.ofxclient.session'
+
+OFX_RESPONSE = 'OFXHEADER:100\r\n\r\n<OFX>%s</OFX>'
+
+
+class StubOfxHandler(BaseHTTPRequestHandler):
+    """
+    Stub OFX server. Requests without a cookie get an empty response that sets
+    a session cookie, like some institutions do; requests with the cookie get
+    an OFX body echoing the account number requested.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(
+            int(self.headers['Content-Length'])
+        ).decode()
+        cookie = self.headers.get('Cookie')
+        self.server.requests.append((self.client_address[1], cookie, body))
+        if cookie is None:
+            data = b''
+        else:
+            acctid = body.split('<ACCTID>')[1].split('\r\n')[0]
+            data = (OFX_RESPONSE % acctid).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ofx')
+        self.send_header('Content-Length', str(len(data)))
+        if cookie is None:
+            self.send_header('Set-Cookie', 'sess=abc123')
+        self.end_headers()
+        self.wfile.write(data)
+        if self.server.close_after:
+            # drop the keep-alive connection without telling the client
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+class TestNewConnection(object):
+
+    def test_https(self):
+        conn = Session('https', 'example.com')._new_connection()
+        assert isinstance(conn, HTTPSConnection)
+
+    def test_http_uses_https_by_default(self):
+        conn = Session('http', 'example.com')._new_connection()
+        assert isinstance(conn, HTTPSConnection)
+
+    def test_http_allowed(self):
+        with patch(f'{pbm}.ALLOW_PLAIN_HTTP', True):
+            conn = Session('http', 'example.com')._new_connection()
+        assert isinstance(conn, HTTPConnection)
+        assert not isinstance(conn, HTTPSConnection)
+
+
+class TestSessionReuse(object):
+
+    def setup_method(self):
+        close_sessions()
+        self.plain_http = patch(f'{pbm}.ALLOW_PLAIN_HTTP', True)
+        self.plain_http.start()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubOfxHandler)
+        self.server.requests = []
+        self.server.close_after = False
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%d/ofx' % self.server.server_address[1]
+
+    def teardown_method(self):
+        self.plain_http.stop()
+        close_sessions()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def account(self, number):
+        # separate Institution instances, as when deserializing each account
+        inst = Institution(
+            id='1234', org='Org', url=self.url, username='u', password='p'
+        )
+        return CreditCardAccount(number=number, institution=inst)
+
+    def test_shared_connection_and_cookie(self):
+        a1 = self.account('1111')
+        a2 = self.account('2222')
+        assert a1.download(days=5).read() == OFX_RESPONSE % '1111'
+        assert a2.download(days=5).read() == OFX_RESPONSE % '2222'
+        reqs = self.server.requests
+        assert len(reqs) == 3
+        # one connection for all requests
+        assert len(set(r[0] for r in reqs)) == 1
+        assert [r[1] for r in reqs] == [None, 'sess=abc123', 'sess=abc123']
+        session = a1.institution.client().session
+        assert session is a2.institution.client().session
+        assert session.connections_opened == 1
+        assert session.cookie == 'sess=abc123'
+
+    def test_different_institution_not_shared(self):
+        a1 = self.account('1111')
+        a2 = self.account('2222')
+        a2.institution.username = 'other'
+        a1.download(days=5)
+        a2.download(days=5)
+        assert a1.institution.client().session is not \
+            a2.institution.client().session
+        assert len(set(r[0] for r in self.server.requests)) == 2
+
+    def test_stale_connection_retried(self):
+        self.server.close_after = True
+        a1 = self.account('1111')
+        a2 = self.account('2222')
+        session = a1.institution.client().session
+        session.cookie = 'sess=abc123'
+        assert a1.download(days=5).read() == OFX_RESPONSE % '1111'
+        assert a2.download(days=5).read() == OFX_RESPONSE % '2222'
+        assert len(self.server.requests) == 2
+        assert session.connections_opened == 2
+
+    def test_close_sessions(self):
+        a1 = self.account('1111')
+        a1.download(days=5)
+        session = a1.institution.client().session
+        assert len(session._idle) == 1
+        close_sessions()
+        assert session._idle == []
+        assert a1.institution.client().session is not session
@@ -0,0 +1,168 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import sys
+import threading
+import time
+
+from biweeklybudget.ofxgetter import OfxGetter
+
+# https://code.google.com/p/mock/issues/detail?id=249
+# py>=3.4 should use unittest.mock not the mock package on pypi
+if (
+        sys.version_info[0] < 3 or
+        sys.version_info[0] == 3 and sys.version_info[1] < 4
+):
+    from mock import patch, call, Mock, DEFAULT  # noqa
+else:
+    from unittest.mock import patch, call, Mock, DEFAULT  # noqa
+
+pbm = 'biweeklybudget.ofxgetter'
+
+
+def inst(url):
+    return {'institution': {'url': url, 'org': 'org', 'id': '1'}}
+
+
+class TestOfxGetterConcurrent(object):
+
+    def setup_method(self):
+        with patch('%s.OfxGetter.__init__' % pbm) as m_init:
+            m_init.return_value = None
+            self.cls = OfxGetter(Mock())
+        self.cls._account_data = {
+            'a1': {'id': 1, 'config': inst('https://a')},
+            'a2': {'id': 2, 'config': inst('https://a')},
+            'a3': {'id': 3, 'config': inst('https://a')},
+            'b1': {'id': 4, 'config': inst('https://b')},
+            's1': {
+                'id': 5,
+                'config': {'module_name': 'foo.bar', 'class_name': 'Baz'}
+            }
+        }
+        self.lock = threading.Lock()
+        self.running = {}
+        self.max_running = {}
+        self.total = 0
+        self.max_total = 0
+
+    def download(self, name, days=30):
+        key = self.cls.institution_key(name)
+        with self.lock:
+            self.running[key] = self.running.get(key, 0) + 1
+            self.max_running[key] = max(
+                self.max_running.get(key, 0), self.running[key]
+            )
+            self.total += 1
+            self.max_total = max(self.max_total, self.total)
+        time.sleep(0.02)
+        with self.lock:
+            self.running[key] -= 1
+            self.total -= 1
+        if name == 'b1':
+            raise RuntimeError('foo')
+        return 'ofx-%s' % name
+
+    def test_institution_key(self):
+        assert self.cls.institution_key('a1') == ('https://a', 'org', '1')
+        assert self.cls.institution_key('s1') == ('foo.bar', 'Baz')
+
+    def test_get_all(self):
+        db_threads = set()
+
+        def se_db(name, fname, ofxdata):
+            db_threads.add(threading.current_thread())
+            if name == 'a2':
+                raise RuntimeError('bar')
+
+        with patch.object(
+            self.cls, '_download_ofx', side_effect=self.download
+        ), patch.object(
+            self.cls, '_write_ofx_file', side_effect=lambda n, d: n + '.ofx'
+        ), patch.object(
+            self.cls, '_ofx_to_db', side_effect=se_db
+        ) as m_db:
+            res = self.cls.get_all(days=10, workers=4, per_institution=2)
+        assert sorted(res.keys()) == ['a1', 'a2', 'a3', 'b1', 's1']
+        assert {k: v['success'] for k, v in res.items()} == {
+            'a1': True, 'a2': False, 'a3': True, 'b1': False, 's1': True
+        }
+        for v in res.values():
+            assert v['download'] >= 0.02
+        assert self.max_running[('https://a', 'org', '1')] == 2
+        assert 1 < self.max_total <= 4
+        assert db_threads == set([threading.current_thread()])
+        assert sorted(m_db.mock_calls) == [
+            call('a1', 'a1.ofx', 'ofx-a1'),
+            call('a2', 'a2.ofx', 'ofx-a2'),
+            call('a3', 'a3.ofx', 'ofx-a3'),
+            call('s1', 's1.ofx', 'ofx-s1')
+        ]
+
+    def test_get_all_serial(self):
+        with patch.object(
+            self.cls, '_download_ofx', side_effect=self.download
+        ), patch.object(
+            self.cls, '_write_ofx_file', side_effect=lambda n, d: n + '.ofx'
+        ), patch.object(self.cls, '_ofx_to_db') as m_db:
+            res = self.cls.get_all(account_names=['b1', 'a1', 's1'])
+        assert sorted(res.keys()) == ['a1', 'b1', 's1']
+        assert self.max_total == 1
+        assert m_db.mock_calls == [
+            call('a1', 'a1.ofx', 'ofx-a1'),
+            call('s1', 's1.ofx', 'ofx-s1')
+        ]
+
+    def test_get_all_bad_config(self):
+        self.cls._account_data['x1'] = {'id': 6, 'config': {}}
+        with patch.object(
+            self.cls, '_download_ofx', side_effect=self.download
+        ), patch.object(
+            self.cls, '_write_ofx_file', side_effect=lambda n, d: n + '.ofx'
+        ), patch.object(self.cls, '_ofx_to_db') as m_db:
+            res = self.cls.get_all(
+                account_names=['x1', 'a1', 'unknown'], workers=2
+            )
+        assert res == {
+            'x1': {'success': False, 'download': 0.0, 'db': 0.0},
+            'a1': {
+                'success': True, 'download': res['a1']['download'],
+                'db': res['a1']['db']
+            },
+            'unknown': {'success': False, 'download': 0.0, 'db': 0.0}
+        }
+        assert m_db.mock_calls == [call('a1', 'a1.ofx', 'ofx-a1')]
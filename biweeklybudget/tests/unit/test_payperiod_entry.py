@@ -0,0 +1,133 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import json
+import pytest
+from datetime import date
+from decimal import Decimal
+
+from biweeklybudget.flaskapp.jsonencoder import MagicJSONEncoder
+from biweeklybudget.payperiod_entry import PayPeriodEntry
+
+
+def trans_entry(**kwargs):
+    d = dict(
+        type='Transaction', id=1, date=date(2017, 3, 20), sched_type=None,
+        sched_trans_id=2, description='desc', amount=Decimal('12.34'),
+        budgeted_amount=Decimal('10.00'), account_id=3, account_name='acct',
+        reconcile_id=None, budgets={4: {'name': 'b', 'amount': Decimal('1')}},
+        planned_budget_id=4, planned_budget_name='b'
+    )
+    d.update(kwargs)
+    return PayPeriodEntry(**d)
+
+
+class TestPayPeriodEntry(object):
+
+    def test_transaction(self):
+        e = trans_entry()
+        expected = {
+            'type': 'Transaction',
+            'id': 1,
+            'date': date(2017, 3, 20),
+            'sched_type': None,
+            'sched_trans_id': 2,
+            'description': 'desc',
+            'amount': Decimal('12.34'),
+            'budgeted_amount': Decimal('10.00'),
+            'account_id': 3,
+            'account_name': 'acct',
+            'reconcile_id': None,
+            'budgets': {4: {'name': 'b', 'amount': Decimal('1')}},
+            'planned_budget_id': 4,
+            'planned_budget_name': 'b'
+        }
+        assert e.as_dict == expected
+        assert type(e.as_dict) is dict
+        assert e == expected
+        assert e['amount'] == Decimal('12.34')
+        assert e.amount == Decimal('12.34')
+        assert e.get('foo') is None
+        assert len(e) == 14
+        assert e.sort_key == (date(2017, 3, 20), Decimal('12.34'))
+        assert not hasattr(e, '__dict__')
+
+    def test_scheduled(self):
+        e = PayPeriodEntry(
+            type='ScheduledTransaction', id=1, date=None,
+            sched_type='per period', sched_trans_id=None, description='desc',
+            amount=Decimal('12.34'), budgeted_amount=None, account_id=3,
+            account_name='acct', reconcile_id=None, budgets={}
+        )
+        assert e.as_dict == {
+            'type': 'ScheduledTransaction',
+            'id': 1,
+            'date': None,
+            'sched_type': 'per period',
+            'sched_trans_id': None,
+            'description': 'desc',
+            'amount': Decimal('12.34'),
+            'budgeted_amount': None,
+            'account_id': 3,
+            'account_name': 'acct',
+            'reconcile_id': None,
+            'budgets': {}
+        }
+        assert 'planned_budget_id' not in e
+        with pytest.raises(KeyError):
+            e['planned_budget_id']
+        assert e.get('planned_budget_id', 'x') == 'x'
+        assert e.sort_key == (date.min, Decimal('12.34'))
+
+    def test_read_only(self):
+        e = trans_entry()
+        with pytest.raises(AttributeError):
+            e.amount = Decimal('1.00')
+        with pytest.raises(AttributeError):
+            e.foo = 'bar'
+        with pytest.raises(AttributeError):
+            del e.amount
+        with pytest.raises(TypeError):
+            e['amount'] = Decimal('1.00')
+
+    def test_json(self):
+        res = json.loads(json.dumps(
+            trans_entry(date=None, budgets={}), cls=MagicJSONEncoder
+        ))
+        assert res['class'] == 'PayPeriodEntry'
+        assert res['amount'] == 12.34
+        assert res['planned_budget_name'] == 'b'
@@ -0,0 +1,147 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import sys
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy.orm.session import Session
+
+from biweeklybudget.biweeklypayperiod import BiweeklyPayPeriod
+from biweeklybudget.payperiod_sums import PayPeriodSumsManager
+
+# https://code.google.com/p/mock/issues/detail?id=249
+# py>=3.4 should use unittest.mock not the mock package on pypi
+if (
+        sys.version_info[0] < 3 or
+        sys.version_info[0] == 3 and sys.version_info[1] < 4
+):
+    from mock import patch, call, Mock, DEFAULT  # noqa
+else:
+    from unittest.mock import patch, call, Mock, DEFAULT  # noqa
+
+pbm = 'biweeklybudget.payperiod_sums'
+
+
+class TestPeriodStartDates(object):
+
+    def test_start_dates(self):
+        mock_sess = Mock(spec_set=Session)
+        mock_sess.query.return_value.one.return_value = (
+            date(2017, 3, 20), date(2017, 4, 2)
+        )
+        mock_sess.query.return_value.scalar.return_value = date(2017, 5, 1)
+        cls = PayPeriodSumsManager(mock_sess)
+        with patch('%s.dtnow' % pbm) as mock_dtnow:
+            mock_dtnow.return_value = datetime(2017, 4, 10, 12, 0, 0)
+            res = cls.period_start_dates(periods_ahead=1)
+        assert res == [
+            date(2017, 3, 17), date(2017, 3, 31), date(2017, 4, 14),
+            date(2017, 4, 28)
+        ]
+
+    def test_no_transactions(self):
+        mock_sess = Mock(spec_set=Session)
+        mock_sess.query.return_value.one.return_value = (None, None)
+        mock_sess.query.return_value.scalar.return_value = None
+        cls = PayPeriodSumsManager(mock_sess)
+        with patch('%s.dtnow' % pbm) as mock_dtnow:
+            mock_dtnow.return_value = datetime(2017, 4, 10, 12, 0, 0)
+            res = cls.period_start_dates(periods_ahead=1)
+        assert res == [date(2017, 3, 31), date(2017, 4, 14)]
+
+
+class TestCompare(object):
+
+    def test_compare(self):
+        mock_sess = Mock(spec_set=Session)
+        cls = PayPeriodSumsManager(mock_sess)
+        pp = BiweeklyPayPeriod(date(2017, 3, 17), mock_sess)
+
+        def sums(allocated, spent):
+            return {
+                'allocated': Decimal(allocated),
+                'spent': Decimal(spent),
+                'trans_total': Decimal(spent)
+            }
+
+        pp._data_cache['budget_sums'] = {
+            1: sums('1.00', '2.00'),
+            2: sums('3.00', '4.00'),
+            3: sums('5.00', '6.00')
+        }
+        stored = {
+            1: sums('1.0000', '2.0000'),
+            2: sums('3.00', '4.50'),
+            4: sums('0.00', '0.00')
+        }
+        assert cls._compare(pp, stored) == [
+            '2017-03-17 budget 2: stored spent 4.50 != calculated 4.00',
+            '2017-03-17 budget 2: stored trans_total 4.50 != calculated 4.00',
+            '2017-03-17 budget 3: missing from stored sums',
+            '2017-03-17 budget 4: stored but not calculated'
+        ]
+
+
+class TestRebuild(object):
+
+    def test_rebuild(self):
+        mock_sess = Mock(spec_set=Session)
+        cls = PayPeriodSumsManager(mock_sess)
+        dates = [date(2017, 3, 17), date(2017, 3, 31)]
+        with patch.multiple(
+            pbm,
+            BATCH_SIZE=1,
+            PayPeriodBudgetSum=DEFAULT,
+            BiweeklyPayPeriod=DEFAULT
+        ) as mocks:
+            with patch.object(
+                cls, 'period_start_dates', return_value=dates
+            ) as mock_psd:
+                assert cls.rebuild(periods_ahead=3) == 2
+        assert mock_psd.mock_calls == [call(periods_ahead=3)]
+        assert mocks['PayPeriodBudgetSum'].mock_calls == [
+            call.invalidate(mock_sess)
+        ]
+        assert mocks['BiweeklyPayPeriod'].mock_calls == [
+            call.store_budget_sums({date(2017, 3, 17)}, mock_sess),
+            call.store_budget_sums({date(2017, 3, 31)}, mock_sess)
+        ]
+        assert mock_sess.mock_calls == [
+            call.commit(),
+            call.commit(),
+            call.commit()
+        ]
@@ -35,15 +35,19 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 ################################################################################
 """
 
-from biweeklybudget.plaid_updater import PlaidUpdateResult, PlaidUpdater
+from biweeklybudget.plaid_updater import (
+    PlaidUpdateResult, PlaidUpdater, plaid_update_job
+)
 from biweeklybudget.models.account import Account
 from biweeklybudget.models.ofx_transaction import OFXTransaction
 from biweeklybudget.models.plaid_items import PlaidItem
 from biweeklybudget.models.plaid_accounts import PlaidAccount
+from plaid import ApiException
 from plaid.api.plaid_api import PlaidApi
 from datetime import datetime, date
 from decimal import Decimal
 from pytz import UTC
+import threading
 
 from unittest.mock import Mock, patch, call, MagicMock, DEFAULT
 import pytest
@@ -72,7 +76,10 @@ class TestPlaidUpdateResult:
             'exception': 'foo',
             'statement_ids': [123],
             'added': 2,
-            'updated': 1
+            'updated': 1,
+            'removed': 0,
+            'fetch_time': 0.0,
+            'db_time': 0.0
         }
 
 
@@ -121,49 +128,168 @@ class PlaidUpdaterTester:
 class TestUpdate(PlaidUpdaterTester):
 
     def test_accounts_none(self):
-        item1 = Mock()
-        item2 = Mock()
-        item3 = Mock()
-        items = [item1, item2, item3]
-        res1 = Mock()
-        res2 = Mock()
-        res3 = Mock()
-        results = [res1, res2, res3]
+        items = [
+            Mock(item_id=f'Item{x}', access_token=f'Token{x}',
+                 sync_cursor=f'Cursor{x}')
+            for x in range(1, 4)
+        ]
+
+        def se_fetch(name, token, cursor, days):
+            return (token, cursor, days), None, 1.5
+
+        def se_write(item, data, exc, fetch_time):
+            return item.item_id, data, exc, fetch_time
+
         with patch(f'{pb}.available_items') as m_avail:
             m_avail.return_value = items
-            with patch(f'{pb}._do_item') as m_do_item:
-                m_do_item.side_effect = results
-                res = self.cls.update()
-        assert res == results
+            with patch.multiple(
+                pb, _fetch_item=DEFAULT, _write_item=DEFAULT
+            ) as mocks:
+                mocks['_fetch_item'].side_effect = se_fetch
+                mocks['_write_item'].side_effect = se_write
+                res = self.cls.update(workers=2)
+        assert res == [
+            ('Item1', ('Token1', 'Cursor1', 30), None, 1.5),
+            ('Item2', ('Token2', 'Cursor2', 30), None, 1.5),
+            ('Item3', ('Token3', 'Cursor3', 30), None, 1.5),
+        ]
         assert m_avail.mock_calls == [call()]
-        assert m_do_item.mock_calls == [
-            call(item1, days=30),
-            call(item2, days=30),
-            call(item3, days=30)
+        assert sorted(
+            mocks['_fetch_item'].call_args_list, key=lambda x: x[0][1]
+        ) == [
+            call(repr(items[0]), 'Token1', 'Cursor1', 30),
+            call(repr(items[1]), 'Token2', 'Cursor2', 30),
+            call(repr(items[2]), 'Token3', 'Cursor3', 30),
         ]
+        assert mocks['_write_item'].call_count == 3
 
     def test_accounts_specified(self):
-        item1 = Mock()
-        item2 = Mock()
-        item3 = Mock()
-        items = [item1, item2, item3]
-        res1 = Mock()
-        res3 = Mock()
-        results = [res1, res3]
+        items = [
+            Mock(item_id=f'Item{x}', access_token=f'Token{x}',
+                 sync_cursor=None)
+            for x in range(1, 4)
+        ]
         with patch(f'{pb}.available_items') as m_avail:
             m_avail.return_value = items
-            with patch(f'{pb}._do_item') as m_do_item:
-                m_do_item.side_effect = results
-                res = self.cls.update(items=[item1, item3], days=10)
-        assert res == results
+            with patch.multiple(
+                pb, _fetch_item=DEFAULT, _write_item=DEFAULT
+            ) as mocks:
+                mocks['_fetch_item'].return_value = 'data', None, 1.5
+                mocks['_write_item'].side_effect = \
+                    lambda item, *args: item.item_id
+                res = self.cls.update(items=[items[0], items[2]], days=10)
+        assert res == ['Item1', 'Item3']
         assert m_avail.mock_calls == []
-        assert m_do_item.mock_calls == [
-            call(item1, days=10),
-            call(item3, days=10)
+        assert sorted(
+            mocks['_fetch_item'].call_args_list, key=lambda x: x[0][1]
+        ) == [
+            call(repr(items[0]), 'Token1', None, 10),
+            call(repr(items[2]), 'Token3', None, 10),
         ]
+        assert sorted(
+            mocks['_write_item'].call_args_list, key=lambda x: x[0][0].item_id
+        ) == [
+            call(items[0], 'data', None, 1.5),
+            call(items[2], 'data', None, 1.5),
+        ]
+
+    def test_no_items(self):
+        with patch.multiple(
+            pb, _fetch_item=DEFAULT, _write_item=DEFAULT
+        ) as mocks:
+            assert self.cls.update(items=[]) == []
+        assert mocks['_fetch_item'].mock_calls == []
+
+    def test_parallel_single_writer(self):
+        """
+        Fetches for all items run concurrently, and every write happens on
+        the calling thread.
+        """
+        items = [
+            Mock(item_id=f'Item{x}', access_token=f'Token{x}',
+                 sync_cursor=None)
+            for x in range(1, 5)
+        ]
+        barrier = threading.Barrier(4, timeout=5)
+        writer_threads = []
 
+        def se_fetch(name, token, cursor, days):
+            # deadlocks (and times out) unless all 4 fetches run at once
+            barrier.wait()
+            return token, None, 0.1
 
-class TestDoItem(PlaidUpdaterTester):
+        def se_write(item, data, exc, fetch_time):
+            writer_threads.append(threading.get_ident())
+            return data
+
+        with patch.multiple(
+            pb, _fetch_item=DEFAULT, _write_item=DEFAULT
+        ) as mocks:
+            mocks['_fetch_item'].side_effect = se_fetch
+            mocks['_write_item'].side_effect = se_write
+            res = self.cls.update(items=items, workers=4)
+        assert res == ['Token1', 'Token2', 'Token3', 'Token4']
+        assert writer_threads == [threading.get_ident()] * 4
+
+    def test_progress(self):
+        items = [
+            Mock(item_id=f'Item{x}', access_token=f'Token{x}',
+                 sync_cursor=None)
+            for x in range(1, 3)
+        ]
+        mock_progress = Mock()
+        with patch.multiple(
+            pb, _fetch_item=DEFAULT, _write_item=DEFAULT
+        ) as mocks:
+            mocks['_fetch_item'].return_value = 'data', None, 1.5
+            res = self.cls.update(items=items, progress=mock_progress)
+        assert len(res) == 2
+        assert mock_progress.mock_calls == [call(1, 2), call(2, 2)]
+
+
+class TestPlaidUpdateJob:
+
+    def test_all(self):
+        mock_db = Mock()
+        mock_progress = Mock()
+        results = [Mock(as_dict='r1'), Mock(as_dict='r2')]
+        with patch(f'{pbm}.PlaidUpdater') as m_updater:
+            m_updater.return_value.update.return_value = results
+            res = plaid_update_job(
+                mock_db, {'item_ids': 'ALL', 'num_days': 12}, mock_progress
+            )
+        assert res == ['r1', 'r2']
+        assert m_updater.mock_calls == [
+            call.available_items(),
+            call(),
+            call().update(
+                items=m_updater.available_items.return_value, days=12,
+                progress=mock_progress
+            )
+        ]
+        assert mock_db.mock_calls == []
+
+    def test_ids(self):
+        mock_db = Mock()
+        mock_db.query.return_value.get.side_effect = lambda x: f'item_{x}'
+        mock_progress = Mock()
+        with patch(f'{pbm}.PlaidUpdater') as m_updater:
+            m_updater.return_value.update.return_value = []
+            res = plaid_update_job(
+                mock_db, {'item_ids': ['a', 'b'], 'num_days': 30},
+                mock_progress
+            )
+        assert res == []
+        assert m_updater.mock_calls == [
+            call(),
+            call().update(
+                items=['item_a', 'item_b'], days=30, progress=mock_progress
+            )
+        ]
+        assert mock_db.query.mock_calls[0] == call(PlaidItem)
+
+
+class TestWriteItem(PlaidUpdaterTester):
 
     def test_happy_path(self):
         acctA = Mock(spec_set=Account)
@@ -180,25 +306,22 @@ class TestDoItem(PlaidUpdaterTester):
         ]
         mock_item = Mock(
             item_id='Item1', access_token='Token1',
-            last_updated=datetime(2019, 1, 1, 1, 1, 1)
+            last_updated=datetime(2019, 1, 1, 1, 1, 1), sync_cursor='Cursor1'
         )
-        self.mock_client.item_get.return_value = {
-            'item': {},
-            'status': {'transactions': {'foo': 'bar'}}
-        }
-        txns = [
+        data = (
+            datetime(2020, 5, 25, 0, 0, 0),
             [
                 {'account_id': 1, 'amount': 10},
                 {'account_id': 1, 'amount': 11},
                 {'account_id': 3, 'amount': 30}
             ],
+            [],
             {
                 1: {'account_id': 1, 'foo': 'bar'},
                 3: {'account_id': 3, 'baz': 'blam'}
-            }
-        ]
-
-        mock_igr = Mock()
+            },
+            'Cursor2'
+        )
 
         def se_sfa(_, acct, *args):
             if acct['account_id'] == 1:
@@ -210,17 +333,13 @@ class TestDoItem(PlaidUpdaterTester):
             db_session=DEFAULT,
             PlaidAccount=DEFAULT,
             dtnow=DEFAULT,
-            ItemGetRequest=DEFAULT,
         ) as mocks:
             mocks['db_session'].query.return_value.filter. \
                 return_value.all.return_value = accts
-            mocks['ItemGetRequest'].return_value = mock_igr
             with patch(f'{pb}._stmt_for_acct') as m_sfa:
                 m_sfa.side_effect = se_sfa
                 mocks['dtnow'].return_value = datetime(2020, 5, 25, 0, 0, 0)
-                with patch(f'{pb}._get_transactions') as m_gt:
-                    m_gt.return_value = txns
-                    res = self.cls._do_item(mock_item, 15)
+                res = self.cls._write_item(mock_item, data, None, 1.5)
         assert isinstance(res, PlaidUpdateResult)
         assert res.item == mock_item
         assert res.updated == 7
@@ -228,6 +347,8 @@ class TestDoItem(PlaidUpdaterTester):
         assert res.success is True
         assert res.exc is None
         assert res.stmt_ids == ['sid1', 'sid2']
+        assert res.fetch_time == 1.5
+        assert res.db_time >= 0
         assert m_sfa.mock_calls == [
             call(
                 acctA,
@@ -248,6 +369,7 @@ class TestDoItem(PlaidUpdaterTester):
             )
         ]
         assert mock_item.last_updated == datetime(2020, 5, 25, 0, 0, 0)
+        assert mock_item.sync_cursor == 'Cursor2'
         assert mocks['db_session'].mock_calls == [
             call.query(mocks['PlaidAccount']),
             call.query().filter(False),
@@ -255,16 +377,64 @@ class TestDoItem(PlaidUpdaterTester):
             call.add(mock_item),
             call.commit()
         ]
-        assert mocks['ItemGetRequest'].mock_calls == [
-            call(access_token='Token1')
+
+    def test_removed(self):
+        acctA = Mock(spec_set=Account)
+        accts = [
+            Mock(
+                spec_set=PlaidAccount, item_id='Item1', account_id=1,
+                account=acctA
+            ),
         ]
-        assert m_gt.mock_calls == [
+        mock_item = Mock(
+            item_id='Item1', access_token='Token1',
+            last_updated=datetime(2019, 1, 1, 1, 1, 1), sync_cursor='Cursor1'
+        )
+        data = (
+            datetime(2020, 5, 25, 0, 0, 0),
+            [{'account_id': 1, 'amount': 10}],
+            [
+                {'account_id': 1, 'transaction_id': 'r1'},
+                {'account_id': 1, 'transaction_id': 'r2'},
+                {'account_id': 3, 'transaction_id': 'r3'}
+            ],
+            {1: {'account_id': 1, 'foo': 'bar'}},
+            'Cursor2'
+        )
+
+        with patch.multiple(
+            pbm,
+            db_session=DEFAULT,
+            PlaidAccount=DEFAULT,
+            dtnow=DEFAULT,
+        ) as mocks:
+            mocks['db_session'].query.return_value.filter. \
+                return_value.all.return_value = accts
+            mocks['dtnow'].return_value = datetime(2020, 5, 25, 0, 0, 0)
+            with patch.multiple(
+                pb,
+                _stmt_for_acct=DEFAULT,
+                _remove_transactions=DEFAULT,
+            ) as pmocks:
+                pmocks['_stmt_for_acct'].return_value = 'sid1', 1, 0
+                pmocks['_remove_transactions'].return_value = 2
+                res = self.cls._write_item(mock_item, data, None, 1.5)
+        assert res.success is True
+        assert res.added == 1
+        assert res.removed == 2
+        assert res.stmt_ids == ['sid1']
+        assert pmocks['_remove_transactions'].mock_calls == [
+            call(acctA, ['r1', 'r2'])
+        ]
+        assert pmocks['_stmt_for_acct'].mock_calls == [
             call(
-                'Token1',
-                datetime(2020, 5, 10, 0, 0, 0),
+                acctA,
+                {'account_id': 1, 'foo': 'bar'},
+                [{'account_id': 1, 'amount': 10}],
                 datetime(2020, 5, 25, 0, 0, 0)
             )
         ]
+        assert mock_item.sync_cursor == 'Cursor2'
 
     def test_acct_none(self):
         acctA = Mock(spec_set=Account)
@@ -280,25 +450,22 @@ class TestDoItem(PlaidUpdaterTester):
         ]
         mock_item = Mock(
             item_id='Item1', access_token='Token1',
-            last_updated=datetime(2019, 1, 1, 1, 1, 1)
+            last_updated=datetime(2019, 1, 1, 1, 1, 1), sync_cursor='Cursor1'
         )
-        self.mock_client.item_get.return_value = {
-            'item': {},
-            'status': {'transactions': {'foo': 'bar'}}
-        }
-        txns = [
+        data = (
+            datetime(2020, 5, 25, 0, 0, 0),
             [
                 {'account_id': 1, 'amount': 10},
                 {'account_id': 1, 'amount': 11},
                 {'account_id': 3, 'amount': 30}
             ],
+            [],
             {
                 1: {'account_id': 1, 'foo': 'bar'},
                 3: {'account_id': 3, 'baz': 'blam'}
-            }
-        ]
-
-        mock_igr = Mock()
+            },
+            'Cursor2'
+        )
 
         def se_sfa(_, acct, *args):
             if acct['account_id'] == 1:
@@ -310,17 +477,13 @@ class TestDoItem(PlaidUpdaterTester):
             db_session=DEFAULT,
             PlaidAccount=DEFAULT,
             dtnow=DEFAULT,
-            ItemGetRequest=DEFAULT,
         ) as mocks:
             mocks['db_session'].query.return_value.filter.\
                 return_value.all.return_value = accts
-            mocks['ItemGetRequest'].return_value = mock_igr
             with patch(f'{pb}._stmt_for_acct') as m_sfa:
                 m_sfa.side_effect = se_sfa
                 mocks['dtnow'].return_value = datetime(2020, 5, 25, 0, 0, 0)
-                with patch(f'{pb}._get_transactions') as m_gt:
-                    m_gt.return_value = txns
-                    res = self.cls._do_item(mock_item, 15)
+                res = self.cls._write_item(mock_item, data, None, 1.5)
         assert isinstance(res, PlaidUpdateResult)
         assert res.item == mock_item
         assert res.updated == 4
@@ -340,6 +503,7 @@ class TestDoItem(PlaidUpdaterTester):
             )
         ]
         assert mock_item.last_updated == datetime(2020, 5, 25, 0, 0, 0)
+        assert mock_item.sync_cursor == 'Cursor2'
         assert mocks['db_session'].mock_calls == [
             call.query(mocks['PlaidAccount']),
             call.query().filter(False),
@@ -347,230 +511,307 @@ class TestDoItem(PlaidUpdaterTester):
             call.add(mock_item),
             call.commit()
         ]
-        assert mocks['ItemGetRequest'].mock_calls == [
-            call(access_token='Token1')
-        ]
-        assert m_gt.mock_calls == [
-            call(
-                'Token1',
-                datetime(2020, 5, 10, 0, 0, 0),
-                datetime(2020, 5, 25, 0, 0, 0)
-            )
-        ]
+
+    def test_fetch_failed(self):
+        mock_item = Mock(
+            item_id='Item1', access_token='Token1',
+            last_updated=datetime(2019, 1, 1, 1, 1, 1), sync_cursor='Cursor1'
+        )
+        ex = RuntimeError('foo')
+        with patch.multiple(
+            pbm,
+            db_session=DEFAULT,
+            dtnow=DEFAULT,
+        ) as mocks:
+            with patch(f'{pb}._stmt_for_acct') as m_sfa:
+                res = self.cls._write_item(mock_item, None, ex, 1.5)
+        assert isinstance(res, PlaidUpdateResult)
+        assert res.item == mock_item
+        assert res.updated == 0
+        assert res.added == 0
+        assert res.success is False
+        assert res.exc == ex
+        assert res.stmt_ids is None
+        assert res.fetch_time == 1.5
+        assert res.db_time == 0.0
+        assert m_sfa.mock_calls == []
+        assert mock_item.sync_cursor == 'Cursor1'
+        assert mocks['db_session'].mock_calls == []
 
     def test_exception(self):
         acctA = Mock(spec_set=Account)
-        acctB = Mock(spec_set=Account)
         accts = [
             Mock(
                 spec_set=PlaidAccount, item_id='Item1', account_id=1,
                 account=acctA
             ),
-            Mock(
-                spec_set=PlaidAccount, item_id='Item1', account_id=3,
-                account=acctB
-            ),
         ]
         mock_item = Mock(
             item_id='Item1', access_token='Token1',
-            last_updated=datetime(2019, 1, 1, 1, 1, 1)
+            last_updated=datetime(2019, 1, 1, 1, 1, 1), sync_cursor='Cursor1'
+        )
+        data = (
+            datetime(2020, 5, 25, 0, 0, 0),
+            [{'account_id': 1, 'amount': 10}],
+            [],
+            {1: {'account_id': 1, 'foo': 'bar'}},
+            'Cursor2'
         )
-        self.mock_client.item_get.return_value = {
-            'item': {},
-            'status': {'transactions': {'foo': 'bar'}}
-        }
-        txns = [
-            [
-                {'account_id': 1, 'amount': 10},
-                {'account_id': 1, 'amount': 11},
-                {'account_id': 3, 'amount': 30}
-            ],
-            {
-                1: {'account_id': 1, 'foo': 'bar'},
-                3: {'account_id': 3, 'baz': 'blam'}
-            }
-        ]
-
-        mock_igr = Mock()
-
-        def se_sfa(_, acct, *args):
-            if acct['account_id'] == 1:
-                return 'sid1', 1, 4
-            return 'sid2', 2, 3
-
         ex = RuntimeError('foo')
         with patch.multiple(
             pbm,
             db_session=DEFAULT,
             PlaidAccount=DEFAULT,
             dtnow=DEFAULT,
-            ItemGetRequest=DEFAULT,
         ) as mocks:
             mocks['db_session'].query.return_value.filter. \
                 return_value.all.return_value = accts
-            mocks['ItemGetRequest'].return_value = mock_igr
             with patch(f'{pb}._stmt_for_acct') as m_sfa:
-                m_sfa.side_effect = se_sfa
-                mocks['dtnow'].return_value = datetime(2020, 5, 25, 0, 0, 0)
-                with patch(f'{pb}._get_transactions') as m_gt:
-                    m_gt.side_effect = ex
-                    res = self.cls._do_item(mock_item, 15)
-        assert isinstance(res, PlaidUpdateResult)
-        assert res.item == mock_item
-        assert res.updated == 0
-        assert res.added == 0
+                m_sfa.side_effect = ex
+                res = self.cls._write_item(mock_item, data, None, 1.5)
         assert res.success is False
         assert res.exc == ex
         assert res.stmt_ids is None
-        assert m_sfa.mock_calls == []
-        assert mocks['db_session'].mock_calls == []
+        assert res.fetch_time == 1.5
+        assert mock_item.sync_cursor == 'Cursor1'
+        assert mocks['db_session'].mock_calls == [
+            call.query(mocks['PlaidAccount']),
+            call.query().filter(False),
+            call.query().filter().all(),
+            call.rollback()
+        ]
+
+
+class TestFetchItem(PlaidUpdaterTester):
+
+    def test_happy_path(self):
+        self.mock_client.item_get.return_value = {
+            'item': {},
+            'status': {'transactions': {'foo': 'bar'}}
+        }
+        mock_igr = Mock()
+        sync_res = ([{'trans': 1}], [], {1: {'account_id': 1}}, 'Cursor2')
+        with patch.multiple(
+            pbm,
+            dtnow=DEFAULT,
+            ItemGetRequest=DEFAULT,
+            db_session=DEFAULT,
+        ) as mocks:
+            mocks['dtnow'].return_value = datetime(2020, 5, 25, 0, 0, 0)
+            mocks['ItemGetRequest'].return_value = mock_igr
+            with patch(f'{pb}._sync_transactions') as m_st:
+                m_st.return_value = sync_res
+                data, exc, elapsed = self.cls._fetch_item(
+                    'Item1', 'Token1', 'Cursor1', 15
+                )
+        assert data == (
+            datetime(2020, 5, 25, 0, 0, 0),
+            [{'trans': 1}], [], {1: {'account_id': 1}}, 'Cursor2'
+        )
+        assert exc is None
+        assert elapsed >= 0
         assert mocks['ItemGetRequest'].mock_calls == [
             call(access_token='Token1')
         ]
-        assert m_gt.mock_calls == [
-            call(
-                'Token1',
-                datetime(2020, 5, 10, 0, 0, 0),
-                datetime(2020, 5, 25, 0, 0, 0)
-            )
-        ]
+        assert self.mock_client.item_get.mock_calls == [call(mock_igr)]
+        assert m_st.mock_calls == [call('Token1', 'Cursor1', 15)]
+        assert mocks['db_session'].mock_calls == []
 
+    def test_exception(self):
+        ex = RuntimeError('foo')
+        self.mock_client.item_get.return_value = {}
+        with patch.multiple(
+            pbm,
+            dtnow=DEFAULT,
+            ItemGetRequest=DEFAULT,
+        ):
+            with patch(f'{pb}._sync_transactions') as m_st:
+                m_st.side_effect = ex
+                data, exc, elapsed = self.cls._fetch_item(
+                    'Item1', 'Token1', None, 15
+                )
+        assert data is None
+        assert exc == ex
+        assert elapsed >= 0
 
-class TestGetTransactions(PlaidUpdaterTester):
 
-    def test_happy_path_no_paginate(self):
-        self.mock_client.transactions_get.return_value = {
-            'transactions': [
-                {'trans': 1}, {'trans': 2}, {'trans': 3}
-            ],
+class TestSyncTransactions(PlaidUpdaterTester):
+
+    def test_initial_sync_one_page(self):
+        self.mock_client.transactions_sync.return_value = {
+            'added': [{'trans': 1}, {'trans': 2}],
+            'modified': [{'trans': 3}],
+            'removed': [{'transaction_id': 'r1', 'account_id': 1}],
             'accounts': [
                 {'account_id': 1, 'foo': 'bar'},
                 {'account_id': 3, 'baz': 'blam'}
             ],
-            'total_transactions': 3
+            'next_cursor': 'c1',
+            'has_more': False
         }
-
-        mock_tgr1 = Mock()
-        mock_tgro1 = Mock()
+        mock_tsr1 = Mock()
+        mock_tsro1 = Mock()
 
         with patch.multiple(
             pbm,
-            TransactionsGetRequest=DEFAULT,
-            TransactionsGetRequestOptions=DEFAULT,
+            TransactionsSyncRequest=DEFAULT,
+            TransactionsSyncRequestOptions=DEFAULT,
         ) as mocks:
-            mocks['TransactionsGetRequest'].side_effect = [mock_tgr1]
-            mocks['TransactionsGetRequestOptions'].side_effect = [mock_tgro1]
-            res = self.cls._get_transactions(
-                'aToken', datetime(2020, 5, 10, 0, 0, 0),
-                datetime(2020, 5, 25, 0, 0, 0)
-            )
+            mocks['TransactionsSyncRequest'].side_effect = [mock_tsr1]
+            mocks['TransactionsSyncRequestOptions'].side_effect = [mock_tsro1]
+            res = self.cls._sync_transactions('aToken', None, 15)
         assert res == (
             [{'trans': 1}, {'trans': 2}, {'trans': 3}],
+            [{'transaction_id': 'r1', 'account_id': 1}],
             {
                 1: {'account_id': 1, 'foo': 'bar'},
                 3: {'account_id': 3, 'baz': 'blam'}
-            }
+            },
+            'c1'
         )
-        assert mocks['TransactionsGetRequest'].mock_calls == [
-            call(
-                access_token='aToken',
-                start_date=date(2020, 5, 10),
-                end_date=date(2020, 5, 25),
-                options=mock_tgro1
-            )
+        assert mocks['TransactionsSyncRequest'].mock_calls == [
+            call(access_token='aToken', count=500, options=mock_tsro1)
+        ]
+        assert mocks['TransactionsSyncRequestOptions'].mock_calls == [
+            call(days_requested=15)
+        ]
+        assert self.mock_client.transactions_sync.mock_calls == [
+            call(mock_tsr1)
         ]
-        assert mocks['TransactionsGetRequestOptions'].mock_calls == [call()]
 
-    def test_happy_path_paginate(self):
-        self.mock_client.transactions_get.side_effect = [
+    def test_cursor_paginate(self):
+        self.mock_client.transactions_sync.side_effect = [
             {
-                'transactions': [
-                    {'trans': 1}, {'trans': 2}
-                ],
-                'accounts': [
-                    {'account_id': 1, 'foo': 'bar'},
-                    {'account_id': 3, 'baz': 'blam'}
-                ],
-                'total_transactions': 5
+                'added': [{'trans': 1}, {'trans': 2}],
+                'modified': [],
+                'removed': [],
+                'accounts': [{'account_id': 1, 'foo': 'bar'}],
+                'next_cursor': 'c2',
+                'has_more': True
             },
             {
-                'transactions': [
-                    {'trans': 3}, {'trans': 4}
-                ],
-                'accounts': [
-                    {'account_id': 1, 'foo': 'bar'},
-                    {'account_id': 3, 'baz': 'blam'}
-                ],
-                'total_transactions': 5
-            },
-            {
-                'transactions': [
-                    {'trans': 5}
-                ],
-                'accounts': [
-                    {'account_id': 1, 'foo': 'bar'},
-                    {'account_id': 3, 'baz': 'blam'}
-                ],
-                'total_transactions': 5
+                'added': [{'trans': 3}],
+                'modified': [{'trans': 4}],
+                'removed': [{'transaction_id': 'r1', 'account_id': 1}],
+                'accounts': [{'account_id': 1, 'foo': 'baz'}],
+                'next_cursor': 'c3',
+                'has_more': False
             },
         ]
-
-        mock_tgr1 = Mock()
-        mock_tgro1 = Mock()
-        mock_tgr2 = Mock()
-        mock_tgro2 = Mock()
-        mock_tgr3 = Mock()
-        mock_tgro3 = Mock()
+        mock_tsr1 = Mock()
+        mock_tsr2 = Mock()
 
         with patch.multiple(
             pbm,
-            TransactionsGetRequest=DEFAULT,
-            TransactionsGetRequestOptions=DEFAULT,
+            TransactionsSyncRequest=DEFAULT,
+            TransactionsSyncRequestOptions=DEFAULT,
         ) as mocks:
-            mocks['TransactionsGetRequest'].side_effect = [
-                mock_tgr1, mock_tgr2, mock_tgr3
+            mocks['TransactionsSyncRequest'].side_effect = [
+                mock_tsr1, mock_tsr2
             ]
-            mocks['TransactionsGetRequestOptions'].side_effect = [
-                mock_tgro1, mock_tgro2, mock_tgro3
-            ]
-            res = self.cls._get_transactions(
-                'aToken', datetime(2020, 5, 10, 0, 0, 0),
-                datetime(2020, 5, 25, 0, 0, 0)
-            )
+            res = self.cls._sync_transactions('aToken', 'c1', 15)
         assert res == (
-            [
-                {'trans': 1}, {'trans': 2}, {'trans': 3}, {'trans': 4},
-                {'trans': 5}
-            ],
-            {
-                1: {'account_id': 1, 'foo': 'bar'},
-                3: {'account_id': 3, 'baz': 'blam'}
-            }
+            [{'trans': 1}, {'trans': 2}, {'trans': 3}, {'trans': 4}],
+            [{'transaction_id': 'r1', 'account_id': 1}],
+            {1: {'account_id': 1, 'foo': 'baz'}},
+            'c3'
         )
-        assert mocks['TransactionsGetRequest'].mock_calls == [
-            call(
-                access_token='aToken',
-                start_date=date(2020, 5, 10),
-                end_date=date(2020, 5, 25),
-                options=mock_tgro1
-            ),
-            call(
-                access_token='aToken',
-                start_date=date(2020, 5, 10),
-                end_date=date(2020, 5, 25),
-                options=mock_tgro2
-            ),
-            call(
-                access_token='aToken',
-                start_date=date(2020, 5, 10),
-                end_date=date(2020, 5, 25),
-                options=mock_tgro3
-            )
+        assert mocks['TransactionsSyncRequest'].mock_calls == [
+            call(access_token='aToken', count=500, cursor='c1'),
+            call(access_token='aToken', count=500, cursor='c2')
+        ]
+        assert mocks['TransactionsSyncRequestOptions'].mock_calls == []
+
+    def test_restart_on_mutation(self):
+        ex = ApiException(status=400)
+        ex.body = '{"error_code": ' \
+                  '"TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION"}'
+        self.mock_client.transactions_sync.side_effect = [
+            {
+                'added': [{'trans': 1}],
+                'modified': [],
+                'removed': [],
+                'accounts': [{'account_id': 1, 'foo': 'bar'}],
+                'next_cursor': 'c2',
+                'has_more': True
+            },
+            ex,
+            {
+                'added': [{'trans': 1}, {'trans': 2}],
+                'modified': [],
+                'removed': [],
+                'accounts': [{'account_id': 1, 'foo': 'bar'}],
+                'next_cursor': 'c3',
+                'has_more': False
+            },
         ]
-        assert mocks['TransactionsGetRequestOptions'].mock_calls == [
-            call(), call(offset=2), call(offset=4)
+
+        with patch.multiple(
+            pbm,
+            TransactionsSyncRequest=DEFAULT,
+            TransactionsSyncRequestOptions=DEFAULT,
+        ) as mocks:
+            res = self.cls._sync_transactions('aToken', 'c1', 15)
+        assert res == (
+            [{'trans': 1}, {'trans': 2}],
+            [],
+            {1: {'account_id': 1, 'foo': 'bar'}},
+            'c3'
+        )
+        assert mocks['TransactionsSyncRequest'].mock_calls == [
+            call(access_token='aToken', count=500, cursor='c1'),
+            call(access_token='aToken', count=500, cursor='c2'),
+            call(access_token='aToken', count=500, cursor='c1')
         ]
 
+    def test_restart_limit(self):
+        ex = ApiException(status=400)
+        ex.body = '{"error_code": ' \
+                  '"TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION"}'
+        self.mock_client.transactions_sync.side_effect = ex
+
+        with patch.multiple(
+            pbm,
+            TransactionsSyncRequest=DEFAULT,
+            TransactionsSyncRequestOptions=DEFAULT,
+        ):
+            with pytest.raises(ApiException):
+                self.cls._sync_transactions('aToken', 'c1', 15)
+        assert self.mock_client.transactions_sync.call_count == 4
+
+    def test_other_api_error(self):
+        ex = ApiException(status=400)
+        ex.body = '{"error_code": "ITEM_LOGIN_REQUIRED"}'
+        self.mock_client.transactions_sync.side_effect = ex
+
+        with patch.multiple(
+            pbm,
+            TransactionsSyncRequest=DEFAULT,
+            TransactionsSyncRequestOptions=DEFAULT,
+        ):
+            with pytest.raises(ApiException):
+                self.cls._sync_transactions('aToken', 'c1', 15)
+        assert self.mock_client.transactions_sync.call_count == 1
+
+
+class TestRemoveTransactions(PlaidUpdaterTester):
+
+    def test_remove(self):
+        acct = Mock(spec_set=Account, id=2)
+        type(acct).name = 'AcctName'
+        t1 = Mock(spec_set=OFXTransaction, fitid='a', reconcile=None)
+        t2 = Mock(spec_set=OFXTransaction, fitid='b', reconcile=Mock())
+        t3 = Mock(spec_set=OFXTransaction, fitid='c', reconcile=None)
+
+        with patch(f'{pbm}.db_session') as m_db:
+            m_db.query.return_value.filter.return_value.all.return_value = [
+                t1, t2, t3
+            ]
+            res = self.cls._remove_transactions(acct, ['a', 'b', 'c', 'd'])
+        assert res == 2
+        assert m_db.mock_calls[0] == call.query(OFXTransaction)
+        assert m_db.delete.mock_calls == [call(t1), call(t3)]
+
 
 class TestStmtForAcct(PlaidUpdaterTester):
 
@@ -940,6 +1181,7 @@ class TestUpdateBankOrCredit(PlaidUpdaterTester):
         assert mock_stmt.currency == 'USD'
         assert mock_db.mock_calls == [call.add(mock_stmt)]
         assert mock_acct.mock_calls == [
+            call.set_latest_statement(mock_stmt),
             call.set_balance(
                 overall_date=end_dt,
                 ledger=Decimal('1234.57'),
@@ -1020,6 +1262,7 @@ class TestUpdateBankOrCredit(PlaidUpdaterTester):
         assert mock_stmt.currency == 'USD'
         assert mock_db.mock_calls == [call.add(mock_stmt)]
         assert mock_acct.mock_calls == [
+            call.set_latest_statement(mock_stmt),
             call.set_balance(
                 overall_date=end_dt,
                 ledger=Decimal('1234.57'),
@@ -1073,6 +1316,7 @@ class TestUpdateBankOrCredit(PlaidUpdaterTester):
         assert mock_stmt.currency == 'USD'
         assert mock_db.mock_calls == [call.add(mock_stmt)]
         assert mock_acct.mock_calls == [
+            call.set_latest_statement(mock_stmt),
             call.set_balance(
                 overall_date=end_dt,
                 ledger=Decimal('1234.57'),
@@ -1104,6 +1348,7 @@ class TestUpdateInvestment(PlaidUpdaterTester):
         assert mock_stmt.currency == 'USD'
         assert mock_db.mock_calls == [call.add(mock_stmt)]
         assert mock_acct.mock_calls == [
+            call.set_latest_statement(mock_stmt),
             call.set_balance(
                 overall_date=end_dt,
                 ledger=Decimal('1234.57'),
@@ -0,0 +1,224 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import sys
+from collections import namedtuple
+
+from biweeklybudget.models.account import Account
+from biweeklybudget.models.ofx_transaction import (
+    OFXTransaction, clear_matcher_cache
+)
+from biweeklybudget.reclassify import (
+    reclassify_account, reclassify_job, start_reclassify, job_status, wait
+)
+
+# https://code.google.com/p/mock/issues/detail?id=249
+# py>=3.4 should use unittest.mock not the mock package on pypi
+if (
+        sys.version_info[0] < 3 or
+        sys.version_info[0] == 3 and sys.version_info[1] < 4
+):
+    from mock import patch, call, Mock, DEFAULT  # noqa
+else:
+    from unittest.mock import patch, call, Mock, DEFAULT  # noqa
+
+pbm = 'biweeklybudget.reclassify'
+
+Row = namedtuple(
+    'Row', [
+        'fitid', 'name', 'is_interest_charge', 'is_interest_payment',
+        'is_payment', 'is_late_fee', 'is_other_fee'
+    ]
+)
+
+
+class TestReclassifyAccount(object):
+
+    def setup_method(self):
+        clear_matcher_cache()
+
+    def teardown_method(self):
+        clear_matcher_cache()
+
+    def test_reclassify(self):
+        acct = Account(id=2, re_payment='^pay', re_late_fee='^late')
+        rows1 = [
+            Row('a', 'Payment', False, False, True, False, False),
+            Row('b', 'Late', False, False, True, False, False),
+        ]
+        rows2 = [
+            Row('c', 'Payment', False, False, False, False, False),
+            Row(
+                'd', 'Interest Charged - MANUALLY ENTERED',
+                True, False, False, False, False
+            ),
+        ]
+        mock_db = Mock()
+        q = mock_db.query.return_value
+        q.filter.return_value = q
+        q.order_by.return_value = q
+        q.limit.return_value = q
+        q.get.return_value = acct
+        q.scalar.return_value = 4
+        q.all.side_effect = [rows1, rows2, []]
+        progress = Mock()
+        res = reclassify_account(mock_db, 2, progress=progress, chunk_size=2)
+        assert res == 2
+        assert progress.mock_calls == [call(2, 4), call(4, 4)]
+        assert mock_db.commit.call_count == 2
+        assert q.limit.mock_calls == [call(2), call(2), call(2)]
+        assert q.update.mock_calls == [
+            call({
+                'is_interest_charge': False, 'is_interest_payment': False,
+                'is_late_fee': True, 'is_other_fee': False,
+                'is_payment': False
+            }, synchronize_session=False),
+            call({
+                'is_interest_charge': False, 'is_interest_payment': False,
+                'is_late_fee': False, 'is_other_fee': False,
+                'is_payment': True
+            }, synchronize_session=False)
+        ]
+        # the fitid of the last row of each chunk is used for the next one
+        filters = [str(c[1][0]) for c in q.filter.mock_calls]
+        assert filters.count('ofx_trans.fitid > :fitid_1') == 2
+        updates = [c[1][1] for c in q.filter.mock_calls if len(c[1]) == 2]
+        assert len(updates) == 2
+        assert str(updates[1]) == str(OFXTransaction.fitid.in_(['c']))
+
+
+def job(job_id, state, result=None, error=None):
+    return {
+        'id': job_id, 'job_type': 'reclassify', 'job_key': 'reclassify:5',
+        'state': state, 'done': 3, 'total': 4, 'message': None,
+        'result': result, 'error': error, 'created': None, 'started': None,
+        'finished': None
+    }
+
+
+class TestBackgroundJob(object):
+
+    def test_reclassify_job(self):
+        mock_db = Mock()
+        mock_progress = Mock()
+        with patch('%s.reclassify_account' % pbm) as mock_reclassify:
+            mock_reclassify.return_value = 2
+            res = reclassify_job(mock_db, {'account_id': 5}, mock_progress)
+        assert res == {'updated': 2}
+        assert mock_reclassify.mock_calls == [
+            call(mock_db, 5, mock_progress)
+        ]
+
+    def test_start(self):
+        with patch('%s.runner' % pbm) as mock_runner:
+            mock_runner.return_value.statuses_for_key.return_value = [
+                job(2, 'done', result={'updated': 1})
+            ]
+            start_reclassify(5)
+        assert mock_runner.mock_calls == [
+            call(),
+            call().statuses_for_key('reclassify:5', limit=2),
+            call().enqueue(
+                'reclassify', {'account_id': 5}, job_key='reclassify:5'
+            )
+        ]
+
+    def test_start_already_queued(self):
+        with patch('%s.runner' % pbm) as mock_runner:
+            mock_runner.return_value.statuses_for_key.return_value = [
+                job(3, 'queued'), job(2, 'running')
+            ]
+            start_reclassify(5)
+        assert mock_runner.mock_calls == [
+            call(),
+            call().statuses_for_key('reclassify:5', limit=2)
+        ]
+
+    def test_job_status(self):
+        with patch('%s.runner' % pbm) as mock_runner:
+            mock_runner.return_value.statuses_for_key.return_value = [
+                job(3, 'done', result={'updated': 2}), job(2, 'failed')
+            ]
+            res = job_status(5)
+        assert res == {
+            'account_id': 5,
+            'job_id': 3,
+            'state': 'done',
+            'done': 3,
+            'total': 4,
+            'updated': 2,
+            'error': None,
+            'rerun': False
+        }
+        assert mock_runner.return_value.statuses_for_key.mock_calls == [
+            call('reclassify:5', limit=2)
+        ]
+
+    def test_job_status_failed(self):
+        with patch('%s.runner' % pbm) as mock_runner:
+            mock_runner.return_value.statuses_for_key.return_value = [
+                job(3, 'failed', error='foo')
+            ]
+            res = job_status(5)
+        assert res['state'] == 'failed'
+        assert res['error'] == 'foo'
+        assert res['updated'] is None
+
+    def test_job_status_rerun(self):
+        with patch('%s.runner' % pbm) as mock_runner:
+            mock_runner.return_value.statuses_for_key.return_value = [
+                job(3, 'queued'), job(2, 'running')
+            ]
+            res = job_status(5)
+        assert res['job_id'] == 2
+        assert res['state'] == 'running'
+        assert res['rerun'] is True
+
+    def test_job_status_none(self):
+        with patch('%s.runner' % pbm) as mock_runner:
+            mock_runner.return_value.statuses_for_key.return_value = []
+            assert job_status(5) is None
+
+    def test_wait(self):
+        with patch('%s.runner' % pbm) as mock_runner:
+            mock_runner.return_value.statuses_for_key.return_value = [
+                job(4, 'queued'), job(3, 'running'), job(2, 'done')
+            ]
+            wait(5, timeout=10)
+        assert mock_runner.return_value.wait.mock_calls == [
+            call(4, timeout=10), call(3, timeout=10)
+        ]
@@ -0,0 +1,292 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import sys
+from datetime import date, timedelta
+from decimal import Decimal
+from sqlalchemy.orm.session import Session
+
+from biweeklybudget.biweeklypayperiod import BiweeklyPayPeriod
+from biweeklybudget.models.scheduled_transaction import ScheduledTransaction
+from biweeklybudget.recurrence import RecurrenceEngine, Occurrence
+
+# https://code.google.com/p/mock/issues/detail?id=249
+# py>=3.4 should use unittest.mock not the mock package on pypi
+if (
+        sys.version_info[0] < 3 or
+        sys.version_info[0] == 3 and sys.version_info[1] < 4
+):
+    from mock import Mock
+else:
+    from unittest.mock import Mock
+
+
+def st(id, **kwargs):
+    d = {
+        'id': id, 'date': None, 'day_of_month': None, 'num_per_period': None,
+        'day_of_week': None, 'annual_month': None, 'annual_day': None,
+        'amount': Decimal('1.00')
+    }
+    d.update(kwargs)
+    m = Mock(spec_set=ScheduledTransaction, **d)
+    for k, v in [
+        ('date', 'date'), ('day_of_month', 'monthly'),
+        ('num_per_period', 'per period'), ('day_of_week', 'weekly'),
+        ('annual_month', 'annual')
+    ]:
+        if d[k] is not None:
+            m.schedule_type = v
+            break
+    return m
+
+
+class TestRecurrenceEngine(object):
+
+    def test_empty(self):
+        res = RecurrenceEngine([]).expand(date(2017, 3, 17), date(2017, 4, 20))
+        assert res == {
+            date(2017, 3, 17): [],
+            date(2017, 3, 31): [],
+            date(2017, 4, 14): []
+        }
+        assert list(res.keys()) == [
+            date(2017, 3, 17), date(2017, 3, 31), date(2017, 4, 14)
+        ]
+
+    def test_date(self):
+        s1 = st(1, date=date(2017, 3, 16))
+        s2 = st(2, date=date(2017, 3, 30))
+        s3 = st(3, date=date(2017, 3, 17))
+        s4 = st(4, date=date(2017, 3, 31))
+        s5 = st(5, date=date(2017, 3, 17))
+        res = RecurrenceEngine([s1, s2, s3, s4, s5]).expand(
+            date(2017, 3, 17), date(2017, 3, 30)
+        )
+        assert res == {
+            date(2017, 3, 17): [
+                Occurrence(date(2017, 3, 17), 'date', s3),
+                Occurrence(date(2017, 3, 17), 'date', s5),
+                Occurrence(date(2017, 3, 30), 'date', s2)
+            ]
+        }
+
+    def test_monthly(self):
+        s1 = st(1, day_of_month=1)
+        s2 = st(2, day_of_month=31)
+        s3 = st(3, day_of_month=20)
+        s4 = st(4, day_of_month=30)
+        res = RecurrenceEngine([s1, s2, s3, s4]).expand(
+            date(2017, 2, 17), date(2017, 4, 10)
+        )
+        assert res == {
+            date(2017, 2, 17): [
+                Occurrence(date(2017, 2, 20), 'monthly', s3),
+                Occurrence(date(2017, 3, 1), 'monthly', s1)
+            ],
+            date(2017, 3, 3): [],
+            date(2017, 3, 17): [
+                Occurrence(date(2017, 3, 20), 'monthly', s3),
+                Occurrence(date(2017, 3, 30), 'monthly', s4)
+            ],
+            date(2017, 3, 31): [
+                Occurrence(date(2017, 3, 31), 'monthly', s2),
+                Occurrence(date(2017, 4, 1), 'monthly', s1)
+            ]
+        }
+
+    def test_annual(self):
+        s1 = st(1, annual_month=1, annual_day=2)
+        s2 = st(2, annual_month=2, annual_day=29)
+        s3 = st(3, annual_month=12, annual_day=31)
+        res = RecurrenceEngine([s1, s2, s3]).expand(
+            date(2015, 12, 25), date(2016, 3, 10)
+        )
+        assert [
+            (k, v) for k, v in res.items() if len(v) > 0
+        ] == [
+            (date(2015, 12, 25), [
+                Occurrence(date(2015, 12, 31), 'annual', s3),
+                Occurrence(date(2016, 1, 2), 'annual', s1)
+            ]),
+            (date(2016, 2, 19), [
+                Occurrence(date(2016, 2, 29), 'annual', s2)
+            ])
+        ]
+        res = RecurrenceEngine([s2]).expand(
+            date(2017, 2, 17), date(2017, 3, 16)
+        )
+        assert res == {date(2017, 2, 17): [], date(2017, 3, 3): []}
+
+    def test_weekly_and_per_period(self):
+        # 2017-03-17 is a Friday
+        s1 = st(1, day_of_week=4)
+        s2 = st(2, day_of_week=0)
+        s3 = st(3, num_per_period=2)
+        s4 = st(4, num_per_period=1)
+        res = RecurrenceEngine([s1, s2, s3, s4]).expand(
+            date(2017, 3, 17), date(2017, 3, 31)
+        )
+        assert res == {
+            date(2017, 3, 17): [
+                Occurrence(None, 'per period', s3),
+                Occurrence(None, 'per period', s3),
+                Occurrence(None, 'per period', s4),
+                Occurrence(date(2017, 3, 17), 'weekly', s1),
+                Occurrence(date(2017, 3, 20), 'weekly', s2),
+                Occurrence(date(2017, 3, 24), 'weekly', s1),
+                Occurrence(date(2017, 3, 27), 'weekly', s2)
+            ],
+            date(2017, 3, 31): [
+                Occurrence(None, 'per period', s3),
+                Occurrence(None, 'per period', s3),
+                Occurrence(None, 'per period', s4),
+                Occurrence(date(2017, 3, 31), 'weekly', s1),
+                Occurrence(date(2017, 4, 3), 'weekly', s2),
+                Occurrence(date(2017, 4, 7), 'weekly', s1),
+                Occurrence(date(2017, 4, 10), 'weekly', s2)
+            ]
+        }
+
+    def test_matches_per_period_expansion(self):
+        """
+        Expanding two years at once gives the same results as the existing
+        per-period :py:class:`~.BiweeklyPayPeriod` methods.
+        """
+        sched = [st(100 + i, date=date(2017, 3, 17) + timedelta(days=i * 9))
+                 for i in range(80)]
+        sched += [st(200 + d, day_of_month=d) for d in range(1, 29)]
+        sched += [
+            st(300 + i, annual_month=m, annual_day=d)
+            for i, (m, d) in enumerate([(1, 1), (2, 28), (6, 15), (12, 31)])
+        ]
+        sched += [st(400 + d, day_of_week=d) for d in range(0, 7)]
+        engine = RecurrenceEngine(sched)
+        res = engine.expand(date(2017, 3, 17), date(2019, 3, 14))
+        assert len(res) == 52
+        mock_sess = Mock(spec_set=Session)
+        for start, occs in res.items():
+            pp = BiweeklyPayPeriod(start, mock_sess)
+            expected = [
+                t for t in sched
+                if t.schedule_type == 'date' and
+                pp.start_date <= t.date <= pp.end_date
+            ]
+            assert [
+                o.sched_trans for o in occs if o.sched_type == 'date'
+            ] == expected
+            for o in occs:
+                assert o.date is None or pp.start_date <= o.date <= pp.end_date
+            monthly = [o for o in occs if o.sched_type == 'monthly']
+            sd = pp.start_date.day
+            ed = pp.end_date.day
+            assert [o.sched_trans.day_of_month for o in monthly] == sorted(
+                [
+                    t.day_of_month for t in sched
+                    if t.schedule_type == 'monthly' and (
+                        sd <= t.day_of_month <= ed if sd < ed
+                        else t.day_of_month <= ed or t.day_of_month >= sd
+                    )
+                ],
+                key=lambda x: (x < sd, x)
+            )
+            for o in monthly:
+                assert o.date == pp._dict_for_sched_trans(
+                    o.sched_trans
+                )['date']
+            assert [
+                o.sched_trans for o in occs if o.sched_type == 'annual'
+            ] == sorted(
+                pp._filter_annual_for_period(
+                    [t for t in sched if t.schedule_type == 'annual']
+                ),
+                key=lambda t: pp._dict_for_sched_trans(t)['date']
+            )
+            for t in sched:
+                if t.schedule_type != 'weekly':
+                    continue
+                assert [
+                    o.date for o in occs if o.sched_trans is t
+                ] == pp._dates_for_weekday_in_period(t.day_of_week)
+
+    def test_matches_per_period_short_months(self):
+        """
+        Monthly days that some months lack and annual February 29th are
+        skipped the same way by the engine and by
+        :py:class:`~.BiweeklyPayPeriod`. ``day_of_month`` is validated to
+        1-28 on the model, but the mocks bypass that.
+        """
+        sched = [st(200 + d, day_of_month=d) for d in range(27, 32)]
+        sched += [
+            st(300, annual_month=2, annual_day=29),
+            st(301, annual_month=2, annual_day=28),
+            st(302, annual_month=3, annual_day=1)
+        ]
+        engine = RecurrenceEngine(sched)
+        # covers 2019 and 2021 (non-leap) and 2020 (leap)
+        res = engine.expand(date(2019, 1, 4), date(2021, 12, 31))
+        mock_sess = Mock(spec_set=Session)
+        for start, occs in res.items():
+            pp = BiweeklyPayPeriod(start, mock_sess)
+            for stype, filt in [
+                ('monthly', pp._filter_monthly_for_period),
+                ('annual', pp._filter_annual_for_period)
+            ]:
+                got = [
+                    (o.date, o.sched_trans) for o in occs
+                    if o.sched_type == stype
+                ]
+                expected = sorted(
+                    [
+                        (pp._sched_trans_date(t), t)
+                        for t in filt(
+                            [t for t in sched if t.schedule_type == stype]
+                        )
+                    ],
+                    key=lambda x: x[0]
+                )
+                assert got == expected
+        dates = [
+            o.date for occs in res.values() for o in occs
+            if o.sched_trans.id in [229, 230, 231, 300]
+        ]
+        assert [d for d in dates if d.month == 2] == [
+            date(2020, 2, 29), date(2020, 2, 29)
+        ]
+        assert [d for d in dates if d.day == 31] == [
+            date(y, m, 31) for y in [2019, 2020, 2021]
+            for m in [1, 3, 5, 7, 8, 10, 12]
+        ]
@@ -1,11 +1,5 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
-try:
-    # python 3
-    from http.client import HTTPSConnection
-except ImportError:
-    # python 2
-    from httplib import HTTPSConnection
 import logging
 import time
 try:
@@ -16,6 +10,10 @@ except ImportError:
     from urllib import splittype, splithost
 import uuid
 
+from biweeklybudget.vendored.ofxclient.session import (
+    session_for, STALE_CONNECTION_ERRORS
+)
+
 DEFAULT_APP_ID = 'QWIN'
 DEFAULT_APP_VERSION = '2500'
 DEFAULT_OFX_VERSION = '102'
@@ -129,18 +127,37 @@ class Client:
         """
         Wrapper around ``_do_post()`` to handle accounts that require
         sending back session cookies (``self.set_cookies`` True).
+
+        Cookies are remembered in the institution's shared
+        :py:class:`~.session.Session` and sent with later requests, so that
+        other accounts at the same institution reuse the sign-on session.
         """
         res, response = self._do_post(query)
         cookies = res.getheader('Set-Cookie', None)
+        if cookies is not None:
+            self.session.set_cookie(cookies)
         if len(response) == 0 and cookies is not None and res.status == 200:
             logging.debug('Got 0-length 200 response with Set-Cookies header; '
                           'retrying request with cookies')
             _, response = self._do_post(query, [('Cookie', cookies)])
         return response
 
+    @property
+    def session(self):
+        """The shared :py:class:`~.session.Session` for this institution.
+
+        :rtype: :py:class:`~.session.Session`
+        """
+        scheme, path = splittype(self.institution.url)
+        host, _ = splithost(path)
+        return session_for(self.institution, scheme, host)
+
     def _do_post(self, query, extra_headers=[]):
         """
-        Do a POST to the Institution.
+        Do a POST to the Institution, on a keep-alive connection from the
+        institution's shared :py:class:`~.session.Session`. If a reused
+        connection turns out to have been closed by the server, the request
+        is retried once on a new connection.
 
         :param query: Body content to POST (OFX Query)
         :type query: str
@@ -154,11 +171,7 @@ class Client:
         logging.debug('posting data to %s' % i.url)
         garbage, path = splittype(i.url)
         host, selector = splithost(path)
-        h = HTTPSConnection(host, timeout=60)
-        # Discover requires a particular ordering of headers, so send the
-        # request step by step.
-        h.putrequest('POST', selector, skip_host=True,
-                     skip_accept_encoding=True)
+        session = self.session
         headers = [
             ('Content-Type', 'application/x-ofx'),
             ('Host', host),
@@ -171,6 +184,35 @@ class Client:
             headers.append(('User-Agent', self.user_agent))
         for ehname, ehval in extra_headers:
             headers.append((ehname, ehval))
+        if session.cookie is not None and 'Cookie' not in dict(headers):
+            headers.append(('Cookie', session.cookie))
+        while True:
+            h, reused = session.checkout()
+            try:
+                res, response = self._send(h, selector, headers, query)
+            except STALE_CONNECTION_ERRORS:
+                h.close()
+                if not reused:
+                    raise
+                logging.debug('reused connection was closed; retrying')
+                continue
+            except Exception:
+                h.close()
+                raise
+            session.checkin(h, res)
+            return res, response
+
+    def _send(self, h, selector, headers, query):
+        """
+        Send one request on a connection and read the whole response.
+
+        :return: 2-tuple of (HTTPResponse, str response body)
+        :rtype: tuple
+        """
+        # Discover requires a particular ordering of headers, so send the
+        # request step by step.
+        h.putrequest('POST', selector, skip_host=True,
+                     skip_accept_encoding=True)
         logging.debug('---- request headers ----')
         for hname, hval in headers:
             logging.debug('%s: %s', hname, hval)
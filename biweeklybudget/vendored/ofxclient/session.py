@@ -0,0 +1,131 @@
+from __future__ import absolute_import
+from __future__ import unicode_literals
+try:
+    # python 3
+    from http.client import HTTPConnection, HTTPSConnection, HTTPException
+except ImportError:
+    # python 2
+    from httplib import HTTPConnection, HTTPSConnection, HTTPException
+import logging
+import threading
+
+#: Exceptions that mean a reused keep-alive connection was closed by the
+#: server; the request is retried once on a new connection.
+STALE_CONNECTION_ERRORS = (HTTPException, ConnectionError)
+
+#: Whether ``http://`` institution URLs use plain HTTP. Off by default, so
+#: that credentials and session cookies are always sent over HTTPS; only for
+#: testing against a local stub OFX server.
+ALLOW_PLAIN_HTTP = False
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class Session(object):
+    """Persistent HTTP(S) session with one institution
+
+    Holds a pool of idle keep-alive connections to the institution's OFX
+    server and the last session cookie that the server set, so that all
+    requests to one institution in a run (authentication, account listing
+    and each account's statement download) share TCP/TLS connections and
+    sign-on cookies instead of setting them up for every request.
+
+    A session can be used from multiple threads; each request checks out its
+    own connection.
+
+    :param scheme: URL scheme, ``https`` or ``http``; ``http`` only uses
+      plain HTTP if :py:data:`ALLOW_PLAIN_HTTP` is set
+    :type scheme: string
+    :param host: host (and optional port) to connect to
+    :type host: string
+    :param timeout: socket timeout in seconds
+    :type timeout: int
+    """
+    def __init__(self, scheme, host, timeout=60):
+        self.scheme = scheme
+        self.host = host
+        self.timeout = timeout
+        self.cookie = None
+        self.connections_opened = 0
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _new_connection(self):
+        if self.scheme == 'http' and ALLOW_PLAIN_HTTP:
+            cls = HTTPConnection
+        else:
+            cls = HTTPSConnection
+        with self._lock:
+            self.connections_opened += 1
+        logging.debug('opening new %s connection to %s',
+                      cls.__name__, self.host)
+        return cls(self.host, timeout=self.timeout)
+
+    def checkout(self):
+        """Return a connection to use for one request, and whether it is a
+        reused keep-alive connection.
+
+        :rtype: tuple of (HTTPConnection, bool)
+        """
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._new_connection(), False
+
+    def checkin(self, conn, response):
+        """Return a connection to the idle pool after its response has been
+        completely read, unless the server asked to close it.
+
+        :param conn: connection from :py:meth:`checkout`
+        :param response: the response read from ``conn``
+        :type response: HTTPResponse
+        """
+        if response.will_close:
+            conn.close()
+            return
+        with self._lock:
+            self._idle.append(conn)
+
+    def set_cookie(self, cookie):
+        with self._lock:
+            self.cookie = cookie
+
+    def close(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle = self._idle
+            self._idle = []
+        for conn in idle:
+            conn.close()
+
+
+def session_for(institution, scheme, host):
+    """Get the shared :py:class:`Session` for an institution, creating it if
+    needed. Institutions with the same URL, org, FI ID and username share a
+    session, even if they are different ``Institution`` instances (i.e. one
+    per deserialized account).
+
+    :param institution: the institution
+    :type institution: :py:class:`ofxclient.Institution`
+    :param scheme: URL scheme, ``https`` or ``http``
+    :type scheme: string
+    :param host: host (and optional port) to connect to
+    :type host: string
+    :rtype: :py:class:`Session`
+    """
+    key = (institution.url, institution.org, institution.id,
+           institution.username)
+    with _sessions_lock:
+        if key not in _sessions:
+            _sessions[key] = Session(scheme, host)
+        return _sessions[key]
+
+
+def close_sessions():
+    """Close and forget all shared sessions; call at the end of a run."""
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for s in sessions:
+        s.close()
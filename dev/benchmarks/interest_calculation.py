@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""
+Development script to benchmark
+:py:meth:`biweeklybudget.interest.AdbCompoundedDaily.calculate`, and a
+minimum-payment :py:func:`biweeklybudget.interest.calculate_payoffs`
+simulation for six cards, compared to stepping through every day of each
+billing period.
+
+Usage:
+
+    SETTINGS_MODULE=biweeklybudget.tests.fixtures.test_settings \\
+        python dev/benchmarks/interest_calculation.py
+
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import timeit
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from biweeklybudget.interest import (
+    AdbCompoundedDaily, MinPaymentDiscover, MinPaymentMethod, _BillingPeriod,
+    CCStatement, calculate_payoffs, _InterestCalculation
+)
+
+NUM_CALLS = 2000
+
+#: (APR, balance) of each card in the payoff simulation
+CARDS = [
+    ('0.2499', '12000.00'),
+    ('0.1999', '8500.00'),
+    ('0.2799', '4300.00'),
+    ('0.1499', '15250.00'),
+    ('0.2199', '2900.00'),
+    ('0.0999', '6100.00'),
+]
+
+
+def day_loop(self, principal, first_d, last_d, transactions={}):
+    """
+    The day-by-day implementation of
+    :py:meth:`~.AdbCompoundedDaily.calculate`, for comparison.
+    """
+    dpr = self._apr / Decimal(365.0)
+    interest = Decimal(0.0)
+    num_days = 0
+    bal_total = Decimal(0.0)
+    bal = principal
+    d = first_d
+    while d <= last_d:
+        num_days += 1
+        if d in transactions:
+            bal += transactions[d]
+        int_amt = bal * dpr
+        interest += int_amt
+        bal += int_amt
+        bal_total += bal
+        d += timedelta(days=1)
+    adb = bal_total / Decimal(num_days)
+    final = adb * self._apr * num_days / Decimal(365.0)
+    bal += final * dpr
+    return {
+        'interest_paid': final,
+        'end_balance': bal
+    }
+
+
+def statements():
+    return [
+        CCStatement(
+            AdbCompoundedDaily(Decimal(apr)), Decimal(bal),
+            MinPaymentDiscover(), _BillingPeriod(date(2017, 7, 31)),
+            end_balance=Decimal(bal), interest_amt=Decimal('0')
+        ) for apr, bal in CARDS
+    ]
+
+
+def bench_period():
+    cls = AdbCompoundedDaily(Decimal('0.2499'))
+    txns = {
+        date(2017, 7, 9): Decimal('-250.00'),
+        date(2017, 7, 21): Decimal('42.18')
+    }
+
+    def run():
+        cls.calculate(
+            Decimal('5498.65'), date(2017, 7, 1), date(2017, 7, 31), txns
+        )
+
+    closed = min(timeit.repeat(run, number=NUM_CALLS, repeat=5))
+    with patch.object(AdbCompoundedDaily, 'calculate', day_loop):
+        loop = min(timeit.repeat(run, number=NUM_CALLS, repeat=5))
+    return loop / NUM_CALLS * 1e6, closed / NUM_CALLS * 1e6
+
+
+def bench_payoffs():
+    def run():
+        return calculate_payoffs(MinPaymentMethod(), statements())
+
+    closed = min(timeit.repeat(run, number=1, repeat=3))
+    res = run()
+    with patch.object(AdbCompoundedDaily, 'calculate', day_loop):
+        with patch.object(
+            AdbCompoundedDaily, 'calculate_payment',
+            _InterestCalculation.calculate_payment
+        ):
+            loop = min(timeit.repeat(run, number=1, repeat=3))
+            loop_res = run()
+    for (m1, a1, _), (m2, a2, _) in zip(res, loop_res):
+        assert m1 == m2
+        assert a1.quantize(Decimal('0.01')) == a2.quantize(Decimal('0.01'))
+    return max(x[0] for x in res), loop, closed
+
+
+def main():
+    loop, closed = bench_period()
+    print('31-day billing period: %.1f us day loop, %.1f us closed form '
+          '(%.1fx)' % (loop, closed, loop / closed))
+    months, loop, closed = bench_payoffs()
+    print('%d-card minimum payment payoff (%d months): %.3f s day loop, '
+          '%.3f s closed form (%.1fx)' % (
+              len(CARDS), months, loop, closed, loop / closed
+          ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""
+Development script to benchmark the per-page-render overhead of the
+notifications shown at the top of every page
+(:py:class:`biweeklybudget.flaskapp.notifications.NotificationsController`),
+against the database configured by ``SETTINGS_MODULE`` / ``DB_CONNSTRING``.
+It compares the previous per-Account implementations of the account balance
+and unreconciled sums and stale account count with the current SQL
+aggregates, and uncached notifications with cached ones. Besides sums that
+the web application would store anyway, it does not modify the database.
+
+Usage:
+
+    SETTINGS_MODULE=biweeklybudget.tests.fixtures.test_settings \\
+        python dev/benchmarks/notifications.py
+
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import timeit
+from decimal import Decimal
+
+from sqlalchemy import event
+
+from biweeklybudget import settings
+from biweeklybudget.db import db_session, engine, init_db, cleanup_db
+from biweeklybudget.flaskapp.notifications import NotificationsController
+from biweeklybudget.models.account import Account
+
+NUM_RENDERS = 20
+
+
+def legacy_num_stale_accounts():
+    return sum(
+        1 if a.is_stale else 0 for a in db_session.query(
+            Account).filter(Account.is_active.__eq__(True)).all()
+    )
+
+
+def legacy_budget_account_sum():
+    total = Decimal('0.0')
+    for acct in db_session.query(Account).filter(
+        Account.is_budget_source.__eq__(True), Account.is_active.__eq__(True)
+    ):
+        if acct.balance is not None:
+            total += acct.balance.ledger
+    return total
+
+
+def legacy_budget_account_unreconciled():
+    total = Decimal('0.0')
+    for acct in db_session.query(Account).filter(
+        Account.is_budget_source.__eq__(True), Account.is_active.__eq__(True)
+    ):
+        total += acct.unreconciled_sum
+    return total
+
+
+class QueryCounter(object):
+
+    def __init__(self):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._before)
+
+    def _before(self, *args):
+        self.count += 1
+
+
+def bench(name, func, counter):
+    def run():
+        # start each "request" with an empty identity map, like the app does
+        db_session.expire_all()
+        func()
+
+    run()
+    before = counter.count
+    run()
+    queries = counter.count - before
+    t = min(timeit.repeat(run, number=NUM_RENDERS, repeat=3)) / NUM_RENDERS
+    print('%-36s %10.2f ms %8d queries' % (name, t * 1000, queries))
+
+
+def main():
+    init_db()
+    counter = QueryCounter()
+    for name in [
+        'num_stale_accounts', 'budget_account_sum',
+        'budget_account_unreconciled'
+    ]:
+        legacy = globals()['legacy_' + name]()
+        current = getattr(NotificationsController, name)()
+        assert legacy == current, '%s: %s != %s' % (name, legacy, current)
+    for name, func in [
+        ('legacy num_stale_accounts', legacy_num_stale_accounts),
+        ('num_stale_accounts', NotificationsController.num_stale_accounts),
+        ('legacy budget_account_sum', legacy_budget_account_sum),
+        ('budget_account_sum', NotificationsController.budget_account_sum),
+        (
+            'legacy budget_account_unreconciled',
+            legacy_budget_account_unreconciled
+        ),
+        (
+            'budget_account_unreconciled',
+            NotificationsController.budget_account_unreconciled
+        ),
+        ('pp_sum', NotificationsController.pp_sum),
+        ('get_notifications (uncached)',
+         NotificationsController.get_notifications)
+    ]:
+        bench(name, func, counter)
+    settings.NOTIFICATIONS_CACHE_SECONDS = 60
+    NotificationsController.clear_cache()
+    bench(
+        'cached_notifications', NotificationsController.cached_notifications,
+        counter
+    )
+    cleanup_db()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""
+Development script to benchmark OFX statement ingest throughput, in
+transactions per second, of
+:py:meth:`biweeklybudget.ofxapi.local.OfxApiLocal._update_bank_or_credit`
+with the previous one-query-per-transaction :py:func:`~.upsert_record` loop
+and with the current :py:func:`~.bulk_upsert_records`, for both new
+transactions and re-imports of existing ones. Runs against the database
+configured by ``SETTINGS_MODULE`` / ``DB_CONNSTRING``, using the first active
+Bank or Credit account; all changes are rolled back.
+
+Usage:
+
+    SETTINGS_MODULE=biweeklybudget.tests.fixtures.test_settings \\
+        python dev/benchmarks/ofx_ingest.py [NUM_TRANSACTIONS]
+
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import sys
+import time
+from io import BytesIO
+
+from ofxparse import OfxParser
+from sqlalchemy import event
+
+from biweeklybudget.db import (
+    db_session, engine, init_db, cleanup_db, upsert_record
+)
+from biweeklybudget.models.account import Account, AcctType
+from biweeklybudget.models.ofx_transaction import OFXTransaction
+from biweeklybudget.ofxapi.local import OfxApiLocal
+from biweeklybudget.utils import dtnow
+
+OFX_TEMPLATE = """OFXHEADER:100
+DATA:OFXSGML
+VERSION:103
+SECURITY:NONE
+ENCODING:USASCII
+CHARSET:1252
+COMPRESSION:NONE
+OLDFILEUID:NONE
+NEWFILEUID:NONE
+
+<OFX><SIGNONMSGSRSV1><SONRS><STATUS><CODE>0<SEVERITY>INFO</STATUS>\
+<DTSERVER>20170728053000.0000[-0:UTC]<LANGUAGE>ENG</SONRS></SIGNONMSGSRSV1>\
+<CREDITCARDMSGSRSV1><CCSTMTTRNRS><TRNUID>1<STATUS><CODE>0<SEVERITY>INFO\
+</STATUS><CCSTMTRS><CURDEF>USD<CCACCTFROM><ACCTID>Bench</CCACCTFROM>\
+<BANKTRANLIST><DTSTART>20170101000000.000[-0:UTC]\
+<DTEND>20170728053000.000[-0:UTC]%s</BANKTRANLIST><LEDGERBAL>\
+<BALAMT>-1234.56<DTASOF>20170728052932.0000[-0:UTC]</LEDGERBAL></CCSTMTRS>\
+</CCSTMTTRNRS></CREDITCARDMSGSRSV1></OFX>"""
+
+TXN_TEMPLATE = '<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20170727160000.000' \
+               '<TRNAMT>-%d.%02d<FITID>BENCH%08d<NAME>Benchmark %d</STMTTRN>'
+
+
+def make_ofx(num_txns, seed):
+    txns = ''.join(
+        TXN_TEMPLATE % (i % 500, seed, i, i) for i in range(num_txns)
+    )
+    return OfxParser.parse(BytesIO((OFX_TEMPLATE % txns).encode('ascii')))
+
+
+def legacy_update_bank_or_credit(self, acct, ofx, stmt):
+    db_session.add(stmt)
+    for txn in ofx.account.statement.transactions:
+        kwargs = OFXTransaction.params_from_ofxparser_transaction(
+            txn, acct.id, stmt, cat_memo=acct.ofx_cat_memo_to_name
+        )
+        upsert_record(OFXTransaction, ['account_id', 'fitid'], **kwargs)
+    return stmt
+
+
+class QueryCounter(object):
+
+    def __init__(self):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._before)
+
+    def _before(self, *args):
+        self.count += 1
+
+
+def ingest(api, update_func, acct, ofx, name):
+    stmt = api._create_statement(acct, ofx, dtnow(), name)
+    update_func(api, acct, ofx, stmt)
+    db_session.flush()
+
+
+def bench(name, update_func, acct_id, num_txns, counter):
+    api = OfxApiLocal(db_session)
+    new_ofx = make_ofx(num_txns, 1)
+    upd_ofx = make_ofx(num_txns, 2)
+    try:
+        for label, ofx in [('new', new_ofx), ('update', upd_ofx)]:
+            # start with an empty identity map, like a new ofxgetter run
+            db_session.expunge_all()
+            acct = db_session.query(Account).get(acct_id)
+            before = counter.count
+            start = time.time()
+            ingest(api, update_func, acct, ofx, 'bench-%s-%s' % (name, label))
+            elapsed = time.time() - start
+            print('%-8s %-8s %10.0f txn/s %8d queries' % (
+                name, label, num_txns / elapsed, counter.count - before
+            ))
+    finally:
+        db_session.rollback()
+
+
+def main():
+    num_txns = 2000
+    if len(sys.argv) > 1:
+        num_txns = int(sys.argv[1])
+    init_db()
+    counter = QueryCounter()
+    acct = db_session.query(Account).filter(
+        Account.is_active.__eq__(True),
+        Account.acct_type.in_([AcctType.Bank, AcctType.Credit])
+    ).order_by(Account.id).first()
+    print('Ingesting %d transactions to %s' % (num_txns, acct))
+    bench('legacy', legacy_update_bank_or_credit, acct.id, num_txns, counter)
+    bench(
+        'bulk', OfxApiLocal._update_bank_or_credit, acct.id, num_txns, counter
+    )
+    cleanup_db()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+"""
+Development script to benchmark
+:py:func:`biweeklybudget.interest.calculate_payoffs` for long payoffs of
+several cards, compared to paying each card's statement with
+:py:meth:`biweeklybudget.interest.CCStatement.pay` every month.
+
+Usage:
+
+    SETTINGS_MODULE=biweeklybudget.tests.fixtures.test_settings \\
+        python dev/benchmarks/payoff_simulation.py
+
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import timeit
+from datetime import date
+from decimal import Decimal
+
+from biweeklybudget.interest import (
+    AdbCompoundedDaily, SimpleInterest, MinPaymentAmEx, MinPaymentCiti,
+    MinPaymentDiscover, MinPaymentMethod, LowestBalanceFirstMethod,
+    HighestInterestRateFirstMethod, _BillingPeriod, CCStatement,
+    calculate_payoffs
+)
+
+#: (interest calculation, minimum payment formula, APR, balance) of each card
+CARDS = [
+    (AdbCompoundedDaily, MinPaymentDiscover, '0.2499', '12000.00'),
+    (AdbCompoundedDaily, MinPaymentAmEx, '0.1999', '8500.00'),
+    (SimpleInterest, MinPaymentCiti, '0.2799', '4300.00'),
+    (AdbCompoundedDaily, MinPaymentDiscover, '0.1499', '15250.00'),
+    (AdbCompoundedDaily, MinPaymentCiti, '0.2199', '2900.00'),
+    (SimpleInterest, MinPaymentAmEx, '0.0999', '6100.00'),
+]
+
+METHODS = [
+    ('minimum payment', lambda: MinPaymentMethod()),
+    (
+        'lowest balance first',
+        lambda: LowestBalanceFirstMethod(Decimal('1500.00'))
+    ),
+    (
+        'highest interest rate first',
+        lambda: HighestInterestRateFirstMethod(Decimal('1500.00'))
+    ),
+]
+
+
+def statements():
+    return [
+        CCStatement(
+            icls(Decimal(apr)), Decimal(bal), mcls(),
+            _BillingPeriod(date(2017, 7, 31)),
+            end_balance=Decimal(bal), interest_amt=Decimal('0')
+        ) for icls, mcls, apr, bal in CARDS
+    ]
+
+
+def ccstatement_payoffs(payment_method, statements):
+    """
+    Pay off the statements by calling :py:meth:`~.CCStatement.pay` for each
+    unpaid card every month, for comparison.
+    """
+    def unpaid(s): return [x for x in s.keys() if s[x]['done'] is False]
+    payoffs = {}
+    for idx, stmt in enumerate(statements):
+        payoffs[stmt] = {
+            'months': 0, 'amt': Decimal('0.0'), 'idx': idx, 'done': False,
+            'next_pymt_amt': None
+        }
+    while len(unpaid(payoffs)) > 0:
+        u = unpaid(payoffs)
+        to_pay = payment_method.find_payments(u)
+        for stmt, p_amt in dict(zip(u, to_pay)).items():
+            if stmt.principal <= Decimal('0'):
+                payoffs[stmt]['done'] = True
+                continue
+            if stmt.principal <= p_amt:
+                payoffs[stmt]['done'] = True
+                payoffs[stmt]['months'] += 1
+                payoffs[stmt]['amt'] += stmt.principal
+                if payoffs[stmt]['next_pymt_amt'] is None:
+                    payoffs[stmt]['next_pymt_amt'] = stmt.principal
+                continue
+            payoffs[stmt]['months'] += 1
+            payoffs[stmt]['amt'] += p_amt
+            if payoffs[stmt]['next_pymt_amt'] is None:
+                payoffs[stmt]['next_pymt_amt'] = p_amt
+            new_s = stmt.pay(Decimal('-1') * p_amt)
+            payoffs[new_s] = payoffs[stmt]
+            del payoffs[stmt]
+    res = []
+    for s in sorted(payoffs, key=lambda x: payoffs[x]['idx']):
+        tmp = (
+            payoffs[s]['months'],
+            payoffs[s]['amt'],
+            payoffs[s]['next_pymt_amt']
+        )
+        if payoffs[s]['next_pymt_amt'] is None:
+            tmp = (
+                payoffs[s]['months'],
+                payoffs[s]['amt'],
+                Decimal('0.0')
+            )
+        res.append(tmp)
+    return res
+
+
+def bench(method):
+    res = calculate_payoffs(method(), statements())
+    assert res == ccstatement_payoffs(method(), statements())
+    old = min(timeit.repeat(
+        lambda: ccstatement_payoffs(method(), statements()),
+        number=1, repeat=5
+    ))
+    new = min(timeit.repeat(
+        lambda: calculate_payoffs(method(), statements()),
+        number=10, repeat=5
+    )) / 10
+    return max(x[0] for x in res), old, new
+
+
+def main():
+    print('%-28s %7s %14s %14s %8s' % (
+        'method', 'months', 'CCStatement', 'simulation', 'speedup'
+    ))
+    for name, method in METHODS:
+        months, old, new = bench(method)
+        print('%-28s %7d %12.4f s %12.4f s %7.1fx' % (
+            name, months, old, new, old / new
+        ))
+
+
+if __name__ == "__main__":
+    main()
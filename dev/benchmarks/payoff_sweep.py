@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Development script to benchmark
+:py:meth:`biweeklybudget.interest.PayoffSimulation.sweep` over 100 maximum
+total monthly payment amounts for each payoff method shown in the UI,
+compared to a separate :py:func:`biweeklybudget.interest.calculate_payoffs`
+run for every amount.
+
+Usage:
+
+    SETTINGS_MODULE=biweeklybudget.tests.fixtures.test_settings \\
+        python dev/benchmarks/payoff_sweep.py
+
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import time
+from datetime import date
+from decimal import Decimal
+
+from biweeklybudget.interest import (
+    AdbCompoundedDaily, SimpleInterest, MinPaymentAmEx, MinPaymentCiti,
+    MinPaymentDiscover, _BillingPeriod, CCStatement, calculate_payoffs,
+    PayoffSimulation, PAYOFF_METHOD_NAMES, sweep_amounts
+)
+
+#: (interest calculation, minimum payment formula, APR, balance) of each card
+CARDS = [
+    (AdbCompoundedDaily, MinPaymentDiscover, '0.2499', '12000.00'),
+    (AdbCompoundedDaily, MinPaymentAmEx, '0.1999', '8500.00'),
+    (SimpleInterest, MinPaymentCiti, '0.2799', '4300.00'),
+    (AdbCompoundedDaily, MinPaymentDiscover, '0.1499', '15250.00'),
+    (AdbCompoundedDaily, MinPaymentCiti, '0.2199', '2900.00'),
+    (SimpleInterest, MinPaymentAmEx, '0.0999', '6100.00'),
+]
+
+AMOUNTS = sweep_amounts(Decimal('1000'), Decimal('5950'), Decimal('50'))
+
+
+def statements():
+    return [
+        CCStatement(
+            icls(Decimal(apr)), Decimal(bal), mcls(),
+            _BillingPeriod(date(2017, 7, 31)),
+            end_balance=Decimal(bal), interest_amt=Decimal('0')
+        ) for icls, mcls, apr, bal in CARDS
+    ]
+
+
+def separate(cls):
+    res = []
+    for amt in AMOUNTS:
+        try:
+            res.append((calculate_payoffs(cls(amt), statements()), None))
+        except TypeError as ex:
+            res.append((None, str(ex)))
+    return res
+
+
+def main():
+    methods = [
+        (name, x['cls']) for name, x in sorted(PAYOFF_METHOD_NAMES.items())
+        if x['cls'].show_in_ui
+    ]
+    start = time.time()
+    expected = [separate(cls) for _, cls in methods]
+    old = time.time() - start
+    start = time.time()
+    sim = PayoffSimulation(statements())
+    res = [sim.sweep(cls, AMOUNTS) for _, cls in methods]
+    new = time.time() - start
+    assert res == expected
+    print('%d amounts x %d methods' % (len(AMOUNTS), len(methods)))
+    print('separate runs: %.3f s' % old)
+    print('sweep:         %.3f s' % new)
+    print('speedup:       %.1fx' % (old / new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""
+Development script to measure the build time and memory use of one pay
+period's transaction entries
+(:py:meth:`biweeklybudget.biweeklypayperiod.BiweeklyPayPeriod._make_combined_transactions`)
+with several thousand Transactions and ScheduledTransactions, comparing
+:py:class:`biweeklybudget.payperiod_entry.PayPeriodEntry` to the equivalent
+plain dicts (``as_dict``) sorted the way they were previously.
+
+Usage:
+
+    SETTINGS_MODULE=biweeklybudget.tests.fixtures.test_settings \\
+        python dev/benchmarks/payperiod_entries.py
+
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import random
+import timeit
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+from operator import attrgetter
+
+from biweeklybudget import biweeklypayperiod
+from biweeklybudget.biweeklypayperiod import BiweeklyPayPeriod
+from biweeklybudget.payperiod_entry import PayPeriodEntry
+
+NUM_TRANS = 1500
+NUM_SCHED = 500
+
+
+class Named(object):
+
+    def __init__(self, id):
+        self.id = id
+        self.name = 'name%d' % id
+
+
+class FakeBT(object):
+
+    def __init__(self, r):
+        self.budget = Named(r.randint(1, 20))
+        self.budget_id = self.budget.id
+        self.amount = Decimal(r.randint(1, 10000)) / 100
+
+
+class FakeTrans(object):
+
+    def __init__(self, id, start, r):
+        self.id = id
+        self.date = start + timedelta(days=r.randint(0, 13))
+        self.scheduled_trans_id = None
+        self.description = 'Transaction %d' % id
+        self.actual_amount = Decimal(r.randint(1, 10000)) / 100
+        self.budgeted_amount = None
+        self.account = Named(r.randint(1, 5))
+        self.account_id = self.account.id
+        self.reconcile = None
+        self.planned_budget = None
+        self.planned_budget_id = None
+        self.budget_transactions = [FakeBT(r) for _ in range(r.randint(1, 2))]
+
+
+class FakeST(object):
+
+    def __init__(self, id, start, r):
+        self.id = id
+        self.schedule_type = 'date'
+        self.date = start + timedelta(days=r.randint(0, 13))
+        self.description = 'ScheduledTransaction %d' % id
+        self.amount = Decimal(r.randint(1, 10000)) / 100
+        self.account = Named(r.randint(1, 5))
+        self.account_id = self.account.id
+        self.budget = Named(r.randint(1, 20))
+        self.budget_id = self.budget.id
+
+
+def legacy_sort(dicts):
+    """
+    Sort entry dicts the way they were sorted before PayPeriodEntry.
+    """
+    dicts = sorted(dicts, key=lambda k: k['date'])
+
+    def sortkey(k):
+        d = k.get('date', None)
+        if d is None:
+            d = date.min
+        return d, k['amount']
+
+    return sorted(dicts, key=sortkey)
+
+
+def retained(func):
+    """
+    Return the result of ``func`` and the number of bytes it allocated that
+    are still in use afterwards.
+    """
+    tracemalloc.start()
+    res = func()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return res, size
+
+
+def main():
+    r = random.Random(42)
+    pp = BiweeklyPayPeriod.period_for_date(date(2020, 1, 1), None)
+    pp._data_cache = {
+        'transactions': [
+            FakeTrans(i, pp.start_date, r) for i in range(NUM_TRANS)
+        ],
+        'st_date': [FakeST(i, pp.start_date, r) for i in range(NUM_SCHED)],
+        'st_per_period': [],
+        'st_monthly': [],
+        'st_weekly': [],
+        'st_annual': []
+    }
+    # let the fake transactions through the isinstance() check in _trans_dict
+    biweeklypayperiod.Transaction = FakeTrans
+    build = min(timeit.repeat(
+        pp._make_combined_transactions, number=10, repeat=3
+    )) / 10
+    entries = pp._make_combined_transactions()
+    print('%d entries per period; built and sorted in %.2f ms' % (
+        len(entries), build * 1000
+    ))
+    dicts = [e.as_dict for e in entries]
+    # memory of the containers only; values are shared by both
+    _, d_size = retained(lambda: [dict(d) for d in dicts])
+    _, e_size = retained(lambda: [PayPeriodEntry(**d) for d in dicts])
+    print('%-16s %12s %14s' % ('', 'memory (KiB)', 'sort (ms)'))
+    shuffled = list(entries)
+    r.shuffle(shuffled)
+    s_entries = min(timeit.repeat(
+        lambda: sorted(shuffled, key=attrgetter('sort_key')),
+        number=10, repeat=3
+    )) / 10
+    shuffled_dicts = [e.as_dict for e in shuffled]
+    s_dicts = min(timeit.repeat(
+        lambda: legacy_sort(shuffled_dicts), number=10, repeat=3
+    )) / 10
+    print('%-16s %12.1f %14.2f' % (
+        'PayPeriodEntry', e_size / 1024.0, s_entries * 1000
+    ))
+    print('%-16s %12.1f %14.2f' % ('dict', d_size / 1024.0, s_dicts * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Development script to benchmark
+:py:meth:`biweeklybudget.biweeklypayperiod.BiweeklyPayPeriod.period_for_date`
+for dates at increasing distances from ``PAY_PERIOD_START_DATE``. Latency
+should be flat regardless of distance.
+
+Usage:
+
+    SETTINGS_MODULE=biweeklybudget.tests.fixtures.test_settings \\
+        python dev/benchmarks/period_for_date.py
+
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import timeit
+from datetime import timedelta
+
+from biweeklybudget import settings
+from biweeklybudget.biweeklypayperiod import (
+    BiweeklyPayPeriod, clear_period_registry
+)
+
+NUM_CALLS = 10000
+
+
+def bench(years):
+    dt = settings.PAY_PERIOD_START_DATE + timedelta(days=int(365.25 * years))
+
+    def cold():
+        clear_period_registry()
+        BiweeklyPayPeriod.period_for_date(dt, None)
+
+    def warm():
+        BiweeklyPayPeriod.period_for_date(dt, None)
+
+    c = min(timeit.repeat(cold, number=NUM_CALLS, repeat=5)) / NUM_CALLS
+    warm()
+    w = min(timeit.repeat(warm, number=NUM_CALLS, repeat=5)) / NUM_CALLS
+    return c * 1e6, w * 1e6
+
+
+def main():
+    print('%-8s %14s %14s' % ('years', 'cold (us)', 'interned (us)'))
+    for years in [1, 10, 50]:
+        c, w = bench(years)
+        print('%-8d %14.3f %14.3f' % (years, c, w))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""
+Development script to benchmark
+:py:class:`biweeklybudget.recurrence.RecurrenceEngine` expanding several
+hundred ScheduledTransactions of every schedule type over five years of pay
+periods, compared to expanding them one period at a time with the
+per-period :py:class:`~biweeklybudget.biweeklypayperiod.BiweeklyPayPeriod`
+helpers.
+
+Usage:
+
+    SETTINGS_MODULE=biweeklybudget.tests.fixtures.test_settings \\
+        python dev/benchmarks/recurrence.py
+
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016-2024 Jason Antman <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import random
+import timeit
+from datetime import date, timedelta
+
+from biweeklybudget.biweeklypayperiod import BiweeklyPayPeriod
+from biweeklybudget.recurrence import RecurrenceEngine
+
+NUM_YEARS = 5
+NUM_PER_TYPE = 60
+
+
+class FakeST(object):
+    """
+    Minimal stand-in for a ScheduledTransaction, to avoid needing a database.
+    """
+
+    def __init__(self, schedule_type, **kwargs):
+        self.schedule_type = schedule_type
+        for k in [
+            'date', 'day_of_month', 'num_per_period', 'day_of_week',
+            'annual_month', 'annual_day'
+        ]:
+            setattr(self, k, kwargs.get(k, None))
+
+
+def make_sched(start):
+    r = random.Random(42)
+    res = []
+    for _ in range(NUM_PER_TYPE):
+        res.append(FakeST(
+            'date', date=start + timedelta(days=r.randint(0, 365 * NUM_YEARS))
+        ))
+        res.append(FakeST('monthly', day_of_month=r.randint(1, 28)))
+        res.append(FakeST(
+            'annual', annual_month=r.randint(1, 12), annual_day=r.randint(1, 28)
+        ))
+        res.append(FakeST('weekly', day_of_week=r.randint(0, 6)))
+        res.append(FakeST('per period', num_per_period=r.randint(1, 3)))
+    return res
+
+
+def per_period(sched, periods):
+    """
+    Expand ``sched`` one period at a time, the way a BiweeklyPayPeriod does.
+    """
+    by_type = {}
+    for t in sched:
+        by_type.setdefault(t.schedule_type, []).append(t)
+    res = {}
+    for pp in periods:
+        sd = pp.start_date.day
+        ed = pp.end_date.day
+        occ = [
+            t for t in by_type['date']
+            if pp.start_date <= t.date <= pp.end_date
+        ]
+        occ.extend(
+            t for t in by_type['monthly']
+            if (sd <= t.day_of_month <= ed if sd < ed else
+                t.day_of_month <= ed or t.day_of_month >= sd)
+        )
+        occ.extend(pp._filter_annual_for_period(by_type['annual']))
+        for t in by_type['weekly']:
+            occ.extend(pp._dates_for_weekday_in_period(t.day_of_week))
+        for t in by_type['per period']:
+            occ.extend([t] * t.num_per_period)
+        res[pp.start_date] = occ
+    return res
+
+
+def main():
+    start = BiweeklyPayPeriod.period_for_date(date(2020, 1, 1), None)
+    end = start.start_date + timedelta(days=int(365.25 * NUM_YEARS))
+    periods = [start]
+    while periods[-1].end_date < end:
+        periods.append(periods[-1].next)
+    sched = make_sched(start.start_date)
+    engine = RecurrenceEngine(sched)
+
+    def run_engine():
+        RecurrenceEngine(sched).expand(start.start_date, end)
+
+    def run_per_period():
+        per_period(sched, periods)
+
+    res = engine.expand(start.start_date, end)
+    print('%d ScheduledTransactions, %d periods, %d occurrences' % (
+        len(sched), len(res), sum(len(x) for x in res.values())
+    ))
+    for name, func in [
+        ('RecurrenceEngine', run_engine), ('per-period', run_per_period)
+    ]:
+        t = min(timeit.repeat(func, number=5, repeat=3)) / 5
+        print('%-18s %10.2f ms' % (name, t * 1000))
+
+
+if __name__ == "__main__":
+    main()
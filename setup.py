@@ -96,6 +96,8 @@ setup(
     ofxgetter = biweeklybudget.ofxgetter:main
     ofxbackfiller = biweeklybudget.backfill_ofx:main
     initdb = biweeklybudget.initdb:main
+    payperiodsums = biweeklybudget.payperiod_sums:main
+    indexadvisor = biweeklybudget.index_advisor:main
     wishlist2project = biweeklybudget.wishlist2project:main
     ofxclient = biweeklybudget.vendored.ofxclient.cli:run
     [flask.commands]